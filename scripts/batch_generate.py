@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from app.engine.offline import answer_offline
+
+
+def load_questions(path: Path, limit: int = 0) -> list[dict[str, Any]]:
+    samples = [
+        json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()
+    ]
+    return samples[:limit] if limit > 0 else samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Answer a question set offline through the provider's batch API"
+    )
+    parser.add_argument(
+        "dataset", type=str, nargs="?", default="data/golden/qa.jsonl", help="JSONL with question"
+    )
+    parser.add_argument("--out", type=str, default="reports/batch_answers.jsonl")
+    parser.add_argument(
+        "--workdir", type=str, default=None, help="Batch files (default: reports/batches/<time>)"
+    )
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank", action="store_true")
+    parser.add_argument("--limit", type=int, default=0, help="Limit number of questions (0 = all)")
+    parser.add_argument("--poll-s", type=float, default=None, help="Default: LLM_BATCH_POLL_S")
+    args = parser.parse_args()
+
+    samples = load_questions(Path(args.dataset), args.limit)
+    workdir = args.workdir or f"reports/batches/{datetime.now(UTC).strftime('%Y%m%dT%H%M%SZ')}"
+    answers = answer_offline(
+        [str(s["question"]) for s in samples],
+        workdir,
+        top_k=args.top_k,
+        rerank=args.rerank,
+        poll_s=args.poll_s,
+    )
+
+    # Same shape as the input, with generated answers and retrieved contexts, so the output
+    # can be scored with scripts/evaluate.py
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", encoding="utf-8") as f:
+        for i, (sample, result) in enumerate(zip(samples, answers.results, strict=True)):
+            row = dict(sample)
+            if result is None:
+                row.update(answer="", contexts=[], error=answers.errors.get(i))
+            else:
+                row.update(
+                    answer=result.answer,
+                    contexts=[c.text for c in result.citations],
+                    tokens=result.tokens,
+                )
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(
+        json.dumps(
+            {
+                "questions": len(samples),
+                "failed": len(answers.errors),
+                "batches": answers.batch_ids,
+                "timings_ms": answers.timings,
+                "out": str(out),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
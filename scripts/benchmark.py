@@ -0,0 +1,1237 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import requests
+
+SRC_DIR = str(Path(__file__).resolve().parents[1] / "src")
+
+
+def _env(extra: dict[str, str] | None = None) -> dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (SRC_DIR, env.get("PYTHONPATH")) if p)
+    env.update(extra or {})
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _wait_for(url: str, deadline: float) -> float | None:
+    """Poll `url` until it returns 200; return when it did, or None on timeout or failure.
+
+    A readiness body reporting ``state: failed`` (e.g. a model download error) ends the wait.
+    """
+    while time.perf_counter() < deadline:
+        try:
+            resp = requests.get(url, timeout=1)
+            if resp.status_code == 200:
+                return time.perf_counter()
+            if resp.headers.get("content-type", "").startswith("application/json"):
+                if resp.json().get("state") == "failed":
+                    return None
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def bench_cold_start(args: argparse.Namespace) -> dict[str, Any]:
+    """Measure `import app.main`, time until the port serves /health, and time until /ready."""
+    snippet = (
+        "import time; t = time.perf_counter(); import app.main; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    import_ms = [
+        float(subprocess.check_output([sys.executable, "-c", snippet], env=_env()).strip())
+        for _ in range(args.repeat)
+    ]
+
+    runs: list[dict[str, float | None]] = []
+    for _ in range(args.repeat):
+        port = _free_port()
+        env = _env({"PRELOAD_MODELS": "false" if args.no_preload else "true"})
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = start + args.timeout
+            base = f"http://127.0.0.1:{port}"
+            healthy = _wait_for(f"{base}/health", deadline)
+            ready = _wait_for(f"{base}/ready", deadline) if healthy else None
+            models = requests.get(f"{base}/health", timeout=5).json()["model"] if ready else {}
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        embeddings = models.get("models", {}).get("embeddings", {})
+        runs.append(
+            {
+                "serving_ms": (healthy - start) * 1000 if healthy else None,
+                "ready_ms": (ready - start) * 1000 if ready else None,
+                "embeddings_load_ms": embeddings.get("load_ms"),
+                "embeddings_warmup_ms": embeddings.get("warmup_ms"),
+            }
+        )
+
+    def median(key: str) -> float | None:
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None  # type: ignore[type-var]
+
+    return {
+        "benchmark": "cold-start",
+        "preload": not args.no_preload,
+        "import_app_main_ms": statistics.median(import_ms),
+        "serving_ms": median("serving_ms"),
+        "ready_ms": median("ready_ms"),
+        "embeddings_load_ms": median("embeddings_load_ms"),
+        "embeddings_warmup_ms": median("embeddings_warmup_ms"),
+        "runs": runs,
+    }
+
+
+def _latency_summary(samples_ms: list[float]) -> dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "mean_ms": statistics.fmean(ordered),
+    }
+
+
+def _fresh_collection(qdrant_url: str | None, name: str, dim: int):  # type: ignore[no-untyped-def]
+    """(client, collection, vector_name) for an empty collection on a server or in-process."""
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.qdrant_store import ensure_collection
+
+    client = QdrantClient(url=qdrant_url) if qdrant_url else QdrantClient(":memory:")
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    collection, vector_name = ensure_collection(
+        client, name, vector_size=dim, desired_vector_name="content"
+    )
+    return client, collection, vector_name
+
+
+def bench_filtered_search(args: argparse.Namespace) -> dict[str, Any]:
+    """Compare filtered and unfiltered vector search latency on a synthetic collection.
+
+    Points are spread over `--products` source prefixes and a handful of tags; the filtered
+    queries restrict search to one product (roughly 1/products of the collection). Needs a
+    Qdrant server: the in-process backend does not use payload indexes, so its filtered
+    searches are full scans and say nothing about the served path.
+    """
+    import numpy as np
+
+    from app.retrieval.filters import RetrievalFilters, build_qdrant_filter, chunk_metadata
+    from app.retrieval.qdrant_store import search, upsert_points
+
+    client, collection, vector_name = _fresh_collection(
+        args.qdrant_url, f"bench_filtered_{args.points}", args.dim
+    )
+
+    rng = np.random.default_rng(0)
+    now = int(time.time())
+    for start in range(0, args.points, args.batch_size):
+        n = min(args.batch_size, args.points - start)
+        vectors = rng.standard_normal((n, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        payloads = []
+        for i in range(start, start + n):
+            source_id = f"docs/product-{i % args.products}/doc-{i // args.products}.md"
+            payloads.append(
+                {
+                    "source_id": source_id,
+                    "chunk_index": 0,
+                    "text": "",
+                    **chunk_metadata(
+                        source_id, tags=[f"tag-{i % 7}"], ingested_at=now - (i % 365) * 86400
+                    ),
+                }
+            )
+        upsert_points(client, collection, vectors, payloads, vector_name=vector_name)
+
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    cases = {
+        "unfiltered": None,
+        "source_prefix": RetrievalFilters(source_id_prefix="docs/product-1"),
+        "source_prefix_and_tag": RetrievalFilters(
+            source_id_prefix="docs/product-1", tags=["tag-3"]
+        ),
+    }
+    results: dict[str, Any] = {}
+    for name, filters in cases.items():
+        qfilter = build_qdrant_filter(filters)
+        latencies: list[float] = []
+        hits = 0
+        for q in queries:
+            t = time.perf_counter()
+            found = search(
+                client, collection, q, top_k=args.top_k, filters=qfilter, vector_name=vector_name
+            )
+            latencies.append((time.perf_counter() - t) * 1000)
+            hits += len(found)
+        results[name] = {**_latency_summary(latencies), "mean_hits": hits / len(queries)}
+
+    return {
+        "benchmark": "filtered-search",
+        "backend": args.qdrant_url,
+        "points": args.points,
+        "dim": args.dim,
+        "products": args.products,
+        "top_k": args.top_k,
+        "results": results,
+    }
+
+
+def bench_slim_payload(args: argparse.Namespace) -> dict[str, Any]:
+    """Compare search with full payloads against slim search plus text-store hydration.
+
+    The full path fetches `--pool` candidates with their text, as retrieval did before the
+    text store; the slim path fetches them without text and hydrates only `--top-k` texts
+    from a local `ChunkTextStore`. Payload bytes are measured as serialized JSON.
+    """
+    import tempfile
+
+    import numpy as np
+
+    from app.retrieval.qdrant_store import search, upsert_points
+    from app.retrieval.text_store import ChunkTextStore
+
+    client, collection, vector_name = _fresh_collection(
+        args.qdrant_url, f"bench_slim_{args.points}", args.dim
+    )
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i}" for i in range(5000)])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkTextStore(tmp)
+        for start in range(0, args.points, args.batch_size):
+            n = min(args.batch_size, args.points - start)
+            vectors = rng.standard_normal((n, args.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            texts = [
+                " ".join(rng.choice(words, size=args.text_chars // 5))[: args.text_chars]
+                for _ in range(n)
+            ]
+            payloads = [
+                {"source_id": f"doc-{start + i}.md", "chunk_index": 0, "text": t}
+                for i, t in enumerate(texts)
+            ]
+            ids = upsert_points(client, collection, vectors, payloads, vector_name=vector_name)
+            store.append(zip(ids, texts, strict=True))
+
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        results: dict[str, Any] = {}
+        for mode in ("full", "slim"):
+            latencies: list[float] = []
+            payload_bytes = 0
+            for q in queries:
+                t = time.perf_counter()
+                found = search(
+                    client,
+                    collection,
+                    q,
+                    top_k=args.pool,
+                    vector_name=vector_name,
+                    exclude_payload=["text"] if mode == "slim" else None,
+                )
+                chunks = [dict(r.payload or {}, point_id=str(r.id)) for r in found]
+                if mode == "slim":
+                    for c in chunks[: args.top_k]:
+                        c["text"] = store.get(c["point_id"])
+                latencies.append((time.perf_counter() - t) * 1000)
+                payload_bytes += sum(len(json.dumps(r.payload)) for r in found)
+            results[mode] = {
+                **_latency_summary(latencies),
+                "payload_bytes_per_query": payload_bytes / len(queries),
+            }
+        store.close()
+
+    return {
+        "benchmark": "slim-payload",
+        "backend": args.qdrant_url or "local",
+        "points": args.points,
+        "text_chars": args.text_chars,
+        "pool": args.pool,
+        "top_k": args.top_k,
+        "results": results,
+    }
+
+
+def bench_two_stage(args: argparse.Namespace) -> dict[str, Any]:
+    """Recall@k and latency of two-stage (low-dim prefilter + rescoring) vs full-vector search.
+
+    Golden-set questions are embedded and searched three ways: exact full-dimension search
+    (the recall reference), the default HNSW search on the full vector and two-stage search
+    for each `--oversample` factor. With `--corpus` the corpus is ingested into an in-process
+    collection first; otherwise the configured collection is used and must have been
+    ingested with a low-dimensional vector (`LOWDIM_VECTOR_SIZE` / `--lowdim-size`).
+    """
+    import math
+
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    from app.retrieval.models import get_embedder
+    from app.retrieval.qdrant_store import (
+        collection_vector_sizes,
+        get_qdrant_client,
+        lowdim_vector_name,
+        search,
+        truncate_vectors,
+    )
+
+    questions = [
+        json.loads(line)["question"]
+        for line in Path(args.dataset).read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+    embedder = get_embedder()
+    if args.corpus:
+        from app.retrieval.ingest_cli import collect_chunks, ingest_chunks
+
+        client = QdrantClient(":memory:")
+        chunks = collect_chunks(args.corpus, chunk_size=args.chunk_size, chunk_overlap=150)
+        collection, _ = ingest_chunks(
+            client, embedder, chunks, "bench_two_stage", lowdim_size=args.lowdim_size
+        )
+    else:
+        from app.retrieval.service import _resolve_collection_and_vector_name
+
+        client = get_qdrant_client()
+        collection, _ = _resolve_collection_and_vector_name(args.collection)
+    vector_name = "content"
+    lowdim_name = lowdim_vector_name(vector_name)
+    lowdim = collection_vector_sizes(client, collection).get(lowdim_name)
+    if not lowdim:
+        raise SystemExit(f"{collection} has no {lowdim_name} vector; re-ingest with --lowdim-size")
+
+    k = args.top_k
+    queries = embedder.embed(questions)
+    exact_ids = [
+        {
+            str(p.id)
+            for p in client.query_points(
+                collection_name=collection,
+                query=q.tolist(),
+                using=vector_name,
+                limit=k,
+                search_params=qmodels.SearchParams(exact=True),
+                with_payload=False,
+            ).points
+        }
+        for q in queries
+    ]
+
+    def run(prefilter_factor: float | None) -> dict[str, float]:
+        latencies: list[float] = []
+        recalls: list[float] = []
+        for _ in range(args.repeat):
+            for q, truth in zip(queries, exact_ids, strict=True):
+                prefilter = None
+                if prefilter_factor is not None:
+                    limit = math.ceil(k * prefilter_factor)
+                    prefilter = (lowdim_name, truncate_vectors(q, lowdim), limit)
+                t = time.perf_counter()
+                found = search(
+                    client, collection, q, top_k=k, vector_name=vector_name, prefilter=prefilter
+                )
+                latencies.append((time.perf_counter() - t) * 1000)
+                if truth:
+                    recalls.append(len({str(p.id) for p in found} & truth) / len(truth))
+        return {
+            **_latency_summary(latencies),
+            "recall_at_k": statistics.fmean(recalls) if recalls else 0.0,
+        }
+
+    results: dict[str, Any] = {"full": run(None)}
+    for factor in args.oversample:
+        results[f"two_stage_x{factor:g}"] = run(factor)
+    return {
+        "benchmark": "two-stage",
+        "collection": collection,
+        "queries": len(questions),
+        "top_k": k,
+        "full_dim": int(queries.shape[1]),
+        "lowdim": lowdim,
+        "results": results,
+    }
+
+
+class _PrecomputedEmbedder:
+    """Serves vectors computed up front, so both rebuild paths time only their write path."""
+
+    model_name = "precomputed"
+
+    def __init__(self, vectors: dict[str, Any]) -> None:
+        self.vectors = vectors
+
+    def embed(self, texts: list[str]) -> Any:
+        import numpy as np
+
+        return np.stack([self.vectors[t] for t in texts])
+
+
+def bench_rebuild(args: argparse.Namespace) -> dict[str, Any]:
+    """Wall-clock of a full rebuild: online upserts vs offline build + artifact restore.
+
+    Chunks come from `--corpus` (or are synthetic) and are embedded once up front, with
+    `--embeddings` or as random unit vectors; both paths then ingest the same vectors, so
+    the comparison isolates writing to Qdrant. Run against your cluster with `--qdrant-url`.
+    """
+    import tempfile
+
+    import numpy as np
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.chunking import TextChunk
+    from app.retrieval.ingest_cli import collect_chunks, ingest_chunks
+    from app.retrieval.offline import build_artifact, restore_artifact
+
+    if args.corpus:
+        chunks = collect_chunks(args.corpus, chunk_size=args.chunk_size, chunk_overlap=150)
+    else:
+        rng = np.random.default_rng(0)
+        words = [f"w{i}" for i in range(5000)]
+        chunks = [
+            TextChunk(" ".join(rng.choice(words, size=120)), f"docs/d{i % 50}.md", i)
+            for i in range(args.points)
+        ]
+    texts = [c.text for c in chunks]
+    start = time.perf_counter()
+    if args.embeddings:
+        from app.retrieval.embeddings import EmbeddingsClient
+
+        rows = EmbeddingsClient(model_name=args.embeddings).embed(texts)
+    else:
+        rows = np.random.default_rng(1).standard_normal((len(texts), args.dim))
+        rows = (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+    embed_s = time.perf_counter() - start
+    embedder = _PrecomputedEmbedder(dict(zip(texts, rows, strict=True)))
+
+    def target() -> QdrantClient:
+        return QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+
+    def drop(client: QdrantClient, name: str) -> None:
+        if client.collection_exists(name):
+            client.delete_collection(name)
+
+    online_client = target()
+    drop(online_client, "bench_rebuild_online")
+    start = time.perf_counter()
+    ingest_chunks(online_client, embedder, chunks, "bench_rebuild_online")
+    online_s = time.perf_counter() - start
+    drop(online_client, "bench_rebuild_online")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = Path(tmp) / "index.tar"
+        start = time.perf_counter()
+        manifest = build_artifact(embedder, chunks, artifact, "bench_rebuild_offline")
+        built_s = time.perf_counter() - start
+        artifact_bytes = artifact.stat().st_size
+        offline_client = target()
+        start = time.perf_counter()
+        restore_artifact(
+            offline_client,
+            artifact,
+            "bench_rebuild_offline",
+            replace=True,
+            batch_size=args.batch_size,
+            parallel=args.parallel,
+        )
+        restore_s = time.perf_counter() - start
+        drop(offline_client, "bench_rebuild_offline")
+
+    return {
+        "benchmark": "rebuild",
+        "target": args.qdrant_url or "in-process",
+        "chunks": len(chunks),
+        "points": manifest["points"],
+        "embed_s": embed_s,
+        "online": {"total_s": online_s},
+        "offline": {
+            "build_s": manifest["build_s"],
+            "export_s": manifest["export_s"],
+            "artifact_bytes": artifact_bytes,
+            "restore_s": restore_s,
+            "total_s": built_s + restore_s,
+        },
+    }
+
+
+class _RandomEmbedder:
+    """Random unit vectors, for timing the pipeline around the embedding model."""
+
+    model_name = "random"
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> Any:
+        import numpy as np
+
+        rows = np.random.default_rng(len(texts)).standard_normal((len(texts), self.dim))
+        return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _synthetic_corpus(directory: Path, docs: int, doc_kb: float) -> None:
+    """Write `docs` markdown files of about `doc_kb` KB of word salad in paragraphs."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    words = ["".join(rng.choice(list("etaoinshrdlu"), size=n)) for n in rng.integers(2, 10, 5000)]
+    target = int(doc_kb * 1024)
+    for d in range(docs):
+        paragraphs: list[str] = []
+        size = 0
+        while size < target:
+            sentences = [
+                " ".join(rng.choice(words, size=int(rng.integers(8, 20)))).capitalize() + "."
+                for _ in range(int(rng.integers(3, 7)))
+            ]
+            paragraphs.append(" ".join(sentences))
+            size += len(paragraphs[-1]) + 2
+        (directory / f"doc{d:05d}.md").write_text(
+            f"# Document {d}\n\n" + "\n\n".join(paragraphs), encoding="utf-8"
+        )
+
+
+def bench_ingest(args: argparse.Namespace) -> dict[str, Any]:
+    """Ingestion throughput with per-stage wall time.
+
+    Runs `--corpus` (or a synthetic corpus of `--docs` files of `--doc-kb` KB) through
+    `collect_chunks` and `ingest_chunks` against in-process Qdrant or `--qdrant-url`, and
+    reports the time of each stage (read, chunk, dedup, embed, collection, payloads, points,
+    upsert, ...), docs/s, chunks/s, MB/s and peak RSS. With `--profile`, the pipeline runs a
+    second time with the profiler enabled only during the slowest stage (or
+    `--profile-stage`) and the profile is written to `--profile-out`.
+    """
+    import contextlib
+    import tempfile
+
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.ingest_cli import collect_chunks, ingest_chunks
+    from app.utils.memory import MB, peak_rss_bytes, rss_bytes
+    from app.utils.timing import StageTimer
+
+    rss_start = rss_bytes()
+    start = time.perf_counter()
+    if args.embeddings == "random":
+        embedder: Any = _RandomEmbedder(args.dim)
+    else:
+        from app.retrieval.embeddings import EmbeddingsClient
+
+        embedder = EmbeddingsClient(model_name=args.embeddings)
+    model_load_s = time.perf_counter() - start
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(":memory:")
+    collection = "bench_ingest"
+
+    def run(stages: StageTimer) -> tuple[int, int]:
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        # ingest_chunks reports progress on stdout, which carries the JSON result
+        with contextlib.redirect_stdout(sys.stderr):
+            chunks = collect_chunks(
+                paths,
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap,
+                stages=stages,
+            )
+            _, points = ingest_chunks(
+                client,
+                embedder,
+                chunks,
+                collection,
+                dedup_threshold=None if args.no_dedup else args.dedup_threshold,
+                stages=stages,
+            )
+        return len(chunks), points
+
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-") as tmp:
+        paths = args.corpus
+        if not paths:
+            _synthetic_corpus(Path(tmp), args.docs, args.doc_kb)
+            paths = [tmp]
+        files = [
+            f
+            for p in map(Path, paths)
+            for f in (p.rglob("*") if p.is_dir() else [p])
+            if f.is_file() and f.suffix.lower() in {".txt", ".md"}
+        ]
+        corpus_bytes = sum(f.stat().st_size for f in files)
+
+        stages = StageTimer()
+        start = time.perf_counter()
+        chunks, points = run(stages)
+        total_s = time.perf_counter() - start
+        peak = peak_rss_bytes()
+        stage_s = {name: ms / 1000 for name, ms in stages.ms.items()}
+        slowest = max(stage_s, key=stage_s.__getitem__)
+        result: dict[str, Any] = {
+            "benchmark": "ingest",
+            "target": args.qdrant_url or "in-process",
+            "embeddings": args.embeddings,
+            "model_load_s": model_load_s,
+            "docs": len(files),
+            "corpus_mb": corpus_bytes / MB,
+            "chunks": chunks,
+            "points": points,
+            "total_s": total_s,
+            "docs_per_s": len(files) / total_s,
+            "chunks_per_s": chunks / total_s,
+            "mb_per_s": corpus_bytes / MB / total_s,
+            "stages_s": stage_s,
+            "stage_share": {name: t / total_s for name, t in stage_s.items()},
+            "slowest_stage": slowest,
+            "rss_start_mb": None if rss_start is None else rss_start / MB,
+            "peak_rss_mb": None if peak is None else peak / MB,
+        }
+
+        if args.profile:
+            stage = args.profile_stage or slowest
+            result["profile"] = _profile_ingest_stage(args, stage, run)
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    return result
+
+
+def _profile_ingest_stage(args: argparse.Namespace, stage: str, run: Any) -> dict[str, Any]:
+    """Re-run the ingestion with `args.profile` enabled only during `stage`; write the dump."""
+    from app.utils.timing import StageTimer
+
+    suffix = ".prof" if args.profile == "cprofile" else ".html"
+    out = Path(args.profile_out or f"reports/ingest_{stage}{suffix}")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if args.profile == "cprofile":
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        run(StageTimer(profile_stage=stage, profiler=profiler))
+        profiler.dump_stats(out)
+        stats = pstats.Stats(profiler).sort_stats("cumulative")
+        # (file, line, function) -> (calls, total calls, own time, cumulative time, callers)
+        top = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[: args.profile_top]
+        return {
+            "stage": stage,
+            "tool": "cprofile",
+            "path": str(out),
+            "top_cumulative": [
+                {"function": f"{f}:{line}({name})", "calls": calls, "cumulative_s": cum}
+                for (f, line, name), (_, calls, _, cum, _) in top
+            ],
+        }
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return {"stage": stage, "error": "pyinstrument is not installed"}
+
+    class _Adapter:
+        # StageTimer drives profilers through enable()/disable()
+        def __init__(self) -> None:
+            self.profiler = Profiler()
+
+        def enable(self) -> None:
+            self.profiler.start()
+
+        def disable(self) -> None:
+            self.profiler.stop()
+
+    adapter = _Adapter()
+    run(StageTimer(profile_stage=stage, profiler=adapter))
+    out.write_text(adapter.profiler.output_html(), encoding="utf-8")
+    return {"stage": stage, "tool": "pyinstrument", "path": str(out)}
+
+
+def bench_embeddings(args: argparse.Namespace) -> dict[str, Any]:
+    """Latency, throughput and parity of the torch and ONNX Runtime embedding backends.
+
+    For each of `--backends` (torch, onnx = fp32, onnx-int8) reports the load time (including
+    the ONNX export on first use), p50/p95
+    latency of embedding one golden question at a time, texts/s when embedding the corpus
+    chunks in batches, and the ONNX model size. With torch among the backends, each ONNX
+    variant is compared against it: cosine similarity of the vectors and recall@k of the
+    golden questions over the corpus chunks (the share of torch's top-k that it also
+    retrieves).
+    """
+    from app.retrieval.embeddings import EmbeddingsClient
+    from app.retrieval.ingest_cli import collect_chunks
+    from app.retrieval.onnx_embeddings import OnnxEmbeddingsClient, parity
+
+    samples = [
+        json.loads(line)
+        for line in Path(args.dataset).read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+    questions = [s["question"] for s in samples]
+    # Corpus chunks plus the golden contexts, so every question has relevant documents
+    documents = [c.text for c in collect_chunks(args.corpus, chunk_size=args.chunk_size)]
+    documents += [c for s in samples for c in s.get("contexts", [])]
+    batch = (documents * (args.texts // max(len(documents), 1) + 1))[: args.texts]
+
+    result: dict[str, Any] = {
+        "benchmark": "embeddings",
+        "model": args.model,
+        "questions": len(questions),
+        "documents": len(documents),
+        "backends": {},
+    }
+    clients: dict[str, Any] = {}
+    for backend in args.backends:
+        start = time.perf_counter()
+        if backend == "torch":
+            client: Any = EmbeddingsClient(model_name=args.model)
+        else:
+            client = OnnxEmbeddingsClient(
+                args.model,
+                quantize=backend == "onnx-int8",
+                model_dir=args.model_dir,
+                intra_op_threads=args.threads,
+            )
+        client.embed(["warm up"])
+        load_s = time.perf_counter() - start
+        latencies = []
+        for _ in range(args.repeat):
+            for question in questions:
+                t0 = time.perf_counter()
+                client.embed([question])
+                latencies.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        client.embed(batch)
+        entry: dict[str, Any] = {
+            "load_s": load_s,
+            "query": _latency_summary(latencies),
+            "texts_per_s": len(batch) / (time.perf_counter() - t0),
+        }
+        if hasattr(client, "footprint"):
+            entry["model_mb"] = client.footprint()["parameter_bytes"] / 1024 / 1024
+        result["backends"][backend] = entry
+        clients[backend] = client
+
+    if "torch" in clients:
+        for backend, client in clients.items():
+            if backend != "torch":
+                result["backends"][backend]["parity"] = parity(
+                    clients["torch"], client, questions, documents, k=args.k
+                )
+    return result
+
+
+def bench_mmr(args: argparse.Namespace) -> dict[str, Any]:
+    """Latency of MMR selection over `--candidates` random unit vectors."""
+    import numpy as np
+
+    from app.retrieval.diversity import mmr_select
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.candidates, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    relevance = np.sort(rng.uniform(0.3, 0.9, args.candidates))[::-1].astype(np.float32)
+    latencies = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        mmr_select(vectors, relevance, args.top_k, duplicate_threshold=0.95)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "benchmark": "mmr",
+        "candidates": args.candidates,
+        "dim": args.dim,
+        "top_k": args.top_k,
+        **_latency_summary(latencies),
+    }
+
+
+def bench_logging(args: argparse.Namespace) -> dict[str, Any]:
+    """Per-request latency with logging off, synchronous, asynchronous and sampled.
+
+    Each simulated request does `--work-ms` of work and emits the records `RAGEngine.query`
+    logs. Records go to a pipe drained at `--sink-mbps`, standing in for a log collector
+    that cannot keep up; synchronous logging then blocks request threads on the full pipe.
+    """
+    import logging
+    import threading
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.logging.json_logger import (
+        configure_json_logging,
+        flush_logging,
+        logging_stats,
+        trace_id_var,
+    )
+
+    logger = logging.getLogger("app.engine.rag_engine")
+    chunk = max(1, int(args.sink_mbps * 1024 * 1024 / 100))
+
+    def request() -> float:
+        trace_id_var.set(str(uuid.uuid4()))
+        start = time.perf_counter()
+        logger.info(
+            "Starting RAG query",
+            extra={"query": "what is retrieval augmented generation?", "top_k": 5, "rerank": True},
+        )
+        time.sleep(args.work_ms / 2000)
+        logger.info("Retrieved chunks", extra={"count": 20})
+        logger.info("Rerank plan", extra={"pool": 20, "rerank_candidates": 8, "reason": "gap"})
+        time.sleep(args.work_ms / 2000)
+        logger.info("Generated answer", extra={"tokens": 412, "groundedness": 0.83})
+        return (time.perf_counter() - start) * 1000
+
+    modes = {
+        "off": None,
+        "sync": {},
+        "async": {"queue_size": args.queue_size},
+        "async_sampled": {
+            "queue_size": args.queue_size,
+            "sample_rates": {"app.engine": args.sample_rate},
+        },
+    }
+    results = []
+    for mode, options in modes.items():
+        read_fd, write_fd = os.pipe()
+
+        def drain(fd: int = read_fd) -> None:
+            # Read at most `chunk` bytes every 10 ms until the writer closes
+            while os.read(fd, chunk):
+                time.sleep(0.01)
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+        stream = os.fdopen(write_fd, "w", encoding="utf-8")
+        if options is None:
+            configure_json_logging("WARNING", stream=stream)
+        else:
+            configure_json_logging("INFO", stream=stream, **options)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            latencies = list(pool.map(lambda _: request(), range(args.requests)))
+        elapsed = time.perf_counter() - start
+        stats = logging_stats()
+        # Let the writer catch up before detaching the sink
+        flush_logging(timeout_s=300.0)
+        configure_json_logging("WARNING", stream=sys.stderr)
+        stream.close()
+        reader.join()
+        os.close(read_fd)
+        results.append(
+            {
+                "mode": mode,
+                "requests_per_s": args.requests / elapsed,
+                **_latency_summary(latencies),
+                "dropped": stats["dropped"],
+                "sampled_out": stats["sampled_out"],
+            }
+        )
+    return {
+        "benchmark": "logging",
+        "requests": args.requests,
+        "threads": args.threads,
+        "work_ms": args.work_ms,
+        "sink_mbps": args.sink_mbps,
+        "results": results,
+    }
+
+
+def _memory_mb(pid: int) -> dict[str, float]:
+    """RSS and PSS of a process (Linux). PSS splits shared pages between the processes
+    mapping them, so summing PSS over the workers gives their real footprint."""
+    out: dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in {"Rss", "Pss"}:
+                    out[key.lower() + "_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return out
+
+
+def _child_pids(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _load(
+    url: str, payload: dict[str, Any], headers: dict[str, str], concurrency: int, duration_s: float
+) -> dict[str, Any]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run() -> tuple[list[float], dict[int, int]]:
+        session = requests.Session()
+        latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        end = time.perf_counter() + duration_s
+        while time.perf_counter() < end:
+            t = time.perf_counter()
+            try:
+                status = session.post(url, json=payload, headers=headers, timeout=60).status_code
+            except requests.RequestException:
+                status = 0
+            latencies.append((time.perf_counter() - t) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+        return latencies, statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: run(), range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = [ms for r in results for ms in r[0]]
+    statuses: dict[int, int] = {}
+    for _, counts in results:
+        for code, n in counts.items():
+            statuses[code] = statuses.get(code, 0) + n
+    ok = statuses.get(200, 0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": ok / elapsed,
+        **(_latency_summary(latencies) if latencies else {}),
+    }
+
+
+def bench_serving(args: argparse.Namespace) -> dict[str, Any]:
+    """Throughput and per-worker memory of `python -m app.serve` across worker counts."""
+    payload = {"query": args.query, "top_k": args.top_k, "rerank": args.rerank}
+    headers = {"X-API-Key": os.environ["API_KEY"]} if os.environ.get("API_KEY") else {}
+    results = []
+    for workers in args.workers:
+        port = _free_port()
+        cmd = [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", str(workers)]
+        if args.pin_cpus:
+            cmd.append("--pin-cpus")
+        proc = subprocess.Popen(
+            cmd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            if _wait_for(f"{base}/ready", time.perf_counter() + args.timeout) is None:
+                results.append({"workers": workers, "error": "server did not become ready"})
+                continue
+            url = f"{base}/v1/query"
+            _load(url, payload, headers, concurrency=workers, duration_s=args.warmup)
+            concurrency = args.concurrency or 2 * workers
+            load = _load(url, payload, headers, concurrency=concurrency, duration_s=args.duration)
+            worker_memory = [_memory_mb(pid) for pid in _child_pids(proc.pid)]
+            parent = _memory_mb(proc.pid)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        pss = [m.get("pss_mb", 0.0) for m in [parent, *worker_memory]]
+        results.append(
+            {
+                "workers": workers,
+                "concurrency": concurrency,
+                **load,
+                "parent_memory": parent,
+                "worker_memory": worker_memory,
+                "total_pss_mb": round(sum(pss), 1) if worker_memory else None,
+            }
+        )
+    return {"benchmark": "serving", "payload": payload, "results": results}
+
+
+def _peak_rss_mb(pid: int) -> float | None:
+    """High-water mark of a running process's resident set (VmHWM, Linux)."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def bench_memory(args: argparse.Namespace) -> dict[str, Any]:
+    """Peak RSS of ingestion and serving workloads.
+
+    `ingest` runs `ingest_cli --offline-build` over `--corpus` in a child process and reports
+    its peak RSS. `serve` starts `app.serve` with `MEMORY_PROFILING=true`, sends `--requests`
+    queries one at a time and reports the peak RSS of the parent and each worker, the model
+    footprint from `/debug/memory` and the mean per-stage memory of the responses.
+    """
+    import tempfile
+
+    result: dict[str, Any] = {"benchmark": "memory"}
+    if "ingest" in args.workloads:
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [
+                sys.executable,
+                "-m",
+                "app.retrieval.ingest_cli",
+                *args.corpus,
+                "--embeddings",
+                args.embeddings,
+                "--offline-build",
+                str(Path(tmp) / "index.tar"),
+            ]
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                cmd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            # wait4 returns the child's own resource usage, including its peak RSS (in KB)
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            result["ingest"] = {
+                "corpus": args.corpus,
+                "exit_code": proc.returncode,
+                "seconds": time.perf_counter() - start,
+                "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+            }
+
+    if "serve" in args.workloads:
+        headers = {"X-API-Key": os.environ["API_KEY"]} if os.environ.get("API_KEY") else {}
+        payload = {"query": args.query, "top_k": args.top_k, "rerank": args.rerank}
+        port = _free_port()
+        cmd = [sys.executable, "-m", "app.serve", "--port", str(port)]
+        cmd += ["--workers", str(args.workers)]
+        proc = subprocess.Popen(
+            cmd,
+            env=_env({"MEMORY_PROFILING": "true"}),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            if _wait_for(f"{base}/ready", time.perf_counter() + args.timeout) is None:
+                result["serve"] = {"error": "server did not become ready"}
+                return result
+            stages: dict[str, list[float]] = {}
+            errors = 0
+            session = requests.Session()
+            for _ in range(args.requests):
+                resp = session.post(f"{base}/v1/query", json=payload, headers=headers, timeout=60)
+                if not resp.ok:
+                    errors += 1
+                    continue
+                for key, value in (resp.json().get("memory_mb") or {}).items():
+                    stages.setdefault(key, []).append(value)
+            debug = session.get(f"{base}/debug/memory?top=5", headers=headers, timeout=10)
+            result["serve"] = {
+                "workers": args.workers,
+                "requests": args.requests,
+                "errors": errors,
+                "parent_peak_rss_mb": _peak_rss_mb(proc.pid),
+                "worker_peak_rss_mb": [_peak_rss_mb(pid) for pid in _child_pids(proc.pid)],
+                "models": debug.json().get("models") if debug.ok else None,
+                "stage_memory_mb": {k: statistics.fmean(v) for k, v in sorted(stages.items())},
+            }
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the RAG service")
+    parser.add_argument("--out", type=str, default=None, help="Write JSON results to this path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cold = sub.add_parser("cold-start", help="Import, port-bind and readiness times of the API")
+    cold.add_argument("--repeat", type=int, default=3)
+    cold.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for /ready")
+    cold.add_argument("--no-preload", action="store_true", help="Run with PRELOAD_MODELS=false")
+    cold.set_defaults(func=bench_cold_start)
+
+    filtered = sub.add_parser(
+        "filtered-search", help="Filtered vs unfiltered vector search latency"
+    )
+    filtered.add_argument(
+        "--qdrant-url",
+        type=str,
+        required=True,
+        help="Qdrant server; in-process Qdrant ignores payload indexes and scans every point",
+    )
+    filtered.add_argument("--points", type=int, default=20000)
+    filtered.add_argument("--dim", type=int, default=384)
+    filtered.add_argument("--products", type=int, default=20)
+    filtered.add_argument("--queries", type=int, default=100)
+    filtered.add_argument("--top-k", type=int, default=10)
+    filtered.add_argument("--batch-size", type=int, default=1000)
+    filtered.set_defaults(func=bench_filtered_search)
+
+    slim = sub.add_parser(
+        "slim-payload", help="Full-payload search vs slim search with text-store hydration"
+    )
+    slim.add_argument(
+        "--qdrant-url", type=str, default=None, help="Qdrant server (default: in-process)"
+    )
+    slim.add_argument("--points", type=int, default=5000)
+    slim.add_argument("--dim", type=int, default=384)
+    slim.add_argument("--text-chars", type=int, default=1000)
+    slim.add_argument("--queries", type=int, default=100)
+    slim.add_argument("--pool", type=int, default=20, help="Candidates fetched per query")
+    slim.add_argument("--top-k", type=int, default=5, help="Texts hydrated per query")
+    slim.add_argument("--batch-size", type=int, default=1000)
+    slim.set_defaults(func=bench_slim_payload)
+
+    two = sub.add_parser("two-stage", help="Recall@k vs latency of two-stage search")
+    two.add_argument("--dataset", type=str, default="data/golden/qa.jsonl")
+    two.add_argument("--collection", type=str, default=None, help="Default: QDRANT_COLLECTION")
+    two.add_argument(
+        "--corpus", type=str, nargs="*", default=None, help="Ingest into an in-process collection"
+    )
+    two.add_argument("--chunk-size", type=int, default=1000, help="With --corpus")
+    two.add_argument("--lowdim-size", type=int, default=256, help="With --corpus")
+    two.add_argument("--top-k", type=int, default=10)
+    two.add_argument("--oversample", type=float, nargs="+", default=[2.0, 4.0, 8.0])
+    two.add_argument("--repeat", type=int, default=3)
+    two.set_defaults(func=bench_two_stage)
+
+    rebuild = sub.add_parser(
+        "rebuild", help="Full rebuild time: online upserts vs offline build + restore"
+    )
+    rebuild.add_argument(
+        "--qdrant-url", type=str, default=None, help="Qdrant server (default: in-process)"
+    )
+    rebuild.add_argument("--corpus", type=str, nargs="*", default=None)
+    rebuild.add_argument("--chunk-size", type=int, default=1000, help="With --corpus")
+    rebuild.add_argument("--points", type=int, default=5000, help="Synthetic chunks")
+    rebuild.add_argument("--dim", type=int, default=768, help="Random vector size")
+    rebuild.add_argument(
+        "--embeddings", type=str, default=None, help="Embed with this model instead"
+    )
+    rebuild.add_argument("--batch-size", type=int, default=256, help="Restore upload batch")
+    rebuild.add_argument("--parallel", type=int, default=2, help="Restore upload workers")
+    rebuild.set_defaults(func=bench_rebuild)
+
+    ingest = sub.add_parser("ingest", help="Ingestion throughput with per-stage timings")
+    ingest.add_argument("--corpus", type=str, nargs="*", default=None, help="Default: synthetic")
+    ingest.add_argument("--docs", type=int, default=200, help="Synthetic documents")
+    ingest.add_argument("--doc-kb", type=float, default=8.0, help="Synthetic document size")
+    ingest.add_argument(
+        "--qdrant-url", type=str, default=None, help="Qdrant server (default: in-process)"
+    )
+    ingest.add_argument(
+        "--embeddings",
+        type=str,
+        default="BAAI/bge-base-en-v1.5",
+        help="Embedding model, or 'random' to time everything but the model",
+    )
+    ingest.add_argument("--dim", type=int, default=768, help="With --embeddings random")
+    ingest.add_argument("--chunk-size", type=int, default=1000)
+    ingest.add_argument("--chunk-overlap", type=int, default=150)
+    ingest.add_argument("--dedup-threshold", type=float, default=0.9)
+    ingest.add_argument("--no-dedup", action="store_true")
+    ingest.add_argument(
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        default=None,
+        help="Profile the slowest stage in a second run",
+    )
+    ingest.add_argument("--profile-stage", type=str, default=None, help="Stage to profile")
+    ingest.add_argument(
+        "--profile-out", type=str, default=None, help="Default: reports/ingest_<stage>.prof"
+    )
+    ingest.add_argument("--profile-top", type=int, default=15, help="Functions in the JSON")
+    ingest.set_defaults(func=bench_ingest)
+
+    emb = sub.add_parser(
+        "embeddings", help="torch vs ONNX Runtime (fp32/int8) embedding latency and parity"
+    )
+    emb.add_argument("--model", type=str, default="BAAI/bge-base-en-v1.5")
+    emb.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["torch", "onnx", "onnx-int8"],
+        default=["torch", "onnx", "onnx-int8"],
+    )
+    emb.add_argument("--dataset", type=str, default="data/golden/qa.jsonl", help="Questions")
+    emb.add_argument("--corpus", type=str, nargs="+", default=["data/sample"], help="Documents")
+    emb.add_argument("--chunk-size", type=int, default=500)
+    emb.add_argument("--texts", type=int, default=256, help="Texts per throughput batch")
+    emb.add_argument("--repeat", type=int, default=20, help="Passes over the questions")
+    emb.add_argument("--k", type=int, default=5, help="For recall@k")
+    emb.add_argument("--threads", type=int, default=None, help="ONNX intra-op threads")
+    emb.add_argument("--model-dir", type=str, default=None, help="Default: ONNX_MODEL_DIR")
+    emb.set_defaults(func=bench_embeddings)
+
+    mmr = sub.add_parser("mmr", help="Latency of MMR diversity selection")
+    mmr.add_argument("--candidates", type=int, default=50)
+    mmr.add_argument("--dim", type=int, default=768)
+    mmr.add_argument("--top-k", type=int, default=5)
+    mmr.add_argument("--repeat", type=int, default=1000)
+    mmr.set_defaults(func=bench_mmr)
+
+    log = sub.add_parser("logging", help="Request latency with logging off/sync/async/sampled")
+    log.add_argument("--requests", type=int, default=2000)
+    log.add_argument("--threads", type=int, default=8)
+    log.add_argument("--work-ms", type=float, default=5.0, help="Simulated work per request")
+    log.add_argument("--sink-mbps", type=float, default=0.5, help="Log sink drain rate")
+    log.add_argument("--queue-size", type=int, default=10000)
+    log.add_argument("--sample-rate", type=float, default=0.1, help="For async_sampled")
+    log.set_defaults(func=bench_logging)
+
+    serving = sub.add_parser(
+        "serving", help="Throughput and per-worker memory of prefork serving vs worker count"
+    )
+    serving.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    serving.add_argument(
+        "--concurrency", type=int, default=None, help="Client threads (default: 2 x workers)"
+    )
+    serving.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    serving.add_argument("--warmup", type=float, default=5.0, help="Seconds of warm-up load")
+    serving.add_argument("--query", type=str, default="What is retrieval-augmented generation?")
+    serving.add_argument("--top-k", type=int, default=3)
+    serving.add_argument("--rerank", action="store_true")
+    serving.add_argument("--pin-cpus", action="store_true")
+    serving.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for /ready")
+    serving.set_defaults(func=bench_serving)
+
+    mem = sub.add_parser("memory", help="Peak RSS of ingestion and serving workloads")
+    mem.add_argument(
+        "--workloads", nargs="+", choices=["ingest", "serve"], default=["ingest", "serve"]
+    )
+    mem.add_argument("--corpus", nargs="+", default=["data/sample"], help="For ingest")
+    mem.add_argument("--embeddings", type=str, default="BAAI/bge-base-en-v1.5")
+    mem.add_argument("--workers", type=int, default=1, help="For serve")
+    mem.add_argument("--requests", type=int, default=50, help="Sequential queries for serve")
+    mem.add_argument("--query", type=str, default="What is retrieval-augmented generation?")
+    mem.add_argument("--top-k", type=int, default=3)
+    mem.add_argument("--rerank", action="store_true")
+    mem.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for /ready")
+    mem.set_defaults(func=bench_memory)
+
+    args = parser.parse_args()
+    result = args.func(args)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
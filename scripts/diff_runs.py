@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Any
+
+from app.eval.results_store import (
+    DEFAULT_REGRESSION_THRESHOLD,
+    DEFAULT_ROOT,
+    diff_runs,
+    list_runs,
+    run_summaries,
+    summarize_diff,
+)
+
+
+def resolve_run(value: str, runs: list[str]) -> str:
+    """Accept a full run id, a unique prefix, or ``latest``/``previous``."""
+    if value in ("latest", "previous"):
+        index = -1 if value == "latest" else -2
+        if len(runs) < -index:
+            raise SystemExit(f"Not enough stored runs for '{value}'")
+        return runs[index]
+    matches = [r for r in runs if r.startswith(value)]
+    if len(matches) != 1:
+        raise SystemExit(f"Run '{value}' matches {len(matches)} stored runs")
+    return matches[0]
+
+
+def print_summary(summary: dict[str, dict[str, Any]]) -> None:
+    print(
+        f"{'metric':<20} {'n':>5} {'base':>7} {'cand':>7} {'delta':>8} {'worse':>6} {'better':>6}"
+    )
+    for metric, s in sorted(summary.items()):
+        print(
+            f"{metric:<20} {s['compared']:>5} {s['base_mean']:>7.3f} {s['candidate_mean']:>7.3f}"
+            f" {s['delta_mean']:>+8.3f} {s['regressions']:>6} {s['improvements']:>6}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare per-question evaluation scores of two stored runs"
+    )
+    parser.add_argument("base", nargs="?", default="previous", help="Run id, prefix or 'previous'")
+    parser.add_argument("candidate", nargs="?", default="latest", help="Run id, prefix or 'latest'")
+    parser.add_argument("--root", type=str, default=str(DEFAULT_ROOT), help="Results store")
+    parser.add_argument("--metrics", type=str, nargs="*", default=None, help="Metrics to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Score drop that counts as a regression",
+    )
+    parser.add_argument("--show", type=int, default=10, help="Regressions to list (0 = all)")
+    parser.add_argument("--json", action="store_true", help="Print the summary and rows as JSON")
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 when any question regressed (for CI)",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List stored runs with their mean scores and exit"
+    )
+    args = parser.parse_args()
+
+    runs = list_runs(args.root)
+    if args.list:
+        for row in run_summaries(args.root).to_pylist():
+            mean, count = row["score_mean"], row["score_count"]
+            print(f"{row['run_id']}  {row['metric']:<20} {mean:.3f}  n={count}")
+        return
+
+    base = resolve_run(args.base, runs)
+    candidate = resolve_run(args.candidate, runs)
+    diff = diff_runs(
+        base, candidate, root=args.root, metrics=args.metrics, threshold=args.threshold
+    )
+    summary = summarize_diff(diff)
+    regressions = diff.filter(diff["regression"])
+    shown = regressions if args.show <= 0 else regressions.slice(0, args.show)
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "base": base,
+                    "candidate": candidate,
+                    "summary": summary,
+                    "regressions": shown.to_pylist(),
+                },
+                indent=2,
+            )
+        )
+    else:
+        print(f"base {base} -> candidate {candidate}")
+        print_summary(summary)
+        if regressions.num_rows:
+            print(f"\nRegressions (score drop > {args.threshold}):")
+            for row in shown.to_pylist():
+                question = (row["question"] or row["sample_id"])[:80]
+                print(
+                    f"  {row['metric']:<18} {row['base']:.3f} -> {row['candidate']:.3f}"
+                    f"  {question}"
+                )
+    if args.fail_on_regression and regressions.num_rows:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,16 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Any
 
-from app.eval.ragas_runner import run_evaluation
+from app.eval.batch_runner import merge_checkpoints, run_evaluation_batched, sample_id
 from app.eval.reporting import write_report_files
 
+E2E_DEFAULT_JSON = "reports/benchmark_report.json"
+E2E_DEFAULT_MD = "reports/benchmark_report.md"
+
 
 def load_jsonl(path: Path) -> list[dict[str, Any]]:
     items: list[dict[str, Any]] = []
@@ -20,11 +24,146 @@ def load_jsonl(path: Path) -> list[dict[str, Any]]:
     return items
 
 
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse an ``INDEX/COUNT`` shard spec such as ``0/4``."""
+    try:
+        index, count = (int(v) for v in value.split("/", 1))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 0/4") from e
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"invalid shard {value}")
+    return index, count
+
+
+def parse_rerank(value: str) -> list[bool]:
+    """Map an on/off/both switch to the boolean values to sweep."""
+    return {"on": [True], "off": [False], "both": [False, True]}[value]
+
+
+def build_chunk_collection(corpus: list[str], base: str):  # type: ignore[no-untyped-def]
+    """Return a builder that re-ingests `corpus` into a fresh collection per chunk setting."""
+    from app.retrieval.embeddings import EmbeddingsClient
+    from app.retrieval.ingest_cli import collect_chunks, ingest_chunks
+    from app.retrieval.qdrant_store import get_qdrant_client
+
+    def build(chunk_size: int, chunk_overlap: int) -> str:
+        client = get_qdrant_client()
+        name = f"{base}__bench_c{chunk_size}_o{chunk_overlap}"
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        chunks = collect_chunks(corpus, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        ingest_chunks(client, EmbeddingsClient(), chunks, name)
+        return name
+
+    return build
+
+
+def model_names(*, scored: bool = True) -> dict[str, str]:
+    """Models behind a run: the generator, the query embedder and, if scored, the judge."""
+    from app.llm.client import LLMClient
+    from app.retrieval.models import embedder_name
+
+    llm = LLMClient()
+    generator = llm.openai_model if llm.provider == "openai" else llm.gemini_model
+    models = {"generator": generator, "embedding": embedder_name()}
+    if scored:
+        from app.eval.ragas_runner import JUDGE_MODEL
+
+        models["judge"] = JUDGE_MODEL
+    return models
+
+
+def result_runs(
+    args: argparse.Namespace, result: dict[str, Any], samples: list[dict[str, Any]]
+) -> list[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    """(config, per-sample rows) for each run to persist; e2e sweeps store one run per point.
+
+    Pops the per-sample scores from `result` so they stay out of the JSON report.
+    """
+    from app.eval.results_store import question_id
+
+    base = {"mode": args.mode, "dataset": args.dataset, "metrics": args.metrics}
+    if args.mode == "e2e":
+        runs = []
+        for point in result["sweep"]:
+            rows = [
+                {
+                    "sample_id": question_id(sample),
+                    "question": record["question"],
+                    "scores": record.pop("scores", None),
+                    "latency_ms": record.get("latency_ms"),
+                }
+                for sample, record in zip(samples, point["records"], strict=True)
+            ]
+            runs.append(({**base, **point["config"]}, rows))
+        return runs
+    per_sample: dict[str, dict[str, float]] = result.pop("per_sample", {})
+    config = {**base, "merge": args.merge} if args.merge else base
+    if not samples:
+        # Merged checkpoints without their dataset: only batch sample ids are known
+        return [(config, [{"sample_id": sid, "scores": row} for sid, row in per_sample.items()])]
+    rows = [
+        {"sample_id": question_id(s), "question": s.get("question"), "scores": per_sample[sid]}
+        for s, sid in ((s, sample_id(s)) for s in samples)
+        if sid in per_sample
+    ]
+    return [(config, rows)]
+
+
+def store_results(
+    args: argparse.Namespace, result: dict[str, Any], samples: list[dict[str, Any]]
+) -> None:
+    try:
+        from app.eval.results_store import write_run
+
+        runs = result_runs(args, result, samples)
+        models = model_names(scored=not getattr(args, "no_score", False))
+        for config, rows in runs:
+            if not any(row["scores"] for row in rows):
+                continue
+            run_id = write_run(rows, root=args.results_dir, config=config, models=models)
+            print("Saved results:", Path(args.results_dir) / f"run_id={run_id}")
+    except RuntimeError as e:
+        # pyarrow is optional; the reports are still written
+        print(f"Not storing per-sample results: {e}", file=sys.stderr)
+
+
+def run_e2e(args: argparse.Namespace, samples: list[dict[str, Any]]) -> dict[str, Any]:
+    from app.config.settings import get_settings
+    from app.eval.benchmark import run_sweep
+
+    grid: dict[str, list[Any]] = {
+        "top_k": args.top_k,
+        "rerank": parse_rerank(args.rerank),
+        "adaptive": parse_rerank(args.adaptive) if args.adaptive else [],
+        "self_check_threshold": args.self_check_threshold or [],
+        "chunk_size": args.chunk_size or [],
+        "chunk_overlap": args.chunk_overlap or [],
+    }
+    build = None
+    if args.chunk_size or args.chunk_overlap:
+        if not args.corpus:
+            raise SystemExit("--chunk-size/--chunk-overlap sweeps require --corpus")
+        build = build_chunk_collection(args.corpus, get_settings().qdrant_collection)
+    points = run_sweep(
+        samples,
+        grid,
+        metrics=args.metrics,
+        concurrency=args.concurrency,
+        build_collection=build,
+        score=not args.no_score,
+        price_prompt_per_1k=args.price_prompt_per_1k,
+        price_completion_per_1k=args.price_completion_per_1k,
+    )
+    return {"sweep": points}
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run RAG evaluation on a JSONL dataset")
     parser.add_argument(
         "dataset",
         type=str,
+        nargs="?",
         help="Path to JSONL with fields: question, contexts, answer, ground_truths",
     )
     parser.add_argument(
@@ -50,12 +189,103 @@ def main() -> None:
         default=None,
         help="Metrics to compute (e.g., faithfulness answer_relevancy)",
     )
+    parser.add_argument("--batch-size", type=int, default=8, help="Samples per RAGAS call")
+    parser.add_argument("--workers", type=int, default=1, help="Batches scored concurrently")
+    parser.add_argument(
+        "--judge-rpm", type=float, default=None, help="Judge LLM request budget per minute"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="JSONL file for per-sample scores; reruns resume from it",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        help="Score only shard INDEX/COUNT of the dataset (use a checkpoint per shard)",
+    )
+    parser.add_argument(
+        "--merge",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Skip scoring and merge these shard checkpoints into one report",
+    )
+    e2e = parser.add_argument_group(
+        "end-to-end benchmark", "Run golden questions through RAGEngine (--mode e2e)"
+    )
+    e2e.add_argument(
+        "--mode",
+        choices=["offline", "e2e"],
+        default="offline",
+        help="offline: score precomputed answers; e2e: generate answers with RAGEngine",
+    )
+    e2e.add_argument("--top-k", type=int, nargs="+", default=[5], help="top_k values to sweep")
+    e2e.add_argument("--rerank", choices=["on", "off", "both"], default="off")
+    e2e.add_argument(
+        "--adaptive",
+        choices=["on", "off", "both"],
+        default=None,
+        help="Adaptive candidate sizing/rerank skipping (default: ADAPTIVE_RETRIEVAL)",
+    )
+    e2e.add_argument(
+        "--self-check-threshold", type=float, nargs="*", default=None, help="Thresholds to sweep"
+    )
+    e2e.add_argument("--chunk-size", type=int, nargs="*", default=None, help="Requires --corpus")
+    e2e.add_argument("--chunk-overlap", type=int, nargs="*", default=None, help="Requires --corpus")
+    e2e.add_argument(
+        "--corpus", type=str, nargs="*", default=None, help="Files to re-ingest per chunk setting"
+    )
+    e2e.add_argument("--concurrency", type=int, default=4, help="Concurrent engine queries")
+    e2e.add_argument("--no-score", action="store_true", help="Skip RAGAS; latency/cost only")
+    e2e.add_argument("--price-prompt-per-1k", type=float, default=0.0, help="USD per 1k tokens")
+    e2e.add_argument("--price-completion-per-1k", type=float, default=0.0, help="USD per 1k tokens")
+    parser.add_argument(
+        "--results-dir",
+        type=str,
+        default="reports/eval_results",
+        help="Parquet store receiving per-sample scores (compare runs with scripts/diff_runs.py)",
+    )
+    parser.add_argument("--no-store", action="store_true", help="Do not persist per-sample scores")
     args = parser.parse_args()
+    if not args.dataset and not args.merge:
+        parser.error("dataset is required unless --merge is given")
 
-    samples = load_jsonl(Path(args.dataset))
-    if args.limit and args.limit > 0:
-        samples = samples[: args.limit]
-    result = run_evaluation(samples, metrics=args.metrics)
+    samples: list[dict[str, Any]] = []
+    if args.mode == "e2e":
+        samples = load_jsonl(Path(args.dataset))
+        if args.limit and args.limit > 0:
+            samples = samples[: args.limit]
+        result = run_e2e(args, samples)
+        if args.out_json == parser.get_default("out_json"):
+            args.out_json = E2E_DEFAULT_JSON
+        if args.out_md == parser.get_default("out_md"):
+            args.out_md = E2E_DEFAULT_MD
+    elif args.merge:
+        if args.dataset:
+            samples = load_jsonl(Path(args.dataset))
+        result = merge_checkpoints(
+            [Path(p) for p in args.merge], metrics=args.metrics, per_sample=not args.no_store
+        )
+    else:
+        samples = load_jsonl(Path(args.dataset))
+        if args.limit and args.limit > 0:
+            samples = samples[: args.limit]
+        result = run_evaluation_batched(
+            samples,
+            metrics=args.metrics,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            judge_rpm=args.judge_rpm,
+            checkpoint=Path(args.checkpoint) if args.checkpoint else None,
+            shard_index=args.shard[0],
+            num_shards=args.shard[1],
+            per_sample=not args.no_store,
+        )
+    if not args.no_store:
+        store_results(args, result, samples)
     # Backward compatibility: if --out provided, override out-json
     out_json = Path(args.out) if args.out else Path(args.out_json)
     out_md = Path(args.out_md) if args.out_md else None
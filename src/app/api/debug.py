@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, Query
+
+from app.engine.admission import AdmissionController, get_admission_controller
+from app.engine.coalesce import QueryCoalescer, get_coalescer
+from app.logging.json_logger import logging_stats
+from app.retrieval.cache import cache_stats
+from app.retrieval.models import model_footprint
+from app.utils.memory import process_memory, tracemalloc_summary
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/admission")
+def admission_status(
+    admission: AdmissionController = Depends(get_admission_controller),
+) -> dict[str, Any]:
+    """In-flight counts, queue depths per priority and rejection counters per stage."""
+    return admission.snapshot()
+
+
+@router.get("/coalescing")
+def coalescing_status(coalescer: QueryCoalescer = Depends(get_coalescer)) -> dict[str, Any]:
+    """Queries in flight and leader/follower/timeout counts of request coalescing."""
+    return coalescer.stats()
+
+
+@router.get("/cache")
+def retrieval_cache_status() -> dict[str, Any]:
+    """Entries, capacity and hit/miss counters of the query-embedding and search caches."""
+    return cache_stats()
+
+
+@router.get("/logging")
+def logging_status() -> dict[str, Any]:
+    """Log queue depth and enqueued/dropped/sampled-out record counts."""
+    return logging_stats()
+
+
+@router.get("/memory")
+def memory_status(top: int = Query(10, ge=0, le=100)) -> dict[str, Any]:
+    """Process RSS, resident models with their parameter bytes, cache sizes and, while
+    tracemalloc is tracing (MEMORY_PROFILING), the `top` allocation sites."""
+    return {
+        "process": process_memory(),
+        "models": model_footprint(),
+        "caches": cache_stats(),
+        "tracemalloc": tracemalloc_summary(top),
+    }
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-from pathlib import Path
+import json
+from collections.abc import AsyncIterator
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+import anyio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-import app.eval.ragas_runner as rr
-from app.eval.reporting import write_report_files
+from app.eval.jobs import EvalJob, EvalJobManager, JobQueueFullError, get_job_manager
 
 router = APIRouter(prefix="/v1", tags=["evaluate"])
 
@@ -26,16 +28,64 @@ class EvalRequest(BaseModel):
     out_md: str | None = None
 
 
-@router.post("/evaluate")
-def post_evaluate(req: EvalRequest) -> dict[str, Any]:
+def _get_job(job_id: str, manager: EvalJobManager) -> EvalJob:
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Evaluation job {job_id} not found")
+    return job
+
+
+@router.post("/evaluate", status_code=202)
+def post_evaluate(
+    req: EvalRequest, manager: EvalJobManager = Depends(get_job_manager)
+) -> dict[str, Any]:
     try:
-        samples = [s.model_dump() for s in req.samples]
-        result = rr.run_evaluation(samples, metrics=req.metrics)
-        paths = write_report_files(
-            result,
-            out_json=Path(req.out_json) if req.out_json else None,
-            out_md=Path(req.out_md) if req.out_md else None,
+        job = manager.submit(
+            [s.model_dump() for s in req.samples],
+            metrics=req.metrics,
+            out_json=req.out_json,
+            out_md=req.out_md,
         )
-        return {"result": result, "written": paths}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"}) from e
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "status_url": f"/v1/evaluate/{job.id}",
+        "events_url": f"/v1/evaluate/{job.id}/events",
+    }
+
+
+@router.get("/evaluate/{job_id}")
+def get_evaluate(job_id: str, manager: EvalJobManager = Depends(get_job_manager)) -> dict[str, Any]:
+    return _get_job(job_id, manager).snapshot()
+
+
+@router.get("/evaluate/{job_id}/events")
+def stream_evaluate_events(
+    job_id: str, manager: EvalJobManager = Depends(get_job_manager)
+) -> StreamingResponse:
+    """Server-Sent Events stream of per-sample progress until the job finishes."""
+    job = _get_job(job_id, manager)
+
+    async def event_stream() -> AsyncIterator[str]:
+        cursor = 0
+        while True:
+            events, finished = await anyio.to_thread.run_sync(
+                manager.wait_for_events, job, cursor, 1.0
+            )
+            cursor += len(events)
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            if finished:
+                return
+            if not events:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException
 from pydantic import BaseModel, Field
 
-from app.engine.rag_engine import RAGEngine, RetrievedChunk
+from app.engine.admission import AdmissionController, OverloadedError, get_admission_controller
+from app.engine.coalesce import QueryCoalescer, coalesce_key, get_coalescer
+from app.engine.rag_engine import RAGEngine, RAGResult, RetrievedChunk
+from app.retrieval.filters import RetrievalFilters
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/v1", tags=["query"])
 
@@ -12,6 +19,10 @@ class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1)
     top_k: int = Field(5, ge=1, le=20)
     rerank: bool = Field(default=False)
+    filters: RetrievalFilters | None = None
+    # Maximal-marginal-relevance context selection; unset fields use MMR_ENABLED/MMR_LAMBDA
+    mmr: bool | None = None
+    mmr_lambda: float | None = Field(default=None, ge=0.0, le=1.0)
 
 
 class QueryResponse(BaseModel):
@@ -20,6 +31,8 @@ class QueryResponse(BaseModel):
     timings_ms: dict[str, float] | None = None
     tokens: dict[str, int] | None = None
     groundedness: float | None = None
+    # Per-stage RSS deltas and allocation peaks, only with MEMORY_PROFILING=true
+    memory_mb: dict[str, float] | None = None
 
 
 def get_rag_engine() -> RAGEngine:
@@ -27,14 +40,48 @@ def get_rag_engine() -> RAGEngine:
 
 
 @router.post("/query", response_model=QueryResponse)
-def post_query(req: QueryRequest, engine: RAGEngine = Depends(get_rag_engine)) -> QueryResponse:
+def post_query(
+    req: QueryRequest,
+    engine: RAGEngine = Depends(get_rag_engine),
+    admission: AdmissionController = Depends(get_admission_controller),
+    coalescer: QueryCoalescer = Depends(get_coalescer),
+    priority: str = Header(default="interactive", alias="X-Priority"),
+    timeout_s: float | None = Header(default=None, alias="X-Request-Timeout", gt=0),
+) -> QueryResponse:
+    """Answer a query. `X-Priority: batch` marks non-interactive callers, which are queued
+    behind interactive ones and shed first; `X-Request-Timeout` (seconds) shortens the
+    request deadline. Identical concurrent queries are answered once; the duplicates' timings
+    carry `coalesced` and `coalesce_wait`."""
+
+    # Only explicitly requested MMR options are passed, so the settings apply otherwise
+    options = {
+        k: v for k, v in {"mmr": req.mmr, "mmr_lambda": req.mmr_lambda}.items() if v is not None
+    }
+
+    def run() -> RAGResult:
+        with admission.admit(priority=priority, timeout_s=timeout_s):
+            return engine.query(req.query, req.top_k, req.rerank, filters=req.filters, **options)
+
     try:
-        result = engine.query(req.query, req.top_k, req.rerank)
+        if coalescer.enabled:
+            key = coalesce_key(req.query, req.top_k, req.rerank, req.filters, **options)
+            result = coalescer.run(key, run, admission.timeout_for(timeout_s))
+        else:
+            result = run()
+    except OverloadedError as e:
+        logger.warning(
+            "Request shed", extra={"reason": str(e), "status": e.status_code, "priority": priority}
+        )
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
+        ) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
-    # Token usage is provider-specific; placeholder zeros for now
     tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    tokens.update(result.tokens)
 
     return QueryResponse(
         answer=result.answer,
@@ -42,4 +89,5 @@ def post_query(req: QueryRequest, engine: RAGEngine = Depends(get_rag_engine)) -
         timings_ms=result.timings,
         tokens=tokens,
         groundedness=result.groundedness,
+        memory_mb=result.memory,
     )
@@ -31,6 +31,10 @@ class AppSettings(BaseSettings):
 
     app_env: str = Field(default="dev", alias="APP_ENV")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    # Records are queued and written by a background thread (0 = write synchronously)
+    log_queue_size: int = Field(default=10000, alias="LOG_QUEUE_SIZE")
+    # Fraction of INFO/DEBUG records kept per logger prefix, e.g. "app.engine=0.1"
+    log_sample_rates: str = Field(default="", alias="LOG_SAMPLE_RATES")
 
     openai_api_key: str | None = Field(default=None, alias="OPENAI_API_KEY")
     api_key: str | None = Field(default=None, alias="API_KEY")
@@ -40,14 +44,114 @@ class AppSettings(BaseSettings):
     gemini_model: str | None = Field(default=None, alias="GEMINI_MODEL")
     llm_temperature: float = Field(default=0.2, alias="LLM_TEMPERATURE")
     llm_max_tokens: int = Field(default=512, alias="LLM_MAX_TOKENS")
+    # OpenAI-compatible API root (chat completions and the batch API)
+    openai_base_url: str = Field(default="https://api.openai.com/v1", alias="OPENAI_BASE_URL")
+    # Offline batch generation (app.llm.batch): status poll interval, how long to wait for a
+    # batch, and requests per batch file (the OpenAI batch API accepts up to 50,000)
+    llm_batch_poll_s: float = Field(default=30.0, alias="LLM_BATCH_POLL_S")
+    llm_batch_timeout_s: float = Field(default=86400.0, alias="LLM_BATCH_TIMEOUT_S")
+    llm_batch_max_requests: int = Field(default=50000, alias="LLM_BATCH_MAX_REQUESTS")
+    # Prompt token budget (system prompt + template + packed context)
+    context_max_tokens: int = Field(default=3000, alias="CONTEXT_MAX_TOKENS")
 
     qdrant_url: str | None = Field(default=None, alias="QDRANT_URL")
     qdrant_api_key: str | None = Field(default=None, alias="QDRANT_API_KEY")
     qdrant_collection: str = Field(default="agentic_rag_poc", alias="QDRANT_COLLECTION")
+    # Sharding: chunks hash-partitioned over QDRANT_SHARDS collections `<collection>_shard<i>`
+    # (0 = one collection), on QDRANT_SHARD_URLS (one per shard, comma-separated) or QDRANT_URL;
+    # queries search all shards concurrently and drop shards slower than SHARD_TIMEOUT_MS
+    qdrant_shards: int = Field(default=0, alias="QDRANT_SHARDS")
+    qdrant_shard_urls: str | None = Field(default=None, alias="QDRANT_SHARD_URLS")
+    shard_timeout_ms: float = Field(default=1000.0, alias="SHARD_TIMEOUT_MS")
+    # Versioned rebuilds (ingest_cli --reindex): previous versions kept after an alias swap for
+    # rollback, and the share of the live version's points a new version must reach to go live
+    reindex_keep_versions: int = Field(default=1, alias="REINDEX_KEEP_VERSIONS")
+    reindex_min_point_ratio: float = Field(default=0.8, alias="REINDEX_MIN_POINT_RATIO")
+    # Local memory-mapped chunk text store; when set, searches skip the `text` payload field
+    text_store_path: str | None = Field(default=None, alias="TEXT_STORE_PATH")
+    # Two-stage search: ingestion adds a truncated vector of this size to new collections;
+    # queries prefilter on it (oversampled) and rescore with the full vector
+    lowdim_vector_size: int | None = Field(default=None, alias="LOWDIM_VECTOR_SIZE")
+    two_stage_search: bool = Field(default=True, alias="TWO_STAGE_SEARCH")
+    two_stage_oversample: float = Field(default=4.0, alias="TWO_STAGE_OVERSAMPLE")
+    # Retrieval caches: query embeddings (LRU) and search results (LRU with TTL), invalidated
+    # by the collection data version that ingestion bumps (re-read every check interval)
+    retrieval_cache_enabled: bool = Field(default=True, alias="RETRIEVAL_CACHE_ENABLED")
+    embedding_cache_size: int = Field(default=4096, alias="EMBEDDING_CACHE_SIZE")
+    result_cache_size: int = Field(default=1024, alias="RESULT_CACHE_SIZE")
+    result_cache_ttl_s: float = Field(default=300.0, alias="RESULT_CACHE_TTL_S")
+    cache_version_check_s: float = Field(default=5.0, alias="CACHE_VERSION_CHECK_S")
+    # Adaptive candidate sizing and reranking (see app.retrieval.adaptive)
+    adaptive_retrieval: bool = Field(default=False, alias="ADAPTIVE_RETRIEVAL")
+    adaptive_pool_min: int = Field(default=10, alias="ADAPTIVE_POOL_MIN")
+    adaptive_pool_max: int = Field(default=20, alias="ADAPTIVE_POOL_MAX")
+    adaptive_flat_spread: float = Field(default=0.05, alias="ADAPTIVE_FLAT_SPREAD")
+    adaptive_rerank_gap: float = Field(default=0.15, alias="ADAPTIVE_RERANK_GAP")
+    adaptive_rerank_budget_ms: float = Field(default=250.0, alias="ADAPTIVE_RERANK_BUDGET_MS")
+    # Admission control: in-flight request bound with a bounded wait queue, per-stage
+    # concurrency limits and a default request deadline
+    admission_enabled: bool = Field(default=True, alias="ADMISSION_ENABLED")
+    request_timeout_s: float = Field(default=30.0, alias="REQUEST_TIMEOUT_S")
+    max_inflight_requests: int = Field(default=16, alias="MAX_INFLIGHT_REQUESTS")
+    max_queued_requests: int = Field(default=16, alias="MAX_QUEUED_REQUESTS")
+    stage_concurrency_embedding: int = Field(default=2, alias="STAGE_CONCURRENCY_EMBEDDING")
+    stage_concurrency_rerank: int = Field(default=1, alias="STAGE_CONCURRENCY_RERANK")
+    stage_concurrency_llm: int = Field(default=8, alias="STAGE_CONCURRENCY_LLM")
+    # Maximal-marginal-relevance selection of the context chunks (per-request override);
+    # candidates at least this similar to a selected chunk are dropped as duplicates
+    mmr_enabled: bool = Field(default=False, alias="MMR_ENABLED")
+    mmr_lambda: float = Field(default=0.7, alias="MMR_LAMBDA")
+    mmr_duplicate_threshold: float = Field(default=0.95, alias="MMR_DUPLICATE_THRESHOLD")
+    # Per-stage memory instrumentation (RSS deltas, tracemalloc peaks) in query responses;
+    # tracemalloc slows allocation-heavy code noticeably, so this is for diagnosis only
+    memory_profiling: bool = Field(default=False, alias="MEMORY_PROFILING")
+    tracemalloc_frames: int = Field(default=1, alias="TRACEMALLOC_FRAMES")
+    # Single-flight coalescing of identical concurrent queries; with a shared directory
+    # (e.g. under /dev/shm) duplicates are also coalesced across worker processes
+    coalesce_enabled: bool = Field(default=True, alias="COALESCE_ENABLED")
+    coalesce_shared_dir: str | None = Field(default=None, alias="COALESCE_SHARED_DIR")
+    # Prefork serving (python -m app.serve): worker count, torch/BLAS threads per worker and
+    # CPU pinning; unset counts are derived from the available cores
+    serve_workers: int | None = Field(default=None, alias="SERVE_WORKERS")
+    serve_threads_per_worker: int | None = Field(default=None, alias="SERVE_THREADS_PER_WORKER")
+    serve_pin_cpus: bool = Field(default=False, alias="SERVE_PIN_CPUS")
+    # Embedding backend: "torch" (SentenceTransformer, fp32) or "onnx" (ONNX Runtime; exported
+    # once to ONNX_MODEL_DIR, int8 weights with ONNX_QUANTIZE). 0 intra-op threads follows
+    # the process's thread budget (the prefork worker share, else all cores)
+    embeddings_backend: str = Field(default="torch", alias="EMBEDDINGS_BACKEND")
+    onnx_model_dir: str = Field(default="models/onnx", alias="ONNX_MODEL_DIR")
+    onnx_quantize: bool = Field(default=True, alias="ONNX_QUANTIZE")
+    onnx_intra_op_threads: int = Field(default=0, alias="ONNX_INTRA_OP_THREADS")
+    onnx_inter_op_threads: int = Field(default=1, alias="ONNX_INTER_OP_THREADS")
+    # Model loading: preload (with a warm-up inference) in the background at startup
+    preload_models: bool = Field(default=True, alias="PRELOAD_MODELS")
+    preload_reranker: bool = Field(default=False, alias="PRELOAD_RERANKER")
+    # Cache warming after the preload: replay the WARMUP_TOP_N most frequent logged queries
+    # (JSON log files matching WARMUP_LOG_PATHS, comma-separated globs), topped up from the
+    # golden set. /ready waits until it finishes or WARMUP_BUDGET_S runs out. Retrieval and
+    # rerank only, unless WARMUP_GENERATE also calls the LLM
+    warmup_enabled: bool = Field(default=False, alias="WARMUP_ENABLED")
+    warmup_log_paths: str | None = Field(default=None, alias="WARMUP_LOG_PATHS")
+    warmup_golden_path: str | None = Field(
+        default="data/golden/qa.jsonl", alias="WARMUP_GOLDEN_PATH"
+    )
+    warmup_top_n: int = Field(default=50, alias="WARMUP_TOP_N")
+    warmup_concurrency: int = Field(default=4, alias="WARMUP_CONCURRENCY")
+    warmup_budget_s: float = Field(default=60.0, alias="WARMUP_BUDGET_S")
+    warmup_generate: bool = Field(default=False, alias="WARMUP_GENERATE")
+
     # Self-check configuration
     self_check_min_groundedness: float = Field(default=0.7, alias="SELF_CHECK_MIN_GROUNDEDNESS")
     self_check_retry: bool = Field(default=True, alias="SELF_CHECK_RETRY")
 
+    # Asynchronous evaluation jobs (/v1/evaluate)
+    eval_job_workers: int = Field(default=1, alias="EVAL_JOB_WORKERS")
+    eval_job_max_pending: int = Field(default=16, alias="EVAL_JOB_MAX_PENDING")
+    eval_job_ttl_s: float = Field(default=3600.0, alias="EVAL_JOB_TTL_S")
+    eval_batch_size: int = Field(default=8, alias="EVAL_BATCH_SIZE")
+    eval_batch_workers: int = Field(default=2, alias="EVAL_BATCH_WORKERS")
+    eval_judge_rpm: float | None = Field(default=None, alias="EVAL_JUDGE_RPM")
+
     # Prompts
     system_prompt: str = Field(
         default=(
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any
+
+from app.config.settings import AppSettings, get_settings
+from app.exceptions import RAGException
+from app.utils.deadline import deadline_scope, deadline_var
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "batch")
+STAGES = ("embedding", "rerank", "llm")
+
+priority_var: ContextVar[str] = ContextVar("priority", default="interactive")
+
+
+class OverloadedError(RAGException):
+    """Raised when a request is shed: the wait queue is full or its deadline ran out"""
+
+    def __init__(self, message: str, *, status_code: int = 503, retry_after: float = 1.0):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class StageLimiter:
+    """Concurrency limit with a bounded, priority-ordered wait queue.
+
+    Up to `limit` holders run at once. Further callers wait in FIFO order, interactive
+    callers ahead of batch callers. With `max_queue`, callers beyond the queue bound are
+    rejected immediately (batch callers may use only half of the queue, keeping the rest for
+    interactive traffic). Waits end at the caller's deadline.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int | None = None) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues: dict[str, deque[object]] = {p: deque() for p in PRIORITIES}
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "deadline": 0}
+        self._hold_ms: float | None = None
+        self._wait_ms: float | None = None
+
+    def _waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _head(self) -> object | None:
+        for priority in PRIORITIES:
+            if self._queues[priority]:
+                return self._queues[priority][0]
+        return None
+
+    def _retry_after_s(self) -> float:
+        # Time for the current queue to drain at the observed service time
+        hold_s = (self._hold_ms or 1000.0) / 1000.0
+        return hold_s * (self._waiting() + 1) / self.limit
+
+    def acquire(self, priority: str = "interactive", deadline: float | None = None) -> None:
+        queue = self._queues.get(priority, self._queues["interactive"])
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.limit and self._head() is None:
+                self._active += 1
+                self._admitted += 1
+                return
+            if self.max_queue is not None:
+                bound = self.max_queue if priority != "batch" else self.max_queue // 2
+                if self._waiting() >= bound:
+                    self._rejected["queue_full"] += 1
+                    raise OverloadedError(
+                        f"{self.name} queue is full",
+                        status_code=429,
+                        retry_after=self._retry_after_s(),
+                    )
+            token = object()
+            queue.append(token)
+            try:
+                while not (self._active < self.limit and self._head() is token):
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        self._rejected["deadline"] += 1
+                        raise OverloadedError(
+                            f"Deadline exceeded waiting for {self.name}",
+                            status_code=503,
+                            retry_after=self._retry_after_s(),
+                        )
+                    self._cond.wait(timeout)
+            finally:
+                queue.remove(token)
+                # The head changed; let the next waiter re-check
+                self._cond.notify_all()
+            self._active += 1
+            self._admitted += 1
+            self._wait_ms = _ewma(self._wait_ms, (time.monotonic() - start) * 1000.0)
+
+    def release(self, held_ms: float | None = None) -> None:
+        with self._cond:
+            self._active -= 1
+            if held_ms is not None:
+                self._hold_ms = _ewma(self._hold_ms, held_ms)
+            self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, priority: str = "interactive", deadline: float | None = None) -> Iterator[None]:
+        self.acquire(priority, deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release((time.monotonic() - start) * 1000.0)
+
+    def record_rejection(self, reason: str) -> None:
+        with self._cond:
+            self._rejected[reason] = self._rejected.get(reason, 0) + 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "waiting": {p: len(q) for p, q in self._queues.items()},
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "hold_ms_ewma": self._hold_ms,
+                "wait_ms_ewma": self._wait_ms,
+            }
+
+
+def _ewma(current: float | None, sample: float, alpha: float = 0.2) -> float:
+    return sample if current is None else current + alpha * (sample - current)
+
+
+class AdmissionController:
+    """Request admission plus per-stage bulkheads around `RAGEngine`.
+
+    `admit` bounds in-flight requests (with a bounded wait queue) and sets the request's
+    deadline and priority; `stage` bounds concurrent work per pipeline stage (embedding,
+    rerank, LLM) so that a slow LLM cannot starve CPU-bound stages and vice versa. Both
+    raise `OverloadedError` instead of letting work pile up.
+    """
+
+    def __init__(self, settings: AppSettings) -> None:
+        self.enabled = settings.admission_enabled
+        self.request_timeout_s = settings.request_timeout_s
+        self.request = StageLimiter(
+            "request", settings.max_inflight_requests, settings.max_queued_requests
+        )
+        self.stages = {
+            "embedding": StageLimiter("embedding", settings.stage_concurrency_embedding),
+            "rerank": StageLimiter("rerank", settings.stage_concurrency_rerank),
+            "llm": StageLimiter("llm", settings.stage_concurrency_llm),
+        }
+
+    def timeout_for(self, timeout_s: float | None = None) -> float:
+        """Deadline in seconds for a request asking for `timeout_s` (capped at the default)."""
+        if timeout_s is None:
+            return self.request_timeout_s
+        return min(timeout_s, self.request_timeout_s)
+
+    @contextmanager
+    def admit(
+        self, priority: str = "interactive", timeout_s: float | None = None
+    ) -> Iterator[None]:
+        """Admit one request; its deadline is `timeout_s` (capped at `REQUEST_TIMEOUT_S`)."""
+        if priority not in PRIORITIES:
+            priority = "interactive"
+        token = priority_var.set(priority)
+        try:
+            with deadline_scope(self.timeout_for(timeout_s)) as deadline:
+                if not self.enabled:
+                    yield
+                    return
+                with self.request.hold(priority, deadline):
+                    yield
+        finally:
+            priority_var.reset(token)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        limiter = self.stages.get(name)
+        if not self.enabled or limiter is None:
+            yield
+            return
+        deadline = deadline_var.get()
+        if deadline is not None and deadline <= time.monotonic():
+            limiter.record_rejection("deadline")
+            raise OverloadedError(f"Deadline exceeded before {name}", status_code=503)
+        with limiter.hold(priority_var.get(), deadline):
+            yield
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "request_timeout_s": self.request_timeout_s,
+            "request": self.request.snapshot(),
+            "stages": {name: limiter.snapshot() for name, limiter in self.stages.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+    return AdmissionController(get_settings())
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Hold the process-wide bulkhead for pipeline stage `name` (see `STAGES`)."""
+    with get_admission_controller().stage(name):
+        yield
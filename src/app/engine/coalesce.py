@@ -0,0 +1,235 @@
+"""Single-flight coalescing of identical concurrent queries.
+
+The first request for a key (normalized query, top_k, rerank, filters) runs the pipeline;
+requests for the same key that arrive while it is running wait for its result instead of
+repeating retrieval, reranking, generation and the groundedness check. Followers get a copy
+of the leader's result with ``coalesced`` and their own ``coalesce_wait`` in the timings.
+
+Within a process, waiters share an in-memory call. With a shared directory, the in-process
+leaders of several workers also coordinate through one lock file per key (``fcntl.flock``):
+the worker holding the lock runs the query and writes the result next to it; workers that
+had to wait for the lock read that result instead of running the query again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Any
+
+from app.config.settings import get_settings
+from app.engine.admission import OverloadedError
+from app.engine.rag_engine import RAGResult
+from app.retrieval.cache import normalize_query
+from app.retrieval.filters import RetrievalFilters
+
+logger = logging.getLogger(__name__)
+
+# Result and lock files untouched for this long belong to finished calls and are removed
+STALE_AFTER_S = 300.0
+
+
+def coalesce_key(
+    query: str,
+    top_k: int,
+    rerank: bool,
+    filters: RetrievalFilters | None = None,
+    **options: Any,
+) -> str:
+    """Key of a query: requests with equal keys get the same answer. `options` are further
+    request parameters that change the answer (e.g. MMR settings)."""
+    spec = [
+        normalize_query(query),
+        top_k,
+        rerank,
+        filters.model_dump(mode="json", exclude_none=True) if filters else None,
+        options,
+    ]
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "shared", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result: RAGResult | None = None
+        self.error: BaseException | None = None
+        # Whether the result was produced by another worker
+        self.shared = False
+
+
+def _try_lock(fh: IO[bytes]) -> bool:
+    import fcntl
+
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class QueryCoalescer:
+    """Run each key at most once at a time; concurrent callers of a key share the result.
+
+    Errors of the leader are raised in its followers too, except `OverloadedError`: a leader
+    shed for its own priority or deadline says nothing about the followers', so a follower
+    with time left retries, becoming the leader with its own `fn`. Waiting is bounded by the
+    follower's own timeout, after which it is shed with `OverloadedError` (503).
+    """
+
+    def __init__(self, enabled: bool = True, shared_dir: str | Path | None = None) -> None:
+        self.enabled = enabled
+        self.shared_dir = Path(shared_dir) if shared_dir else None
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._stats = {
+            "leaders": 0,
+            "followers": 0,
+            "shared_hits": 0,
+            "timeouts": 0,
+            "retries": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def run(self, key: str, fn: Callable[[], RAGResult], timeout_s: float) -> RAGResult:
+        start = time.monotonic()
+        deadline = start + timeout_s
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if call is None:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                try:
+                    call.result, call.shared = self._lead(key, fn, deadline)
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+                if not call.shared:
+                    self._count("leaders")
+                    return call.result
+                self._count("shared_hits")
+                return _mark(call.result, start)
+
+            if not call.done.wait(max(0.0, deadline - time.monotonic())):
+                with self._lock:
+                    call.waiters -= 1
+                    self._stats["timeouts"] += 1
+                raise OverloadedError("Deadline exceeded waiting for an identical query")
+            if isinstance(call.error, OverloadedError) and time.monotonic() < deadline:
+                # The leader was shed under its own priority and deadline; run under ours
+                self._count("retries")
+                continue
+            self._count("followers")
+            if call.error is not None:
+                raise call.error
+            assert call.result is not None
+            return _mark(call.result, start)
+
+    def _lead(
+        self, key: str, fn: Callable[[], RAGResult], deadline: float
+    ) -> tuple[RAGResult, bool]:
+        if self.shared_dir is None:
+            return fn(), False
+        import fcntl
+
+        self.shared_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = self.shared_dir / f"{key}.lock"
+        result_path = self.shared_dir / f"{key}.json"
+        waiting_since = time.time()
+        with open(lock_path, "ab") as fh:
+            if not _try_lock(fh):
+                while not _try_lock(fh):
+                    if time.monotonic() >= deadline:
+                        self._count("timeouts")
+                        raise OverloadedError("Deadline exceeded waiting for an identical query")
+                    time.sleep(0.005)
+                # Another worker ran the query while we waited; a result written before we
+                # started waiting belongs to an earlier call and is not reused
+                result = _read_result(result_path, since=waiting_since)
+                if result is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+                    return result, True
+            try:
+                os.utime(lock_path)
+                result = fn()
+                _write_result(result_path, result)
+                return result, False
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+                self._prune()
+
+    def _prune(self) -> None:
+        """Remove lock and result files of calls that finished long ago."""
+        now = time.time()
+        if self.shared_dir is None or now - self._last_prune < STALE_AFTER_S:
+            return
+        self._last_prune = now
+        for path in self.shared_dir.iterdir():
+            try:
+                if now - path.stat().st_mtime > STALE_AFTER_S:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "shared_dir": str(self.shared_dir) if self.shared_dir else None,
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                **self._stats,
+            }
+
+
+def _mark(result: RAGResult, start: float) -> RAGResult:
+    result = result.model_copy(deep=True)
+    result.timings["coalesced"] = 1.0
+    result.timings["coalesce_wait"] = (time.monotonic() - start) * 1000.0
+    return result
+
+
+def _read_result(path: Path, since: float) -> RAGResult | None:
+    try:
+        if path.stat().st_mtime < since:
+            return None
+        return RAGResult.model_validate_json(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_result(path: Path, result: RAGResult) -> None:
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(result.model_dump_json(), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("Could not share coalesced result", extra={"path": str(path)})
+        tmp.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def get_coalescer() -> QueryCoalescer:
+    settings = get_settings()
+    return QueryCoalescer(settings.coalesce_enabled, settings.coalesce_shared_dir)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+BLOCK_SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextBlock:
+    """A run of adjacent chunks from one source merged into a single prompt block."""
+
+    source_id: str
+    text: str
+    chunks: list[dict[str, Any]]
+    rank: int
+
+
+@dataclass
+class PackedContext:
+    """Context blocks selected to fit the prompt budget.
+
+    Attributes
+    ----------
+    text: str
+        Formatted context ready to be substituted into the user prompt template.
+    blocks: List[ContextBlock]
+        Blocks that made it into the prompt, in relevance order.
+    chunks: List[Dict[str, Any]]
+        Original chunks covered by the included blocks, in relevance order.
+    tokens: int
+        Token count of `text`.
+    dropped: int
+        Number of blocks left out because they did not fit the budget.
+    """
+
+    text: str
+    blocks: list[ContextBlock] = field(default_factory=list)
+    chunks: list[dict[str, Any]] = field(default_factory=list)
+    tokens: int = 0
+    dropped: int = 0
+
+
+def overlap_length(left: str, right: str, *, min_overlap: int = 16) -> int:
+    """Return the length of the longest suffix of `left` that is also a prefix of `right`.
+
+    Overlaps shorter than `min_overlap` are ignored so that accidental matches (a shared
+    trailing word) are not stripped from chunks ingested without overlap.
+    """
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        # Scanning left-to-right, the first full match is the longest overlap
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+def merge_adjacent_chunks(chunks: list[dict[str, Any]]) -> list[ContextBlock]:
+    """Merge chunks with consecutive `chunk_index` from the same source, removing overlaps.
+
+    Input order is treated as relevance order; each block is ranked by its best member.
+    """
+    by_source: dict[str, list[tuple[int, dict[str, Any]]]] = {}
+    for rank, chunk in enumerate(chunks):
+        by_source.setdefault(str(chunk.get("source_id", "")), []).append((rank, chunk))
+
+    blocks: list[ContextBlock] = []
+    for source_id, members in by_source.items():
+        members.sort(key=lambda m: int(m[1].get("chunk_index", 0)))
+        run: list[tuple[int, dict[str, Any]]] = []
+        for member in members:
+            index = int(member[1].get("chunk_index", 0))
+            if run:
+                last = int(run[-1][1].get("chunk_index", 0))
+                if index == last:
+                    # Duplicate hit for the same chunk; keep the better-ranked one
+                    if member[0] < run[-1][0]:
+                        run[-1] = member
+                    continue
+                if index != last + 1:
+                    blocks.append(_merge_run(source_id, run))
+                    run = []
+            run.append(member)
+        if run:
+            blocks.append(_merge_run(source_id, run))
+    blocks.sort(key=lambda b: b.rank)
+    return blocks
+
+
+def _merge_run(source_id: str, run: list[tuple[int, dict[str, Any]]]) -> ContextBlock:
+    text = str(run[0][1].get("text", ""))
+    for _, chunk in run[1:]:
+        nxt = str(chunk.get("text", ""))
+        text += nxt[overlap_length(text, nxt) :]
+    ordered = sorted(run, key=lambda m: m[0])
+    return ContextBlock(
+        source_id=source_id,
+        text=text,
+        chunks=[c for _, c in ordered],
+        rank=ordered[0][0],
+    )
+
+
+def format_block(block: ContextBlock) -> str:
+    return f"[source: {block.source_id}]\n{block.text}"
+
+
+def pack_context(
+    chunks: list[dict[str, Any]],
+    *,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+) -> PackedContext:
+    """Fill a token budget with merged context blocks in relevance order.
+
+    Blocks that do not fit are skipped so smaller, less relevant blocks can still use the
+    remaining budget. If not even the most relevant block fits, it is truncated so the
+    prompt always carries some context.
+    """
+    blocks = merge_adjacent_chunks(chunks)
+    separator_tokens = count_tokens(BLOCK_SEPARATOR)
+    selected: list[tuple[ContextBlock, str]] = []
+    used = 0
+    dropped = 0
+    for block in blocks:
+        formatted = format_block(block)
+        cost = count_tokens(formatted) + (separator_tokens if selected else 0)
+        if used + cost <= max_tokens:
+            selected.append((block, formatted))
+            used += cost
+        else:
+            dropped += 1
+
+    if not selected and blocks and max_tokens > 0:
+        block = blocks[0]
+        formatted = _truncate_to_budget(format_block(block), max_tokens, count_tokens)
+        if formatted:
+            selected.append((block, formatted))
+            used = count_tokens(formatted)
+            dropped -= 1
+
+    rank_of = {id(c): i for i, c in enumerate(chunks)}
+    return PackedContext(
+        text=BLOCK_SEPARATOR.join(f for _, f in selected),
+        blocks=[b for b, _ in selected],
+        chunks=sorted((c for b, _ in selected for c in b.chunks), key=lambda c: rank_of[id(c)]),
+        tokens=used,
+        dropped=dropped,
+    )
+
+
+def _truncate_to_budget(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    tokens = count_tokens(text)
+    while text and tokens > max_tokens:
+        text = text[: int(len(text) * max_tokens / tokens * 0.95)]
+        tokens = count_tokens(text)
+    return text
@@ -0,0 +1,97 @@
+"""Answer large question sets offline, generating through provider batch jobs.
+
+`answer_offline` retrieves context for every query locally (query embeddings computed in
+batches, searches on a few threads), reranks and packs each context exactly as
+`RAGEngine.query` does, then sends all prompts through `app.llm.batch` and joins the
+answers back into `RAGResult`s. The groundedness self-check and its retry are skipped:
+they need further synchronous model calls per query.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import app.retrieval.service as retrieval_service
+from app.engine.rag_engine import GenerationRequest, RAGEngine, RAGResult
+from app.llm.batch import BatchTransport, PromptRequest, run_batches
+from app.utils.timing import timer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OfflineAnswers:
+    """One result per query, in order; None where generation failed (see `errors`)."""
+
+    results: list[RAGResult | None]
+    errors: dict[int, str] = field(default_factory=dict)
+    batch_ids: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def answer_offline(
+    queries: Sequence[str],
+    directory: str | Path,
+    *,
+    top_k: int = 5,
+    rerank: bool = False,
+    engine: RAGEngine | None = None,
+    transport: BatchTransport | None = None,
+    embed_batch_size: int = 64,
+    search_workers: int = 4,
+    poll_s: float | None = None,
+    timeout_s: float | None = None,
+) -> OfflineAnswers:
+    """Answer `queries` with batch generation; batch files are written under `directory`.
+
+    `timings` holds the wall time of the retrieval, preparation (rerank and packing) and
+    generation phases for the whole run. Queries with nothing retrieved get an empty answer
+    without a model call, as in `RAGEngine.query`.
+    """
+    engine = engine or RAGEngine()
+    timings: dict[str, float] = {}
+    options = engine.retrieval_options(top_k)
+    with timer() as t:
+        retrieved = retrieval_service.retrieve_top_chunks_batch(
+            queries, batch_size=embed_batch_size, workers=search_workers, **options
+        )
+    timings["retrieve"] = t["elapsed_ms"]
+
+    with timer() as t:
+        prepared: list[GenerationRequest] = [
+            engine.prepare_generation(query, top_k, rerank, chunks=chunks)
+            for query, chunks in zip(queries, retrieved, strict=True)
+        ]
+    timings["prepare"] = t["elapsed_ms"]
+
+    prompts = [
+        PromptRequest(f"q{i}", request.system_prompt, request.user_prompt)
+        for i, request in enumerate(prepared)
+        if request.packed is not None
+    ]
+    logger.info(
+        "Submitting offline generation", extra={"queries": len(queries), "prompts": len(prompts)}
+    )
+    with timer() as t:
+        run = run_batches(
+            prompts, directory, transport=transport, poll_s=poll_s, timeout_s=timeout_s
+        )
+    timings["generate"] = t["elapsed_ms"]
+
+    answers = OfflineAnswers(results=[], batch_ids=run.batch_ids, timings=timings)
+    for i, request in enumerate(prepared):
+        if request.packed is None:
+            answers.results.append(engine.result_from_answer(request, ""))
+            continue
+        output = run.outputs[f"q{i}"]
+        if output.answer is None:
+            answers.results.append(None)
+            answers.errors[i] = output.error or "unknown error"
+            continue
+        answers.results.append(engine.result_from_answer(request, output.answer, output.usage))
+    if answers.errors:
+        logger.warning("Offline generation errors", extra={"failed": len(answers.errors)})
+    return answers
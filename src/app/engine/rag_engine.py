@@ -1,13 +1,23 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from typing import Any
 
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, Field
 
 import app.llm.client as llm_client
 import app.retrieval.service as retrieval_service
-from app.config.settings import get_settings
+from app.config.settings import AppSettings, get_settings
+from app.engine.admission import stage
+from app.engine.context_packer import PackedContext, pack_context
+from app.retrieval.adaptive import RerankPlan, plan_candidates, rerank_costs
+from app.retrieval.cache import record_cache_events
+from app.retrieval.diversity import mmr_select, relevance_scores
+from app.retrieval.filters import RetrievalFilters
+from app.retrieval.sharding import record_shard_stats
+from app.utils.memory import memory_probe, process_memory
 from app.utils.timing import timer
 
 logger = logging.getLogger(__name__)
@@ -18,6 +28,8 @@ class RetrievedChunk(BaseModel):
     source_id: str
     chunk_index: int
     score: float
+    # Other sources carrying the same (deduplicated) text, if any
+    source_ids: list[str] = Field(default_factory=list)
 
 
 class RAGResult(BaseModel):
@@ -25,60 +37,107 @@ class RAGResult(BaseModel):
     citations: list[RetrievedChunk]
     timings: dict[str, float]
     groundedness: float | None = None
+    tokens: dict[str, int] = Field(default_factory=dict)
+    # Per-stage memory in MB when MEMORY_PROFILING is on (see `memory_probe`)
+    memory: dict[str, float] | None = None
+
+
+@dataclass
+class GenerationRequest:
+    """Prompts of one query, prepared for generation outside the engine (e.g. batch APIs).
+
+    `packed` is None when nothing was retrieved; such queries have no prompt to send.
+    """
+
+    query: str
+    system_prompt: str
+    user_prompt: str
+    packed: PackedContext | None
+    timings: dict[str, float]
 
 
 class RAGEngine:
-    def __init__(self) -> None:
-        self.settings = get_settings()
+    def __init__(self, settings: AppSettings | None = None) -> None:
+        # An explicit settings object lets benchmarks run several configurations side by side
+        self.settings = settings or get_settings()
         self.llm = llm_client.LLMClient()
 
-    def query(self, query: str, top_k: int, rerank: bool) -> RAGResult:
+    def query(
+        self,
+        query: str,
+        top_k: int,
+        rerank: bool,
+        filters: RetrievalFilters | None = None,
+        mmr: bool | None = None,
+        mmr_lambda: float | None = None,
+    ) -> RAGResult:
         """
-        Execute the full RAG pipeline including retrieval, reranking, generation, 
-        and optional retry.
+        Execute the full RAG pipeline including retrieval, reranking, generation,
+        and optional retry. `filters` restricts retrieval (including the retry) to matching
+        chunks. `mmr` (default `MMR_ENABLED`) selects the context chunks by maximal marginal
+        relevance with weight `mmr_lambda` (default `MMR_LAMBDA`) on relevance.
         """
         timings: dict[str, float] = {}
+        diversity = self._diversity(mmr, mmr_lambda)
+        memory: dict[str, float] | None = {} if self.settings.memory_profiling else None
 
         # 1. Retrieve
-        logger.info("Starting RAG query", extra={"query": query, "top_k": top_k, "rerank": rerank})
-        with timer() as t_retr:
-            chunks = retrieval_service.retrieve_top_chunks(query, top_k=max(top_k, 10))
+        logger.info(
+            "Starting RAG query",
+            extra={
+                "query": query,
+                "top_k": top_k,
+                "rerank": rerank,
+                "filters": (
+                    filters.model_dump(mode="json", exclude_defaults=True) if filters else None
+                ),
+            },
+        )
+        with (
+            timer() as t_retr,
+            record_cache_events() as cache_events,
+            record_shard_stats() as shard_stats,
+            memory_probe(memory, "retrieve"),
+        ):
+            chunks = self._retrieve(
+                query,
+                top_k=self._pool_size(top_k),
+                filters=filters,
+                with_vectors=diversity is not None,
+            )
         timings["retrieve"] = t_retr["elapsed_ms"]
+        # embedding_cache_hit / search_cache_hit (1.0 or 0.0) when the caches are enabled
+        timings.update(cache_events)
+        # shard<i>_ms, shards_timed_out and shards_failed with QDRANT_SHARDS
+        timings.update(shard_stats)
 
         if not chunks:
             logger.warning("No chunks retrieved for query", extra={"query": query})
-            return RAGResult(answer="", citations=[], timings=timings)
+            return RAGResult(answer="", citations=[], timings=timings, memory=memory)
 
         logger.info("Retrieved chunks", extra={"count": len(chunks)})
 
         # 2. Rerank
-        if rerank:
-            try:
-                from app.retrieval.reranker import CrossEncoderReranker
-
-                with timer() as t_rr:
-                    reranker = CrossEncoderReranker()
-                    chunks = reranker.rerank(query, chunks, top_k=len(chunks))
-                timings["rerank"] = t_rr["elapsed_ms"]
-            except Exception:
-                pass
+        chunks = self._rerank(query, chunks, top_k, rerank, timings, memory=memory)
+        if diversity is not None:
+            chunks = self._diversify(chunks, top_k, diversity, timings)
 
-        current_chunks = chunks[:top_k]
+        current_chunks = self._hydrate(chunks[:top_k])
 
         # 3. Generate
-        with timer() as t_gen:
-            answer = self._call_llm(query, current_chunks)
+        with timer() as t_gen, memory_probe(memory, "generate"):
+            answer, packed, tokens = self._call_llm(query, current_chunks)
         timings["generate"] = t_gen["elapsed_ms"]
+        current_chunks = packed.chunks
 
         # 4. Self-Check
         groundedness = None
         try:
             from app.quality.self_check import compute_groundedness
 
-            with timer() as t_sc:
-                groundedness = compute_groundedness(
-                    answer, [c.get("text", "") for c in current_chunks]
-                )
+            with timer() as t_sc, memory_probe(memory, "self_check"):
+                with stage("llm"):
+                    groundedness = compute_groundedness(answer, [b.text for b in packed.blocks])
             timings["self_check"] = t_sc["elapsed_ms"]
         except Exception:
             pass
@@ -99,7 +158,9 @@ class RAGEngine:
             )
             try:
                 # Retry logic
-                retry_result = self._retry_workflow(query, top_k, rerank, groundedness)
+                retry_result = self._retry_workflow(
+                    query, top_k, rerank, groundedness, filters, memory=memory, diversity=diversity
+                )
                 if retry_result:
                     logger.info(
                         "Retry successful, adopting new answer",
@@ -109,72 +170,341 @@ class RAGEngine:
                     groundedness = retry_result["groundedness"]
                     current_chunks = retry_result["chunks"]
                     timings.update(retry_result["timings"])
+                    tokens = _add_usage(tokens, retry_result["tokens"])
                 else:
                     logger.info("Retry did not improve groundedness")
             except Exception as e:
                 logger.error("Error during retry workflow", extra={"error": str(e)})
                 pass
 
-        citations = [
-            RetrievedChunk(
-                text=c.get("text", ""),
-                source_id=c.get("source_id", ""),
-                chunk_index=int(c.get("chunk_index", 0)),
-                score=float(c.get("score", 0.0)),
-            )
-            for c in current_chunks
-        ]
+        citations = _citations(current_chunks)
 
+        if memory is not None:
+            memory.update({k: v for k, v in process_memory().items() if v is not None})
         return RAGResult(
-            answer=answer, citations=citations, timings=timings, groundedness=groundedness
+            answer=answer,
+            citations=citations,
+            timings=timings,
+            groundedness=groundedness,
+            tokens=tokens,
+            memory=memory,
+        )
+
+    def prepare_generation(
+        self,
+        query: str,
+        top_k: int,
+        rerank: bool,
+        filters: RetrievalFilters | None = None,
+        mmr: bool | None = None,
+        mmr_lambda: float | None = None,
+        *,
+        chunks: list[dict[str, Any]] | None = None,
+    ) -> GenerationRequest:
+        """Run `query` up to the LLM call: retrieval, reranking, MMR and context packing.
+
+        `chunks` is a retrieval result fetched elsewhere (e.g. by
+        `retrieve_top_chunks_batch` with `retrieval_options`); retrieval is skipped then.
+        Pair with `result_from_answer` once the answer is generated. The self-check and its
+        retry need further model calls per query and are not part of this path.
+        """
+        timings: dict[str, float] = {}
+        diversity = self._diversity(mmr, mmr_lambda)
+        if chunks is None:
+            with timer() as t_retr:
+                chunks = self._retrieve(
+                    query,
+                    top_k=self._pool_size(top_k),
+                    filters=filters,
+                    with_vectors=diversity is not None,
+                )
+            timings["retrieve"] = t_retr["elapsed_ms"]
+        if not chunks:
+            return GenerationRequest(query, self.settings.system_prompt, "", None, timings)
+        chunks = self._rerank(query, chunks, top_k, rerank, timings)
+        if diversity is not None:
+            chunks = self._diversify(chunks, top_k, diversity, timings)
+        user_prompt, packed = self._build_prompt(query, self._hydrate(chunks[:top_k]))
+        return GenerationRequest(query, self.settings.system_prompt, user_prompt, packed, timings)
+
+    def result_from_answer(
+        self,
+        request: GenerationRequest,
+        answer: str,
+        usage: dict[str, int] | None = None,
+    ) -> RAGResult:
+        """`RAGResult` for an answer generated from `request`'s prompts. Token counts are
+        taken from the provider's `usage` when given, else counted locally."""
+        if request.packed is None:
+            return RAGResult(answer=answer, citations=[], timings=dict(request.timings))
+        return RAGResult(
+            answer=answer,
+            citations=_citations(request.packed.chunks),
+            timings=dict(request.timings),
+            tokens=self._usage(request.user_prompt, answer, usage),
+        )
+
+    def retrieval_options(
+        self,
+        top_k: int,
+        filters: RetrievalFilters | None = None,
+        mmr: bool | None = None,
+    ) -> dict[str, Any]:
+        """Arguments for `retrieve_top_chunks` (or its batch variant) as `query` would
+        retrieve for these parameters, including the expanded pool as `top_k`."""
+        with_vectors = self._diversity(mmr, None) is not None
+        return {"top_k": self._pool_size(top_k), **self._retrieve_kwargs(filters, with_vectors)}
+
+    def prefetch(self, query: str, top_k: int, rerank: bool) -> dict[str, float]:
+        """Run the retrieval and rerank stages of `query` without generating an answer.
+
+        The retrieval is issued exactly as `query` issues it, so it fills the same embedding
+        and search cache entries (and loads the models on first use); used for cache warming.
+        Returns the stage timings.
+        """
+        timings: dict[str, float] = {}
+        with timer() as t_retr, record_cache_events() as cache_events:
+            chunks = self._retrieve(
+                query, top_k=self._pool_size(top_k), with_vectors=self.settings.mmr_enabled
+            )
+        timings["retrieve"] = t_retr["elapsed_ms"]
+        timings.update(cache_events)
+        if chunks:
+            self._rerank(query, chunks, top_k, rerank, timings)
+        return timings
+
+    def _diversity(self, mmr: bool | None, mmr_lambda: float | None) -> float | None:
+        """MMR relevance weight, or None when MMR is off (`mmr` defaults to `MMR_ENABLED`)."""
+        use_mmr = self.settings.mmr_enabled if mmr is None else mmr
+        if not use_mmr:
+            return None
+        return self.settings.mmr_lambda if mmr_lambda is None else mmr_lambda
+
+    def _pool_size(self, top_k: int) -> int:
+        # With adaptive retrieval the expanded pool is fetched once and trimmed by the policy
+        if self.settings.adaptive_retrieval:
+            return max(top_k, self.settings.adaptive_pool_max)
+        return max(top_k, 10)
+
+    def _retrieve(
+        self,
+        query: str,
+        top_k: int,
+        filters: RetrievalFilters | None = None,
+        with_vectors: bool = False,
+    ) -> list[dict[str, Any]]:
+        kwargs = self._retrieve_kwargs(filters, with_vectors)
+        return retrieval_service.retrieve_top_chunks(query, top_k=top_k, **kwargs)
+
+    def _retrieve_kwargs(
+        self, filters: RetrievalFilters | None, with_vectors: bool
+    ) -> dict[str, Any]:
+        # Optional arguments are only passed when set, keeping the call minimal
+        kwargs: dict[str, Any] = {}
+        if self.settings.qdrant_collection != get_settings().qdrant_collection:
+            kwargs["collection"] = self.settings.qdrant_collection
+        if filters is not None and not filters.is_empty():
+            kwargs["filters"] = filters
+        if self.settings.text_store_path:
+            # Texts are hydrated later, only for the chunks that are reranked or used
+            kwargs["with_text"] = False
+        if with_vectors:
+            kwargs["with_vectors"] = True
+        return kwargs
+
+    def _hydrate(self, chunks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        if all("text" in c for c in chunks):
+            return chunks
+        collection = self.settings.qdrant_collection
+        if collection == get_settings().qdrant_collection:
+            return retrieval_service.hydrate_texts(chunks)
+        return retrieval_service.hydrate_texts(chunks, collection=collection)
+
+    def _plan(self, chunks: list[dict[str, Any]], top_k: int, rerank: bool) -> RerankPlan:
+        if self.settings.adaptive_retrieval:
+            return plan_candidates(chunks, top_k, rerank=rerank, settings=self.settings)
+        n = len(chunks)
+        return RerankPlan(pool=n, rerank_candidates=n if rerank else 0, flat=False, reason="static")
+
+    def _rerank(
+        self,
+        query: str,
+        chunks: list[dict[str, Any]],
+        top_k: int,
+        rerank: bool,
+        timings: dict[str, float],
+        suffix: str = "",
+        memory: dict[str, float] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Trim the dense pool and cross-encode the candidates chosen by the adaptive policy.
+
+        Candidates beyond the reranked head keep their dense order after it. The plan is
+        recorded in `timings` (pool size, rerank count, whether reranking was skipped).
+        """
+        plan = self._plan(chunks, top_k, rerank)
+        chunks = chunks[: plan.pool]
+        timings.update({f"{k}{suffix}": v for k, v in plan.timings().items()})
+        if plan.skipped:
+            if rerank:
+                logger.info("Rerank skipped", extra={"reason": plan.reason, "pool": plan.pool})
+            return chunks
+        head, tail = chunks[: plan.rerank_candidates], chunks[plan.rerank_candidates :]
+        try:
+            from app.retrieval.models import get_reranker
+
+            head = self._hydrate(head)
+
+            reranker = get_reranker()
+            with stage("rerank"), timer() as t_rr, memory_probe(memory, f"rerank{suffix}"):
+                head = reranker.rerank(query, head, top_k=len(head))
+            timings[f"rerank{suffix}"] = t_rr["elapsed_ms"]
+            rerank_costs.observe(t_rr["elapsed_ms"], len(head))
+        except Exception:
+            timings[f"rerank_candidates{suffix}"] = 0.0
+            timings[f"rerank_skipped{suffix}"] = 1.0
+            return chunks
+        logger.info(
+            "Reranked candidates",
+            extra={"reason": plan.reason, "pool": plan.pool, "candidates": len(head)},
         )
+        return head + tail
+
+    def _diversify(
+        self,
+        chunks: list[dict[str, Any]],
+        top_k: int,
+        lambda_: float,
+        timings: dict[str, float],
+        suffix: str = "",
+    ) -> list[dict[str, Any]]:
+        """Pick up to `top_k` chunks by MMR over their stored vectors, dropping near-duplicates.
+
+        Chunks without vectors (e.g. from a store that does not return them) are passed
+        through unchanged and `mmr_skipped` is recorded.
+        """
+        if len(chunks) <= 1:
+            return chunks
+        if not all(c.get("vector") is not None for c in chunks):
+            timings[f"mmr_skipped{suffix}"] = 1.0
+            return chunks
+        with timer() as t_mmr:
+            selection = mmr_select(
+                np.stack([c["vector"] for c in chunks]),
+                relevance_scores(chunks),
+                top_k,
+                lambda_=lambda_,
+                duplicate_threshold=self.settings.mmr_duplicate_threshold,
+            )
+        timings[f"mmr{suffix}"] = t_mmr["elapsed_ms"]
+        timings[f"mmr_duplicates{suffix}"] = float(selection.duplicates)
+        return [chunks[i] for i in selection.indices]
+
+    def _count_tokens(self, text: str) -> int:
+        count = getattr(self.llm, "count_tokens", None)
+        return int(count(text)) if callable(count) else llm_client.estimate_token_count(text)
 
-    def _call_llm(self, query: str, chunks: list[dict[str, Any]]) -> str:
-        context_blocks = "\n\n".join(
-            [f"[source: {c.get('source_id','')}]\n{c.get('text','')}" for c in chunks]
+    def _build_prompt(self, query: str, chunks: list[dict[str, Any]]) -> tuple[str, PackedContext]:
+        """Pack chunks into the user prompt without exceeding `context_max_tokens`.
+
+        The budget covers the system prompt and template as well, so only the remainder is
+        available to context blocks.
+        """
+        overhead = self._count_tokens(self.settings.system_prompt) + self._count_tokens(
+            self.settings.user_prompt_template.format(context_blocks="", query=query)
+        )
+        packed = pack_context(
+            chunks,
+            max_tokens=max(self.settings.context_max_tokens - overhead, 0),
+            count_tokens=self._count_tokens,
         )
         user_prompt = self.settings.user_prompt_template.format(
-            context_blocks=context_blocks, query=query
+            context_blocks=packed.text, query=query
+        )
+        return user_prompt, packed
+
+    def _call_llm(
+        self, query: str, chunks: list[dict[str, Any]]
+    ) -> tuple[str, PackedContext, dict[str, int]]:
+        user_prompt, packed = self._build_prompt(query, chunks)
+        with stage("llm"):
+            answer = self.llm.generate(self.settings.system_prompt, user_prompt)
+        usage = self._usage(user_prompt, answer, getattr(self.llm, "last_usage", None))
+        logger.info(
+            "Packed context",
+            extra={
+                "blocks": len(packed.blocks),
+                "chunks": len(packed.chunks),
+                "dropped_blocks": packed.dropped,
+                "context_tokens": packed.tokens,
+            },
+        )
+        return answer, packed, usage
+
+    def _usage(self, user_prompt: str, answer: str, reported: Any) -> dict[str, int]:
+        if isinstance(reported, dict) and reported.get("total_tokens"):
+            return dict(reported)
+        # Provider did not report usage; count locally
+        prompt_tokens = self._count_tokens(self.settings.system_prompt) + self._count_tokens(
+            user_prompt
         )
-        return self.llm.generate(self.settings.system_prompt, user_prompt)
+        completion_tokens = self._count_tokens(answer)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
 
     def _retry_workflow(
-        self, query: str, top_k: int, rerank: bool, current_score: float
+        self,
+        query: str,
+        top_k: int,
+        rerank: bool,
+        current_score: float,
+        filters: RetrievalFilters | None = None,
+        memory: dict[str, float] | None = None,
+        diversity: float | None = None,
     ) -> dict[str, Any] | None:
         timings = {}
 
         # Expand retrieval
-        with timer() as t_retr:
-            more_chunks = retrieval_service.retrieve_top_chunks(query, top_k=20)
+        pool_size = (
+            max(top_k, self.settings.adaptive_pool_max) if self.settings.adaptive_retrieval else 20
+        )
+        with (
+            timer() as t_retr,
+            record_cache_events() as cache_events,
+            record_shard_stats() as shard_stats,
+            memory_probe(memory, "retrieve_retry"),
+        ):
+            more_chunks = self._retrieve(
+                query, top_k=pool_size, filters=filters, with_vectors=diversity is not None
+            )
         timings["retrieve_retry"] = t_retr["elapsed_ms"]
+        timings.update({f"{name}_retry": hit for name, hit in cache_events.items()})
+        timings.update({f"{name}_retry": value for name, value in shard_stats.items()})
 
-        if rerank:
-            try:
-                from app.retrieval.reranker import CrossEncoderReranker
-
-                with timer() as t_rr:
-                    reranker = CrossEncoderReranker()
-                    more_chunks = reranker.rerank(query, more_chunks, top_k=len(more_chunks))
-                timings["rerank_retry"] = t_rr["elapsed_ms"]
-            except Exception:
-                pass
+        more_chunks = self._rerank(
+            query, more_chunks, top_k, rerank, timings, suffix="_retry", memory=memory
+        )
+        if diversity is not None:
+            more_chunks = self._diversify(more_chunks, top_k, diversity, timings, suffix="_retry")
 
-        more_chunks = more_chunks[:top_k]
+        more_chunks = self._hydrate(more_chunks[:top_k])
 
         # Generate
-        with timer() as t_gen:
-            answer = self._call_llm(query, more_chunks)
+        with timer() as t_gen, memory_probe(memory, "generate_retry"):
+            answer, packed, tokens = self._call_llm(query, more_chunks)
         timings["generate_retry"] = t_gen["elapsed_ms"]
+        more_chunks = packed.chunks
 
         # Check
         groundedness = None
         try:
             from app.quality.self_check import compute_groundedness
 
-            with timer() as t_sc:
-                groundedness = compute_groundedness(
-                    answer, [c.get("text", "") for c in more_chunks]
-                )
+            with timer() as t_sc, memory_probe(memory, "self_check_retry"):
+                with stage("llm"):
+                    groundedness = compute_groundedness(answer, [b.text for b in packed.blocks])
             timings["self_check_retry"] = t_sc["elapsed_ms"]
         except Exception:
             return None
@@ -185,5 +515,23 @@ class RAGEngine:
                 "groundedness": groundedness,
                 "chunks": more_chunks,
                 "timings": timings,
+                "tokens": tokens,
             }
         return None
+
+
+def _citations(chunks: list[dict[str, Any]]) -> list[RetrievedChunk]:
+    return [
+        RetrievedChunk(
+            text=c.get("text", ""),
+            source_id=c.get("source_id", ""),
+            chunk_index=int(c.get("chunk_index", 0)),
+            score=float(c.get("score", 0.0)),
+            source_ids=list(c.get("source_ids", [])),
+        )
+        for c in chunks
+    ]
+
+
+def _add_usage(left: dict[str, int], right: dict[str, int]) -> dict[str, int]:
+    return {k: left.get(k, 0) + right.get(k, 0) for k in set(left) | set(right)}
@@ -0,0 +1,234 @@
+"""Cache warming at startup.
+
+After a deploy the embedding and search caches are empty, so the first real requests pay
+for every query embedding and vector search. `warm_caches` replays the most frequent
+queries seen in the structured JSON logs (the engine's "Starting RAG query" records carry
+`query`, `top_k` and `rerank`), topped up from the golden set, through the engine.
+
+By default only the retrieval and rerank stages run (`RAGEngine.prefetch`): they are what
+the caches hold, and replaying generation would pay for LLM calls whose answers are not
+kept. With ``WARMUP_GENERATE`` every query runs the full pipeline instead. Queries run on a
+small thread pool; queries not started within the time budget are skipped, and queries
+still running when it ends finish in the background without holding up readiness.
+"""
+
+from __future__ import annotations
+
+import glob
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any
+
+import app.retrieval.models as model_registry
+from app.config.settings import AppSettings, get_settings
+from app.engine.rag_engine import RAGEngine
+from app.retrieval.cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_MESSAGE = "Starting RAG query"
+# States during which /ready reports 503
+PENDING_STATES = ("pending", "running")
+
+_status: dict[str, Any] = {"state": "not_started"}
+_status_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class WarmupQuery:
+    query: str
+    top_k: int = 5
+    rerank: bool = False
+
+
+def expand_log_paths(spec: str | None) -> list[Path]:
+    """Files matching the comma-separated glob patterns in `spec` (e.g. rotated logs)."""
+    paths: set[Path] = set()
+    for pattern in (spec or "").split(","):
+        if pattern.strip():
+            paths.update(Path(p) for p in glob.glob(pattern.strip()) if Path(p).is_file())
+    return sorted(paths)
+
+
+def _open_log(path: Path) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return path.open("r", encoding="utf-8", errors="replace")
+
+
+def queries_from_logs(paths: Iterable[str | Path], top_n: int) -> list[WarmupQuery]:
+    """The `top_n` most frequent unfiltered queries logged in `paths`, most frequent first.
+
+    Queries are counted by their normalized text (as the caches key them) together with
+    `top_k` and `rerank`. Lines are checked for the message before being parsed, so
+    unrelated records cost a substring search; malformed lines are ignored.
+    """
+    counts: Counter[WarmupQuery] = Counter()
+    for path in paths:
+        with _open_log(Path(path)) as f:
+            for line in f:
+                if QUERY_LOG_MESSAGE not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("message") != QUERY_LOG_MESSAGE or record.get("filters"):
+                    continue
+                query = normalize_query(str(record.get("query") or ""))
+                if query:
+                    top_k = int(record.get("top_k") or 5)
+                    counts[WarmupQuery(query, top_k, bool(record.get("rerank")))] += 1
+    # Ties keep first-seen order
+    return [q for q, _ in counts.most_common(top_n)]
+
+
+def queries_from_golden(path: str | Path, limit: int) -> list[WarmupQuery]:
+    """Up to `limit` questions of a golden set (JSON lines with ``question``), in order."""
+    queries: dict[WarmupQuery, None] = {}
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            if len(queries) >= limit:
+                break
+            if line.strip():
+                query = normalize_query(str(json.loads(line).get("question") or ""))
+                if query:
+                    queries.setdefault(WarmupQuery(query))
+    return list(queries)
+
+
+def select_queries(settings: AppSettings) -> list[WarmupQuery]:
+    """`WARMUP_TOP_N` queries: the most frequent logged ones first, then golden questions."""
+    top_n = max(settings.warmup_top_n, 0)
+    selected: dict[WarmupQuery, None] = dict.fromkeys(
+        queries_from_logs(expand_log_paths(settings.warmup_log_paths), top_n)
+    )
+    golden = settings.warmup_golden_path
+    if len(selected) < top_n and golden and Path(golden).exists():
+        for query in queries_from_golden(golden, top_n):
+            if len(selected) >= top_n:
+                break
+            selected.setdefault(query)
+    return list(selected)
+
+
+def run_warmup(
+    queries: Sequence[WarmupQuery],
+    *,
+    concurrency: int = 4,
+    budget_s: float = 60.0,
+    generate: bool = False,
+    engine_factory: Callable[[], RAGEngine] | None = None,
+) -> dict[str, Any]:
+    """Replay `queries` on `concurrency` threads within `budget_s` seconds.
+
+    Returns counts of completed, failed, skipped (not started in time) and still running
+    queries, the elapsed time and whether the budget ran out. Failures are logged and
+    counted: warming is best-effort and never raises for a single query.
+    """
+    deadline = time.monotonic() + budget_s
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def replay(q: WarmupQuery) -> None:
+        if time.monotonic() >= deadline:
+            outcome = "skipped"
+        else:
+            try:
+                engine = (engine_factory or RAGEngine)()
+                if generate:
+                    engine.query(q.query, q.top_k, q.rerank)
+                else:
+                    engine.prefetch(q.query, q.top_k, q.rerank)
+                outcome = "completed"
+            except Exception as e:
+                logger.warning("Warm-up query failed", extra={"query": q.query, "error": str(e)})
+                outcome = "failed"
+        with lock:
+            counts[outcome] += 1
+
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="warmup")
+    futures = [pool.submit(replay, q) for q in queries]
+    _, pending = wait(futures, timeout=max(budget_s, 0.0))
+    # Queries still queued are dropped; running ones finish on their own
+    pool.shutdown(wait=False, cancel_futures=True)
+    cancelled = sum(1 for f in pending if f.cancelled())
+    with lock:
+        summary: dict[str, Any] = dict(counts)
+    in_flight = len(queries) - sum(summary.values()) - cancelled
+    summary["skipped"] += cancelled
+    summary.update(
+        in_flight=in_flight,
+        queries=len(queries),
+        elapsed_ms=(time.monotonic() - started) * 1000.0,
+        budget_exhausted=bool(pending),
+    )
+    return summary
+
+
+def warm_caches(settings: AppSettings | None = None) -> dict[str, Any]:
+    """Select the warm-up queries and replay them, updating `warmup_status`."""
+    settings = settings or get_settings()
+    _update(state="running", started_at=time.time(), finished_at=None, error=None)
+    try:
+        queries = select_queries(settings)
+        summary = run_warmup(
+            queries,
+            concurrency=settings.warmup_concurrency,
+            budget_s=settings.warmup_budget_s,
+            generate=settings.warmup_generate,
+        )
+    except Exception as e:
+        logger.error("Cache warm-up failed", extra={"error": str(e)})
+        _update(state="failed", finished_at=time.time(), error=str(e))
+        return warmup_status()
+    _update(state="done", finished_at=time.time(), **summary)
+    logger.info("Cache warm-up finished", extra=summary)
+    return warmup_status()
+
+
+def start_background_warmup(after: threading.Thread | None = None) -> threading.Thread:
+    """Warm the caches on a daemon thread, once the `after` thread (the model preload) ends.
+
+    The status turns ``pending`` immediately, so readiness waits from startup on. Warm-up is
+    skipped when the models failed to load.
+    """
+    _update(state="pending", started_at=None, finished_at=None, error=None)
+
+    def run() -> None:
+        if after is not None:
+            after.join()
+        if model_registry.readiness()["state"] == "failed":
+            _update(state="skipped", finished_at=time.time(), error="model preload failed")
+            return
+        warm_caches()
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _update(**fields: Any) -> None:
+    with _status_lock:
+        _status.update(fields)
+
+
+def warmup_status() -> dict[str, Any]:
+    with _status_lock:
+        return dict(_status)
+
+
+def reset_warmup() -> None:
+    """Forget warm-up state (used by tests)."""
+    with _status_lock:
+        _status.clear()
+        _status["state"] = "not_started"
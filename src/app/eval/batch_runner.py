@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+import app.eval.ragas_runner as rr
+from app.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+Scorer = Callable[[Sequence[dict[str, Any]], Sequence[str] | None], list[dict[str, float]]]
+ProgressCallback = Callable[[str, dict[str, float], int, int], None]
+
+
+def sample_id(sample: dict[str, Any]) -> str:
+    """Stable identifier for a sample, derived from its question, answer and contexts."""
+    if sample.get("id"):
+        return str(sample["id"])
+    key = json.dumps(
+        [sample.get("question", ""), sample.get("answer", ""), sample.get("contexts", [])],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def shard_samples(
+    samples: Sequence[dict[str, Any]], shard_index: int = 0, num_shards: int = 1
+) -> list[dict[str, Any]]:
+    """Return the samples owned by one shard; assignment is by sample id, not position."""
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index}/{num_shards}")
+    if num_shards == 1:
+        return list(samples)
+    return [s for s in samples if int(sample_id(s)[:8], 16) % num_shards == shard_index]
+
+
+def load_checkpoint(path: Path) -> dict[str, dict[str, float]]:
+    """Load per-sample scores from a JSONL checkpoint, tolerating a truncated last line."""
+    scores: dict[str, dict[str, float]] = {}
+    if not path.exists():
+        return scores
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves a partial line; that sample is simply re-scored
+                continue
+            scores[str(record["sample_id"])] = dict(record.get("scores", {}))
+    return scores
+
+
+class CheckpointWriter:
+    """Append-only JSONL writer shared by worker threads."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, records: Iterable[tuple[str, dict[str, float]]]) -> None:
+        lines = "".join(
+            json.dumps({"sample_id": sid, "scores": scores}) + "\n" for sid, scores in records
+        )
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+
+
+def run_evaluation_batched(
+    samples: Sequence[dict[str, Any]],
+    metrics: Sequence[str] | None = None,
+    *,
+    batch_size: int = 8,
+    workers: int = 1,
+    judge_rpm: float | None = None,
+    checkpoint: Path | None = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    max_retries: int = 2,
+    scorer: Scorer | None = None,
+    on_progress: ProgressCallback | None = None,
+    per_sample: bool = False,
+) -> dict[str, Any]:
+    """Run a RAGAS evaluation in batches on a worker pool, checkpointing per-sample scores.
+
+    Parameters
+    ----------
+    samples: Sequence[Dict[str, Any]]
+        Evaluation samples (see `ragas_runner.run_evaluation`).
+    metrics: Sequence[str] | None
+        Metric names to compute.
+    batch_size: int
+        Samples per `ragas.evaluate` call.
+    workers: int
+        Number of batches scored concurrently.
+    judge_rpm: float | None
+        Judge LLM request budget per minute. Each sample is charged one request per metric.
+    checkpoint: Path | None
+        JSONL file receiving per-sample scores. Samples already present are not re-scored.
+    shard_index, num_shards: int
+        Score only the samples owned by this shard, so a run can be split across processes
+        and combined with `merge_checkpoints`.
+    max_retries: int
+        Retries per batch (with exponential backoff) before its samples are counted as failed.
+    scorer: Callable | None
+        Per-sample scoring function; defaults to `ragas_runner.score_samples`.
+    on_progress: Callable | None
+        Called as ``on_progress(sample_id, scores, done, total)`` after each scored sample.
+    per_sample: bool
+        Also return the individual scores as ``per_sample`` (``{sample_id: {metric: score}}``),
+        e.g. for `results_store.write_run`.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Aggregate metrics over all scored samples of the shard plus run counters.
+    """
+
+    score = scorer or rr.score_samples
+    selected = list(metrics or rr.DEFAULT_METRICS)
+    owned = shard_samples(samples, shard_index, num_shards)
+    done_scores = load_checkpoint(checkpoint) if checkpoint else {}
+    writer = CheckpointWriter(checkpoint) if checkpoint else None
+
+    ids = [sample_id(s) for s in owned]
+    results: dict[str, dict[str, float]] = {
+        sid: done_scores[sid] for sid in ids if sid in done_scores
+    }
+    resumed = len(results)
+    pending = [(sid, s) for sid, s in zip(ids, owned, strict=True) if sid not in results]
+    batches = [pending[i : i + batch_size] for i in range(0, len(pending), max(batch_size, 1))]
+    limiter = TokenBucket.per_minute(judge_rpm) if judge_rpm else None
+    lock = threading.Lock()
+    failed = 0
+
+    logger.info(
+        "Starting batched evaluation",
+        extra={
+            "samples": len(owned),
+            "resumed": resumed,
+            "batches": len(batches),
+            "shard": f"{shard_index}/{num_shards}",
+        },
+    )
+
+    def run_batch(batch: list[tuple[str, dict[str, Any]]]) -> None:
+        nonlocal failed
+        for attempt in range(max_retries + 1):
+            if limiter:
+                limiter.acquire(len(batch) * len(selected))
+            try:
+                rows = score([s for _, s in batch], selected)
+                if len(rows) != len(batch):
+                    raise ValueError(f"Scorer returned {len(rows)} rows for {len(batch)} samples")
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    logger.error(
+                        "Evaluation batch failed", extra={"size": len(batch), "error": str(e)}
+                    )
+                    with lock:
+                        failed += len(batch)
+                    return
+                time.sleep(2**attempt)
+        scored = [(sid, row) for (sid, _), row in zip(batch, rows, strict=True)]
+        if writer:
+            writer.write(scored)
+        with lock:
+            for sid, row in scored:
+                results[sid] = row
+                if on_progress:
+                    on_progress(sid, row, len(results), len(owned))
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(run_batch, b) for b in batches]
+        for fut in as_completed(futures):
+            fut.result()
+
+    summary: dict[str, Any] = {
+        "metrics": rr.aggregate_scores(list(results.values()), selected),
+        "samples": len(owned),
+        "scored": len(results),
+        "resumed": resumed,
+        "failed": failed,
+    }
+    if per_sample:
+        summary["per_sample"] = results
+    return summary
+
+
+def merge_checkpoints(
+    paths: Sequence[Path], metrics: Sequence[str] | None = None, *, per_sample: bool = False
+) -> dict[str, Any]:
+    """Combine checkpoints written by separate shard processes into one aggregate result."""
+    merged: dict[str, dict[str, float]] = {}
+    for path in paths:
+        merged.update(load_checkpoint(path))
+    summary: dict[str, Any] = {
+        "metrics": rr.aggregate_scores(list(merged.values()), metrics),
+        "samples": len(merged),
+        "scored": len(merged),
+    }
+    if per_sample:
+        summary["per_sample"] = merged
+    return summary
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import re
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from app.config.settings import AppSettings, get_settings
+from app.engine.rag_engine import RAGEngine
+from app.eval.batch_runner import Scorer, run_evaluation_batched, sample_id
+from app.utils.timing import timer
+
+logger = logging.getLogger(__name__)
+
+# Sweep parameters understood by `run_sweep`; chunk settings require a corpus to re-ingest
+SWEEP_KEYS = (
+    "top_k",
+    "rerank",
+    "adaptive",
+    "self_check_threshold",
+    "chunk_size",
+    "chunk_overlap",
+)
+CHUNK_KEYS = ("chunk_size", "chunk_overlap")
+
+# Timings entries that are counts or flags rather than durations (`RAGResult.timings` mixes
+# both); an optional `_retry` suffix marks the self-check retry's values
+COUNTER_TIMINGS = re.compile(
+    r"(.+_cache_hit|candidate_pool|rerank_candidates|.+_skipped|coalesced|mmr_duplicates"
+    r"|shards_timed_out|shards_failed)(_retry)?"
+)
+
+EngineFactory = Callable[[AppSettings], RAGEngine]
+CollectionBuilder = Callable[[int, int], str]
+
+
+def expand_grid(grid: dict[str, Sequence[Any]]) -> list[dict[str, Any]]:
+    """Cartesian product of a parameter grid; empty or missing axes are omitted."""
+    axes = [(k, list(v)) for k, v in grid.items() if v]
+    if not axes:
+        return [{}]
+    keys = [k for k, _ in axes]
+    combos = itertools.product(*(v for _, v in axes))
+    return [dict(zip(keys, combo, strict=True)) for combo in combos]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q)) if values else 0.0
+
+
+def run_queries(
+    samples: Sequence[dict[str, Any]],
+    *,
+    settings: AppSettings,
+    top_k: int,
+    rerank: bool,
+    concurrency: int = 4,
+    engine_factory: EngineFactory = RAGEngine,
+) -> list[dict[str, Any]]:
+    """Run each sample's question through `RAGEngine.query` concurrently.
+
+    Each record carries the answer, citations, per-stage timings, end-to-end latency and token
+    usage, plus the sample's ground truths so it can be scored directly.
+    """
+
+    def run_one(sample: dict[str, Any]) -> dict[str, Any]:
+        question = str(sample.get("question", ""))
+        record: dict[str, Any] = {
+            "question": question,
+            "ground_truths": list(sample.get("ground_truths", [])),
+        }
+        # One engine per call: LLMClient keeps per-call usage state
+        engine = engine_factory(settings)
+        try:
+            with timer() as t:
+                result = engine.query(question, top_k, rerank)
+        except Exception as e:
+            logger.error("Benchmark query failed", extra={"query": question, "error": str(e)})
+            record.update(error=str(e), answer="", contexts=[], latency_ms=t["elapsed_ms"])
+            return record
+        record.update(
+            answer=result.answer,
+            contexts=[c.text for c in result.citations],
+            citations=[c.model_dump() for c in result.citations],
+            timings=result.timings,
+            tokens=result.tokens,
+            groundedness=result.groundedness,
+            latency_ms=t["elapsed_ms"],
+        )
+        return record
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        return list(pool.map(run_one, samples))
+
+
+def summarize_records(
+    records: Sequence[dict[str, Any]],
+    *,
+    price_prompt_per_1k: float = 0.0,
+    price_completion_per_1k: float = 0.0,
+) -> dict[str, Any]:
+    """Latency percentiles, mean per-stage timings, token totals and cost for one sweep point.
+
+    Counters and flags among the timings (cache hits, candidate counts, skips, ...) are
+    averaged separately as ``counter_mean``, so ``stage_mean_ms`` holds durations only.
+    """
+    ok = [r for r in records if "error" not in r]
+    latencies = [float(r["latency_ms"]) for r in ok]
+    stages: dict[str, list[float]] = {}
+    counters: dict[str, list[float]] = {}
+    for r in ok:
+        for name, value in r.get("timings", {}).items():
+            target = counters if COUNTER_TIMINGS.fullmatch(name) else stages
+            target.setdefault(name, []).append(float(value))
+    prompt_tokens = sum(int(r.get("tokens", {}).get("prompt_tokens", 0)) for r in ok)
+    completion_tokens = sum(int(r.get("tokens", {}).get("completion_tokens", 0)) for r in ok)
+    cost = (
+        prompt_tokens / 1000 * price_prompt_per_1k
+        + completion_tokens / 1000 * price_completion_per_1k
+    )
+    return {
+        "queries": len(records),
+        "errors": len(records) - len(ok),
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "stage_mean_ms": {k: float(np.mean(v)) for k, v in stages.items()},
+        "counter_mean": {k: float(np.mean(v)) for k, v in counters.items()},
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": cost,
+        "cost_per_query_usd": cost / len(ok) if ok else 0.0,
+    }
+
+
+def run_sweep(
+    samples: Sequence[dict[str, Any]],
+    grid: dict[str, Sequence[Any]],
+    *,
+    metrics: Sequence[str] | None = None,
+    concurrency: int = 4,
+    base_settings: AppSettings | None = None,
+    build_collection: CollectionBuilder | None = None,
+    engine_factory: EngineFactory = RAGEngine,
+    scorer: Scorer | None = None,
+    score: bool = True,
+    price_prompt_per_1k: float = 0.0,
+    price_completion_per_1k: float = 0.0,
+) -> list[dict[str, Any]]:
+    """Benchmark every point of a configuration grid end to end.
+
+    Parameters
+    ----------
+    samples: Sequence[Dict[str, Any]]
+        Golden items; only `question` and `ground_truths` are used.
+    grid: Dict[str, Sequence[Any]]
+        Values per key in `SWEEP_KEYS`.
+    build_collection: Callable | None
+        ``build_collection(chunk_size, chunk_overlap) -> collection`` re-ingests the corpus for
+        chunk settings. Required when the grid sweeps chunk settings.
+    score: bool
+        Score answers with RAGAS; disable for latency-only runs.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        One entry per grid point with its config, latency/cost summary, quality metrics and
+        raw per-query records.
+    """
+    base = base_settings or get_settings()
+    unknown = set(grid) - set(SWEEP_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    if any(grid.get(k) for k in CHUNK_KEYS) and build_collection is None:
+        raise ValueError("Sweeping chunk settings requires a corpus to re-ingest")
+
+    collections: dict[tuple[int, int], str] = {}
+    points: list[dict[str, Any]] = []
+    for config in expand_grid(grid):
+        updates: dict[str, Any] = {}
+        if "adaptive" in config:
+            updates["adaptive_retrieval"] = bool(config["adaptive"])
+        if "self_check_threshold" in config:
+            updates["self_check_min_groundedness"] = float(config["self_check_threshold"])
+        if build_collection is not None and any(k in config for k in CHUNK_KEYS):
+            key = (int(config.get("chunk_size", 1000)), int(config.get("chunk_overlap", 150)))
+            if key not in collections:
+                collections[key] = build_collection(*key)
+            updates["qdrant_collection"] = collections[key]
+        settings = base.model_copy(update=updates)
+
+        logger.info("Running sweep point", extra={"config": config})
+        records = run_queries(
+            samples,
+            settings=settings,
+            top_k=int(config.get("top_k", 5)),
+            rerank=bool(config.get("rerank", False)),
+            concurrency=concurrency,
+            engine_factory=engine_factory,
+        )
+        point: dict[str, Any] = {
+            "config": config,
+            **summarize_records(
+                records,
+                price_prompt_per_1k=price_prompt_per_1k,
+                price_completion_per_1k=price_completion_per_1k,
+            ),
+            "metrics": {},
+            "records": records,
+        }
+        ok = [r for r in records if "error" not in r]
+        answered = [
+            {k: r[k] for k in ("question", "contexts", "answer", "ground_truths")} for r in ok
+        ]
+        if score and answered:
+            evaluation = run_evaluation_batched(
+                answered, metrics=metrics, workers=concurrency, scorer=scorer, per_sample=True
+            )
+            point["metrics"] = evaluation["metrics"]
+            # Per-question scores stay on the records, e.g. for `results_store.write_run`
+            for record, sample in zip(ok, answered, strict=True):
+                record["scores"] = evaluation["per_sample"].get(sample_id(sample), {})
+        points.append(point)
+    return points
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import app.eval.ragas_runner as rr
+from app.config.settings import get_settings
+from app.eval.batch_runner import run_evaluation_batched
+from app.eval.reporting import write_report_files
+from app.exceptions import RAGException
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"succeeded", "failed"})
+
+
+class JobQueueFullError(RAGException):
+    """Raised when the evaluation job queue is at capacity"""
+
+    pass
+
+
+@dataclass
+class EvalJob:
+    """State of one asynchronous evaluation job."""
+
+    id: str
+    samples: list[dict[str, Any]]
+    metrics: list[str] | None
+    out_json: str | None
+    out_md: str | None
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    done: int = 0
+    rows: list[dict[str, float]] = field(default_factory=list)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    result: dict[str, Any] | None = None
+    written: dict[str, str | None] | None = None
+    error: str | None = None
+
+    @property
+    def total(self) -> int:
+        return len(self.samples)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Public view of the job, including running means over samples scored so far."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "partial_metrics": rr.aggregate_scores(self.rows, self.metrics),
+            "result": self.result,
+            "written": self.written,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class EvalJobManager:
+    """Runs evaluation jobs on a bounded background executor and keeps their state.
+
+    Parameters
+    ----------
+    max_workers: int
+        Jobs evaluated in parallel.
+    max_pending: int
+        Jobs allowed to wait or run at once; further submissions are rejected.
+    ttl_s: float
+        Seconds a finished job stays queryable before it is evicted.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 16, ttl_s: float = 3600.0) -> None:
+        self.max_pending = max_pending
+        self.ttl_s = ttl_s
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(max_workers, 1), thread_name_prefix="eval-job"
+        )
+        self._jobs: dict[str, EvalJob] = {}
+        self._cond = threading.Condition()
+
+    def submit(
+        self,
+        samples: list[dict[str, Any]],
+        metrics: list[str] | None = None,
+        out_json: str | None = None,
+        out_md: str | None = None,
+    ) -> EvalJob:
+        with self._cond:
+            self._evict_expired()
+            active = sum(1 for j in self._jobs.values() if j.status not in TERMINAL_STATUSES)
+            if active >= self.max_pending:
+                raise JobQueueFullError(f"{active} evaluation jobs already pending")
+            job = EvalJob(
+                id=uuid.uuid4().hex,
+                samples=samples,
+                metrics=metrics,
+                out_json=out_json,
+                out_md=out_md,
+            )
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        logger.info("Evaluation job queued", extra={"job_id": job.id, "samples": job.total})
+        return job
+
+    def get(self, job_id: str) -> EvalJob | None:
+        with self._cond:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def wait_for_events(
+        self, job: EvalJob, cursor: int, timeout: float
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Return events after `cursor`, blocking up to `timeout` if there are none yet.
+
+        The flag is True once the job has finished and every event has been returned.
+        """
+        with self._cond:
+            if len(job.events) <= cursor and job.status not in TERMINAL_STATUSES:
+                self._cond.wait(timeout)
+            events = job.events[cursor:]
+            finished = job.status in TERMINAL_STATUSES and cursor + len(events) == len(job.events)
+            return events, finished
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_s
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _emit(self, job: EvalJob, event: dict[str, Any]) -> None:
+        with self._cond:
+            job.events.append(event)
+            self._cond.notify_all()
+
+    def _run(self, job: EvalJob) -> None:
+        settings = get_settings()
+        with self._cond:
+            job.status = "running"
+            job.started_at = time.time()
+        self._emit(job, {"event": "started", "total": job.total})
+
+        def on_progress(sample_id: str, scores: dict[str, float], done: int, total: int) -> None:
+            with self._cond:
+                job.done = done
+                job.rows.append(scores)
+            self._emit(
+                job,
+                {
+                    "event": "progress",
+                    "sample_id": sample_id,
+                    "scores": scores,
+                    "done": done,
+                    "total": total,
+                },
+            )
+
+        try:
+            result = run_evaluation_batched(
+                job.samples,
+                metrics=job.metrics,
+                batch_size=settings.eval_batch_size,
+                workers=settings.eval_batch_workers,
+                judge_rpm=settings.eval_judge_rpm,
+                on_progress=on_progress,
+            )
+            if job.total and not result["scored"]:
+                # Every batch failed: report the run as failed rather than as an empty success
+                raise RAGException(f"No sample was scored ({result['failed']} failed)")
+            written = write_report_files(
+                result,
+                out_json=Path(job.out_json) if job.out_json else None,
+                out_md=Path(job.out_md) if job.out_md else None,
+            )
+        except Exception as e:
+            logger.error("Evaluation job failed", extra={"job_id": job.id, "error": str(e)})
+            with self._cond:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = time.time()
+            self._emit(job, {"event": "failed", "error": str(e)})
+            return
+        with self._cond:
+            job.result = result
+            job.written = written
+            job.status = "succeeded"
+            job.finished_at = time.time()
+        self._emit(job, {"event": "succeeded", "result": result, "written": written})
+        logger.info("Evaluation job finished", extra={"job_id": job.id})
+
+
+@lru_cache(maxsize=1)
+def get_job_manager() -> EvalJobManager:
+    settings = get_settings()
+    return EvalJobManager(
+        max_workers=settings.eval_job_workers,
+        max_pending=settings.eval_job_max_pending,
+        ttl_s=settings.eval_job_ttl_s,
+    )
@@ -3,26 +3,28 @@ from __future__ import annotations
 from collections.abc import Sequence
 from typing import Any
 
+DEFAULT_METRICS = ["faithfulness", "answer_relevancy"]
+JUDGE_MODEL = "gemini-1.5-flash"
 
-def run_evaluation(
+
+def score_samples(
     samples: Sequence[dict[str, Any]],
     metrics: Sequence[str] | None = None,
-) -> dict[str, Any]:
-    """Run a RAG evaluation on provided samples using RAGAS.
+) -> list[dict[str, float]]:
+    """Score samples with RAGAS and return one ``{metric: score}`` dict per sample.
 
     Parameters
     ----------
     samples: Sequence[Dict[str, Any]]
-        Items with keys: question (str), contexts (List[str]), answer (str), 
+        Items with keys: question (str), contexts (List[str]), answer (str),
         ground_truths (List[str])
     metrics: Sequence[str] | None
-        Metric names to compute. Defaults to faithfulness, answer_relevancy, 
-        context_precision, context_recall.
+        Metric names to compute. Defaults to faithfulness and answer_relevancy.
 
     Returns
     -------
-    Dict[str, Any]
-        Aggregate metrics with means and per-sample scores if available.
+    List[Dict[str, float]]
+        Per-sample metric scores, in the same order as `samples`.
     """
 
     # Import ragas lazily so that importing this module doesn't require it
@@ -36,17 +38,12 @@ def run_evaluation(
         faithfulness,
     )
 
-    selected = metrics or [
-        "faithfulness",
-        "answer_relevancy",
-        # For simplicity in the POC, compute precision/recall only when reference is present
-        # "context_precision",
-        # "context_recall",
-    ]
+    selected = list(metrics or DEFAULT_METRICS)
 
     name_to_metric = {
         "faithfulness": faithfulness,
         "answer_relevancy": answer_relevancy,
+        # For simplicity in the POC, compute precision/recall only when reference is present
         # "context_precision": context_precision,
         # "context_recall": context_recall,
     }
@@ -59,15 +56,51 @@ def run_evaluation(
         raise RuntimeError("GEMINI_API_KEY is required to run RAGAS with Gemini judge")
 
     llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", google_api_key=gemini_api_key, temperature=0.0
+        model=JUDGE_MODEL, google_api_key=gemini_api_key, temperature=0.0
     )
     result = evaluate(ds, metrics=metric_objs, llm=llm)
-    # Ragas returns a Dataset with columns for metric scores and an aggregate .to_pandas().mean()
     df = result.to_pandas()
+    rows: list[dict[str, float]] = []
+    for _, row in df.iterrows():
+        rows.append({m: float(row[m]) for m in selected if m in df.columns})
+    return rows
+
+
+def aggregate_scores(
+    rows: Sequence[dict[str, float]], metrics: Sequence[str] | None = None
+) -> dict[str, float]:
+    """Mean of each metric over per-sample rows, ignoring missing and NaN scores."""
+    selected = list(metrics or DEFAULT_METRICS)
     aggregates: dict[str, float] = {}
     for m in selected:
-        if m in df.columns:
-            aggregates[m] = float(df[m].mean())
+        values = [r[m] for r in rows if m in r and r[m] == r[m]]
+        if values:
+            aggregates[m] = sum(values) / len(values)
+    return aggregates
+
+
+def run_evaluation(
+    samples: Sequence[dict[str, Any]],
+    metrics: Sequence[str] | None = None,
+) -> dict[str, Any]:
+    """Run a RAG evaluation on provided samples using RAGAS.
+
+    Parameters
+    ----------
+    samples: Sequence[Dict[str, Any]]
+        Items with keys: question (str), contexts (List[str]), answer (str), 
+        ground_truths (List[str])
+    metrics: Sequence[str] | None
+        Metric names to compute. Defaults to faithfulness, answer_relevancy, 
+        context_precision, context_recall.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Aggregate metrics with means and per-sample scores if available.
+    """
+
+    rows = score_samples(samples, metrics=metrics)
     return {
-        "metrics": aggregates,
+        "metrics": aggregate_scores(rows, metrics),
     }
@@ -7,13 +7,45 @@ from typing import Any
 
 def generate_markdown_report(result: dict[str, Any], title: str = "RAG Evaluation Report") -> str:
     metrics: dict[str, float] = result.get("metrics", {})  # type: ignore[assignment]
-    lines = [f"# {title}", "", "## Metrics", "", "| Metric | Score |", "|---|---:|"]
-    for name, value in metrics.items():
-        lines.append(f"| {name} | {value:.3f} |")
-    lines.append("")
+    lines = [f"# {title}", ""]
+    if metrics or "sweep" not in result:
+        lines += ["## Metrics", "", "| Metric | Score |", "|---|---:|"]
+        for name, value in metrics.items():
+            lines.append(f"| {name} | {value:.3f} |")
+        lines.append("")
+    if "sweep" in result:
+        lines += _sweep_table(result["sweep"])
     return "\n".join(lines)
 
 
+def _sweep_table(points: list[dict[str, Any]]) -> list[str]:
+    metric_names = sorted({m for p in points for m in p.get("metrics", {})})
+    header = ["Config", *metric_names, "p50 (ms)", "p95 (ms)", "Tokens", "Cost ($)", "Errors"]
+    lines = [
+        "## Quality vs Latency/Cost",
+        "",
+        "| " + " | ".join(header) + " |",
+        "|---|" + "---:|" * (len(header) - 1),
+    ]
+    for p in points:
+        config = ", ".join(f"{k}={v}" for k, v in p.get("config", {}).items()) or "default"
+        metrics = p.get("metrics", {})
+        scores = [f"{metrics[m]:.3f}" if m in metrics else "-" for m in metric_names]
+        tokens = int(p.get("prompt_tokens", 0)) + int(p.get("completion_tokens", 0))
+        row = [
+            config,
+            *scores,
+            f"{p.get('latency_p50_ms', 0.0):.0f}",
+            f"{p.get('latency_p95_ms', 0.0):.0f}",
+            str(tokens),
+            f"{p.get('cost_usd', 0.0):.4f}",
+            str(p.get("errors", 0)),
+        ]
+        lines.append("| " + " | ".join(row) + " |")
+    lines.append("")
+    return lines
+
+
 def write_report_files(
     result: dict[str, Any], out_json: Path | None = None, out_md: Path | None = None
 ) -> dict[str, str | None]:
@@ -0,0 +1,277 @@
+"""Append-only Parquet store of per-sample evaluation scores.
+
+Every run is written once, as ``<root>/run_id=<run id>/part-0.parquet``, in long form: one
+row per (sample, metric) with the score, the sample's latency, the run's config hash and
+model names. The schema is fixed, so runs scoring different metrics share one dataset.
+Reads locate run files from their ids, so selecting runs only opens those files, and
+decode only the requested columns. `open_dataset` exposes the same layout as a hive-
+partitioned `pyarrow.dataset` for ad-hoc queries.
+
+`pyarrow` is an optional dependency (``pip install '.[results]'``) and is imported on use.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+DEFAULT_ROOT = Path("reports/eval_results")
+PART_FILE = "part-0.parquet"
+# A score drop larger than this counts as a regression in `diff_runs`
+DEFAULT_REGRESSION_THRESHOLD = 0.05
+
+
+def _pa() -> Any:
+    try:
+        import pyarrow
+    except ImportError as e:  # pragma: no cover - optional dependency
+        raise RuntimeError(
+            "pyarrow is required for the results store (pip install '.[results]')"
+        ) from e
+    return pyarrow
+
+
+def schema() -> pa.Schema:
+    pa = _pa()
+    return pa.schema(
+        [
+            ("sample_id", pa.string()),
+            ("question", pa.string()),
+            ("metric", pa.dictionary(pa.int32(), pa.string())),
+            ("score", pa.float64()),
+            ("latency_ms", pa.float64()),
+            ("config_hash", pa.string()),
+            ("config", pa.string()),
+            ("judge_model", pa.string()),
+            ("generator_model", pa.string()),
+            ("embedding_model", pa.string()),
+            ("created_at", pa.timestamp("ms", tz="UTC")),
+        ]
+    )
+
+
+def config_hash(config: dict[str, Any] | None) -> str:
+    """Short, stable hash of a run configuration (key order does not matter)."""
+    blob = json.dumps(config or {}, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def question_id(sample: dict[str, Any]) -> str:
+    """Identifier of a sample's question (its ``id`` if set), so runs that produced different
+    answers for the same question line up in `diff_runs`."""
+    if sample.get("id"):
+        return str(sample["id"])
+    return hashlib.sha1(str(sample.get("question", "")).encode("utf-8")).hexdigest()[:16]
+
+
+def new_run_id() -> str:
+    """Run ids sort by creation time: ``20260101T120000123456Z-1a2b3c``."""
+    return f"{datetime.now(UTC).strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:6]}"
+
+
+def write_run(
+    samples: Iterable[dict[str, Any]],
+    *,
+    root: str | Path = DEFAULT_ROOT,
+    run_id: str | None = None,
+    config: dict[str, Any] | None = None,
+    models: dict[str, str | None] | None = None,
+) -> str:
+    """Persist one run and return its id.
+
+    Each sample is ``{"sample_id", "question", "scores": {metric: score}, "latency_ms"}``
+    (`question` and `latency_ms` may be missing). Runs are never modified after writing;
+    an existing run id raises `FileExistsError`.
+    """
+    pa = _pa()
+    import pyarrow.parquet as pq
+
+    run_id = run_id or new_run_id()
+    models = models or {}
+    columns: dict[str, list[Any]] = {name: [] for name in schema().names}
+    for sample in samples:
+        for metric, score in (sample.get("scores") or {}).items():
+            columns["sample_id"].append(str(sample["sample_id"]))
+            columns["question"].append(sample.get("question"))
+            columns["metric"].append(metric)
+            columns["score"].append(None if score is None else float(score))
+            columns["latency_ms"].append(sample.get("latency_ms"))
+    n = len(columns["sample_id"])
+    columns["config_hash"] = [config_hash(config)] * n
+    columns["config"] = [json.dumps(config or {}, sort_keys=True, default=str)] * n
+    for role in ("judge", "generator", "embedding"):
+        columns[f"{role}_model"] = [models.get(role)] * n
+    columns["created_at"] = [datetime.now(UTC)] * n
+
+    directory = Path(root) / f"run_id={run_id}"
+    directory.mkdir(parents=True, exist_ok=False)
+    tmp = directory / f".{PART_FILE}.tmp"
+    pq.write_table(pa.table(columns, schema=schema()), tmp)
+    # Readers skip dot files, so a run appears only once its file is complete
+    tmp.rename(directory / PART_FILE)
+    return run_id
+
+
+def list_runs(root: str | Path = DEFAULT_ROOT) -> list[str]:
+    """Run ids in creation order, from the directory names (no file is opened)."""
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(
+        p.name.removeprefix("run_id=")
+        for p in root.iterdir()
+        if p.name.startswith("run_id=") and (p / PART_FILE).exists()
+    )
+
+
+def open_dataset(root: str | Path = DEFAULT_ROOT) -> Any:
+    """Lazy `pyarrow.dataset.Dataset` over all runs (e.g. for DuckDB or Polars); nothing is
+    read until it is scanned."""
+    pa = _pa()
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("run_id", pa.string())]), flavor="hive")
+    return ds.dataset(
+        str(root),
+        format="parquet",
+        schema=schema().append(pa.field("run_id", pa.string())),
+        partitioning=partitioning,
+    )
+
+
+def load_results(
+    root: str | Path = DEFAULT_ROOT,
+    *,
+    runs: Sequence[str] | None = None,
+    metrics: Sequence[str] | None = None,
+    columns: Sequence[str] | None = None,
+) -> pa.Table:
+    """Rows of the given runs (default: all) and metrics, decoding only `columns`.
+
+    Run files are located from the run ids and read one by one on a thread pool; with many
+    small files this is several times faster than a `pyarrow.dataset` scan.
+    """
+    pa = _pa()
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    wanted = list(columns) if columns else [*schema().names, "run_id"]
+    file_columns = [c for c in wanted if c != "run_id"]
+    if metrics is not None and "metric" not in file_columns:
+        file_columns.append("metric")
+    run_ids = list_runs(root) if runs is None else list(runs)
+
+    def read(run_id: str) -> pa.Table | None:
+        path = Path(root) / f"run_id={run_id}" / PART_FILE
+        return pq.ParquetFile(path).read(columns=file_columns) if path.exists() else None
+
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        found = [
+            (r, t) for r, t in zip(run_ids, pool.map(read, run_ids), strict=True) if t is not None
+        ]
+    if not found:
+        full = schema().append(pa.field("run_id", pa.string()))
+        return full.empty_table().select(wanted)
+    table = pa.concat_tables([t for _, t in found], promote_options="permissive")
+    if "run_id" in wanted:
+        # One dictionary entry per run instead of a repeated string per row
+        lengths = np.array([t.num_rows for _, t in found])
+        indices = np.repeat(np.arange(len(found), dtype=np.int32), lengths)
+        run_column = pa.DictionaryArray.from_arrays(indices, pa.array([r for r, _ in found]))
+        table = table.append_column("run_id", run_column)
+    if metrics is not None:
+        table = table.filter(pc.is_in(table["metric"].cast(pa.string()), pa.array(metrics)))
+    return table.select(wanted)
+
+
+def _scores(root: str | Path, run_id: str, metrics: Sequence[str] | None) -> pa.Table:
+    pa = _pa()
+    table = load_results(
+        root, runs=[run_id], metrics=metrics, columns=["sample_id", "question", "metric", "score"]
+    )
+    # Join keys must be plain strings
+    return table.set_column(2, "metric", table["metric"].cast(pa.string()))
+
+
+def diff_runs(
+    base: str,
+    candidate: str,
+    *,
+    root: str | Path = DEFAULT_ROOT,
+    metrics: Sequence[str] | None = None,
+    threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+) -> pa.Table:
+    """Per-question score changes from run `base` to run `candidate`.
+
+    Samples are matched on (sample_id, metric); samples scored in only one run are left out.
+    Rows carry both scores, ``delta = candidate - base`` and ``regression`` (the score fell
+    by more than `threshold`), sorted by delta, worst first.
+    """
+    import pyarrow.compute as pc
+
+    left = _scores(root, base, metrics).rename_columns(["sample_id", "question", "metric", "base"])
+    right = _scores(root, candidate, metrics).select(["sample_id", "metric", "score"])
+    right = right.rename_columns(["sample_id", "metric", "candidate"])
+    joined = left.join(right, keys=["sample_id", "metric"], join_type="inner")
+    delta = pc.subtract(joined["candidate"], joined["base"])
+    joined = joined.append_column("delta", delta)
+    joined = joined.append_column("regression", pc.less(delta, -threshold))
+    return joined.sort_by([("delta", "ascending"), ("sample_id", "ascending")])
+
+
+def summarize_diff(diff: pa.Table) -> dict[str, dict[str, float]]:
+    """Per metric: compared samples, mean scores and delta, regressions and improvements."""
+    if diff.num_rows == 0:
+        return {}
+    grouped = diff.group_by("metric").aggregate(
+        [
+            ("base", "mean"),
+            ("candidate", "mean"),
+            ("delta", "mean"),
+            ("delta", "count"),
+            ("regression", "sum"),
+        ]
+    )
+    import pyarrow.compute as pc
+
+    improved = diff.filter(pc.greater(diff["delta"], 0.0)).group_by("metric")
+    improvements = {
+        row["metric"]: row["delta_count"]
+        for row in improved.aggregate([("delta", "count")]).to_pylist()
+    }
+    return {
+        row["metric"]: {
+            "compared": row["delta_count"],
+            "base_mean": row["base_mean"],
+            "candidate_mean": row["candidate_mean"],
+            "delta_mean": row["delta_mean"],
+            "regressions": row["regression_sum"],
+            "improvements": improvements.get(row["metric"], 0),
+        }
+        for row in grouped.to_pylist()
+    }
+
+
+def run_summaries(root: str | Path = DEFAULT_ROOT, runs: Sequence[str] | None = None) -> pa.Table:
+    """Mean score and sample count per run and metric (one scan of three columns)."""
+    pa = _pa()
+    table = load_results(root, runs=runs, columns=["run_id", "metric", "score"])
+    table = table.set_column(0, "run_id", table["run_id"].cast(pa.string()))
+    table = table.set_column(1, "metric", table["metric"].cast(pa.string()))
+    return (
+        table.group_by(["run_id", "metric"])
+        .aggregate([("score", "mean"), ("score", "count")])
+        .sort_by([("run_id", "ascending"), ("metric", "ascending")])
+    )
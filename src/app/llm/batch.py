@@ -0,0 +1,288 @@
+"""Offline generation through the OpenAI batch API.
+
+Chat-completion requests are written to JSONL files in the batch input format (one
+``{"custom_id", "method", "url", "body"}`` object per line), uploaded and submitted as batch
+jobs, polled until they finish, and their output files parsed back into answers keyed by
+`custom_id`. Batches are billed at a discount and do not count against the synchronous rate
+limits, at the cost of latency (up to the 24 h completion window), so this suits nightly runs
+over large question sets rather than serving.
+
+Talking to the provider goes through a `BatchTransport`. `HttpBatchTransport` implements the
+OpenAI Files and Batches endpoints under `OPENAI_BASE_URL`, so any compatible server,
+including a local stand-in for tests, can take the provider's place.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Protocol
+
+import requests
+
+from app.config.settings import AppSettings, get_settings
+from app.exceptions import LLMError
+
+logger = logging.getLogger(__name__)
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Batch states after which the status no longer changes
+TERMINAL_STATES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+@dataclass
+class PromptRequest:
+    custom_id: str
+    system_prompt: str
+    user_prompt: str
+
+
+@dataclass
+class BatchOutput:
+    """Outcome of one request: the answer and reported token usage, or an error."""
+
+    custom_id: str
+    answer: str | None = None
+    usage: dict[str, int] | None = None
+    error: str | None = None
+
+
+@dataclass
+class BatchRun:
+    """Outputs of a set of batches by `custom_id`, with the provider's batch ids."""
+
+    outputs: dict[str, BatchOutput] = field(default_factory=dict)
+    batch_ids: list[str] = field(default_factory=list)
+
+
+class BatchTransport(Protocol):
+    """How batch files reach the provider and results come back."""
+
+    def submit(self, input_path: Path, endpoint: str) -> str:
+        """Upload the JSONL file, create a batch over it and return the batch id."""
+        ...
+
+    def retrieve(self, batch_id: str) -> dict[str, Any]:
+        """The batch object: ``status``, ``output_file_id``, ``error_file_id``, ..."""
+        ...
+
+    def download(self, file_id: str) -> bytes:
+        """Content of a result file."""
+        ...
+
+
+class HttpBatchTransport:
+    """OpenAI Files and Batches API over HTTP (`base_url` defaults to `OPENAI_BASE_URL`)."""
+
+    def __init__(
+        self, api_key: str, base_url: str | None = None, *, timeout_s: float = 60.0
+    ) -> None:
+        self.base_url = (base_url or get_settings().openai_base_url).rstrip("/")
+        self.timeout_s = timeout_s
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        try:
+            resp = self.session.request(
+                method, f"{self.base_url}{path}", timeout=self.timeout_s, **kwargs
+            )
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            raise LLMError(f"Batch API error ({method} {path}): {e}") from e
+        return resp
+
+    def submit(self, input_path: Path, endpoint: str) -> str:
+        with input_path.open("rb") as f:
+            uploaded = self._request(
+                "POST",
+                "/files",
+                data={"purpose": "batch"},
+                files={"file": (input_path.name, f, "application/jsonl")},
+            ).json()
+        batch = self._request(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": uploaded["id"],
+                "endpoint": endpoint,
+                "completion_window": COMPLETION_WINDOW,
+            },
+        ).json()
+        return str(batch["id"])
+
+    def retrieve(self, batch_id: str) -> dict[str, Any]:
+        return dict(self._request("GET", f"/batches/{batch_id}").json())
+
+    def download(self, file_id: str) -> bytes:
+        return self._request("GET", f"/files/{file_id}/content").content
+
+
+def default_transport(settings: AppSettings | None = None) -> HttpBatchTransport:
+    settings = settings or get_settings()
+    if (settings.llm_provider or "").lower() != "openai":
+        raise ValueError("Batch generation supports LLM_PROVIDER=openai only")
+    if not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    return HttpBatchTransport(settings.openai_api_key, settings.openai_base_url)
+
+
+def chat_request(request: PromptRequest, settings: AppSettings | None = None) -> dict[str, Any]:
+    """One batch input line: the same chat completion `LLMClient` would send."""
+    settings = settings or get_settings()
+    return {
+        "custom_id": request.custom_id,
+        "method": "POST",
+        "url": CHAT_ENDPOINT,
+        "body": {
+            "model": settings.openai_model or "gpt-4o-mini",
+            "temperature": settings.llm_temperature,
+            "max_tokens": settings.llm_max_tokens,
+            "messages": [
+                {"role": "system", "content": request.system_prompt},
+                {"role": "user", "content": request.user_prompt},
+            ],
+        },
+    }
+
+
+def write_batch_files(
+    requests_: Iterable[PromptRequest],
+    directory: str | Path,
+    *,
+    max_requests: int | None = None,
+    settings: AppSettings | None = None,
+) -> list[Path]:
+    """Write the requests as batch input files of at most `max_requests` lines each
+    (default `LLM_BATCH_MAX_REQUESTS`) and return their paths."""
+    settings = settings or get_settings()
+    limit = max(max_requests or settings.llm_batch_max_requests, 1)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = []
+    f: IO[str] | None = None
+    try:
+        for i, request in enumerate(requests_):
+            if i % limit == 0:
+                if f is not None:
+                    f.close()
+                paths.append(directory / f"batch-{len(paths):04d}.jsonl")
+                f = paths[-1].open("w", encoding="utf-8")
+            f.write(json.dumps(chat_request(request, settings), ensure_ascii=False) + "\n")
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+def parse_output(content: bytes) -> Iterator[BatchOutput]:
+    """Parse a batch output or error file (one result object per line)."""
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        custom_id = str(record.get("custom_id"))
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code", 200) >= 400:
+            error = record.get("error") or body.get("error") or response.get("status_code")
+            message = json.dumps(error) if isinstance(error, dict) else str(error)
+            yield BatchOutput(custom_id, error=message)
+            continue
+        try:
+            answer = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            yield BatchOutput(custom_id, error="Response without a message")
+            continue
+        usage = body.get("usage") or {}
+        yield BatchOutput(
+            custom_id,
+            answer=answer,
+            usage={
+                "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+                "completion_tokens": int(usage.get("completion_tokens", 0)),
+                "total_tokens": int(usage.get("total_tokens", 0)),
+            },
+        )
+
+
+def wait_for_batch(
+    transport: BatchTransport,
+    batch_id: str,
+    *,
+    poll_s: float | None = None,
+    timeout_s: float | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> dict[str, Any]:
+    """Poll until the batch reaches a terminal state and return the batch object.
+
+    Raises `LLMError` when it has not finished within `timeout_s` (default
+    `LLM_BATCH_TIMEOUT_S`).
+    """
+    settings = get_settings()
+    poll_s = settings.llm_batch_poll_s if poll_s is None else poll_s
+    timeout_s = settings.llm_batch_timeout_s if timeout_s is None else timeout_s
+    deadline = time.monotonic() + timeout_s
+    while True:
+        batch = transport.retrieve(batch_id)
+        status = batch.get("status")
+        if status in TERMINAL_STATES:
+            return batch
+        if time.monotonic() >= deadline:
+            raise LLMError(f"Batch {batch_id} still {status} after {timeout_s:.0f}s")
+        logger.info(
+            "Waiting for batch",
+            extra={"batch_id": batch_id, "status": status, "counts": batch.get("request_counts")},
+        )
+        sleep(poll_s)
+
+
+def run_batches(
+    prompts: Sequence[PromptRequest],
+    directory: str | Path,
+    *,
+    transport: BatchTransport | None = None,
+    poll_s: float | None = None,
+    timeout_s: float | None = None,
+    max_requests: int | None = None,
+) -> BatchRun:
+    """Generate answers for `prompts` through batch jobs.
+
+    All batch files are submitted before any is polled, so the provider works on them in
+    parallel. Requests of batches that fail or expire, and requests missing from the
+    output, get an error instead of an answer; the run itself only raises when a batch
+    cannot be submitted or polled.
+    """
+    transport = transport or default_transport()
+    run = BatchRun()
+    if not prompts:
+        return run
+    limit = max(max_requests or get_settings().llm_batch_max_requests, 1)
+    paths = write_batch_files(prompts, directory, max_requests=limit)
+    for path in paths:
+        run.batch_ids.append(transport.submit(path, CHAT_ENDPOINT))
+        logger.info("Submitted batch", extra={"batch_id": run.batch_ids[-1], "file": str(path)})
+    statuses: list[str] = []
+    for batch_id in run.batch_ids:
+        batch = wait_for_batch(transport, batch_id, poll_s=poll_s, timeout_s=timeout_s)
+        for key in ("output_file_id", "error_file_id"):
+            if batch.get(key):
+                for output in parse_output(transport.download(batch[key])):
+                    run.outputs[output.custom_id] = output
+        statuses.append(str(batch.get("status")))
+        if batch.get("status") != "completed":
+            logger.warning(
+                "Batch did not complete", extra={"batch_id": batch_id, "status": batch["status"]}
+            )
+    for i, prompt in enumerate(prompts):
+        if prompt.custom_id not in run.outputs:
+            error = f"No result in the output of batch {run.batch_ids[i // limit]}"
+            run.outputs[prompt.custom_id] = BatchOutput(
+                prompt.custom_id, error=f"{error} ({statuses[i // limit]})"
+            )
+    return run
@@ -1,10 +1,38 @@
 from __future__ import annotations
 
 import json
+from functools import lru_cache
+from typing import Any
 
 import requests
 
 from app.config.settings import get_settings
+from app.utils.deadline import remaining_timeout
+
+try:
+    import tiktoken
+except Exception:  # pragma: no cover - optional dependency during import
+    tiktoken = None  # type: ignore[assignment]
+
+
+def estimate_token_count(text: str) -> int:
+    """Approximate token count (~4 characters per token) when no tokenizer is available."""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+@lru_cache(maxsize=8)
+def _tiktoken_encoding(model: str) -> Any:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
 
 
 class LLMClient:
@@ -21,9 +49,25 @@ class LLMClient:
         self.temperature = settings.llm_temperature
         self.max_tokens = settings.llm_max_tokens
         self.openai_api_key = settings.openai_api_key
+        self.openai_base_url = settings.openai_base_url.rstrip("/")
         self.gemini_api_key = settings.gemini_api_key
+        # Token usage reported by the provider for the most recent `generate` call
+        self.last_usage: dict[str, int] | None = None
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the provider's tokenizer when it is available locally.
+
+        OpenAI models use `tiktoken`; Gemini only exposes token counting over the network,
+        so it (and the echo fallback) use a character-based estimate.
+        """
+        if self.provider == "openai":
+            encoding = _tiktoken_encoding(self.openai_model)
+            if encoding is not None:
+                return len(encoding.encode(text, disallowed_special=()))
+        return estimate_token_count(text)
 
     def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.last_usage = None
         if self.provider == "openai":
             if not self.openai_api_key:
                 raise RuntimeError("OPENAI_API_KEY is not set")
@@ -33,10 +77,17 @@ class LLMClient:
                 raise RuntimeError("GEMINI_API_KEY is not set")
             return self._generate_gemini(system_prompt, user_prompt)
         # Fallback: echo user prompt for now
+        prompt_tokens = self.count_tokens(system_prompt) + self.count_tokens(user_prompt)
+        completion_tokens = self.count_tokens(user_prompt)
+        self.last_usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
         return user_prompt
 
     def _generate_openai(self, system_prompt: str, user_prompt: str) -> str:
-        url = "https://api.openai.com/v1/chat/completions"
+        url = f"{self.openai_base_url}/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.openai_api_key}",
             "Content-Type": "application/json",
@@ -51,9 +102,15 @@ class LLMClient:
             ],
         }
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=60)
+            resp = requests.post(url, headers=headers, json=payload, timeout=remaining_timeout(60))
             resp.raise_for_status()
             data = resp.json()
+            usage = data.get("usage") or {}
+            self.last_usage = {
+                "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+                "completion_tokens": int(usage.get("completion_tokens", 0)),
+                "total_tokens": int(usage.get("total_tokens", 0)),
+            }
             return data["choices"][0]["message"]["content"]
         except Exception as e:
             from app.exceptions import LLMError
@@ -79,7 +136,9 @@ class LLMClient:
             },
         }
         try:
-            resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=60)
+            resp = requests.post(
+                url, headers=headers, data=json.dumps(payload), timeout=remaining_timeout(60)
+            )
             resp.raise_for_status()
             data = resp.json()
             # Safety checks for empty response
@@ -87,6 +146,12 @@ class LLMClient:
                 if "promptFeedback" in data:
                     raise ValueError(f"Blocked by safety settings: {data['promptFeedback']}")
                 raise ValueError("No candidates returned")
+            usage = data.get("usageMetadata") or {}
+            self.last_usage = {
+                "prompt_tokens": int(usage.get("promptTokenCount", 0)),
+                "completion_tokens": int(usage.get("candidatesTokenCount", 0)),
+                "total_tokens": int(usage.get("totalTokenCount", 0)),
+            }
             return data["candidates"][0]["content"]["parts"][0]["text"]
         except Exception as e:
             from app.exceptions import LLMError
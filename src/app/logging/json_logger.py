@@ -1,39 +1,193 @@
 from __future__ import annotations
 
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import time
+import zlib
 from contextvars import ContextVar
-from typing import Any
+from datetime import UTC, datetime
+from typing import IO, Any
 
-from pythonjsonlogger import jsonlogger
+try:  # orjson (the `logging` extra) is several times faster than json.dumps
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
 
 trace_id_var: ContextVar[str | None] = ContextVar("trace_id", default=None)
 
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()
+    | {"message", "asctime", "trace_id"}
+)
 
-class JsonFormatter(jsonlogger.JsonFormatter):
-    """JSON formatter that enforces the required logging schema."""
 
-    def add_fields(
-        self, log_record: dict[str, Any], record: logging.LogRecord, message_dict: dict[str, Any]
-    ) -> None:  # noqa: D401
-        super().add_fields(log_record, record, message_dict)
-        log_record.setdefault("timestamp", self.formatTime(record, self.datefmt))
-        log_record.setdefault("level", record.levelname)
-        log_record.setdefault("logger", record.name)
-        log_record.setdefault("message", record.getMessage())
-        log_record.setdefault("file", record.filename)
-        log_record.setdefault("line", record.lineno)
-        log_record.setdefault("function", record.funcName)
-        log_record.setdefault("trace_id", trace_id_var.get())
+class FastJsonFormatter(logging.Formatter):
+    """JSON formatter that enforces the required logging schema, built directly and encoded
+    with orjson when available. ``timestamp`` is ISO-8601 UTC with milliseconds.
 
+    The trace id is read from the record (captured when it was queued) before falling back
+    to the current context, so records formatted on the writer thread keep their request's id.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "message": record.getMessage(),
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "function": record.funcName,
+            "trace_id": getattr(record, "trace_id", None) or trace_id_var.get(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        if orjson is not None:
+            try:
+                return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode(
+                    "utf-8"
+                )
+            except TypeError:
+                # e.g. an integer wider than 64 bits; json.dumps copes, so never lose the record
+                pass
+        return json.dumps(data, default=str, separators=(",", ":"))
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, float]:
+    """Parse ``"app.engine=0.1,app.retrieval.service=0.5"`` into logger-prefix rates."""
+    rates: dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, sep, rate = item.strip().partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO/DEBUG records per logger; WARNING and above always pass.
+
+    The rate of the longest configured prefix of the logger name applies. Records carrying a
+    trace id are sampled by hashing it, so a request's records are kept or dropped together.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        # Longest prefix first
+        self.rates = sorted(rates.items(), key=lambda kv: len(kv[0]), reverse=True)
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        trace_id = trace_id_var.get()
+        draw = (zlib.crc32(trace_id.encode()) / 2**32) if trace_id else random.random()
+        if draw < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller on a full queue.
+
+    `prepare` only resolves the message and captures the trace id; JSON encoding and the
+    write happen on the listener thread. INFO/DEBUG records that do not fit are dropped and
+    counted. WARNING and above are never dropped: when the queue is full they are written
+    synchronously through `fallback`.
+    """
 
-def configure_json_logging(level: str = "INFO") -> logging.Logger:
+    def __init__(self, log_queue: queue.Queue[Any], fallback: logging.Handler) -> None:
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.enqueued = 0
+        self.dropped = 0
+        self.written_inline = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # Traceback objects must not outlive the caller's frame; render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = trace_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.written_inline += 1
+                self.fallback.handle(record)
+            else:
+                self.dropped += 1
+
+
+# Active asynchronous logging setup of this process, if any
+_async_state: dict[str, Any] = {}
+
+
+def _stop_listener() -> None:
+    listener = _async_state.pop("listener", None)
+    pid = _async_state.pop("pid", None)
+    _async_state.clear()
+    # A listener inherited through fork has no thread in this process; just drop it
+    if listener is not None and pid == os.getpid():
+        listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+def configure_json_logging(
+    level: str = "INFO",
+    *,
+    queue_size: int | None = None,
+    sample_rates: dict[str, float] | None = None,
+    stream: IO[str] | None = None,
+) -> logging.Logger:
     """Configure root logger with JSON formatting.
 
     Parameters
     ----------
     level: str
         Logging level string (e.g., INFO, DEBUG).
+    queue_size: int | None
+        With a size, records are handed to a bounded queue and encoded and written by a
+        background thread; otherwise they are written synchronously.
+    sample_rates: dict[str, float] | None
+        Fraction of INFO/DEBUG records kept per logger-name prefix (see `SamplingFilter`).
+    stream: IO[str] | None
+        Output stream (default: stdout).
 
     Returns
     -------
@@ -41,13 +195,55 @@ def configure_json_logging(level: str = "INFO") -> logging.Logger:
         Configured root logger.
     """
 
-    handler = logging.StreamHandler(sys.stdout)
-    formatter = JsonFormatter()
-    handler.setFormatter(formatter)
+    _stop_listener()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(FastJsonFormatter())
 
     root_logger = logging.getLogger()
     root_logger.handlers.clear()
-    root_logger.addHandler(handler)
+    if queue_size:
+        log_queue: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+        queue_handler = AsyncQueueHandler(log_queue, fallback=handler)
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        _async_state.update(
+            listener=listener, pid=os.getpid(), handler=queue_handler, queue=log_queue
+        )
+        root_logger.addHandler(queue_handler)
+        sink: logging.Handler = queue_handler
+    else:
+        root_logger.addHandler(handler)
+        sink = handler
+    if sample_rates:
+        sampler = SamplingFilter(sample_rates)
+        sink.addFilter(sampler)
+        _async_state["sampler"] = sampler
+    _async_state["writer"] = handler
     root_logger.setLevel(level.upper())
     root_logger.propagate = False
     return root_logger
+
+
+def logging_stats() -> dict[str, Any]:
+    """Queue depth and enqueued/dropped/sampled-out counters of the current configuration."""
+    queue_handler: AsyncQueueHandler | None = _async_state.get("handler")
+    sampler: SamplingFilter | None = _async_state.get("sampler")
+    log_queue: queue.Queue[Any] | None = _async_state.get("queue")
+    return {
+        "async": queue_handler is not None,
+        "queue_size": log_queue.maxsize if log_queue is not None else None,
+        "queued": log_queue.qsize() if log_queue is not None else 0,
+        "enqueued": queue_handler.enqueued if queue_handler else 0,
+        "dropped": queue_handler.dropped if queue_handler else 0,
+        "written_inline": queue_handler.written_inline if queue_handler else 0,
+        "sampled_out": sampler.sampled_out if sampler else 0,
+        "sample_rates": dict(sampler.rates) if sampler else {},
+    }
+
+
+def flush_logging(timeout_s: float = 5.0) -> None:
+    """Wait until queued records are written (e.g. before exit or in tests)."""
+    log_queue: queue.Queue[Any] | None = _async_state.get("queue")
+    deadline = time.monotonic() + timeout_s
+    while log_queue is not None and log_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.005)
@@ -2,23 +2,34 @@ from __future__ import annotations
 
 import platform
 import time
+import tracemalloc
 import uuid
 from typing import Any
 
 from fastapi import Depends, FastAPI, Request
 from fastapi.responses import JSONResponse
 
+import app.retrieval.models as model_registry
 from app import __version__
+from app.api.debug import router as debug_router
 from app.api.evaluate import router as eval_router
 from app.api.query import router as query_router
 from app.api.security import get_api_key
 from app.config.settings import get_settings
+from app.engine import warmup
+from app.eval.jobs import get_job_manager
 from app.exceptions import LLMError, RAGException, VectorDBError
-from app.logging.json_logger import configure_json_logging, trace_id_var
+from app.logging.json_logger import (
+    configure_json_logging,
+    flush_logging,
+    parse_sample_rates,
+    trace_id_var,
+)
 
 app = FastAPI(title="Agentic RAG Benchmarking POC", version=__version__)
 app.include_router(query_router, dependencies=[Depends(get_api_key)])
 app.include_router(eval_router, dependencies=[Depends(get_api_key)])
+app.include_router(debug_router, dependencies=[Depends(get_api_key)])
 
 
 @app.middleware("http")
@@ -57,12 +68,36 @@ async def rag_exception_handler(request: Request, exc: RAGException):
 @app.on_event("startup")
 def _startup() -> None:
     settings = get_settings()
-    configure_json_logging(settings.log_level)
+    configure_json_logging(
+        settings.log_level,
+        queue_size=settings.log_queue_size,
+        sample_rates=parse_sample_rates(settings.log_sample_rates),
+    )
+    if settings.memory_profiling and not tracemalloc.is_tracing():
+        tracemalloc.start(settings.tracemalloc_frames)
+    preload = None
+    if settings.preload_models:
+        # Load in the background so the server binds its port immediately; /ready reports
+        # 503 until the models are loaded and warmed up.
+        preload = model_registry.start_background_preload(
+            include_reranker=settings.preload_reranker
+        )
+    if settings.warmup_enabled:
+        # Replays frequent queries into the caches once the models are loaded
+        warmup.start_background_warmup(after=preload)
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    if get_job_manager.cache_info().currsize:
+        get_job_manager().shutdown()
+    flush_logging()
 
 
 @app.get("/health")
 def health() -> dict[str, Any]:
     settings = get_settings()
+    models = model_registry.model_status()
     # GPU status (Mac): unavailable by default for this POC
     gpu_status = {"available": False, "details": {"device": None}}
     model_status = {
@@ -70,7 +105,9 @@ def health() -> dict[str, Any]:
             "openai": bool(settings.openai_api_key),
             "gemini": bool(settings.gemini_api_key),
         },
-        "loaded": False,
+        "loaded": bool(models.get("embeddings", {}).get("loaded")),
+        "models": models,
+        "readiness": model_registry.readiness()["state"],
     }
     vectordb_status = {
         "provider": "qdrant",
@@ -87,3 +124,27 @@ def health() -> dict[str, Any]:
         "vectordb": vectordb_status,
         "last_successful_prediction_at": None,
     }
+
+
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness probe: 200 once models are loaded and warmed up, 503 before that.
+
+    With PRELOAD_MODELS disabled models load lazily on first use, so the service is ready
+    as soon as it is up. With WARMUP_ENABLED it also waits for cache warming, which ends
+    after WARMUP_BUDGET_S at the latest.
+    """
+    settings = get_settings()
+    state = model_registry.readiness()
+    cache_warmup = warmup.warmup_status()
+    models_ready = state["state"] == "ready" or not settings.preload_models
+    is_ready = models_ready and cache_warmup["state"] not in warmup.PENDING_STATES
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            **state,
+            "models": model_registry.model_status(),
+            "warmup": cache_warmup,
+        },
+    )
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from app.config.settings import AppSettings
+
+
+@dataclass
+class RerankPlan:
+    """Outcome of the adaptive policy for one query.
+
+    `pool` is the number of dense candidates kept, `rerank_candidates` how many of them the
+    cross-encoder scores (0 when reranking is skipped) and `reason` names the rule that
+    decided it: ``gap``, ``gap_truncated``, ``budget``, ``full`` or ``disabled``.
+    """
+
+    pool: int
+    rerank_candidates: int
+    flat: bool
+    reason: str
+
+    @property
+    def skipped(self) -> bool:
+        return self.rerank_candidates == 0
+
+    def timings(self) -> dict[str, float]:
+        return {
+            "candidate_pool": float(self.pool),
+            "rerank_candidates": float(self.rerank_candidates),
+            "rerank_skipped": 1.0 if self.skipped else 0.0,
+        }
+
+
+class RerankCostTracker:
+    """Exponentially weighted moving average of reranker cost per candidate (ms)."""
+
+    def __init__(self, alpha: float = 0.2) -> None:
+        self.alpha = alpha
+        self._per_candidate_ms: float | None = None
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms: float, candidates: int) -> None:
+        if candidates <= 0:
+            return
+        sample = elapsed_ms / candidates
+        with self._lock:
+            if self._per_candidate_ms is None:
+                self._per_candidate_ms = sample
+            else:
+                self._per_candidate_ms += self.alpha * (sample - self._per_candidate_ms)
+
+    @property
+    def per_candidate_ms(self) -> float | None:
+        with self._lock:
+            return self._per_candidate_ms
+
+    def max_candidates(self, budget_ms: float) -> int | None:
+        """Candidates that fit in `budget_ms`, or None before any timing has been observed."""
+        cost = self.per_candidate_ms
+        if cost is None or cost <= 0:
+            return None
+        return int(budget_ms // cost)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._per_candidate_ms = None
+
+
+# Shared by all engines in the process, so budgets follow the reranker's recent behaviour
+rerank_costs = RerankCostTracker()
+
+
+def _scores(chunks: Sequence[dict[str, Any]]) -> list[float]:
+    return [float(c.get("score", 0.0)) for c in chunks]
+
+
+def is_flat(scores: Sequence[float], window: int, min_spread: float) -> bool:
+    """True when the top `window` dense scores are within `min_spread` of each other."""
+    head = list(scores[:window])
+    if len(head) < 2:
+        return False
+    return max(head) - min(head) < min_spread
+
+
+def first_gap(scores: Sequence[float], start: int, min_gap: float) -> int | None:
+    """Position `i >= start` of the first drop ``scores[i-1] - scores[i] >= min_gap``."""
+    for i in range(max(start, 1), len(scores)):
+        if scores[i - 1] - scores[i] >= min_gap:
+            return i
+    return None
+
+
+def plan_candidates(
+    chunks: Sequence[dict[str, Any]],
+    top_k: int,
+    *,
+    rerank: bool,
+    settings: AppSettings,
+    tracker: RerankCostTracker | None = None,
+) -> RerankPlan:
+    """Decide how many dense candidates to keep and how many to rerank.
+
+    `chunks` is the dense result list in score order, retrieved at the expanded pool size.
+    The base pool is ``max(top_k, adaptive_pool_min)``; the expanded pool is kept only when
+    the base pool's scores are flat (the dense ranking is not decisive, so deeper candidates
+    may be as relevant). When a clear gap separates the first `top_k` candidates from the
+    rest, only those are reranked: the rest cannot displace them, but their order still
+    follows the cross-encoder. A clear gap further down truncates reranking the same way.
+    Finally the rerank count is capped by the latency budget using the recent per-candidate
+    reranker cost, but never below `top_k` candidates.
+    """
+    tracker = tracker or rerank_costs
+    scores = _scores(chunks)
+    base = max(top_k, settings.adaptive_pool_min)
+    flat = is_flat(scores, base, settings.adaptive_flat_spread)
+    pool = min(len(chunks), max(settings.adaptive_pool_max, base) if flat else base)
+    if not rerank:
+        return RerankPlan(pool=pool, rerank_candidates=0, flat=flat, reason="disabled")
+
+    candidates, reason = pool, "full"
+    gap = first_gap(scores[:pool], top_k, settings.adaptive_rerank_gap)
+    if gap is not None:
+        candidates, reason = gap, "gap" if gap == top_k else "gap_truncated"
+
+    budget = tracker.max_candidates(settings.adaptive_rerank_budget_ms)
+    if budget is not None and budget < candidates:
+        candidates, reason = max(budget, min(top_k, candidates)), "budget"
+    return RerankPlan(pool=pool, rerank_candidates=candidates, flat=flat, reason=reason)
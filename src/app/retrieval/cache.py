@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.retrieval.qdrant_store import collection_data_version
+
+# Per-request record of cache hits (`<name>_cache_hit` -> 1.0 / 0.0), set by the engine
+cache_events_var: ContextVar[dict[str, float] | None] = ContextVar("cache_events", default=None)
+
+# Bumped by ingestion in this process; part of every data version, so in-process ingests
+# invalidate cached results immediately even when the Qdrant server cannot store a version
+_epoch = 0
+_epoch_lock = threading.Lock()
+
+
+def normalize_query(text: str) -> str:
+    """NFKC-normalize and collapse whitespace, so trivially different spellings share entries."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+@contextmanager
+def record_cache_events() -> Iterator[dict[str, float]]:
+    """Collect the cache hits of the enclosed retrieval calls into the yielded dict."""
+    events: dict[str, float] = {}
+    token = cache_events_var.set(events)
+    try:
+        yield events
+    finally:
+        cache_events_var.reset(token)
+
+
+def note_cache_event(name: str, hit: bool) -> None:
+    events = cache_events_var.get()
+    if events is not None:
+        events[f"{name}_cache_hit"] = 1.0 if hit else 0.0
+
+
+class EmbeddingCache:
+    """LRU of query embeddings kept in one preallocated float32 matrix.
+
+    Entries are keyed by (model name, normalized query) and map to a row of the matrix, so
+    the cache holds `capacity` vectors without per-entry array objects. The matrix is
+    allocated on the first insert, when the dimension is known; its pages are only touched
+    as rows are filled.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._matrix: np.ndarray | None = None
+        self._slots: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._free: list[int] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, text: str) -> np.ndarray | None:
+        key = (model, text)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or self._matrix is None:
+                self.misses += 1
+                return None
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return self._matrix[slot].copy()
+
+    def put(self, model: str, text: str, vector: np.ndarray) -> None:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        key = (model, text)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                # First entry, or a model with another dimension: start over
+                self._matrix = np.empty((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._slots.clear()
+                self._free = list(range(self.capacity - 1, -1, -1))
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._free.pop() if self._free else self._slots.popitem(last=False)[1]
+            self._slots[key] = slot
+            self._slots.move_to_end(key)
+            self._matrix[slot] = vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._slots.clear()
+            self._free = []
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._slots),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": 0 if self._matrix is None else int(self._matrix.nbytes),
+            }
+
+
+class SearchResultCache:
+    """LRU of search results tagged with the collection data version they were read at.
+
+    An entry is served only while the collection's version is unchanged and it is younger
+    than `ttl_s`; payload dicts are copied in and out because callers fill in texts in place.
+    """
+
+    def __init__(self, capacity: int, ttl_s: float) -> None:
+        self.capacity = max(1, capacity)
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[Hashable, tuple[Hashable, float, list[dict[str, Any]]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Hashable) -> list[dict[str, Any]] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(p) for p in entry[2]]
+
+    def put(self, key: Hashable, version: Hashable, payloads: list[dict[str, Any]]) -> None:
+        entry = (version, time.monotonic() + self.ttl_s, [dict(p) for p in payloads])
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def search_key(
+    collection: str,
+    vector_name: str | None,
+    query_vector: np.ndarray,
+    top_k: int,
+    **options: Any,
+) -> tuple[Any, ...]:
+    """Cache key of one search; `options` are the remaining request parameters (JSON-able)."""
+    vector = np.ascontiguousarray(query_vector, dtype=np.float32)
+    digest = hashlib.blake2b(vector.tobytes(), digest_size=16).hexdigest()
+    return (
+        collection,
+        vector_name,
+        digest,
+        top_k,
+        json.dumps(options, sort_keys=True, default=str),
+    )
+
+
+def bump_local_epoch() -> int:
+    """Invalidate every cached result in this process (called after ingestion)."""
+    global _epoch
+    with _epoch_lock:
+        _epoch += 1
+        return _epoch
+
+
+def local_epoch() -> int:
+    return _epoch
+
+
+class CollectionVersions:
+    """Data versions of collections, re-read from Qdrant at most every `check_interval_s`.
+
+    The version is ``(stored version, local epoch)``: ingestion bumps the counter stored in
+    the collection's metadata (seen by every API process within one check interval) and the
+    local epoch (seen by this process at once).
+    """
+
+    def __init__(self, check_interval_s: float) -> None:
+        self.check_interval_s = check_interval_s
+        self._versions: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, client: Any, collection: str) -> tuple[int, int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(collection)
+        if cached is None or now - cached[1] >= self.check_interval_s:
+            try:
+                stored = collection_data_version(client, collection)
+            except Exception:
+                stored = cached[0] if cached else 0
+            cached = (stored, now)
+            with self._lock:
+                self._versions[collection] = cached
+        return cached[0], local_epoch()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(get_settings().embedding_cache_size)
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> SearchResultCache:
+    settings = get_settings()
+    return SearchResultCache(settings.result_cache_size, settings.result_cache_ttl_s)
+
+
+@lru_cache(maxsize=1)
+def get_collection_versions() -> CollectionVersions:
+    return CollectionVersions(get_settings().cache_version_check_s)
+
+
+def cache_stats() -> dict[str, Any]:
+    return {
+        "enabled": get_settings().retrieval_cache_enabled,
+        "embeddings": get_embedding_cache().stats(),
+        "results": get_result_cache().stats(),
+    }
+
+
+def clear_retrieval_caches() -> None:
+    """Drop all cached embeddings, results and versions (used by tests and benchmarks)."""
+    for getter in (get_embedding_cache, get_result_cache, get_collection_versions):
+        getter().clear()
+        getter.cache_clear()
+    bump_local_epoch()
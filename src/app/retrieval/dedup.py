@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from app.retrieval.chunking import TextChunk
+
+_WHITESPACE = re.compile(r"\s+")
+_SHIFT = np.uint64(32)
+_LOW32 = np.uint64(0xFFFFFFFF)
+# Shingles hashed per vectorized step; keeps the (num_perm x shingles) matrix cache-sized
+_MAX_SHINGLES_PER_BATCH = 20_000
+
+
+@dataclass
+class DuplicateGroup:
+    """A canonical chunk and the near-duplicate chunks it stands in for."""
+
+    canonical: TextChunk
+    duplicates: list[TextChunk] = field(default_factory=list)
+
+    @property
+    def source_ids(self) -> list[str]:
+        """Distinct source ids covered by the group, canonical first."""
+        seen = dict.fromkeys([self.canonical.source_id, *(d.source_id for d in self.duplicates)])
+        return list(seen)
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """Distinct 32-bit hashes of the character k-grams (UTF-8 bytes) of the normalized text."""
+    data = np.frombuffer(normalize_text(text).encode("utf-8"), dtype=np.uint8)
+    if data.size < k:
+        data = np.pad(data, (0, k - data.size))
+    data = data.astype(np.uint64)
+    n = data.size - k + 1
+    # Polynomial hash over all windows at once; uint64 overflow wraps, which is fine here
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        h *= np.uint64(257)
+        h += data[j : j + n]
+    return np.unique((h ^ (h >> _SHIFT)) & _LOW32)
+
+
+class MinHasher:
+    """Vectorized MinHash signatures over character shingles.
+
+    Each permutation is a multiply-shift hash ``(a * x + b) >> 32`` on 32-bit shingle hashes,
+    evaluated for a whole batch of chunks as one matrix operation.
+
+    Parameters
+    ----------
+    num_perm: int
+        Number of hash permutations (signature length).
+    shingle_size: int
+        Character k-gram size.
+    seed: int
+        Seed for the permutation coefficients; signatures are only comparable for equal seeds.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        high = np.iinfo(np.uint64).max
+        self._a = rng.integers(0, high, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, high, size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a ``(len(texts), num_perm)`` uint64 signature matrix."""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        hashes = [shingle_hashes(t, self.shingle_size) for t in texts]
+        start = 0
+        while start < len(texts):
+            # Batch chunks so one (num_perm x shingles) matrix stays bounded in memory
+            end, total = start, 0
+            while end < len(texts) and (
+                end == start or total + hashes[end].size <= _MAX_SHINGLES_PER_BATCH
+            ):
+                total += hashes[end].size
+                end += 1
+            batch = hashes[start:end]
+            flat = np.concatenate(batch)
+            offsets = np.cumsum([0] + [h.size for h in batch[:-1]])
+            permuted = self._a * flat[None, :]
+            permuted += self._b
+            permuted >>= _SHIFT
+            out[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return out
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Pick (bands, rows) with ``bands * rows == num_perm`` whose LSH threshold
+    ``(1 / bands) ** (1 / rows)`` is closest to, but not above, `threshold`.
+
+    Erring low admits more candidate pairs, which are then verified, rather than missing
+    duplicates.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    pool = below or options
+    return min(pool, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def find_duplicate_clusters(signatures: np.ndarray, threshold: float) -> np.ndarray:
+    """Cluster rows whose estimated Jaccard similarity is at least `threshold`.
+
+    Candidate pairs come from LSH banding (rows sharing any band bucket) and are verified on
+    the full signature. Returns, per row, the index of its cluster's canonical row (the
+    lowest index in the cluster).
+    """
+    n, num_perm = signatures.shape
+    parent = np.arange(n)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = int(parent[i])
+        return i
+
+    bands, rows = choose_bands(num_perm, threshold)
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        _, bucket_ids = np.unique(block, axis=0, return_inverse=True)
+        bucket_ids = bucket_ids.reshape(-1)
+        order = np.argsort(bucket_ids, kind="stable")
+        splits = np.flatnonzero(np.diff(bucket_ids[order])) + 1
+        for members in np.split(order, splits):
+            remaining = members
+            while remaining.size > 1:
+                # Compare the first member against the rest in one step; drop the matches
+                anchor, rest = remaining[0], remaining[1:]
+                sims = (signatures[rest] == signatures[anchor]).mean(axis=1)
+                matched = rest[sims >= threshold]
+                for j in matched:
+                    ra, rj = find(int(anchor)), find(int(j))
+                    if ra != rj:
+                        parent[max(ra, rj)] = min(ra, rj)
+                remaining = rest[sims < threshold]
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def deduplicate_chunks(
+    chunks: Sequence[TextChunk],
+    *,
+    threshold: float = 0.9,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+) -> list[DuplicateGroup]:
+    """Group near-duplicate chunks; the first occurrence (ingest order) is canonical.
+
+    Returns one group per distinct chunk, in the order the canonical chunks appear.
+    """
+    if not chunks:
+        return []
+    hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+    roots = find_duplicate_clusters(hasher.signatures([c.text for c in chunks]), threshold)
+    groups: dict[int, DuplicateGroup] = {}
+    for i, chunk in enumerate(chunks):
+        root = int(roots[i])
+        if root == i:
+            groups[i] = DuplicateGroup(canonical=chunk)
+        else:
+            groups[root].duplicates.append(chunk)
+    return list(groups.values())
+
+
+def dedup_report(
+    groups: Sequence[DuplicateGroup], *, vector_dim: int, bytes_per_dim: int = 4
+) -> dict[str, Any]:
+    """Embeddings and index bytes avoided by storing one point per group.
+
+    Vector bytes count the raw float32 vectors; payload bytes count the duplicate texts that
+    are no longer stored. HNSW graph links add further per-point savings not counted here.
+    """
+    duplicates = [d for g in groups for d in g.duplicates]
+    vector_bytes = len(duplicates) * vector_dim * bytes_per_dim
+    payload_bytes = sum(len(d.text.encode("utf-8")) for d in duplicates)
+    return {
+        "chunks": len(groups) + len(duplicates),
+        "points": len(groups),
+        "embeddings_avoided": len(duplicates),
+        "vector_bytes_avoided": vector_bytes,
+        "payload_bytes_avoided": payload_bytes,
+        "bytes_avoided": vector_bytes + payload_bytes,
+    }
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+
+@dataclass
+class MMRSelection:
+    """Indices chosen by `mmr_select`, in selection order, and how many candidates were
+    excluded as near-duplicates of a selected one."""
+
+    indices: list[int]
+    duplicates: int
+
+
+def mmr_select(
+    vectors: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    *,
+    lambda_: float = 0.7,
+    duplicate_threshold: float | None = None,
+) -> MMRSelection:
+    """Greedy maximal marginal relevance over `vectors` (one row per candidate).
+
+    Each step picks the candidate maximizing
+    ``lambda_ * relevance - (1 - lambda_) * max cosine similarity to the selected ones``.
+    The pairwise similarities are computed once as a single matrix product, and every
+    step is a vectorized update of the running maximum, so 50 candidates take well under
+    a millisecond. Candidates whose similarity to a selected one reaches
+    `duplicate_threshold` are never selected, so fewer than `k` may be returned.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return MMRSelection([], 0)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.maximum(norms, 1e-12)
+    similarity = matrix @ matrix.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: list[int] = []
+    duplicates = 0
+    while len(selected) < k and available.any():
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = lambda_ * relevance - (1.0 - lambda_) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+        if duplicate_threshold is not None:
+            near = available & (similarity[best] >= duplicate_threshold)
+            duplicates += int(near.sum())
+            available &= ~near
+    return MMRSelection(selected, duplicates)
+
+
+def relevance_scores(chunks: Sequence[dict[str, Any]]) -> np.ndarray:
+    """Relevance of each candidate for `mmr_select`.
+
+    Cross-encoder scores when every candidate has one, else the dense scores. When reranking
+    covered only part of the pool, the reranked candidates swap dense scores among
+    themselves so that they follow the cross-encoder's order: values stay on the dense
+    (cosine) scale of the unreranked ones, which keep theirs, and the reranked head still
+    ranks above the tail it was chosen from.
+    """
+    dense = np.array([float(c.get("score", 0.0)) for c in chunks], dtype=np.float32)
+    reranked = [i for i, c in enumerate(chunks) if "rerank_score" in c]
+    if reranked and len(reranked) == len(chunks):
+        return np.array([float(c["rerank_score"]) for c in chunks], dtype=np.float32)
+    if reranked:
+        order = sorted(reranked, key=lambda i: -float(chunks[i]["rerank_score"]))
+        dense[order] = np.sort(dense[reranked])[::-1]
+    return dense
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+from typing import Any
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from app.config.settings import get_settings
+
+DEFAULT_MODEL = "BAAI/bge-base-en-v1.5"
+BACKENDS = ("torch", "onnx")
 
 
 class EmbeddingsClient:
     """CPU-friendly embeddings client using sentence-transformers.
 
-    Defaults to BAAI/bge-base-en-v1.5.
+    Defaults to BAAI/bge-base-en-v1.5. `sentence_transformers` (and torch) are imported
+    on construction rather than at module import so the API can bind its port quickly.
     """
 
-    def __init__(self, model_name: str = "BAAI/bge-base-en-v1.5", device: str = "cpu") -> None:
+    def __init__(self, model_name: str = DEFAULT_MODEL, device: str = "cpu") -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name, device=device)
 
     def embed(self, texts: list[str], *, normalize: bool = True) -> np.ndarray:
@@ -18,3 +28,21 @@ class EmbeddingsClient:
             texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=normalize
         )
         return vectors.astype(np.float32)
+
+
+def create_embedder(
+    model_name: str = DEFAULT_MODEL, *, backend: str | None = None, quantize: bool | None = None
+) -> Any:
+    """Embeddings client for `backend` (default: EMBEDDINGS_BACKEND).
+
+    ``onnx`` returns an `OnnxEmbeddingsClient` (int8 unless `quantize` is False or
+    ONNX_QUANTIZE is off), exporting the model on first use.
+    """
+    backend = backend or get_settings().embeddings_backend
+    if backend == "torch":
+        return EmbeddingsClient(model_name=model_name)
+    if backend == "onnx":
+        from app.retrieval.onnx_embeddings import OnnxEmbeddingsClient
+
+        return OnnxEmbeddingsClient(model_name, quantize=quantize)
+    raise ValueError(f"Unknown embeddings backend {backend!r}; expected one of {BACKENDS}")
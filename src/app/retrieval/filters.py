@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime
+from pathlib import PurePath
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from qdrant_client.http import models as qmodels
+
+# Payload fields recorded at ingest and indexed for filtered search
+KEYWORD_FIELDS = ("source_id", "source_prefixes", "tags")
+INTEGER_FIELDS = ("ingested_at", "modified_at")
+
+
+class RetrievalFilters(BaseModel):
+    """Structured filters applied to vector search.
+
+    `source_id_prefix` matches whole path components: ``docs/product-a`` matches
+    ``docs/product-a/guide.md`` but not ``docs/product-ab/guide.md``. Tags match if the chunk
+    carries any of them. Date bounds are inclusive and accept ISO-8601 strings or epoch
+    seconds.
+    """
+
+    source_id_prefix: str | None = None
+    tags: list[str] = Field(default_factory=list)
+    ingested_after: datetime | None = None
+    ingested_before: datetime | None = None
+    modified_after: datetime | None = None
+    modified_before: datetime | None = None
+
+    def is_empty(self) -> bool:
+        return not any(self.model_dump().values())
+
+
+def source_prefixes(source_id: str) -> list[str]:
+    """All path-component prefixes of a source id, e.g. ``a``, ``a/b``, ``a/b/c.md``."""
+    parts = PurePath(source_id).parts
+    return ["/".join(parts[: i + 1]).replace("//", "/") for i in range(len(parts))]
+
+
+def chunk_metadata(
+    source_id: str, *, tags: list[str] | None = None, ingested_at: int | None = None
+) -> dict[str, Any]:
+    """Filterable payload fields for a chunk of `source_id`, captured at ingest time."""
+    metadata: dict[str, Any] = {
+        "source_prefixes": source_prefixes(source_id),
+        "tags": sorted(set(tags or [])),
+        "ingested_at": int(ingested_at if ingested_at is not None else time.time()),
+    }
+    try:
+        metadata["modified_at"] = int(os.stat(source_id).st_mtime)
+    except OSError:
+        pass
+    return metadata
+
+
+def _epoch(value: datetime | None) -> int | None:
+    return int(value.timestamp()) if value is not None else None
+
+
+def build_qdrant_filter(filters: RetrievalFilters | None) -> qmodels.Filter | None:
+    """Translate `RetrievalFilters` into a Qdrant filter over the indexed payload fields."""
+    if filters is None or filters.is_empty():
+        return None
+    from qdrant_client.http import models as qmodels
+
+    must: list[qmodels.Condition] = []
+    if filters.source_id_prefix:
+        prefix = filters.source_id_prefix.rstrip("/")
+        must.append(
+            qmodels.FieldCondition(key="source_prefixes", match=qmodels.MatchValue(value=prefix))
+        )
+    if filters.tags:
+        must.append(qmodels.FieldCondition(key="tags", match=qmodels.MatchAny(any=filters.tags)))
+    for key, low, high in (
+        ("ingested_at", filters.ingested_after, filters.ingested_before),
+        ("modified_at", filters.modified_after, filters.modified_before),
+    ):
+        if low is not None or high is not None:
+            bounds = qmodels.Range(gte=_epoch(low), lte=_epoch(high))
+            must.append(qmodels.FieldCondition(key=key, range=bounds))
+    return qmodels.Filter(must=must)
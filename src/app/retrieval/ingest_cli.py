@@ -1,34 +1,57 @@
 from __future__ import annotations
 
 import argparse
+import logging
+import sys
+import time
+from collections.abc import Callable
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from app.config.settings import get_settings
+from app.logging.json_logger import configure_json_logging
+from app.retrieval.cache import bump_local_epoch
 from app.retrieval.chunking import TextChunk, recursive_character_chunk
-from app.retrieval.embeddings import EmbeddingsClient
-from app.retrieval.qdrant_store import ensure_collection, get_qdrant_client, upsert_points
+from app.retrieval.dedup import DuplicateGroup, dedup_report, deduplicate_chunks
+from app.retrieval.embeddings import BACKENDS, DEFAULT_MODEL, EmbeddingsClient, create_embedder
+from app.retrieval.filters import chunk_metadata
+from app.retrieval.qdrant_store import (
+    bump_collection_data_version,
+    collection_vector_sizes,
+    ensure_collection,
+    get_qdrant_client,
+    lowdim_vector_name,
+    truncate_vectors,
+    upsert_points,
+)
+from app.retrieval.text_store import ChunkTextStore, get_text_store
+from app.utils.timing import StageTimer
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+
+logger = logging.getLogger(__name__)
 
 
 def read_text_file(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Ingest plain text/markdown files into Qdrant Cloud"
-    )
-    parser.add_argument("paths", nargs="+", help="File or directory paths to ingest")
-    parser.add_argument("--chunk-size", type=int, default=1000)
-    parser.add_argument("--chunk-overlap", type=int, default=150)
-    parser.add_argument("--embeddings", type=str, default="BAAI/bge-base-en-v1.5")
-    args = parser.parse_args()
-
-    settings = get_settings()
-    client = get_qdrant_client()
-    embedder = EmbeddingsClient(model_name=args.embeddings)
+def collect_chunks(
+    paths: list[str],
+    *,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    stages: StageTimer | None = None,
+) -> list[TextChunk]:
+    """Read .txt/.md files (recursing into directories) and split them into chunks.
 
+    `stages` receives the time spent reading files (``read``) and chunking (``chunk``).
+    """
+    stages = stages or StageTimer()
     all_chunks: list[TextChunk] = []
-    for p in args.paths:
+    for p in paths:
         path = Path(p)
         files: list[Path] = []
         if path.is_dir():
@@ -40,35 +63,357 @@ def main() -> None:
         else:
             continue
         for f in files:
-            txt = read_text_file(f)
-            chunks = recursive_character_chunk(
-                txt, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, source_id=str(f)
-            )
+            with stages.stage("read"):
+                txt = read_text_file(f)
+            with stages.stage("chunk"):
+                chunks = recursive_character_chunk(
+                    txt, chunk_size=chunk_size, chunk_overlap=chunk_overlap, source_id=str(f)
+                )
             all_chunks.extend(chunks)
+    return all_chunks
+
+
+def build_payloads(
+    groups: list[DuplicateGroup], tags: list[str] | None = None
+) -> list[dict[str, Any]]:
+    """One payload per canonical chunk: its text and filterable metadata."""
+    ingested_at = int(time.time())
+    metadata: dict[str, dict[str, Any]] = {}
+    payloads = []
+    for g in groups:
+        for source_id in g.source_ids:
+            if source_id not in metadata:
+                metadata[source_id] = chunk_metadata(source_id, tags=tags, ingested_at=ingested_at)
+        payload: dict[str, Any] = {
+            "source_id": g.canonical.source_id,
+            "chunk_index": g.canonical.chunk_index,
+            "text": g.canonical.text,
+            **metadata[g.canonical.source_id],
+        }
+        if g.duplicates:
+            # Filters should match the point through any source it stands in for
+            covered = [metadata[s] for s in g.source_ids]
+            payload["source_ids"] = g.source_ids
+            payload["source_prefixes"] = sorted({p for m in covered for p in m["source_prefixes"]})
+            modified = [m["modified_at"] for m in covered if "modified_at" in m]
+            if modified:
+                payload["modified_at"] = max(modified)
+        payloads.append(payload)
+    return payloads
 
-    if not all_chunks:
-        print("No files or chunks to ingest.")
-        return
 
-    texts = [c.text for c in all_chunks]
-    print(f"Embedding {len(texts)} chunks ...")
-    vectors = embedder.embed(texts)
+def ingest_chunks(
+    client: QdrantClient,
+    embedder: EmbeddingsClient,
+    chunks: list[TextChunk],
+    collection: str,
+    *,
+    tags: list[str] | None = None,
+    dedup_threshold: float | None = None,
+    text_store: ChunkTextStore | None = None,
+    lowdim_size: int | None = None,
+    stages: StageTimer | None = None,
+) -> tuple[str, int]:
+    """Embed chunks and upsert them; return (collection_name_used, points_written).
 
-    # Try to ensure a named vector schema 'content' for portability
-    collection_name, vector_name = ensure_collection(
+    Each payload records filterable metadata (path prefixes, tags, ingest and file
+    modification times) alongside the text. With `dedup_threshold`, near-duplicate chunks
+    (estimated Jaccard similarity at or above it) are stored once as a canonical point whose
+    `source_ids` lists every source it covers. Texts are also appended to `text_store`
+    (default: the store at `TEXT_STORE_PATH`, if configured) under their point ids.
+    `lowdim_size` (default `LOWDIM_VECTOR_SIZE`) gives new collections a truncated
+    companion vector for two-stage search; it is written whenever the collection has one.
+    `stages` receives the wall time of each step (dedup, embed, collection, payloads,
+    points, upsert, text_store, version).
+    """
+    settings = get_settings()
+    stages = stages or StageTimer()
+    if lowdim_size is None:
+        lowdim_size = settings.lowdim_vector_size
+    with stages.stage("dedup"):
+        if dedup_threshold is not None:
+            groups = deduplicate_chunks(chunks, threshold=dedup_threshold)
+        else:
+            groups = [DuplicateGroup(canonical=c) for c in chunks]
+
+    texts = [g.canonical.text for g in groups]
+    logger.info("Embedding chunks", extra={"chunks": len(texts)})
+    with stages.stage("embed"):
+        vectors = embedder.embed(texts)
+
+    with stages.stage("collection"):
+        # Try to ensure a named vector schema 'content' for portability
+        collection_name, vector_name = ensure_collection(
+            client,
+            collection,
+            vector_size=vectors.shape[1],
+            desired_vector_name="content",
+            lowdim_size=lowdim_size,
+        )
+        extra_vectors: dict[str, Any] = {}
+        if vector_name:
+            lowdim_name = lowdim_vector_name(vector_name)
+            lowdim = collection_vector_sizes(client, collection_name).get(lowdim_name)
+            if lowdim:
+                extra_vectors[lowdim_name] = truncate_vectors(vectors, lowdim)
+            elif lowdim_size:
+                logger.warning(
+                    "Collection has no low-dimensional vector; two-stage search disabled",
+                    extra={"collection": collection_name, "vector": lowdim_name},
+                )
+
+    with stages.stage("payloads"):
+        payloads = build_payloads(groups, tags)
+
+    if dedup_threshold is not None:
+        logger.info("Deduplicated chunks", extra=dedup_report(groups, vector_dim=vectors.shape[1]))
+
+    logger.info("Upserting points", extra={"points": len(payloads), "collection": collection_name})
+    ids = upsert_points(
         client,
-        settings.qdrant_collection,
-        vector_size=vectors.shape[1],
-        desired_vector_name="content",
+        collection_name,
+        vectors,
+        payloads,
+        vector_name=vector_name,
+        extra_vectors=extra_vectors,
+        stages=stages,
     )
+    if text_store is None and settings.text_store_path:
+        text_store = get_text_store(settings.text_store_path)
+    if text_store is not None:
+        with stages.stage("text_store"):
+            text_store.append(zip(ids, texts, strict=True))
+        logger.info("Wrote texts", extra={"texts": len(ids), "path": str(text_store.path)})
+    # Cached search results of API processes are keyed to the data version
+    bump_local_epoch()
+    try:
+        with stages.stage("version"):
+            bump_collection_data_version(client, collection_name)
+    except Exception as e:
+        logger.warning(
+            "Could not bump the data version; cached search results in running API processes "
+            "expire after RESULT_CACHE_TTL_S",
+            extra={"collection": collection_name, "error": str(e)},
+        )
+    return collection_name, len(payloads)
+
+
+def _reindex(
+    args: argparse.Namespace,
+    build: Callable[[str], Any],
+    embedder: EmbeddingsClient | None,
+    smoke_queries: list[str],
+) -> dict[str, Any]:
+    from app.retrieval.versioning import reindex
 
-    payloads = [
-        {"source_id": c.source_id, "chunk_index": c.chunk_index, "text": c.text} for c in all_chunks
+    start = time.perf_counter()
+    report = reindex(
+        get_qdrant_client(),
+        get_settings().qdrant_collection,
+        build,
+        embedder=embedder,
+        smoke_queries=smoke_queries,
+        min_points=args.min_points,
+        keep=args.keep_versions,
+    )
+    return {**report, "elapsed_s": time.perf_counter() - start}
+
+
+def _reindex_summary(report: dict[str, Any]) -> str:
+    lines = [
+        f"{report['alias']} -> {report['collection']} ({report['points']} points, previously "
+        f"{report['previous']}) in {report['elapsed_s']:.1f}s"
     ]
+    lines.extend(f"  deleted {collection}" for collection in report["deleted"])
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Ingest plain text/markdown files into Qdrant Cloud"
+    )
+    parser.add_argument("paths", nargs="*", help="File or directory paths to ingest")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--embeddings", type=str, default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--embeddings-backend",
+        choices=BACKENDS,
+        default=None,
+        help="torch or onnx (ONNX Runtime, exported on first use; default: EMBEDDINGS_BACKEND)",
+    )
+    parser.add_argument(
+        "--no-quantize",
+        action="store_true",
+        help="With the onnx backend, use fp32 weights instead of int8",
+    )
+    parser.add_argument(
+        "--tag",
+        dest="tags",
+        action="append",
+        default=[],
+        help="Tag stored on every ingested chunk for filtered search (repeatable)",
+    )
+    parser.add_argument(
+        "--lowdim-size",
+        type=int,
+        default=None,
+        help="Add a truncated vector of this size for two-stage search (new collections only)",
+    )
+    parser.add_argument(
+        "--no-dedup", action="store_true", help="Store near-duplicate chunks individually"
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.9,
+        help="Estimated Jaccard similarity (5-char shingles) at which chunks are merged",
+    )
+    parser.add_argument(
+        "--offline-build",
+        metavar="ARTIFACT",
+        default=None,
+        help="Build the collection in local Qdrant and write it to this artifact (.tar or "
+        ".tar.gz) instead of writing to the server",
+    )
+    parser.add_argument(
+        "--restore",
+        metavar="ARTIFACT",
+        default=None,
+        help="Bulk-load an artifact from --offline-build into QDRANT_COLLECTION",
+    )
+    parser.add_argument(
+        "--replace", action="store_true", help="With --restore, overwrite an existing collection"
+    )
+    parser.add_argument("--upload-batch-size", type=int, default=256, help="With --restore")
+    parser.add_argument("--upload-parallel", type=int, default=2, help="With --restore")
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Build (or --restore) a new version QDRANT_COLLECTION_v<N> and switch the "
+        "QDRANT_COLLECTION alias to it once validated",
+    )
+    parser.add_argument(
+        "--smoke-query",
+        dest="smoke_queries",
+        action="append",
+        default=[],
+        help="With --reindex, a query the new version must answer (repeatable; default: a few "
+        "ingested chunk texts)",
+    )
+    parser.add_argument(
+        "--min-points",
+        type=int,
+        default=None,
+        help="With --reindex, points the new version needs (default: REINDEX_MIN_POINT_RATIO "
+        "of the live version)",
+    )
+    parser.add_argument(
+        "--keep-versions",
+        type=int,
+        default=None,
+        help="With --reindex, older versions to keep (default: REINDEX_KEEP_VERSIONS)",
+    )
+    args = parser.parse_args()
+
+    settings = get_settings()
+    # Progress and warnings of the library functions go to stderr as JSON logs
+    configure_json_logging(settings.log_level, stream=sys.stderr)
+    if settings.qdrant_shards > 0 and (args.restore or args.offline_build or args.reindex):
+        parser.error("--offline-build, --restore and --reindex do not support QDRANT_SHARDS")
+    if args.reindex and args.offline_build:
+        parser.error("--reindex writes to the server; use it with --restore for artifacts")
+    if args.restore:
+        from app.retrieval.offline import restore_artifact
+
+        start = time.perf_counter()
+
+        def restore(collection: str) -> dict[str, Any]:
+            return restore_artifact(
+                get_qdrant_client(),
+                args.restore,
+                collection,
+                replace=args.replace,
+                batch_size=args.upload_batch_size,
+                parallel=args.upload_parallel,
+            )
+
+        if args.reindex:
+            embedder = (
+                create_embedder(
+                    args.embeddings,
+                    backend=args.embeddings_backend,
+                    quantize=False if args.no_quantize else None,
+                )
+                if args.smoke_queries
+                else None
+            )
+            print(_reindex_summary(_reindex(args, restore, embedder, args.smoke_queries)))
+            return
+        report = restore(settings.qdrant_collection)
+        print(
+            f"Restored {report['points']} points into {report['collection']} in "
+            f"{time.perf_counter() - start:.1f}s (upload {report['upload_s']:.1f}s)"
+        )
+        return
+    if not args.paths:
+        parser.error("paths are required unless --restore is given")
+
+    embedder = create_embedder(
+        args.embeddings,
+        backend=args.embeddings_backend,
+        quantize=False if args.no_quantize else None,
+    )
+    all_chunks = collect_chunks(
+        args.paths, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap
+    )
+    if not all_chunks:
+        print("No files or chunks to ingest.")
+        return
+
+    options: dict[str, Any] = {
+        "tags": args.tags,
+        "dedup_threshold": None if args.no_dedup else args.dedup_threshold,
+        "lowdim_size": args.lowdim_size,
+    }
+    start = time.perf_counter()
+    if args.offline_build:
+        from app.retrieval.offline import build_artifact
+
+        manifest = build_artifact(
+            embedder, all_chunks, args.offline_build, settings.qdrant_collection, **options
+        )
+        print(
+            f"Wrote {manifest['points']} points to {args.offline_build} in "
+            f"{time.perf_counter() - start:.1f}s (build {manifest['build_s']:.1f}s, "
+            f"export {manifest['export_s']:.1f}s)"
+        )
+        return
+
+    if args.reindex:
+        client = get_qdrant_client()
+        # Sample chunks from across the corpus must find something in the new version
+        step = max(len(all_chunks) // 3, 1)
+        smoke_queries = args.smoke_queries or [c.text[:200] for c in all_chunks[::step][:3]]
+        report = _reindex(
+            args,
+            lambda collection: ingest_chunks(client, embedder, all_chunks, collection, **options),
+            embedder,
+            smoke_queries,
+        )
+        print(_reindex_summary(report))
+    elif settings.qdrant_shards > 0:
+        from app.retrieval.sharding import configured_shards, ingest_sharded
 
-    print("Upserting to Qdrant Cloud ...")
-    upsert_points(client, collection_name, vectors, payloads, vector_name=vector_name)
-    print("Done.")
+        shards = configured_shards(settings)
+        written = ingest_sharded(embedder, all_chunks, shards, **options)
+        for collection, points in written:
+            print(f"  {collection}: {points} points")
+    else:
+        ingest_chunks(
+            get_qdrant_client(), embedder, all_chunks, settings.qdrant_collection, **options
+        )
+    print(f"Done in {time.perf_counter() - start:.1f}s.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import app.retrieval.embeddings as embeddings_module
+import app.retrieval.reranker as reranker_module
+from app.config.settings import get_settings
+from app.utils.timing import timer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelState:
+    """Load state of one model kind, reported by the health and readiness probes."""
+
+    loaded: bool = False
+    model_name: str | None = None
+    load_ms: float | None = None
+    warmup_ms: float | None = None
+    loaded_at: float | None = None
+    error: str | None = None
+
+
+# Instances are keyed by (kind, factory) so a patched factory never serves a stale instance
+_instances: dict[tuple[str, Callable[..., Any]], Any] = {}
+_states: dict[str, ModelState] = {}
+_load_locks = {"embeddings": threading.Lock(), "reranker": threading.Lock()}
+_readiness: dict[str, Any] = {"state": "not_started", "started_at": None, "finished_at": None}
+_readiness_lock = threading.Lock()
+
+
+def _get_or_load(kind: str, factory: Callable[[], Any]) -> Any:
+    key = (kind, factory)
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+    with _load_locks[kind]:
+        instance = _instances.get(key)
+        if instance is None:
+            try:
+                with timer() as t:
+                    instance = factory()
+            except Exception as e:
+                _states[kind] = ModelState(error=str(e))
+                raise
+            _instances[key] = instance
+            _states[kind] = ModelState(
+                loaded=True,
+                model_name=getattr(instance, "model_name", None),
+                load_ms=t["elapsed_ms"],
+                loaded_at=time.time(),
+            )
+            logger.info("Model loaded", extra={"kind": kind, "load_ms": t["elapsed_ms"]})
+    return instance
+
+
+def get_embedder() -> embeddings_module.EmbeddingsClient:
+    """Return the process-wide embeddings client (per EMBEDDINGS_BACKEND), loading it on
+    first use."""
+    backend = get_settings().embeddings_backend
+    if backend == "onnx":
+        from app.retrieval.onnx_embeddings import OnnxEmbeddingsClient
+
+        return _get_or_load("embeddings", OnnxEmbeddingsClient)
+    if backend != "torch":
+        raise ValueError(f"Unknown embeddings backend {backend!r}")
+    return _get_or_load("embeddings", embeddings_module.EmbeddingsClient)
+
+
+def embedder_name() -> str:
+    """Model name of the embedder queries use: the loaded one, else the one `get_embedder`
+    would load, without loading it."""
+    loaded = _states.get("embeddings")
+    if loaded is not None and loaded.model_name:
+        return loaded.model_name
+    settings = get_settings()
+    if settings.embeddings_backend == "onnx":
+        from app.retrieval.onnx_embeddings import onnx_model_name
+
+        return onnx_model_name(embeddings_module.DEFAULT_MODEL, settings.onnx_quantize)
+    return embeddings_module.DEFAULT_MODEL
+
+
+def get_reranker() -> reranker_module.CrossEncoderReranker:
+    """Return the process-wide cross-encoder reranker, loading it on first use."""
+    return _get_or_load("reranker", reranker_module.CrossEncoderReranker)
+
+
+def preload_models(*, include_reranker: bool = False, warmup: bool = True) -> None:
+    """Load models and run one warm-up inference each, updating readiness state.
+
+    The warm-up pays one-off costs (lazy kernel initialization, allocator growth) so the
+    first real request sees steady-state latency.
+    """
+    with _readiness_lock:
+        if _readiness["state"] != "loading":
+            _readiness["started_at"] = time.time()
+        _readiness.update(state="loading", finished_at=None, error=None)
+    try:
+        embedder = get_embedder()
+        if warmup:
+            with timer() as t:
+                embedder.embed(["warm up"])
+            _states["embeddings"].warmup_ms = t["elapsed_ms"]
+        if include_reranker:
+            reranker = get_reranker()
+            if warmup:
+                with timer() as t:
+                    reranker.rerank("warm up", [{"text": "warm up"}], top_k=1)
+                _states["reranker"].warmup_ms = t["elapsed_ms"]
+    except Exception as e:
+        logger.error("Model preload failed", extra={"error": str(e)})
+        with _readiness_lock:
+            _readiness.update(state="failed", finished_at=time.time(), error=str(e))
+        return
+    with _readiness_lock:
+        _readiness.update(state="ready", finished_at=time.time())
+    logger.info("Models preloaded", extra={"models": model_status()})
+
+
+def start_background_preload(*, include_reranker: bool = False) -> threading.Thread:
+    """Preload models on a daemon thread so startup does not block binding the port."""
+    with _readiness_lock:
+        _readiness.update(state="loading", started_at=time.time())
+    thread = threading.Thread(
+        target=preload_models,
+        kwargs={"include_reranker": include_reranker},
+        name="model-preload",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def model_status() -> dict[str, dict[str, Any]]:
+    return {kind: asdict(state) for kind, state in _states.items()}
+
+
+def _torch_module(instance: Any) -> Any:
+    # EmbeddingsClient.model is a SentenceTransformer (an nn.Module); FlagReranker keeps its
+    # transformer in `.model`
+    candidates = (
+        instance,
+        getattr(instance, "model", None),
+        getattr(getattr(instance, "reranker", None), "model", None),
+    )
+    for candidate in candidates:
+        if candidate is not None and callable(getattr(candidate, "parameters", None)):
+            return candidate
+    return None
+
+
+def model_footprint() -> dict[str, dict[str, Any]]:
+    """Parameter count and bytes (weights plus buffers) of each resident model."""
+    footprint: dict[str, dict[str, Any]] = {}
+    for (kind, _), instance in list(_instances.items()):
+        module = _torch_module(instance)
+        entry: dict[str, Any] = {"model_name": getattr(instance, "model_name", None)}
+        if module is not None:
+            tensors = [*module.parameters(), *module.buffers()]
+            entry["parameters"] = sum(p.numel() for p in module.parameters())
+            entry["parameter_bytes"] = sum(t.numel() * t.element_size() for t in tensors)
+            entry["dtypes"] = sorted({str(t.dtype).removeprefix("torch.") for t in tensors})
+        elif callable(getattr(instance, "footprint", None)):
+            # Non-torch backends (e.g. ONNX Runtime) report their own weight size
+            entry.update(instance.footprint())
+        footprint[kind] = entry
+    return footprint
+
+
+def readiness() -> dict[str, Any]:
+    with _readiness_lock:
+        return dict(_readiness)
+
+
+def reset_models() -> None:
+    """Drop loaded models and readiness state (used by tests)."""
+    _instances.clear()
+    _states.clear()
+    with _readiness_lock:
+        _readiness.update(state="not_started", started_at=None, finished_at=None, error=None)
@@ -0,0 +1,277 @@
+"""Offline index builds: build a collection in local Qdrant, then bulk-restore it.
+
+A full rebuild through `ingest_chunks` against Qdrant Cloud sends every batch over the
+network as it is embedded. `build_artifact` runs the same ingestion pipeline against an
+embedded (local-mode) Qdrant and exports the finished collection into a single tar artifact:
+a JSON manifest plus shards of point ids, float32 vectors (``.npz``) and payloads (JSON
+lines). `restore_artifact` creates the target collection from the manifest and streams the
+shards into it with `upload_collection` (large parallel batches, HNSW indexing deferred until
+the data is in), then creates the payload indexes and bumps the data version.
+
+Point ids are preserved, so a text store written during the build stays valid for the
+restored collection.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import tarfile
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+import numpy as np
+
+from app.retrieval.cache import bump_local_epoch
+from app.retrieval.chunking import TextChunk
+from app.retrieval.qdrant_store import (
+    bump_collection_data_version,
+    collection_vector_sizes,
+    ensure_payload_indexes,
+)
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.embeddings import EmbeddingsClient
+    from app.retrieval.text_store import ChunkTextStore
+
+ARTIFACT_FORMAT = "rag-index-artifact"
+ARTIFACT_VERSION = 1
+MANIFEST = "manifest.json"
+# Key used in the manifest and shards for collections with a single unnamed vector
+UNNAMED = ""
+# Qdrant's default indexing threshold, restored once a bulk load is complete
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def export_collection(
+    client: QdrantClient,
+    collection: str,
+    artifact: str | Path,
+    *,
+    shard_size: int = 4096,
+    extra: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Write every point of `collection` (ids, all vectors, payloads) to a tar artifact.
+
+    Returns the manifest. `extra` is merged into the manifest (e.g. the embedding model).
+    """
+    sizes = collection_vector_sizes(client, collection)
+    if not sizes:
+        info = client.get_collection(collection)
+        sizes = {UNNAMED: int(info.config.params.vectors.size)}  # type: ignore[union-attr]
+    artifact = Path(artifact)
+    artifact.parent.mkdir(parents=True, exist_ok=True)
+    shards: list[dict[str, Any]] = []
+    points = 0
+    offset = None
+    with tarfile.open(artifact, "w:gz" if artifact.name.endswith(".gz") else "w") as tar:
+        while True:
+            records, offset = client.scroll(
+                collection_name=collection,
+                limit=shard_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if records:
+                index = len(shards)
+                # Qdrant ids are unsigned integers or UUIDs; keep the type
+                numeric = all(isinstance(r.id, int) for r in records)
+                arrays: dict[str, np.ndarray] = {
+                    "ids": np.array(
+                        [r.id if numeric else str(r.id) for r in records],
+                        dtype=np.uint64 if numeric else "U36",
+                    )
+                }
+                for name in sizes:
+                    rows = [r.vector[name] if name else r.vector for r in records]  # type: ignore[index]
+                    arrays[f"vector.{name}"] = np.asarray(rows, dtype=np.float32)
+                buf = io.BytesIO()
+                np.savez(buf, **arrays)
+                _add_bytes(tar, f"points-{index:05d}.npz", buf.getvalue())
+                lines = "\n".join(json.dumps(r.payload or {}) for r in records)
+                _add_bytes(tar, f"payloads-{index:05d}.jsonl", lines.encode("utf-8"))
+                shards.append({"index": index, "points": len(records)})
+                points += len(records)
+            if offset is None:
+                break
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "collection": collection,
+            "vectors": sizes,
+            "distance": "Cosine",
+            "points": points,
+            "shards": shards,
+            "created_at": int(time.time()),
+            **(extra or {}),
+        }
+        # Written last so its presence marks a complete artifact
+        _add_bytes(tar, MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def _extract(tar: tarfile.TarFile, name: str) -> IO[bytes] | None:
+    """Open member `name`; None when it is missing or not a regular file."""
+    try:
+        return tar.extractfile(name)
+    except KeyError:
+        return None
+
+
+def read_manifest(artifact: str | Path) -> dict[str, Any]:
+    with tarfile.open(artifact, "r:*") as tar:
+        member = _extract(tar, MANIFEST)
+        if member is None:
+            raise ValueError(f"{artifact} has no {MANIFEST}")
+        manifest = json.loads(member.read())
+    if manifest.get("format") != ARTIFACT_FORMAT or manifest.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"{artifact} is not a version {ARTIFACT_VERSION} index artifact")
+    return manifest
+
+
+def _iter_shards(
+    artifact: str | Path, manifest: dict[str, Any]
+) -> Iterator[tuple[list[int | str], dict[str, np.ndarray], list[dict[str, Any]]]]:
+    with tarfile.open(artifact, "r:*") as tar:
+        for shard in manifest["shards"]:
+            index = shard["index"]
+            points = _extract(tar, f"points-{index:05d}.npz")
+            payloads = _extract(tar, f"payloads-{index:05d}.jsonl")
+            if points is None or payloads is None:
+                raise ValueError(f"{artifact} is missing shard {index}")
+            with np.load(io.BytesIO(points.read())) as data:
+                ids = data["ids"].tolist()
+                vectors = {name: data[f"vector.{name}"] for name in manifest["vectors"]}
+            rows = [json.loads(line) for line in payloads.read().decode("utf-8").splitlines()]
+            yield ids, vectors, rows
+
+
+def restore_artifact(
+    client: QdrantClient,
+    artifact: str | Path,
+    collection: str,
+    *,
+    replace: bool = False,
+    batch_size: int = 256,
+    parallel: int = 1,
+) -> dict[str, Any]:
+    """Create `collection` from an artifact and bulk-load its points; return a report.
+
+    An existing collection is only overwritten with `replace`. Indexing is disabled during
+    the load (building HNSW once at the end is much cheaper than growing it batch by batch).
+    """
+    from qdrant_client.http import models as qmodels
+
+    manifest = read_manifest(artifact)
+    existing = {c.name for c in client.get_collections().collections}
+    if collection in existing:
+        if not replace:
+            raise ValueError(f"Collection {collection} exists; pass replace=True to overwrite")
+        client.delete_collection(collection)
+
+    sizes: dict[str, int] = manifest["vectors"]
+    vectors_config: qmodels.VectorParams | dict[str, qmodels.VectorParams]
+    if list(sizes) == [UNNAMED]:
+        vectors_config = qmodels.VectorParams(size=sizes[UNNAMED], distance=qmodels.Distance.COSINE)
+    else:
+        vectors_config = {
+            name: qmodels.VectorParams(size=size, distance=qmodels.Distance.COSINE)
+            for name, size in sizes.items()
+        }
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=vectors_config,
+        optimizers_config=qmodels.OptimizersConfigDiff(indexing_threshold=0),
+    )
+
+    start = time.perf_counter()
+    for ids, vectors, payloads in _iter_shards(artifact, manifest):
+        client.upload_collection(
+            collection_name=collection,
+            vectors=vectors[UNNAMED] if UNNAMED in vectors else vectors,
+            payload=payloads,
+            ids=ids,
+            batch_size=batch_size,
+            parallel=parallel,
+            wait=True,
+        )
+    upload_s = time.perf_counter() - start
+    client.update_collection(
+        collection_name=collection,
+        optimizers_config=qmodels.OptimizersConfigDiff(
+            indexing_threshold=DEFAULT_INDEXING_THRESHOLD
+        ),
+    )
+    ensure_payload_indexes(client, collection)
+    try:
+        bump_collection_data_version(client, collection)
+    except Exception:
+        # Older servers cannot store collection metadata; cached results expire by TTL
+        pass
+    bump_local_epoch()
+    return {
+        "collection": collection,
+        "points": manifest["points"],
+        "upload_s": upload_s,
+        "source_collection": manifest["collection"],
+    }
+
+
+def build_artifact(
+    embedder: EmbeddingsClient,
+    chunks: list[TextChunk],
+    artifact: str | Path,
+    collection: str,
+    *,
+    tags: list[str] | None = None,
+    dedup_threshold: float | None = None,
+    lowdim_size: int | None = None,
+    text_store: ChunkTextStore | None = None,
+) -> dict[str, Any]:
+    """Run `ingest_chunks` against a temporary local Qdrant and export the result.
+
+    Returns the artifact manifest with the build and export wall-clock times added.
+    """
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.ingest_cli import ingest_chunks
+
+    with tempfile.TemporaryDirectory(prefix="rag-offline-") as workdir:
+        client = QdrantClient(path=workdir)
+        try:
+            start = time.perf_counter()
+            collection_name, _ = ingest_chunks(
+                client,
+                embedder,
+                chunks,
+                collection,
+                tags=tags,
+                dedup_threshold=dedup_threshold,
+                text_store=text_store,
+                lowdim_size=lowdim_size,
+            )
+            build_s = time.perf_counter() - start
+            start = time.perf_counter()
+            manifest = export_collection(
+                client,
+                collection_name,
+                artifact,
+                extra={"embedding_model": getattr(embedder, "model_name", None)},
+            )
+            export_s = time.perf_counter() - start
+        finally:
+            client.close()
+    return {**manifest, "build_s": build_s, "export_s": export_s}
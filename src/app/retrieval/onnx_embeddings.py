@@ -0,0 +1,312 @@
+"""ONNX Runtime embedding backend.
+
+`export_model` converts a sentence-transformers model to ONNX once: the transformer graph
+(token ids -> last hidden state), its tokenizer and the pooling settings, plus an int8 copy
+with dynamically quantized weights. `OnnxEmbeddingsClient` then embeds with only
+`tokenizers` and `onnxruntime`, so loading it does not import torch. It is a drop-in
+replacement for `EmbeddingsClient` (same `embed` signature and output), selected with
+``EMBEDDINGS_BACKEND=onnx`` or ``ingest_cli --embeddings-backend onnx``.
+
+    python -m app.retrieval.onnx_embeddings BAAI/bge-base-en-v1.5   # export ahead of time
+
+`onnxruntime` and `onnx` (for the export and quantization) are optional dependencies
+(``pip install '.[onnx]'``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.retrieval.embeddings import DEFAULT_MODEL
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "embedding_config.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+BATCH_SIZE = 32
+
+
+def onnx_model_name(model_name: str, quantize: bool) -> str:
+    """Name reported by the ONNX client for `model_name`; distinct from the torch model's,
+    since vectors differ slightly between backends."""
+    return f"{model_name}@onnx{'-int8' if quantize else ''}"
+
+
+def model_directory(model_name: str, root: str | Path) -> Path:
+    return Path(root) / model_name.strip("/").replace("/", "__")
+
+
+def export_model(model_name: str, root: str | Path, *, quantize: bool = True) -> Path:
+    """Export `model_name` under `root` (if not already there) and return its directory.
+
+    The fp32 graph is exported from the torch model; the int8 graph is derived from it with
+    `onnxruntime.quantization.quantize_dynamic` (weights stored as int8, activations
+    quantized on the fly), which needs no calibration data.
+    """
+    directory = model_directory(model_name, root)
+    if not (directory / CONFIG_FILE).exists():
+        _export_fp32(model_name, directory)
+    if quantize and not (directory / INT8_FILE).exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = directory / f".{INT8_FILE}.tmp"
+        quantize_dynamic(directory / FP32_FILE, tmp, weight_type=QuantType.QInt8)
+        tmp.rename(directory / INT8_FILE)
+    return directory
+
+
+def _export_fp32(model_name: str, directory: Path) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    # Module classes moved between sentence-transformers releases; match them by name
+    modules = {type(m).__name__: m for m in model}
+    pooling = _pooling_mode(modules["Pooling"].get_config_dict() if "Pooling" in modules else {})
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+            named = dict(zip(input_names, inputs, strict=True))
+            return self.transformer(**named).last_hidden_state
+
+    dynamic = {0: "batch", 1: "sequence"}
+    # Write into a temporary directory and rename, so concurrent loaders never see a
+    # partial export
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{directory.name}-", dir=directory.parent))
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                HiddenStates(),
+                tuple(sample[n] for n in input_names),
+                str(tmp / FP32_FILE),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={name: dynamic for name in [*input_names, "last_hidden_state"]},
+                opset_version=17,
+                dynamo=False,
+            )
+        tokenizer.save_pretrained(str(tmp))
+        config = {
+            "model_name": model_name,
+            "dimension": transformer.config.hidden_size,
+            "max_seq_length": model.max_seq_length,
+            "pooling": pooling,
+            "normalized": "Normalize" in modules,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+            "inputs": input_names,
+        }
+        (tmp / CONFIG_FILE).write_text(json.dumps(config, indent=2), encoding="utf-8")
+        if directory.exists():
+            shutil.rmtree(directory)
+        tmp.rename(directory)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    logger.info("Exported embedding model to ONNX", extra={"model": model_name})
+
+
+def _pooling_mode(config: dict[str, Any]) -> str:
+    # sentence-transformers >= 6 stores a mode name, earlier releases one flag per mode
+    mode = config.get("pooling_mode")
+    if mode is None:
+        flags = {"cls": "pooling_mode_cls_token", "mean": "pooling_mode_mean_tokens"}
+        mode = next((m for m, flag in flags.items() if config.get(flag)), "mean")
+    if mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling mode {mode!r} for the ONNX backend")
+    return str(mode)
+
+
+def _thread_budget() -> int:
+    """Intra-op threads for this process: ONNX_INTRA_OP_THREADS, else the OMP_NUM_THREADS
+    budget that `app.serve` gives each worker, else 0 (onnxruntime's default: all cores)."""
+    configured = get_settings().onnx_intra_op_threads
+    if configured > 0:
+        return configured
+    try:
+        return max(int(os.environ.get("OMP_NUM_THREADS", "0")), 0)
+    except ValueError:
+        return 0
+
+
+class OnnxEmbeddingsClient:
+    """Embeddings from an exported model run with ONNX Runtime on CPU.
+
+    Texts are sorted by length before batching so each batch pads to a similar length.
+    The inference session is created lazily in the process that uses it. A session created
+    before `app.serve` forks its workers (single-threaded, in the parent) is kept when the
+    worker's thread budget matches, so its weights stay shared; otherwise the worker opens
+    its own session with its share of the cores.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        *,
+        quantize: bool | None = None,
+        model_dir: str | None = None,
+        intra_op_threads: int | None = None,
+        inter_op_threads: int | None = None,
+    ) -> None:
+        from tokenizers import Tokenizer
+
+        settings = get_settings()
+        self.quantize = settings.onnx_quantize if quantize is None else quantize
+        self.directory = export_model(
+            model_name, model_dir or settings.onnx_model_dir, quantize=self.quantize
+        )
+        self.config: dict[str, Any] = json.loads(
+            (self.directory / CONFIG_FILE).read_text(encoding="utf-8")
+        )
+        self.model_path = self.directory / (INT8_FILE if self.quantize else FP32_FILE)
+        self.model_name = onnx_model_name(model_name, self.quantize)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads or settings.onnx_inter_op_threads
+
+        self.tokenizer = Tokenizer.from_file(str(self.directory / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=int(self.config["max_seq_length"]))
+        self.tokenizer.enable_padding(
+            pad_id=int(self.config["pad_token_id"]), pad_token=str(self.config["pad_token"])
+        )
+        self._session: Any = None
+        self._session_pid: int | None = None
+        self._session_threads: int | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def dimension(self) -> int:
+        return int(self.config["dimension"])
+
+    def footprint(self) -> dict[str, Any]:
+        """Size and weight type of the loaded graph (see `models.model_footprint`)."""
+        return {
+            "parameter_bytes": self.model_path.stat().st_size,
+            "dtypes": ["int8" if self.quantize else "float32"],
+        }
+
+    def _reusable(self, pid: int, threads: int) -> bool:
+        """Whether the current session can serve this process with `threads` intra-op threads.
+
+        A session created before a fork (e.g. by the parent's preload) is only reused when it
+        runs single-threaded: a larger intra-op pool's threads do not exist in the child.
+        """
+        if self._session_pid == pid:
+            return self._session_threads == threads
+        return self._session_threads == 1 and threads == 1
+
+    def _get_session(self) -> Any:
+        threads = self.intra_op_threads if self.intra_op_threads is not None else _thread_budget()
+        pid = os.getpid()
+        session = self._session
+        if session is not None and self._reusable(pid, threads):
+            return session
+        with self._lock:
+            if self._session is None or not self._reusable(pid, threads):
+                import onnxruntime as ort
+
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = self.inter_op_threads
+                self._session = ort.InferenceSession(
+                    str(self.model_path), options, providers=["CPUExecutionProvider"]
+                )
+                self._session_pid, self._session_threads = pid, threads
+            return self._session
+
+    def embed(self, texts: list[str], *, normalize: bool = True) -> np.ndarray:
+        session = self._get_session()
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), BATCH_SIZE):
+            index = order[start : start + BATCH_SIZE]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in index])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            (hidden,) = session.run(None, {k: feeds[k] for k in self.config["inputs"]})
+            out[index] = self._pool(hidden, mask)
+        if normalize:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.config["pooling"] == "cls":
+            return hidden[:, 0]
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+
+def parity(
+    reference: Any,
+    candidate: Any,
+    queries: Sequence[str],
+    documents: Sequence[str],
+    k: int = 10,
+) -> dict[str, float]:
+    """How closely `candidate` reproduces `reference` embeddings.
+
+    Reports the cosine similarity between the two backends' vectors for the same texts
+    (queries and documents), and recall@k: for each query, the share of the reference
+    backend's top-k documents that the candidate backend also ranks in its top k.
+    """
+    texts = [*queries, *documents]
+    ref = reference.embed(list(texts))
+    cand = candidate.embed(list(texts))
+    cosine = np.sum(ref * cand, axis=1) / np.maximum(
+        np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1), 1e-12
+    )
+    n = len(queries)
+    k = min(k, len(documents))
+    recall = 1.0
+    if n and k:
+        top_ref = np.argsort(-(ref[:n] @ ref[n:].T), axis=1)[:, :k]
+        top_cand = np.argsort(-(cand[:n] @ cand[n:].T), axis=1)[:, :k]
+        hits = [len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand, strict=True)]
+        recall = float(np.mean(hits))
+    return {
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        f"recall_at_{k}": recall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export an embedding model to ONNX")
+    parser.add_argument("model", nargs="?", default=DEFAULT_MODEL)
+    parser.add_argument("--out", type=str, default=None, help="Default: ONNX_MODEL_DIR")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    args = parser.parse_args()
+    directory = export_model(
+        args.model, args.out or get_settings().onnx_model_dir, quantize=not args.no_quantize
+    )
+    for f in sorted(directory.glob("*.onnx")):
+        print(f"{f} ({f.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as qmodels
 
 from app.config.settings import get_settings
+from app.retrieval.filters import INTEGER_FIELDS, KEYWORD_FIELDS
+from app.utils.timing import StageTimer
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+# qdrant_client takes most of a second to import, so it is imported inside the functions
+# that need it; importing this module stays cheap for API cold start.
 
 
 def get_qdrant_client() -> QdrantClient:
+    from qdrant_client import QdrantClient
+
     settings = get_settings()
     if not (settings.qdrant_url and settings.qdrant_api_key):
         raise RuntimeError("Qdrant Cloud is not configured. Set QDRANT_URL and QDRANT_API_KEY.")
@@ -17,18 +26,93 @@ def get_qdrant_client() -> QdrantClient:
 
 
 def ensure_collection(
-    client: QdrantClient, collection: str, vector_size: int, desired_vector_name: str | None = None
+    client: QdrantClient,
+    collection: str,
+    vector_size: int,
+    desired_vector_name: str | None = None,
+    lowdim_size: int | None = None,
 ) -> tuple[str, str | None]:
     """Ensure collection exists and return (collection_name, vector_name_if_named).
 
-    If the collection exists, attempt to detect if it uses a named-vector schema and return the 
-    name. If it does not exist, create either a single-vector collection or a named-vector 
-    collection if desired_vector_name is provided.
+    If the collection exists, attempt to detect if it uses a named-vector schema and return the
+    name. If it does not exist, create either a single-vector collection or a named-vector
+    collection if desired_vector_name is provided. Payload indexes for the filterable
+    metadata fields are created on the collection that is returned.
+
+    `lowdim_size` adds a second named vector (`lowdim_vector_name(desired_vector_name)`) of
+    that size to newly created named-vector collections, used by two-stage search. Existing
+    collections keep their schema.
+    """
+    collection_name, vector_name = _ensure_collection(
+        client, collection, vector_size, desired_vector_name, lowdim_size
+    )
+    ensure_payload_indexes(client, collection_name)
+    return collection_name, vector_name
+
+
+def ensure_payload_indexes(client: QdrantClient, collection: str) -> None:
+    """Create keyword/integer payload indexes used by filtered search (idempotent).
+
+    Without them Qdrant evaluates filters by scanning payloads; with them the filter is
+    resolved from the index and the HNSW search stays as fast as an unfiltered one.
     """
+    from qdrant_client.http import models as qmodels
+
+    existing = set((client.get_collection(collection).payload_schema or {}).keys())
+    schema = {f: qmodels.PayloadSchemaType.KEYWORD for f in KEYWORD_FIELDS}
+    schema.update({f: qmodels.PayloadSchemaType.INTEGER for f in INTEGER_FIELDS})
+    for field_name, field_schema in schema.items():
+        if field_name in existing:
+            continue
+        try:
+            client.create_payload_index(
+                collection_name=collection, field_name=field_name, field_schema=field_schema
+            )
+        except Exception:
+            # Index creation is an optimization; a race or an unsupported backend is not fatal
+            pass
+
+
+def lowdim_vector_name(vector_name: str) -> str:
+    """Name of the low-dimensional companion of a named vector."""
+    return f"{vector_name}_lowdim"
+
+
+def truncate_vectors(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """First `dim` components of each vector, re-normalized to unit length (Matryoshka-style)."""
+    head = np.asarray(vectors, dtype=np.float32)[..., :dim]
+    norms = np.linalg.norm(head, axis=-1, keepdims=True)
+    return head / np.where(norms == 0, 1.0, norms)
+
+
+def _named_vectors_config(
+    name: str, vector_size: int, lowdim_size: int | None
+) -> dict[str, qmodels.VectorParams]:
+    from qdrant_client.http import models as qmodels
+
+    config = {name: qmodels.VectorParams(size=vector_size, distance=qmodels.Distance.COSINE)}
+    if lowdim_size and lowdim_size < vector_size:
+        config[lowdim_vector_name(name)] = qmodels.VectorParams(
+            size=lowdim_size, distance=qmodels.Distance.COSINE
+        )
+    return config
+
+
+def _ensure_collection(
+    client: QdrantClient,
+    collection: str,
+    vector_size: int,
+    desired_vector_name: str | None = None,
+    lowdim_size: int | None = None,
+) -> tuple[str, str | None]:
+    from qdrant_client.http import models as qmodels
+
     existing = [c.name for c in client.get_collections().collections]
+    # An alias (versioned collections) stands for the version it points to
+    collection = alias_target(client, collection) or collection
     if collection in existing:
         # Detect vector schema
-        name = _detect_named_vector_from_dump(client, collection)
+        name = detect_vector_name(client, collection)
         if name is None and desired_vector_name:
             # Prefer a sibling collection with desired named vector schema
             new_collection = f"{collection}__{desired_vector_name}"
@@ -37,11 +121,9 @@ def ensure_collection(
             try:
                 client.create_collection(
                     collection_name=new_collection,
-                    vectors_config={
-                        desired_vector_name: qmodels.VectorParams(
-                            size=vector_size, distance=qmodels.Distance.COSINE
-                        )
-                    },
+                    vectors_config=_named_vectors_config(
+                        desired_vector_name, vector_size, lowdim_size
+                    ),
                 )
             except Exception:
                 # If it already exists or any race, just proceed to use it
@@ -52,11 +134,7 @@ def ensure_collection(
     if desired_vector_name:
         client.create_collection(
             collection_name=collection,
-            vectors_config={
-                desired_vector_name: qmodels.VectorParams(
-                    size=vector_size, distance=qmodels.Distance.COSINE
-                )
-            },
+            vectors_config=_named_vectors_config(desired_vector_name, vector_size, lowdim_size),
         )
         return (collection, desired_vector_name)
     else:
@@ -67,6 +145,14 @@ def ensure_collection(
         return (collection, None)
 
 
+def alias_target(client: QdrantClient, alias: str) -> str | None:
+    """Collection the alias points to, or None when no such alias exists."""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return str(description.collection_name)
+    return None
+
+
 def _resolve_vector_schema(client: QdrantClient, collection: str) -> tuple[bool, str | None]:
     """Return (is_named_vectors, vector_name_if_named).
 
@@ -93,8 +179,11 @@ def _resolve_vector_schema(client: QdrantClient, collection: str) -> tuple[bool,
     return (False, None)
 
 
-def _detect_named_vector_from_dump(client: QdrantClient, collection: str) -> str | None:
-    """Fallback: inspect raw model dump to extract a named vector key if present."""
+def detect_vector_name(client: QdrantClient, collection: str) -> str | None:
+    """Name of the collection's (first) named vector, or None for a single unnamed vector.
+
+    Reads the raw model dump, so it works across qdrant-client versions.
+    """
     info = client.get_collection(collection)
     data = info.model_dump(exclude_none=True)  # type: ignore[attr-defined]
     vectors = (
@@ -110,31 +199,84 @@ def _detect_named_vector_from_dump(client: QdrantClient, collection: str) -> str
     return None
 
 
+def collection_vector_sizes(client: QdrantClient, collection: str) -> dict[str, int]:
+    """Sizes of the named vectors of a collection (empty for a single unnamed vector)."""
+    info = client.get_collection(collection)
+    data = info.model_dump(exclude_none=True)  # type: ignore[attr-defined]
+    vectors = data.get("config", {}).get("params", {}).get("vectors")
+    if not isinstance(vectors, dict) or "size" in vectors:
+        return {}
+    return {
+        name: int(params["size"])
+        for name, params in vectors.items()
+        if isinstance(params, dict) and "size" in params
+    }
+
+
+# Collection metadata key of the data version counter that ingestion bumps
+DATA_VERSION_KEY = "data_version"
+
+
+def collection_data_version(client: QdrantClient, collection: str) -> int:
+    """Data version stored in the collection's metadata (0 if never bumped)."""
+    info = client.get_collection(collection)
+    metadata = getattr(info.config, "metadata", None) or {}
+    return int(metadata.get(DATA_VERSION_KEY, 0))
+
+
+def bump_collection_data_version(client: QdrantClient, collection: str) -> int:
+    """Increment the collection's data version so caches in API processes drop old results.
+
+    Collection metadata needs Qdrant 1.16+; callers should tolerate failure on older servers.
+    """
+    version = collection_data_version(client, collection) + 1
+    client.update_collection(collection_name=collection, metadata={DATA_VERSION_KEY: version})
+    return version
+
+
 def upsert_points(
     client: QdrantClient,
     collection: str,
     embeddings: np.ndarray,
     payloads: list[dict[str, Any]],
     vector_name: str | None = None,
-) -> None:
+    ids: list[str] | None = None,
+    extra_vectors: dict[str, np.ndarray] | None = None,
+    stages: StageTimer | None = None,
+) -> list[str]:
+    """Upsert one point per payload and return the point ids (random UUIDs unless given).
+
+    `extra_vectors` maps further named vectors (e.g. the low-dimensional prefilter vector) to
+    one row per point; it requires `vector_name`. `stages` times building the points
+    (``points``) separately from the write itself (``upsert``).
+    """
+    from uuid import uuid4
+
+    from qdrant_client.http import models as qmodels
+
     assert embeddings.shape[0] == len(payloads)
+    ids = ids or [str(uuid4()) for _ in payloads]
+    assert len(ids) == len(payloads)
     points = []
-    from uuid import uuid4
 
-    for _idx, (vec, payload) in enumerate(zip(embeddings, payloads, strict=True)):
-        if vector_name:
-            points.append(
-                qmodels.PointStruct(
-                    id=str(uuid4()),
-                    vector={vector_name: vec.tolist()},  # dict for named vector
-                    payload=payload,
-                ),
-            )
-        else:
-            points.append(
-                qmodels.PointStruct(id=str(uuid4()), vector=vec.tolist(), payload=payload),
-            )
-    client.upsert(collection_name=collection, points=points, wait=True)
+    extra = extra_vectors or {}
+    assert not extra or vector_name
+    stages = stages or StageTimer()
+    with stages.stage("points"):
+        for i, (point_id, vec, payload) in enumerate(zip(ids, embeddings, payloads, strict=True)):
+            if vector_name:
+                named = {vector_name: vec.tolist()}  # dict for named vector
+                named.update({name: rows[i].tolist() for name, rows in extra.items()})
+                points.append(
+                    qmodels.PointStruct(id=point_id, vector=named, payload=payload),
+                )
+            else:
+                points.append(
+                    qmodels.PointStruct(id=point_id, vector=vec.tolist(), payload=payload),
+                )
+    with stages.stage("upsert"):
+        client.upsert(collection_name=collection, points=points, wait=True)
+    return ids
 
 
 def search(
@@ -144,12 +286,46 @@ def search(
     top_k: int = 5,
     filters: qmodels.Filter | None = None,
     vector_name: str | None = None,
+    exclude_payload: list[str] | None = None,
+    prefilter: tuple[str, np.ndarray, int] | None = None,
+    with_vectors: bool = False,
 ) -> list[qmodels.ScoredPoint]:
-    qv: Any = (vector_name, query_vector.tolist()) if vector_name else query_vector.tolist()
-    return client.search(
+    """Nearest points to `query_vector`; `exclude_payload` drops large fields from the response.
+
+    With `with_vectors`, each point also carries its stored `vector_name` vector.
+
+    `prefilter` is ``(vector_name, query_vector, limit)``: a first pass over that (smaller)
+    vector selects `limit` candidates, which Qdrant then rescores with `query_vector` on
+    `vector_name` in the same request.
+    """
+    from qdrant_client.http import models as qmodels
+
+    with_payload: bool | qmodels.PayloadSelectorExclude = True
+    if exclude_payload:
+        with_payload = qmodels.PayloadSelectorExclude(exclude=exclude_payload)
+    prefetch = None
+    if prefilter is not None:
+        name, vector, limit = prefilter
+        prefetch = qmodels.Prefetch(
+            query=vector.tolist(), using=name, limit=max(limit, top_k), filter=filters
+        )
+    return client.query_points(
         collection_name=collection,
-        query_vector=qv,
+        query=query_vector.tolist(),
+        using=vector_name,
+        prefetch=prefetch,
         limit=top_k,
         query_filter=filters,
-        with_payload=True,
+        with_payload=with_payload,
+        with_vectors=([vector_name] if vector_name else True) if with_vectors else False,
+    ).points
+
+
+def retrieve_payload_field(
+    client: QdrantClient, collection: str, ids: list[str], field: str
+) -> dict[str, Any]:
+    """Fetch one payload field for the given point ids (missing points are omitted)."""
+    records = client.retrieve(
+        collection_name=collection, ids=ids, with_payload=[field], with_vectors=False
     )
+    return {str(r.id): (r.payload or {}).get(field) for r in records}
@@ -2,18 +2,19 @@ from __future__ import annotations
 
 from typing import Any
 
-try:
-    from FlagEmbedding import FlagReranker
-except Exception:  # pragma: no cover - optional dependency during import
-    FlagReranker = None  # type: ignore[assignment]
-
 
 class CrossEncoderReranker:
-    """Cross-encoder reranker using BAAI/bge-reranker-v2-m3 by default."""
+    """Cross-encoder reranker using BAAI/bge-reranker-v2-m3 by default.
+
+    `FlagEmbedding` pulls in torch, so it is imported on construction, not module import.
+    """
 
     def __init__(self, model_name: str = "BAAI/bge-reranker-v2-m3", device: str = "cpu") -> None:
-        if FlagReranker is None:
-            raise RuntimeError("FlagEmbedding is not installed")
+        try:
+            from FlagEmbedding import FlagReranker
+        except Exception as e:  # pragma: no cover - optional dependency
+            raise RuntimeError("FlagEmbedding is not installed") from e
+        self.model_name = model_name
         # use_fp16=True is fine on CPU via bfloat16 emulation; can set False if issues
         self.reranker = FlagReranker(model_name, use_fp16=True, device=device)
 
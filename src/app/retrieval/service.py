@@ -1,48 +1,302 @@
 from __future__ import annotations
 
+import math
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+import numpy as np
+
 from app.config.settings import get_settings
-from app.retrieval.embeddings import EmbeddingsClient
+from app.engine.admission import stage
+from app.retrieval.cache import (
+    get_collection_versions,
+    get_embedding_cache,
+    get_result_cache,
+    local_epoch,
+    normalize_query,
+    note_cache_event,
+    search_key,
+)
+from app.retrieval.filters import RetrievalFilters, build_qdrant_filter
+from app.retrieval.models import get_embedder
 from app.retrieval.qdrant_store import (
+    alias_target,
+    collection_vector_sizes,
+    detect_vector_name,
     get_qdrant_client,
+    lowdim_vector_name,
+    retrieve_payload_field,
+    truncate_vectors,
 )
 from app.retrieval.qdrant_store import (
     search as qdrant_search,
 )
+from app.retrieval.sharding import configured_shards, get_shard_client, scatter_gather
+from app.retrieval.text_store import get_text_store
 
 
-def _resolve_collection_and_vector_name() -> tuple[str, str | None]:
+def _resolve_collection_and_vector_name(
+    base: str | None = None, client: Any = None
+) -> tuple[str, str | None]:
     """Heuristic to choose the right collection and vector name for querying.
 
-    - Prefer a sibling collection with suffix `__content` (created by ingestion) if present.
-    - Otherwise use the base collection.
-    - Vector name is `content` for the sibling; otherwise None and Qdrant default is used.
+    - If the base name is an alias (versioned collections, see `app.retrieval.versioning`),
+      use the collection it points to. Aliases only ever point at validated versions, so
+      queries never see a collection that is still being built.
+    - Otherwise prefer a sibling collection with suffix `__content` (created by ingestion)
+      if present.
+    - Otherwise use the base collection (`QDRANT_COLLECTION` unless `base` is given).
+    - Vector name is `content` for the sibling; otherwise the base collection's named vector
+      if it has one, else None and Qdrant default is used.
+
+    `client` defaults to the `QDRANT_URL` client (shards may live on other endpoints).
     """
     settings = get_settings()
-    base = settings.qdrant_collection
+    base = base or settings.qdrant_collection
     # Prefer sibling if it exists
     preferred = f"{base}__content"
-    client = get_qdrant_client()
+    client = client or get_qdrant_client()
+    target = alias_target(client, base)
+    if target is not None:
+        return target, detect_vector_name(client, target)
     collections = [c.name for c in client.get_collections().collections]
     if preferred in collections:
         return preferred, "content"
+    if base in collections:
+        # Collections created fresh by ingestion use the named `content` vector directly
+        return base, detect_vector_name(client, base)
     return base, None
 
 
-def retrieve_top_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
+# (collection, vector name) resolved per base collection, with the time and local epoch
+# they were resolved at; reused for CACHE_VERSION_CHECK_S when the retrieval cache is on
+_resolved: dict[str | None, tuple[str, str | None, float, int]] = {}
+_resolved_lock = threading.Lock()
+
+
+def _resolve_cached(base: str | None, client: Any = None) -> tuple[str, str | None]:
+    settings = get_settings()
+    if not settings.retrieval_cache_enabled:
+        return _resolve_collection_and_vector_name(base, client)
+    now = time.monotonic()
+    with _resolved_lock:
+        entry = _resolved.get(base)
+    if (
+        entry is not None
+        and entry[3] == local_epoch()
+        and now - entry[2] < settings.cache_version_check_s
+    ):
+        return entry[0], entry[1]
+    collection, vector_name = _resolve_collection_and_vector_name(base, client)
+    with _resolved_lock:
+        _resolved[base] = (collection, vector_name, now, local_epoch())
+    return collection, vector_name
+
+
+def _embed_query(text: str) -> np.ndarray:
+    """Embedding of the (normalized) query text, from the embedding cache when possible."""
+    embedder = get_embedder()
+    if not get_settings().retrieval_cache_enabled:
+        with stage("embedding"):
+            return embedder.embed([text])[0]
+    cache = get_embedding_cache()
+    # Clients without a model name (e.g. test doubles) only share entries with themselves
+    model = getattr(embedder, "model_name", None) or f"{type(embedder).__qualname__}@{id(embedder)}"
+    vector = cache.get(model, text)
+    note_cache_event("embedding", vector is not None)
+    if vector is None:
+        with stage("embedding"):
+            vector = embedder.embed([text])[0]
+        cache.put(model, text, vector)
+    return vector
+
+
+# Named-vector sizes per collection, with the time and local epoch they were read at. A
+# collection can be recreated with another schema (`restore_artifact(replace=True)`,
+# re-ingestion), so like `_resolved` an entry is reused for CACHE_VERSION_CHECK_S only
+_vector_sizes: dict[str, tuple[dict[str, int], float, int]] = {}
+_vector_sizes_lock = threading.Lock()
+
+
+def _lowdim_size(client: Any, collection: str, vector_name: str) -> int | None:
+    """Size of the collection's low-dimensional prefilter vector, if it has one."""
+    now = time.monotonic()
+    with _vector_sizes_lock:
+        entry = _vector_sizes.get(collection)
+    if (
+        entry is not None
+        and entry[2] == local_epoch()
+        and now - entry[1] < get_settings().cache_version_check_s
+    ):
+        sizes = entry[0]
+    else:
+        sizes = collection_vector_sizes(client, collection)
+        with _vector_sizes_lock:
+            _vector_sizes[collection] = (sizes, now, local_epoch())
+    return sizes.get(lowdim_vector_name(vector_name))
+
+
+def retrieve_top_chunks(
+    query: str,
+    top_k: int = 5,
+    *,
+    collection: str | None = None,
+    filters: RetrievalFilters | None = None,
+    with_text: bool = True,
+    two_stage: bool | None = None,
+    with_vectors: bool = False,
+) -> list[dict[str, Any]]:
     """Embed the query and fetch top-k chunks from Qdrant Cloud.
 
-    Returns a list of payload dicts with at least keys: text, source_id, chunk_index, score.
+    Returns a list of payload dicts with at least keys: text, source_id, chunk_index, score
+    and point_id. `collection` overrides `QDRANT_COLLECTION` (e.g. for benchmark
+    collections); `filters` restricts the search to chunks whose ingest metadata matches.
+    With `with_text=False` and a configured text store, `text` is not fetched from Qdrant;
+    call `hydrate_texts` for the chunks that are actually used. With `with_vectors`, each
+    chunk also carries its stored embedding as a float32 array under `vector` (used for MMR
+    diversity selection).
+
+    Collections ingested with a low-dimensional vector are searched in two stages (a
+    prefilter on the small vector oversampled by `TWO_STAGE_OVERSAMPLE`, then full-dimension
+    rescoring) unless `two_stage` (default `TWO_STAGE_SEARCH`) is false.
+
+    With `RETRIEVAL_CACHE_ENABLED`, the query embedding (by normalized text) and the search
+    results (by collection, query vector and parameters) are cached; results are dropped
+    when ingestion bumps the collection's data version. Hits are reported through
+    `app.retrieval.cache.record_cache_events`.
+
+    With `QDRANT_SHARDS` (and no explicit `collection`), the query is embedded once and
+    every shard collection is searched concurrently; see `app.retrieval.sharding`. Chunks
+    then also carry the index of their `shard`.
     """
-    if not query or not query.strip():
+    query = normalize_query(query or "")
+    if not query:
         return []
-    embedder = EmbeddingsClient()
-    qvec = embedder.embed([query])[0]
-    client = get_qdrant_client()
-    collection, vector_name = _resolve_collection_and_vector_name()
+    qvec = _embed_query(query)
+    options: dict[str, Any] = {
+        "filters": filters,
+        "with_text": with_text,
+        "two_stage": two_stage,
+        "with_vectors": with_vectors,
+    }
+    return _search(qvec, top_k, collection, options)
+
+
+def retrieve_top_chunks_batch(
+    queries: Sequence[str],
+    top_k: int = 5,
+    *,
+    batch_size: int = 64,
+    workers: int = 4,
+    collection: str | None = None,
+    filters: RetrievalFilters | None = None,
+    with_text: bool = True,
+    two_stage: bool | None = None,
+    with_vectors: bool = False,
+) -> list[list[dict[str, Any]]]:
+    """`retrieve_top_chunks` for many queries (one result list per query, in order).
+
+    Distinct queries are embedded `batch_size` at a time instead of one by one and searched
+    on `workers` threads. Both the embedding cache and the result cache are bypassed: bulk
+    runs would only evict the entries live traffic relies on. Empty queries get an empty
+    list.
+    """
+    normalized = [normalize_query(q or "") for q in queries]
+    distinct = list(dict.fromkeys(q for q in normalized if q))
+    embedder = get_embedder()
+    vectors: dict[str, np.ndarray] = {}
+    for start in range(0, len(distinct), batch_size):
+        batch = distinct[start : start + batch_size]
+        with stage("embedding"):
+            vectors.update(zip(batch, embedder.embed(batch), strict=True))
+    options: dict[str, Any] = {
+        "filters": filters,
+        "with_text": with_text,
+        "two_stage": two_stage,
+        "with_vectors": with_vectors,
+        "use_cache": False,
+    }
+
+    def search(query: str) -> list[dict[str, Any]]:
+        return _search(vectors[query], top_k, collection, options) if query else []
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return list(pool.map(search, normalized))
+
+
+def _search(
+    qvec: np.ndarray, top_k: int, collection: str | None, options: dict[str, Any]
+) -> list[dict[str, Any]]:
+    shards = configured_shards() if collection is None else []
+    if shards:
+        return scatter_gather(
+            shards,
+            lambda shard: _search_collection(
+                get_shard_client(shard.url), shard.collection, qvec, top_k, **options
+            ),
+            top_k,
+        )
+    return _search_collection(get_qdrant_client(), collection, qvec, top_k, **options)
+
+
+def _search_collection(
+    client: Any,
+    collection: str | None,
+    qvec: np.ndarray,
+    top_k: int,
+    *,
+    filters: RetrievalFilters | None,
+    with_text: bool,
+    two_stage: bool | None,
+    with_vectors: bool,
+    use_cache: bool = True,
+) -> list[dict[str, Any]]:
+    """Search one collection (see `retrieve_top_chunks`), through the result cache unless
+    `use_cache` is false."""
+    settings = get_settings()
     try:
-        results = qdrant_search(client, collection, qvec, top_k=top_k, vector_name=vector_name)
+        collection, vector_name = _resolve_cached(collection, client)
+        use_two_stage = settings.two_stage_search if two_stage is None else two_stage
+        lowdim = _lowdim_size(client, collection, vector_name) if vector_name else None
+        prefilter = None
+        if use_two_stage and lowdim and vector_name:
+            limit = math.ceil(top_k * settings.two_stage_oversample)
+            prefilter = (lowdim_vector_name(vector_name), truncate_vectors(qvec, lowdim), limit)
+        qfilter = build_qdrant_filter(filters)
+        exclude_text = not with_text and bool(settings.text_store_path)
+
+        key = version = None
+        if use_cache and settings.retrieval_cache_enabled:
+            version = get_collection_versions().get(client, collection)
+            key = search_key(
+                collection,
+                vector_name,
+                qvec,
+                top_k,
+                filters=filters.model_dump(mode="json") if filters else None,
+                exclude_text=exclude_text,
+                prefilter=prefilter[2] if prefilter else None,
+                with_vectors=with_vectors,
+            )
+            cached = get_result_cache().get(key, version)
+            note_cache_event("search", cached is not None)
+            if cached is not None:
+                return cached
+
+        results = qdrant_search(
+            client,
+            collection,
+            qvec,
+            top_k=top_k,
+            filters=qfilter,
+            vector_name=vector_name,
+            exclude_payload=["text"] if exclude_text else None,
+            prefilter=prefilter,
+            with_vectors=with_vectors,
+        )
     except Exception as e:
         from app.exceptions import VectorDBError
 
@@ -51,5 +305,52 @@ def retrieve_top_chunks(query: str, top_k: int = 5) -> list[dict[str, Any]]:
     for r in results:
         payload = dict(r.payload or {})
         payload["score"] = r.score
+        payload["point_id"] = str(r.id)
+        if with_vectors and r.vector is not None:
+            vector = r.vector[vector_name] if isinstance(r.vector, dict) else r.vector
+            payload["vector"] = np.asarray(vector, dtype=np.float32)
         payloads.append(payload)
+    if key is not None:
+        get_result_cache().put(key, version, payloads)
     return payloads
+
+
+def hydrate_texts(
+    chunks: list[dict[str, Any]], *, collection: str | None = None
+) -> list[dict[str, Any]]:
+    """Fill in `text` for chunks returned without it, in place; return `chunks`.
+
+    Texts come from the local text store (decoded straight from its memory mapping); ids it
+    does not hold, e.g. points ingested elsewhere, are fetched from Qdrant in one request.
+    """
+    missing = [c for c in chunks if "text" not in c and c.get("point_id")]
+    if not missing:
+        return chunks
+    settings = get_settings()
+    texts: dict[str, str] = {}
+    if settings.text_store_path:
+        texts = get_text_store(settings.text_store_path).get_many(c["point_id"] for c in missing)
+    # Ids the store does not hold are fetched from the collection (or shard) they came from
+    fetch: dict[int | None, list[str]] = {}
+    for c in missing:
+        if c["point_id"] not in texts:
+            fetch.setdefault(c.get("shard"), []).append(c["point_id"])
+    shards = {shard.index: shard for shard in configured_shards()} if collection is None else {}
+    for index, ids in fetch.items():
+        shard = shards.get(index) if index is not None else None
+        try:
+            if shard is not None:
+                client = get_shard_client(shard.url)
+                resolved, _ = _resolve_collection_and_vector_name(shard.collection, client)
+            else:
+                client = get_qdrant_client()
+                resolved, _ = _resolve_collection_and_vector_name(collection, client)
+            fetched = retrieve_payload_field(client, resolved, ids, "text")
+        except Exception as e:
+            from app.exceptions import VectorDBError
+
+            raise VectorDBError(f"Qdrant retrieve failed: {str(e)}") from e
+        texts.update({k: v for k, v in fetched.items() if isinstance(v, str)})
+    for c in missing:
+        c["text"] = texts.get(c["point_id"], "")
+    return chunks
@@ -0,0 +1,231 @@
+"""Hash-partitioned collections searched by scatter-gather.
+
+With ``QDRANT_SHARDS=N`` the corpus is split over N collections,
+``<QDRANT_COLLECTION>_shard<i>``, optionally on different Qdrant endpoints
+(``QDRANT_SHARD_URLS``, one per shard). Ingestion assigns every chunk to the shard given by
+a hash of its source id, so all chunks of a document live in one shard and re-ingesting it
+targets the same shard.
+
+A query is embedded once and sent to every shard concurrently. Each shard returns its own
+top-k sorted by score; the lists are merged with a heap, so the result is the global top-k
+without sorting the union. A shard that fails or does not answer within
+``SHARD_TIMEOUT_MS`` is left out and the others' results are returned; the query only
+fails when no shard answered. Per-shard latencies and the shards left out are reported
+through `record_shard_stats`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import heapq
+import logging
+import time
+import zlib
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any
+
+from app.config.settings import AppSettings, get_settings
+from app.retrieval.cache import note_cache_event, record_cache_events
+from app.retrieval.chunking import TextChunk
+from app.retrieval.qdrant_store import get_qdrant_client
+from app.utils.deadline import remaining_timeout
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.embeddings import EmbeddingsClient
+
+logger = logging.getLogger(__name__)
+
+# Per-request shard statistics (`shard<i>_ms`, `shards_timed_out`, `shards_failed`)
+shard_stats_var: ContextVar[dict[str, float] | None] = ContextVar("shard_stats", default=None)
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    collection: str
+    # Endpoint of the shard; None is the QDRANT_URL client
+    url: str | None = None
+
+
+def shard_collection(base: str, index: int) -> str:
+    return f"{base}_shard{index}"
+
+
+def configured_shards(settings: AppSettings | None = None) -> list[Shard]:
+    """Shards of `QDRANT_COLLECTION` per `QDRANT_SHARDS` and `QDRANT_SHARD_URLS` (empty when
+    unsharded)."""
+    settings = settings or get_settings()
+    count = settings.qdrant_shards
+    if count <= 0:
+        return []
+    urls: list[str | None] = [
+        u.strip() for u in (settings.qdrant_shard_urls or "").split(",") if u.strip()
+    ]
+    if urls and len(urls) != count:
+        raise ValueError(f"QDRANT_SHARD_URLS lists {len(urls)} endpoints for {count} shards")
+    urls = urls or [None] * count
+    return [
+        Shard(i, shard_collection(settings.qdrant_collection, i), urls[i]) for i in range(count)
+    ]
+
+
+@lru_cache(maxsize=32)
+def get_shard_client(url: str | None) -> QdrantClient:
+    """One client per shard endpoint, reused across queries (QDRANT_API_KEY for all)."""
+    if url is None:
+        return get_qdrant_client()
+    from qdrant_client import QdrantClient
+
+    return QdrantClient(url=url, api_key=get_settings().qdrant_api_key, timeout=30)
+
+
+def shard_for(source_id: str, shards: int) -> int:
+    """Shard of a source: a stable hash (CRC-32) of its id modulo the shard count."""
+    return zlib.crc32(source_id.encode("utf-8")) % shards
+
+
+def partition_chunks(chunks: Sequence[TextChunk], shards: int) -> list[list[TextChunk]]:
+    parts: list[list[TextChunk]] = [[] for _ in range(shards)]
+    for chunk in chunks:
+        parts[shard_for(chunk.source_id, shards)].append(chunk)
+    return parts
+
+
+def ingest_sharded(
+    embedder: EmbeddingsClient,
+    chunks: Sequence[TextChunk],
+    shards: Sequence[Shard],
+    **options: Any,
+) -> list[tuple[str, int]]:
+    """Partition `chunks` by source and ingest each part into its shard.
+
+    `options` are passed to `ingest_chunks`. Near-duplicate detection runs per shard, so
+    duplicates whose sources hash to different shards are both stored. Returns the
+    (collection, points written) of every shard that received chunks.
+    """
+    from app.retrieval.ingest_cli import ingest_chunks
+
+    written = []
+    for shard, part in zip(shards, partition_chunks(chunks, len(shards)), strict=True):
+        if part:
+            client = get_shard_client(shard.url)
+            written.append(ingest_chunks(client, embedder, part, shard.collection, **options))
+    return written
+
+
+@contextmanager
+def record_shard_stats() -> Iterator[dict[str, float]]:
+    """Collect the shard statistics of the enclosed retrieval calls into the yielded dict."""
+    stats: dict[str, float] = {}
+    token = shard_stats_var.set(stats)
+    try:
+        yield stats
+    finally:
+        shard_stats_var.reset(token)
+
+
+# Searches run on a pool per shard, so a shard that stops answering can only tie up its own
+# threads (each for up to the client timeout) and never delays searches of the other shards
+SHARD_MAX_INFLIGHT = 4
+
+
+@lru_cache(maxsize=64)
+def _shard_pool(shard: Shard) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=SHARD_MAX_INFLIGHT, thread_name_prefix=f"shard{shard.index}-search"
+    )
+
+
+def scatter_gather(
+    shards: Sequence[Shard],
+    search: Callable[[Shard], list[dict[str, Any]]],
+    top_k: int,
+    *,
+    timeout_s: float | None = None,
+) -> list[dict[str, Any]]:
+    """Run `search` on every shard concurrently and merge the results into the top `top_k`.
+
+    `search` returns a shard's chunks sorted by descending score. Shards that raise or take
+    longer than `timeout_s` (default `SHARD_TIMEOUT_MS`, shortened to the request deadline)
+    are left out. Raises `VectorDBError` when no shard answered.
+    """
+    from app.exceptions import VectorDBError
+
+    timeout = get_settings().shard_timeout_ms / 1000.0 if timeout_s is None else timeout_s
+    timeout = remaining_timeout(timeout, minimum=0.0)
+
+    def run(shard: Shard) -> tuple[list[dict[str, Any]], float, dict[str, float]]:
+        start = time.perf_counter()
+        with record_cache_events() as events:
+            chunks = search(shard)
+        return chunks, (time.perf_counter() - start) * 1000.0, events
+
+    # Shard searches inherit the request's context (trace id, deadline)
+    futures = [
+        _shard_pool(shard).submit(contextvars.copy_context().run, run, shard) for shard in shards
+    ]
+    started = time.perf_counter()
+    wait(futures, timeout=timeout)
+    waited_ms = (time.perf_counter() - started) * 1000.0
+
+    stats: dict[str, float] = {}
+    lists: list[list[dict[str, Any]]] = []
+    timed_out: list[int] = []
+    failed: dict[int, str] = {}
+    cache_hits: list[float] = []
+    for shard, future in zip(shards, futures, strict=True):
+        if not future.done():
+            # Searches still queued behind a stuck shard's threads are dropped; running ones
+            # are left to finish (the client has its own timeout) and their result discarded
+            future.cancel()
+            timed_out.append(shard.index)
+            stats[f"shard{shard.index}_ms"] = waited_ms
+            continue
+        try:
+            chunks, elapsed_ms, events = future.result()
+        except Exception as e:
+            failed[shard.index] = str(e)
+            continue
+        stats[f"shard{shard.index}_ms"] = elapsed_ms
+        cache_hits.extend(v for k, v in events.items() if k == "search_cache_hit")
+        for chunk in chunks:
+            chunk["shard"] = shard.index
+        lists.append(chunks)
+    stats["shards_timed_out"] = float(len(timed_out))
+    stats["shards_failed"] = float(len(failed))
+
+    recorder = shard_stats_var.get()
+    if recorder is not None:
+        recorder.update(stats)
+    if timed_out or failed:
+        logger.warning(
+            "Partial shard results",
+            extra={
+                "timed_out": timed_out,
+                # A list rather than the int-keyed dict, which JSON encoders may reject
+                "failed": [{"shard": i, "error": error} for i, error in failed.items()],
+                "timeout_s": timeout,
+            },
+        )
+    if not lists:
+        raise VectorDBError(
+            f"No shard answered within {timeout:.3f}s "
+            f"(timed out: {timed_out}, failed: {sorted(failed)})"
+        )
+    # The search step counts as a cache hit only when every answering shard hit
+    if cache_hits and len(cache_hits) == len(lists):
+        note_cache_event("search", all(h == 1.0 for h in cache_hits))
+    return list(islice(heapq.merge(*lists, key=lambda c: -float(c["score"])), top_k))
+
+
+def reset_shard_clients() -> None:
+    """Drop cached shard clients (used by tests and after changing shard settings)."""
+    get_shard_client.cache_clear()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+import uuid
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
+# Index record: point id (16-byte UUID), offset (u64) and length (u32) into the data file
+_RECORD = struct.Struct("<16sQI")
+DATA_FILE = "texts.bin"
+INDEX_FILE = "index.bin"
+
+
+def _key(point_id: str | uuid.UUID) -> bytes:
+    return uuid.UUID(str(point_id)).bytes
+
+
+class ChunkTextStore:
+    """Append-only, memory-mapped store of chunk texts keyed by Qdrant point id.
+
+    Texts are appended to ``texts.bin`` and located through fixed-size records in
+    ``index.bin``. Data is written and flushed before its index records, so a crash mid-write
+    never leaves an index entry pointing past the data. Readers map the data file and decode
+    texts straight from the mapping; the mapping is refreshed when another process appends.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._data_path = self.path / DATA_FILE
+        self._index_path = self.path / INDEX_FILE
+        self._data_path.touch(exist_ok=True)
+        self._index_path.touch(exist_ok=True)
+        self._offsets: dict[bytes, tuple[int, int]] = {}
+        self._index_size = 0
+        self._map: mmap.mmap | None = None
+        self._map_size = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, point_id: object) -> bool:
+        return _key(str(point_id)) in self._offsets
+
+    def refresh(self) -> None:
+        """Load index records appended since the last refresh and remap grown data."""
+        with self._lock:
+            size = self._index_path.stat().st_size
+            usable = size - size % _RECORD.size  # ignore a torn trailing record
+            if usable > self._index_size:
+                with self._index_path.open("rb") as f:
+                    f.seek(self._index_size)
+                    chunk = f.read(usable - self._index_size)
+                for key, offset, length in _RECORD.iter_unpack(chunk):
+                    self._offsets[key] = (offset, length)
+                self._index_size = usable
+            data_size = self._data_path.stat().st_size
+            if data_size != self._map_size:
+                # The old mapping is not closed: views handed out by get_bytes may still use
+                # it, and it is released once they are gone
+                self._map = None
+                if data_size:
+                    with self._data_path.open("rb") as f:
+                        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._map_size = data_size
+
+    def append(self, items: Iterable[tuple[str, str]]) -> int:
+        """Append ``(point_id, text)`` pairs; return how many were written."""
+        records: list[bytes] = []
+        with self._lock, self._data_path.open("ab") as data:
+            offset = data.seek(0, os.SEEK_END)
+            for point_id, text in items:
+                raw = text.encode("utf-8")
+                data.write(raw)
+                records.append(_RECORD.pack(_key(point_id), offset, len(raw)))
+                offset += len(raw)
+            data.flush()
+            os.fsync(data.fileno())
+            with self._index_path.open("ab") as index:
+                index.write(b"".join(records))
+                index.flush()
+                os.fsync(index.fileno())
+        self.refresh()
+        return len(records)
+
+    def get_bytes(self, point_id: str) -> memoryview | None:
+        """Zero-copy view of the UTF-8 text for `point_id`, or None if it is not stored."""
+        key = _key(point_id)
+        loc = self._offsets.get(key)
+        if loc is None or loc[0] + loc[1] > self._map_size:
+            self.refresh()
+            loc = self._offsets.get(key)
+            if loc is None:
+                return None
+        offset, length = loc
+        mapping = self._map
+        if mapping is None or length == 0:
+            return memoryview(b"")
+        return memoryview(mapping)[offset : offset + length]
+
+    def get(self, point_id: str) -> str | None:
+        view = self.get_bytes(point_id)
+        if view is None:
+            return None
+        with view:
+            return str(view, "utf-8")
+
+    def get_many(self, point_ids: Iterable[str]) -> dict[str, str]:
+        """Texts for the ids that are stored; missing ids are omitted."""
+        out: dict[str, str] = {}
+        for point_id in point_ids:
+            text = self.get(point_id)
+            if text is not None:
+                out[point_id] = text
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass  # still referenced by a view; released with it
+            self._map = None
+            self._map_size = 0
+
+
+@lru_cache(maxsize=4)
+def get_text_store(path: str) -> ChunkTextStore:
+    """Process-wide store for `path` (one mapping shared by all requests)."""
+    return ChunkTextStore(path)
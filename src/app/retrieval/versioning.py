@@ -0,0 +1,205 @@
+"""Versioned collections behind an alias, for rebuilds without downtime.
+
+A rebuild writes into a fresh collection ``<base>_v<N>`` while queries keep reading the live
+version through the alias ``<base>`` (the `QDRANT_COLLECTION` name). Once the new version is
+built it is validated: its point count must reach `REINDEX_MIN_POINT_RATIO` of the live
+version's, and every smoke query must return hits. Only then is the alias switched, in one
+atomic `update_collection_aliases` request, so a query sees either the old index or the
+new one and never a partially written one. Versions older than the live one are deleted,
+except the newest `REINDEX_KEEP_VERSIONS` (kept for rollback and for API processes that
+have not yet re-resolved the alias). A version that fails validation is dropped and the
+alias stays where it was.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import time
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, Any
+
+from app.config.settings import get_settings
+from app.exceptions import VectorDBError
+from app.retrieval.cache import bump_local_epoch
+from app.retrieval.qdrant_store import alias_target, detect_vector_name, search
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+    from app.retrieval.embeddings import EmbeddingsClient
+
+logger = logging.getLogger(__name__)
+
+
+def version_collection(base: str, version: int) -> str:
+    return f"{base}_v{version}"
+
+
+def collection_versions(client: QdrantClient, base: str) -> dict[int, str]:
+    """Existing versions of `base` by version number, in ascending order."""
+    pattern = re.compile(rf"{re.escape(base)}_v(\d+)")
+    versions = {}
+    for description in client.get_collections().collections:
+        match = pattern.fullmatch(description.name)
+        if match:
+            versions[int(match.group(1))] = description.name
+    return dict(sorted(versions.items()))
+
+
+def validate_collection(
+    client: QdrantClient,
+    collection: str,
+    *,
+    min_points: int = 1,
+    embedder: EmbeddingsClient | None = None,
+    smoke_queries: Sequence[str] = (),
+) -> dict[str, Any]:
+    """Check that a built collection can serve queries; return a report.
+
+    ``failures`` in the report lists every check that did not pass: fewer than `min_points`
+    points, or a smoke query that returns no hits (or errors, e.g. on a vector size that does
+    not match `embedder`).
+    """
+    points = int(client.count(collection_name=collection, exact=True).count)
+    failures = []
+    if points < min_points:
+        failures.append(f"{points} points, expected at least {min_points}")
+    if smoke_queries and embedder is None:
+        raise ValueError("smoke_queries need an embedder")
+    vector_name = detect_vector_name(client, collection)
+    for query in smoke_queries:
+        try:
+            vector = embedder.embed([query])[0]  # type: ignore[union-attr]
+            hits = search(client, collection, vector, top_k=1, vector_name=vector_name)
+        except Exception as e:
+            failures.append(f"smoke query {query!r} failed: {e}")
+            continue
+        if not hits:
+            failures.append(f"smoke query {query!r} returned no hits")
+    return {
+        "collection": collection,
+        "points": points,
+        "min_points": min_points,
+        "smoke_queries": len(smoke_queries),
+        "failures": failures,
+    }
+
+
+def _live_collection(client: QdrantClient, alias: str) -> str | None:
+    """Collection behind `alias` (None before the first version); raises `VectorDBError`
+    when `alias` is the name of a plain collection, which an alias cannot shadow."""
+    live = alias_target(client, alias)
+    if live is None and alias in {c.name for c in client.get_collections().collections}:
+        raise VectorDBError(
+            f"{alias} is a collection, not an alias; versioned rebuilds need a collection name "
+            "that is not in use (or delete the existing collection first)"
+        )
+    return live
+
+
+def swap_alias(client: QdrantClient, alias: str, collection: str) -> str | None:
+    """Point `alias` at `collection` atomically; return the collection it pointed to before."""
+    from qdrant_client.http import models as qmodels
+
+    previous = _live_collection(client, alias)
+    operations: list[Any] = []
+    if previous is not None:
+        operations.append(
+            qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias))
+        )
+    operations.append(
+        qmodels.CreateAliasOperation(
+            create_alias=qmodels.CreateAlias(collection_name=collection, alias_name=alias)
+        )
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+    return previous
+
+
+def gc_versions(client: QdrantClient, base: str, keep: int | None = None) -> list[str]:
+    """Delete versions older than the live one except the newest `keep` (default
+    `REINDEX_KEEP_VERSIONS`); return the deleted collections.
+
+    Versions newer than the live one are left alone, since they may be builds in progress.
+    """
+    keep = get_settings().reindex_keep_versions if keep is None else keep
+    live = alias_target(client, base)
+    versions = collection_versions(client, base)
+    live_version = next((v for v, name in versions.items() if name == live), None)
+    if live_version is None:
+        return []
+    older = [name for v, name in versions.items() if v < live_version]
+    stale = older[: max(len(older) - max(keep, 0), 0)]
+    for name in stale:
+        client.delete_collection(collection_name=name)
+    if stale:
+        logger.info("Deleted old collection versions", extra={"base": base, "deleted": stale})
+    return stale
+
+
+def reindex(
+    client: QdrantClient,
+    base: str,
+    build: Callable[[str], Any],
+    *,
+    embedder: EmbeddingsClient | None = None,
+    smoke_queries: Sequence[str] = (),
+    min_points: int | None = None,
+    keep: int | None = None,
+) -> dict[str, Any]:
+    """Build the next version of `base`, validate it, swap the alias and collect old versions.
+
+    `build` fills the collection whose name it is given (e.g. by `ingest_chunks` or
+    `restore_artifact`). `min_points` defaults to `REINDEX_MIN_POINT_RATIO` of the live
+    version's point count. Raises `VectorDBError` when the new version fails validation
+    (errors from `build` propagate); either way it is deleted and the alias is left
+    unchanged.
+    """
+    settings = get_settings()
+    # Checked before the build rather than at the swap
+    live = _live_collection(client, base)
+    version = max(collection_versions(client, base), default=0) + 1
+    collection = version_collection(base, version)
+
+    start = time.perf_counter()
+    logger.info("Building collection version", extra={"collection": collection, "live": live})
+    try:
+        build(collection)
+    except Exception:
+        # Do not leave a half-built version behind
+        if collection in collection_versions(client, base).values():
+            client.delete_collection(collection_name=collection)
+        raise
+    build_s = time.perf_counter() - start
+
+    if min_points is None:
+        live_points = int(client.count(collection_name=live, exact=True).count) if live else 0
+        min_points = max(math.ceil(settings.reindex_min_point_ratio * live_points), 1)
+    validation = validate_collection(
+        client, collection, min_points=min_points, embedder=embedder, smoke_queries=smoke_queries
+    )
+    if validation["failures"]:
+        client.delete_collection(collection_name=collection)
+        raise VectorDBError(
+            f"{collection} failed validation and was deleted; {base} still points to {live}: "
+            + "; ".join(validation["failures"])
+        )
+
+    previous = swap_alias(client, base, collection)
+    # Cached search results are keyed by the resolved collection, so they move with the alias
+    bump_local_epoch()
+    deleted = gc_versions(client, base, keep)
+    logger.info(
+        "Swapped collection alias",
+        extra={"alias": base, "collection": collection, "previous": previous},
+    )
+    return {
+        "alias": base,
+        "collection": collection,
+        "previous": previous,
+        "points": validation["points"],
+        "build_s": build_s,
+        "deleted": deleted,
+    }
@@ -0,0 +1,276 @@
+"""Prefork serving: load models once, then fork workers that share them copy-on-write.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads its own copy of the
+embedding (and reranker) weights and starts a torch thread pool sized to the whole machine.
+Here the parent loads and warms up the models, freezes the GC so collections in the workers
+do not write to the inherited object headers, binds the listening socket and forks workers
+that accept on it. Tensor storage is never written during inference, so its pages stay
+shared between workers. Each worker's torch/BLAS thread count is set from the cores
+available to the process, optionally pinning each worker to its own cores.
+
+    python -m app.serve --host 0.0.0.0 --port 5000 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+@dataclass(frozen=True)
+class WorkerLayout:
+    """Thread count and (when pinning) CPU set of one worker."""
+
+    threads: int
+    cpus: frozenset[int] | None = None
+
+
+def available_cores() -> list[int]:
+    """CPUs this process may run on (respects container cpusets and `taskset`)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_layouts(
+    cores: list[int], workers: int, *, threads: int | None = None, pin: bool = False
+) -> list[WorkerLayout]:
+    """Split `cores` between `workers`.
+
+    Without an explicit `threads`, each worker gets an equal share of the cores (at least
+    one), so the intra-op pools together never oversubscribe the machine. With `pin`, worker
+    `i` is restricted to its own slice of cores; when there are more workers than cores the
+    slices wrap around.
+    """
+    workers = max(1, workers)
+    per_worker = threads or max(1, len(cores) // workers)
+    layouts = []
+    for i in range(workers):
+        cpus = None
+        if pin and cores:
+            cpus = frozenset(cores[(i * per_worker + j) % len(cores)] for j in range(per_worker))
+        layouts.append(WorkerLayout(threads=per_worker, cpus=cpus))
+    return layouts
+
+
+def limit_threads(n: int) -> None:
+    """Cap BLAS/OpenMP and torch intra-op threads for this process.
+
+    The environment variables only take effect for libraries loaded afterwards; torch, if
+    already imported, is reconfigured directly.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(n)
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(
+    sock: socket.socket, layout: WorkerLayout, index: int, graceful_timeout_s: float
+) -> None:
+    import uvicorn
+
+    from app.main import app
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if layout.cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, layout.cpus)
+    limit_threads(layout.threads)
+    logger.info(
+        "Worker started",
+        extra={
+            "worker": index,
+            "pid": os.getpid(),
+            "threads": layout.threads,
+            "cpus": sorted(layout.cpus) if layout.cpus else None,
+        },
+    )
+    # The socket is already bound and listening; uvicorn only accepts on it
+    config = uvicorn.Config(app, lifespan="on", timeout_graceful_shutdown=graceful_timeout_s)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(
+    sock: socket.socket, layout: WorkerLayout, index: int, graceful_timeout_s: float
+) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, layout, index, graceful_timeout_s)
+        except BaseException:
+            logger.exception("Worker crashed", extra={"worker": index})
+            code = 1
+        finally:
+            # Skip interpreter teardown: it would wait on any request threads still running
+            os._exit(code)
+    return pid
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    *,
+    threads: int | None = None,
+    pin: bool = False,
+    preload: bool = True,
+    include_reranker: bool = False,
+    graceful_timeout_s: float = 30.0,
+) -> int:
+    """Load models, fork `workers` servers on one socket and supervise them until signalled.
+
+    Workers that exit unexpectedly are re-forked from the parent, so they come back with the
+    already-loaded models. On SIGTERM/SIGINT workers get `graceful_timeout_s` to finish
+    in-flight requests before they are killed. Returns the process exit code.
+    """
+    layouts = worker_layouts(available_cores(), workers, threads=threads, pin=pin)
+    # Keep torch single-threaded in the parent: an OpenMP pool started before fork is not
+    # usable in the children. Workers set their own thread counts after forking.
+    limit_threads(1)
+
+    import app.main  # noqa: F401  (import the app tree once, before forking)
+    import app.retrieval.models as model_registry
+
+    if preload:
+        model_registry.preload_models(include_reranker=include_reranker)
+        if model_registry.readiness()["state"] != "ready":
+            logger.warning("Preload failed; workers will load models lazily")
+    # Move everything allocated so far out of the GC's reach: collections in the workers
+    # would otherwise touch (and un-share) every inherited object's GC header
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(host, port)
+    children: dict[int, int] = {}  # pid -> worker index
+    stopping = False
+
+    def signal_children(sig: int) -> None:
+        for pid in list(children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum: int, _frame: object) -> None:
+        nonlocal stopping
+        if not stopping:
+            stopping = True
+            signal.alarm(math.ceil(graceful_timeout_s) + 5)
+        signal_children(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGALRM, lambda signum, frame: signal_children(signal.SIGKILL))
+
+    for index, layout in enumerate(layouts):
+        children[_fork_worker(sock, layout, index, graceful_timeout_s)] = index
+    logger.info(
+        "Serving",
+        extra={"host": host, "port": port, "workers": len(layouts), "pids": sorted(children)},
+    )
+
+    exit_code = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if stopping:
+            continue
+        logger.error("Worker exited; restarting", extra={"worker": index, "exit_code": code})
+        exit_code = 1
+        time.sleep(1.0)
+        if not stopping:
+            children[_fork_worker(sock, layouts[index], index, graceful_timeout_s)] = index
+    sock.close()
+    return 0 if stopping else exit_code
+
+
+def main() -> None:
+    settings = get_settings()
+    cores = available_cores()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.serve_workers or len(cores),
+        help="Worker processes (default: SERVE_WORKERS or the available cores)",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=settings.serve_threads_per_worker,
+        help="torch/BLAS threads per worker (default: cores / workers)",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action=argparse.BooleanOptionalAction,
+        default=settings.serve_pin_cpus,
+        help="Restrict each worker to its own cores",
+    )
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.preload_models,
+        help="Load models in the parent before forking (default: PRELOAD_MODELS)",
+    )
+    args = parser.parse_args()
+
+    from app.logging.json_logger import configure_json_logging
+
+    # Synchronous in the parent: a writer thread would not survive the fork, and each
+    # worker sets up its own asynchronous logging at startup
+    configure_json_logging(settings.log_level)
+    sys.exit(
+        serve(
+            args.host,
+            args.port,
+            args.workers,
+            threads=args.threads_per_worker,
+            pin=args.pin_cpus,
+            preload=args.preload,
+            include_reranker=settings.preload_reranker,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Absolute time.monotonic() deadline of the current request, if it has one
+deadline_var: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(timeout_s: float | None) -> Iterator[float | None]:
+    """Set a deadline `timeout_s` from now for the enclosed work (never extending an outer one)."""
+    deadline = None if timeout_s is None else time.monotonic() + timeout_s
+    outer = deadline_var.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = deadline_var.set(deadline)
+    try:
+        yield deadline
+    finally:
+        deadline_var.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the current deadline (may be negative), or None without one."""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def remaining_timeout(default: float, minimum: float = 0.5) -> float:
+    """Timeout for a blocking call: `default`, shortened to the time left on the deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(min(default, left), minimum)
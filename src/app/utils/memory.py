@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import sys
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size of this process (Linux), or None where unavailable."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> int | None:
+    """High-water mark of this process's resident set size."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux, bytes on macOS
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+@contextmanager
+def memory_probe(into: dict[str, float] | None, name: str) -> Iterator[None]:
+    """Record the memory cost of the enclosed block into `into` (no-op when `into` is None).
+
+    Sets ``<name>_rss_delta`` (MB the resident set grew by; covers torch and other native
+    allocations) and, while `tracemalloc` is tracing, ``<name>_alloc_peak`` (MB of Python and
+    numpy allocations at the block's peak, above the level at entry). The tracemalloc peak is
+    process-wide, so it is only attributable to one stage when requests do not overlap.
+    """
+    if into is None:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        start_traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    start_rss = rss_bytes()
+    try:
+        yield
+    finally:
+        end_rss = rss_bytes()
+        if start_rss is not None and end_rss is not None:
+            into[f"{name}_rss_delta"] = (end_rss - start_rss) / MB
+        if tracing and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            into[f"{name}_alloc_peak"] = max(0, peak - start_traced) / MB
+
+
+def process_memory() -> dict[str, float | None]:
+    rss, peak = rss_bytes(), peak_rss_bytes()
+    return {
+        "rss_mb": None if rss is None else rss / MB,
+        "peak_rss_mb": None if peak is None else peak / MB,
+    }
+
+
+def tracemalloc_summary(limit: int = 10) -> dict[str, Any]:
+    """Traced totals and the allocation sites holding the most memory, when tracing."""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return {
+        "tracing": True,
+        "current_mb": current / MB,
+        "peak_mb": peak / MB,
+        "top": [
+            {"site": str(stat.traceback[0]), "size_mb": stat.size / MB, "count": stat.count}
+            for stat in stats
+        ],
+    }
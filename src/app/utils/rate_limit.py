@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of calls to an external service.
+
+    Parameters
+    ----------
+    rate_per_s: float
+        Tokens added to the bucket per second.
+    capacity: float | None
+        Maximum burst size. Defaults to one second worth of tokens (at least 1).
+    """
+
+    def __init__(self, rate_per_s: float, capacity: float | None = None) -> None:
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be positive")
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity if capacity is not None else max(rate_per_s, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, rate_per_min: float, capacity: float | None = None) -> TokenBucket:
+        return cls(rate_per_min / 60.0, capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        """Block until `tokens` are available; return False if `timeout` expires first.
+
+        Requests larger than the capacity are allowed once the bucket is full, leaving it in
+        debt so the long-run rate is still respected.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return True
+                wait = (needed - self._tokens) / self.rate_per_s
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
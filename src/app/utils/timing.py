@@ -3,6 +3,7 @@ from __future__ import annotations
 import time
 from collections.abc import Iterator
 from contextlib import contextmanager
+from typing import Any
 
 
 @contextmanager
@@ -15,3 +16,32 @@ def timer() -> Iterator[dict[str, float]]:
     finally:
         end = time.perf_counter()
         data["elapsed_ms"] = (end - start) * 1000.0
+
+
+class StageTimer:
+    """Accumulates wall time per named stage of a multi-stage job (e.g. ingestion).
+
+    ``with stages.stage("embed"): ...`` adds the block's duration to ``stages.ms["embed"]``;
+    stages entered repeatedly (one read per file) are summed. When `profiler` is given
+    (anything with ``enable()``/``disable()``, such as `cProfile.Profile`), it runs only
+    while `profile_stage` is executing.
+    """
+
+    def __init__(self, profile_stage: str | None = None, profiler: Any | None = None) -> None:
+        self.ms: dict[str, float] = {}
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        profiling = self.profiler is not None and name == self.profile_stage
+        if profiling:
+            self.profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if profiling:
+                self.profiler.disable()
+            self.ms[name] = self.ms.get(name, 0.0) + elapsed
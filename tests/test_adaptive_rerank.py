@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from app.config.settings import AppSettings
+from app.retrieval.adaptive import RerankCostTracker, plan_candidates
+
+
+def _chunks(scores: list[float]) -> list[dict[str, Any]]:
+    return [
+        {"text": f"c{i}", "source_id": f"s{i}", "chunk_index": 0, "score": s}
+        for i, s in enumerate(scores)
+    ]
+
+
+def _settings(**overrides: Any) -> AppSettings:
+    values = {
+        "adaptive_retrieval": True,
+        "adaptive_pool_min": 4,
+        "adaptive_pool_max": 8,
+        "adaptive_flat_spread": 0.05,
+        "adaptive_rerank_gap": 0.15,
+        "adaptive_rerank_budget_ms": 100.0,
+        **overrides,
+    }
+    return AppSettings().model_copy(update=values)
+
+
+def test_pool_expands_only_when_scores_are_flat() -> None:
+    flat = _chunks([0.80, 0.79, 0.79, 0.78, 0.77, 0.76, 0.75, 0.74, 0.73, 0.72])
+    steep = _chunks([0.90, 0.80, 0.70, 0.60, 0.59, 0.58, 0.57, 0.56, 0.55, 0.54])
+    plan = plan_candidates(flat, 2, rerank=False, settings=_settings(), tracker=RerankCostTracker())
+    assert (plan.pool, plan.flat, plan.skipped) == (8, True, True)
+    plan = plan_candidates(
+        steep, 2, rerank=False, settings=_settings(), tracker=RerankCostTracker()
+    )
+    assert (plan.pool, plan.flat) == (4, False)
+
+
+def test_rerank_limited_to_top_k_on_gap_and_truncated_on_deeper_gap() -> None:
+    tracker = RerankCostTracker()
+    gap_at_k = _chunks([0.90, 0.88, 0.60, 0.58, 0.57])
+    plan = plan_candidates(gap_at_k, 2, rerank=True, settings=_settings(), tracker=tracker)
+    assert plan.reason == "gap"
+    assert plan.timings() == {
+        "candidate_pool": 4.0,
+        "rerank_candidates": 2.0,
+        "rerank_skipped": 0.0,
+    }
+
+    deeper_gap = _chunks([0.90, 0.85, 0.82, 0.50, 0.49])
+    plan = plan_candidates(deeper_gap, 2, rerank=True, settings=_settings(), tracker=tracker)
+    assert (plan.rerank_candidates, plan.reason) == (3, "gap_truncated")
+
+    no_gap = _chunks([0.90, 0.85, 0.80, 0.75, 0.70])
+    plan = plan_candidates(no_gap, 2, rerank=True, settings=_settings(), tracker=tracker)
+    assert (plan.rerank_candidates, plan.reason) == (4, "full")
+
+
+def test_rerank_candidates_capped_by_latency_budget() -> None:
+    tracker = RerankCostTracker(alpha=0.5)
+    tracker.observe(elapsed_ms=200.0, candidates=4)  # 50 ms per candidate
+    tracker.observe(elapsed_ms=120.0, candidates=4)  # EWMA -> 40 ms
+    assert tracker.per_candidate_ms == pytest.approx(40.0)
+
+    scores = _chunks([0.90, 0.85, 0.80, 0.75, 0.70, 0.65, 0.60, 0.55])
+    plan = plan_candidates(scores, 1, rerank=True, settings=_settings(), tracker=tracker)
+    assert (plan.rerank_candidates, plan.reason) == (2, "budget")
+    # Never fewer than top_k candidates, even when the budget is exhausted
+    plan = plan_candidates(scores, 3, rerank=True, settings=_settings(), tracker=tracker)
+    assert plan.rerank_candidates == 3
+
+
+def test_engine_records_adaptive_path(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.models as models
+    import app.retrieval.reranker as rr
+    import app.retrieval.service as svc
+    from app.engine.rag_engine import RAGEngine
+
+    requested: list[int] = []
+    reranked: list[int] = []
+
+    def fake_retrieve(query: str, top_k: int = 5):  # type: ignore[no-untyped-def]
+        requested.append(top_k)
+        return _chunks([0.90, 0.88, 0.50, 0.49, 0.48][:top_k])
+
+    class FakeReranker:
+        def rerank(self, query, chunks, top_k):  # type: ignore[no-untyped-def]
+            reranked.append(len(chunks))
+            return list(reversed(chunks))[:top_k]
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            return "c0 c1"
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", fake_retrieve)
+    monkeypatch.setattr(rr, "CrossEncoderReranker", lambda: FakeReranker())
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+    models.reset_models()
+
+    settings = _settings(self_check_retry=False)
+    result = RAGEngine(settings).query("q", top_k=2, rerank=True)
+    assert requested == [8]
+    # Only the top_k above the gap are reranked, and their cross-encoder order is kept
+    assert reranked == [2]
+    assert result.timings["rerank_candidates"] == 2.0
+    assert result.timings["rerank_skipped"] == 0.0
+    assert [c.text for c in result.citations] == ["c1", "c0"]
+
+    static = settings.model_copy(update={"adaptive_retrieval": False})
+    result = RAGEngine(static).query("q", top_k=2, rerank=True)
+    assert requested[-1] == 10
+    assert reranked == [2, 5]
+    assert result.timings["rerank_candidates"] == 5.0
+    assert result.timings["rerank_skipped"] == 0.0
+    models.reset_models()
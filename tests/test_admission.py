@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.query import get_rag_engine
+from app.config.settings import get_settings
+from app.engine.admission import (
+    AdmissionController,
+    OverloadedError,
+    StageLimiter,
+    get_admission_controller,
+)
+from app.main import app
+
+
+def _occupy(limiter: StageLimiter) -> threading.Event:
+    """Hold one slot of `limiter` from a background thread until the returned event is set."""
+    held, done = threading.Event(), threading.Event()
+
+    def run() -> None:
+        with limiter.hold():
+            held.set()
+            done.wait(5)
+
+    threading.Thread(target=run, daemon=True).start()
+    assert held.wait(5)
+    return done
+
+
+def _wait_for_waiters(limiter: StageLimiter, n: int) -> None:
+    for _ in range(500):
+        if sum(limiter.snapshot()["waiting"].values()) >= n:
+            return
+        time.sleep(0.002)
+    raise AssertionError("waiters did not queue")
+
+
+def test_full_queue_rejects_with_429() -> None:
+    limiter = StageLimiter("request", limit=1, max_queue=0)
+    done = _occupy(limiter)
+    try:
+        with pytest.raises(OverloadedError) as exc:
+            limiter.acquire()
+        assert exc.value.status_code == 429
+        assert int(exc.value.retry_after_header) >= 1
+        assert limiter.snapshot()["rejected"]["queue_full"] == 1
+    finally:
+        done.set()
+
+
+def test_deadline_expires_while_queued_with_503() -> None:
+    limiter = StageLimiter("rerank", limit=1)
+    done = _occupy(limiter)
+    try:
+        with pytest.raises(OverloadedError) as exc:
+            limiter.acquire(deadline=time.monotonic() + 0.05)
+        assert exc.value.status_code == 503
+        assert limiter.snapshot()["rejected"]["deadline"] == 1
+        assert sum(limiter.snapshot()["waiting"].values()) == 0
+    finally:
+        done.set()
+
+
+def test_interactive_waiters_are_admitted_before_batch() -> None:
+    limiter = StageLimiter("llm", limit=1)
+    done = _occupy(limiter)
+    order: list[str] = []
+
+    def waiter(priority: str) -> None:
+        with limiter.hold(priority):
+            order.append(priority)
+
+    threads = []
+    for i, priority in enumerate(["batch", "batch", "interactive"]):
+        t = threading.Thread(target=waiter, args=(priority,))
+        t.start()
+        threads.append(t)
+        _wait_for_waiters(limiter, i + 1)
+    done.set()
+    for t in threads:
+        t.join(5)
+    assert order == ["interactive", "batch", "batch"]
+
+
+def test_batch_is_shed_at_half_the_queue() -> None:
+    limiter = StageLimiter("request", limit=1, max_queue=2)
+    done = _occupy(limiter)
+    t = threading.Thread(target=limiter.acquire, args=("batch",))
+    t.start()
+    _wait_for_waiters(limiter, 1)
+    try:
+        with pytest.raises(OverloadedError):
+            limiter.acquire("batch", deadline=time.monotonic() + 1)
+        # Interactive callers still get the remaining queue slot (and time out here)
+        with pytest.raises(OverloadedError) as exc:
+            limiter.acquire("interactive", deadline=time.monotonic() + 0.02)
+        assert exc.value.status_code == 503
+    finally:
+        done.set()
+        t.join(5)
+        limiter.release()
+
+
+def test_stage_rejects_once_the_deadline_has_passed() -> None:
+    controller = AdmissionController(get_settings())
+    with controller.admit(timeout_s=0.001):
+        time.sleep(0.01)
+        with pytest.raises(OverloadedError):
+            with controller.stage("llm"):
+                pass
+    assert controller.snapshot()["stages"]["llm"]["rejected"]["deadline"] == 1
+
+
+def test_query_api_returns_429_with_retry_after_when_saturated(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("MAX_INFLIGHT_REQUESTS", "1")
+    monkeypatch.setenv("MAX_QUEUED_REQUESTS", "0")
+    get_settings.cache_clear()
+    controller = AdmissionController(get_settings())
+    get_settings.cache_clear()
+    done = _occupy(controller.request)
+
+    class FakeEngine:
+        def query(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+            raise AssertionError("shed requests must not reach the engine")
+
+    app.dependency_overrides[get_admission_controller] = lambda: controller
+    app.dependency_overrides[get_rag_engine] = lambda: FakeEngine()
+    try:
+        client = TestClient(app)
+        resp = client.post("/v1/query", json={"query": "q"}, headers={"X-Priority": "batch"})
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+
+        snapshot = client.get("/debug/admission").json()
+        assert snapshot["request"]["active"] == 1
+        assert snapshot["request"]["rejected"]["queue_full"] == 1
+        assert set(snapshot["stages"]) == {"embedding", "rerank", "llm"}
+    finally:
+        done.set()
+        app.dependency_overrides.clear()
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.logging.json_logger import (
+    configure_json_logging,
+    flush_logging,
+    logging_stats,
+    parse_sample_rates,
+    trace_id_var,
+)
+
+
+@pytest.fixture(autouse=True)
+def _restore_logging():  # type: ignore[no-untyped-def]
+    yield
+    configure_json_logging("INFO")
+
+
+def _records(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_keep_schema_extras_and_trace_id_across_the_writer_thread() -> None:
+    stream = io.StringIO()
+    configure_json_logging("INFO", queue_size=100, stream=stream)
+    token = trace_id_var.set("trace-123")
+    try:
+        logging.getLogger("app.test").info("Retrieved %s chunks", 3, extra={"count": 3})
+    finally:
+        trace_id_var.reset(token)
+    flush_logging()
+    [record] = _records(stream)
+    assert record["message"] == "Retrieved 3 chunks"
+    assert record["count"] == 3
+    assert record["trace_id"] == "trace-123"
+    assert record["level"] == "INFO" and record["logger"] == "app.test"
+    assert {"timestamp", "file", "line", "function"} <= record.keys()
+    # ISO-8601 UTC with milliseconds, e.g. 2026-02-07T09:15:02.123+00:00
+    assert datetime.fromisoformat(record["timestamp"]).utcoffset() == timedelta(0)
+    assert len(record["timestamp"].split(".")[1]) == len("123+00:00")
+    assert logging_stats()["enqueued"] == 1
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_records_with_non_string_keys_are_written(use_orjson: bool, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.logging.json_logger as json_logger
+
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_logger, "orjson", None)
+    stream = io.StringIO()
+    configure_json_logging("INFO", stream=stream)
+    logging.getLogger("app.test").warning("Partial shard results", extra={"failed": {0: "boom"}})
+    [record] = _records(stream)
+    assert record["failed"] == {"0": "boom"}
+
+
+class BlockingStream(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, s: str) -> int:
+        self.release.wait(5)
+        return super().write(s)
+
+
+def test_full_queue_drops_info_but_keeps_errors() -> None:
+    stream = BlockingStream()
+    configure_json_logging("INFO", queue_size=2, stream=stream)
+    logger = logging.getLogger("app.test")
+    logger.info("first")
+    # The writer thread takes the first record and blocks on the stream; fill the queue
+    for _ in range(200):
+        if logging_stats()["queued"] == 0:
+            break
+        time.sleep(0.005)
+    for i in range(20):
+        logger.info("info %d", i)
+    error_thread = threading.Thread(target=logger.error, args=("kept",))
+    error_thread.start()
+    stats = logging_stats()
+    assert stats["dropped"] > 0
+    stream.release.set()
+    error_thread.join(5)
+    flush_logging()
+    messages = [r["message"] for r in _records(stream)]
+    assert "kept" in messages
+    assert logging_stats()["written_inline"] == 1
+
+
+def test_sampling_applies_to_info_only() -> None:
+    stream = io.StringIO()
+    configure_json_logging("INFO", stream=stream, sample_rates={"app.noisy": 0.0})
+    logging.getLogger("app.noisy.engine").info("sampled out")
+    logging.getLogger("app.noisy.engine").warning("always kept")
+    logging.getLogger("app.other").info("other logger")
+    assert [r["message"] for r in _records(stream)] == ["always kept", "other logger"]
+    assert logging_stats()["sampled_out"] == 1
+
+
+def test_parse_sample_rates() -> None:
+    assert parse_sample_rates("app.engine=0.1, app.retrieval = 2") == {
+        "app.engine": 0.1,
+        "app.retrieval": 1.0,
+    }
+    assert parse_sample_rates("") == {}
+
+
+def test_debug_logging_endpoint() -> None:
+    from app.main import app
+
+    configure_json_logging("INFO", queue_size=50, stream=io.StringIO())
+    data = TestClient(app).get("/debug/logging").json()
+    assert data["async"] is True
+    assert data["queue_size"] == 50
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from app.config.settings import get_settings
+from app.engine.rag_engine import RAGEngine, RAGResult, RetrievedChunk
+from app.eval.benchmark import expand_grid, run_sweep, summarize_records
+from app.eval.reporting import generate_markdown_report
+
+
+class FakeEngine:
+    def __init__(self, settings) -> None:  # type: ignore[no-untyped-def]
+        self.settings = settings
+
+    def query(self, query: str, top_k: int, rerank: bool) -> RAGResult:
+        chunk = RetrievedChunk(text=f"ctx {query}", source_id="s", chunk_index=0, score=1.0)
+        return RAGResult(
+            answer=f"answer {query}",
+            citations=[chunk] * top_k,
+            timings={"retrieve": 1.0, "generate": 2.0 if rerank else 1.0},
+            tokens={"prompt_tokens": 100 * top_k, "completion_tokens": 10, "total_tokens": 0},
+            groundedness=self.settings.self_check_min_groundedness,
+        )
+
+
+def test_expand_grid() -> None:
+    grid = expand_grid({"top_k": [3, 5], "rerank": [False, True], "chunk_size": []})
+    assert len(grid) == 4
+    assert {"top_k": 5, "rerank": True} in grid
+    assert expand_grid({}) == [{}]
+
+
+def test_sweep_reports_quality_latency_and_cost() -> None:
+    samples = [{"question": f"q{i}", "ground_truths": ["g"]} for i in range(5)]
+    scored: list[dict[str, Any]] = []
+
+    def scorer(batch, metrics):  # type: ignore[no-untyped-def]
+        scored.extend(batch)
+        return [{"faithfulness": 1.0, "answer_relevancy": 0.5} for _ in batch]
+
+    points = run_sweep(
+        samples,
+        {"top_k": [1, 3], "self_check_threshold": [0.4]},
+        engine_factory=FakeEngine,
+        scorer=scorer,
+        price_prompt_per_1k=1.0,
+    )
+    assert [p["config"]["top_k"] for p in points] == [1, 3]
+    first = points[0]
+    assert first["queries"] == 5 and first["errors"] == 0
+    assert first["latency_p95_ms"] >= first["latency_p50_ms"] >= 0
+    assert first["stage_mean_ms"]["generate"] == pytest.approx(1.0)
+    assert first["metrics"] == {"faithfulness": 1.0, "answer_relevancy": 0.5}
+    assert first["cost_usd"] == pytest.approx(0.5)
+    assert first["records"][0]["groundedness"] == 0.4
+    assert first["records"][0]["scores"] == {"faithfulness": 1.0, "answer_relevancy": 0.5}
+    assert set(scored[0]) == {"question", "contexts", "answer", "ground_truths"}
+
+    md = generate_markdown_report({"sweep": points})
+    assert "| top_k=3, self_check_threshold=0.4 | 0.500 | 1.000 |" in md
+
+
+def test_counters_are_kept_out_of_stage_timings() -> None:
+    timings = {
+        "retrieve": 4.0,
+        "rerank": 2.0,
+        "shard0_ms": 3.0,
+        "coalesce_wait": 1.0,
+        "candidate_pool": 40.0,
+        "rerank_candidates": 20.0,
+        "rerank_skipped": 0.0,
+        "search_cache_hit": 1.0,
+        "embedding_cache_hit_retry": 0.0,
+        "mmr_duplicates": 2.0,
+        "shards_timed_out": 0.0,
+        "coalesced": 1.0,
+    }
+    summary = summarize_records([{"latency_ms": 10.0, "timings": timings}])
+    assert set(summary["stage_mean_ms"]) == {"retrieve", "rerank", "shard0_ms", "coalesce_wait"}
+    assert summary["counter_mean"]["candidate_pool"] == 40.0
+    assert set(summary["counter_mean"]) == set(timings) - set(summary["stage_mean_ms"])
+
+
+def test_chunk_sweep_requires_corpus() -> None:
+    with pytest.raises(ValueError):
+        run_sweep([], {"chunk_size": [500]}, engine_factory=FakeEngine, score=False)
+
+
+def test_engine_settings_override_selects_collection(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    seen: list[str | None] = []
+
+    def fake_retrieve(query: str, top_k: int = 5, collection: str | None = None):  # type: ignore[no-untyped-def]
+        seen.append(collection)
+        return []
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", fake_retrieve)
+    settings = get_settings().model_copy(update={"qdrant_collection": "bench_c500"})
+    RAGEngine(settings).query("q", 3, False)
+    RAGEngine().query("q", 3, False)
+    assert seen == ["bench_c500", None]
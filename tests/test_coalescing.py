@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.query import get_rag_engine
+from app.engine.admission import OverloadedError
+from app.engine.coalesce import QueryCoalescer, coalesce_key, get_coalescer
+from app.engine.rag_engine import RAGResult
+from app.main import app
+from app.retrieval.filters import RetrievalFilters
+
+
+class SlowQuery:
+    """Query function that blocks until released and counts its executions."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self) -> RAGResult:
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        return RAGResult(answer="a", citations=[], timings={"retrieve": 1.0})
+
+
+def _wait_for_followers(coalescer: QueryCoalescer, n: int) -> None:
+    for _ in range(2500):
+        if coalescer.stats()["waiting"] >= n:
+            return
+        time.sleep(0.002)
+    raise AssertionError("followers did not attach")
+
+
+def test_key_normalizes_query_and_separates_parameters() -> None:
+    base = coalesce_key("What is  RAG?", 5, False)
+    assert coalesce_key(" What is RAG? ", 5, False) == base
+    assert coalesce_key("What is RAG?", 3, False) != base
+    assert coalesce_key("What is RAG?", 5, True) != base
+    assert coalesce_key("What is RAG?", 5, False, RetrievalFilters(tags=["a"])) != base
+
+
+def test_concurrent_duplicates_run_once_and_followers_are_marked() -> None:
+    coalescer = QueryCoalescer()
+    fn = SlowQuery()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(coalescer.run, "k", fn, 5.0)]
+        assert fn.started.wait(5)
+        futures += [pool.submit(coalescer.run, "k", fn, 5.0) for _ in range(3)]
+        _wait_for_followers(coalescer, 3)
+        fn.release.set()
+        results = [f.result() for f in futures]
+
+    assert fn.calls == 1
+    assert "coalesced" not in results[0].timings
+    for follower in results[1:]:
+        assert follower.answer == "a"
+        assert follower.timings["coalesced"] == 1.0
+        assert follower.timings["coalesce_wait"] > 0
+        assert follower.timings["retrieve"] == 1.0
+    assert coalescer.stats()["leaders"] == 1
+    assert coalescer.stats()["followers"] == 3
+    assert coalescer.stats()["in_flight"] == 0
+
+
+def test_leader_errors_reach_followers_and_follower_waits_are_bounded() -> None:
+    coalescer = QueryCoalescer()
+    started, release = threading.Event(), threading.Event()
+
+    def failing() -> RAGResult:
+        started.set()
+        release.wait(5)
+        raise RuntimeError("llm down")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(coalescer.run, "k", failing, 5.0)
+        assert started.wait(5)
+        follower = pool.submit(coalescer.run, "k", failing, 5.0)
+        with pytest.raises(OverloadedError):
+            coalescer.run("k", failing, 0.01)
+        _wait_for_followers(coalescer, 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert coalescer.stats()["timeouts"] == 1
+
+
+def test_followers_retry_when_the_leader_is_shed() -> None:
+    coalescer = QueryCoalescer()
+    started, release = threading.Event(), threading.Event()
+
+    def shed_batch_leader() -> RAGResult:
+        # e.g. an X-Priority: batch leader with a 0.2 s X-Request-Timeout
+        started.set()
+        release.wait(5)
+        raise OverloadedError("Deadline exceeded waiting for stage llm")
+
+    own = SlowQuery()
+    own.release.set()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(coalescer.run, "k", shed_batch_leader, 5.0)
+        assert started.wait(5)
+        follower = pool.submit(coalescer.run, "k", own, 5.0)
+        _wait_for_followers(coalescer, 1)
+        release.set()
+        with pytest.raises(OverloadedError):
+            leader.result()
+        result = follower.result()
+    # The follower ran its own query instead of inheriting the leader's 503
+    assert own.calls == 1 and result.answer == "a"
+    assert "coalesced" not in result.timings
+    assert coalescer.stats()["retries"] == 1
+
+
+def test_shared_directory_coalesces_across_workers(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    # Two coalescers stand in for two worker processes: flock locks are per open file, so
+    # they contend exactly as separate processes would
+    first, second = QueryCoalescer(shared_dir=tmp_path), QueryCoalescer(shared_dir=tmp_path)
+    fn = SlowQuery()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(first.run, "k", fn, 5.0)
+        assert fn.started.wait(5)
+        other = pool.submit(second.run, "k", fn, 5.0)
+        time.sleep(0.05)
+        fn.release.set()
+        results = [leader.result(), other.result()]
+    assert fn.calls == 1
+    assert results[1].timings["coalesced"] == 1.0
+    assert second.stats()["shared_hits"] == 1
+
+    # A later, non-concurrent call runs again instead of reusing the stored result
+    assert "coalesced" not in second.run("k", fn, 5.0).timings
+    assert fn.calls == 2
+
+
+def test_query_api_coalesces_duplicates() -> None:
+    fn = SlowQuery()
+
+    class FakeEngine:
+        def query(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+            return fn()
+
+    coalescer = QueryCoalescer()
+    app.dependency_overrides[get_rag_engine] = lambda: FakeEngine()
+    app.dependency_overrides[get_coalescer] = lambda: coalescer
+    try:
+        client = TestClient(app)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            post = lambda q: client.post("/v1/query", json={"query": q})  # noqa: E731
+            futures = [pool.submit(post, "what is rag?")]
+            assert fn.started.wait(5)
+            futures += [pool.submit(post, "What is  RAG?".lower()) for _ in range(2)]
+            _wait_for_followers(coalescer, 2)
+            fn.release.set()
+            responses = [f.result() for f in futures]
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert fn.calls == 1
+        assert sum("coalesced" in r.json()["timings_ms"] for r in responses) == 2
+
+        stats = client.get("/debug/coalescing").json()
+        assert stats["leaders"] == 1 and stats["followers"] == 2
+    finally:
+        app.dependency_overrides.clear()
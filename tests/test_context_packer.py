@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.engine.context_packer import merge_adjacent_chunks, overlap_length, pack_context
+from app.llm.client import estimate_token_count
+from app.main import app
+from app.retrieval.chunking import recursive_character_chunk
+
+
+def _as_dicts(text: str, source_id: str, size: int = 100, overlap: int = 20) -> list[dict]:
+    chunks = recursive_character_chunk(
+        text, chunk_size=size, chunk_overlap=overlap, source_id=source_id
+    )
+    return [
+        {"text": c.text, "source_id": c.source_id, "chunk_index": c.chunk_index, "score": 0.5}
+        for c in chunks
+    ]
+
+
+def test_overlap_length_ignores_short_accidental_matches() -> None:
+    assert overlap_length("x" * 10 + "abcdefghijklmnopqrst", "abcdefghijklmnopqrst!!") == 20
+    assert overlap_length("ends with the", "e start of next") == 0
+
+
+def test_adjacent_chunks_merge_back_to_source_text() -> None:
+    text = " ".join(f"word{i}" for i in range(80))
+    chunks = _as_dicts(text, "doc.md")
+    # Relevance order differs from document order
+    shuffled = [chunks[2], chunks[0], chunks[1]]
+    blocks = merge_adjacent_chunks(shuffled)
+    assert len(blocks) == 1
+    assert blocks[0].text == text[: len(blocks[0].text)]
+    assert [c["chunk_index"] for c in blocks[0].chunks] == [2, 0, 1]
+
+
+def test_non_adjacent_chunks_stay_separate_in_relevance_order() -> None:
+    text = " ".join(f"token{i}" for i in range(200))
+    chunks = _as_dicts(text, "a.md")
+    other = {"text": "other source", "source_id": "b.md", "chunk_index": 0, "score": 0.9}
+    blocks = merge_adjacent_chunks([other, chunks[4], chunks[0]])
+    assert [b.source_id for b in blocks] == ["b.md", "a.md", "a.md"]
+
+
+def test_pack_context_respects_budget() -> None:
+    chunks = [
+        {"text": "a" * 400, "source_id": f"s{i}", "chunk_index": 0, "score": 1.0 - i / 10}
+        for i in range(5)
+    ]
+    packed = pack_context(chunks, max_tokens=250, count_tokens=estimate_token_count)
+    assert packed.tokens <= 250
+    assert [c["source_id"] for c in packed.chunks] == ["s0", "s1"]
+    assert packed.dropped == 3
+
+    tiny = pack_context(chunks, max_tokens=20, count_tokens=estimate_token_count)
+    assert tiny.chunks and tiny.tokens <= 20
+
+
+def test_query_reports_token_usage(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    client = TestClient(app)
+
+    import app.retrieval.service as svc
+
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = _as_dicts(text, "doc.md", size=1000, overlap=150)
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", lambda query, top_k=5: chunks)
+
+    import app.llm.client as llm
+
+    prompts: list[str] = []
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            prompts.append(user_prompt)
+            return "ok"
+
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+
+    resp = client.post("/v1/query", json={"query": "q", "top_k": 3})
+    assert resp.status_code == 200
+    tokens = resp.json()["tokens"]
+    assert tokens["prompt_tokens"] > 0 and tokens["completion_tokens"] > 0
+    assert tokens["total_tokens"] == tokens["prompt_tokens"] + tokens["completion_tokens"]
+    # Overlapping text between adjacent chunks is sent only once
+    assert prompts[0].count("[source: doc.md]") == 1
+    assert prompts[0].count("word120 ") <= 1
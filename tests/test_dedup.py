@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from app.retrieval.chunking import TextChunk
+from app.retrieval.dedup import MinHasher, choose_bands, dedup_report, deduplicate_chunks
+from app.retrieval.filters import RetrievalFilters, build_qdrant_filter
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.qdrant_store import search
+
+LICENSE = (
+    "Licensed under the Apache License, Version 2.0 (the License); you may not use this file "
+    "except in compliance with the License. You may obtain a copy of the License at the URL."
+)
+
+
+def _unique_text(i: int) -> str:
+    rng = np.random.default_rng(i)
+    return " ".join(f"w{n}" for n in rng.integers(0, 10_000, size=60))
+
+
+def test_signatures_estimate_jaccard() -> None:
+    hasher = MinHasher(num_perm=256)
+    sigs = hasher.signatures([LICENSE, LICENSE.upper(), LICENSE + " extra", _unique_text(1)])
+    agree = (sigs[0] == sigs).mean(axis=1)
+    assert agree[1] == 1.0  # normalization lowercases
+    assert agree[2] > 0.85
+    assert agree[3] < 0.1
+
+
+def test_choose_bands_errs_below_threshold() -> None:
+    bands, rows = choose_bands(128, 0.9)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.9
+
+
+def test_deduplicate_groups_near_duplicates_and_reports_savings() -> None:
+    chunks = [
+        TextChunk(LICENSE, "a/LICENSE.md", 0),
+        TextChunk(_unique_text(1), "a/guide.md", 0),
+        TextChunk(LICENSE + " 2026", "b/LICENSE.md", 0),
+        TextChunk(_unique_text(2), "b/guide.md", 0),
+        TextChunk(LICENSE, "c/LICENSE.md", 3),
+    ]
+    groups = deduplicate_chunks(chunks, threshold=0.8)
+    assert [g.canonical.source_id for g in groups] == ["a/LICENSE.md", "a/guide.md", "b/guide.md"]
+    assert groups[0].source_ids == ["a/LICENSE.md", "b/LICENSE.md", "c/LICENSE.md"]
+
+    report = dedup_report(groups, vector_dim=768)
+    assert report["chunks"] == 5
+    assert report["points"] == 3
+    assert report["embeddings_avoided"] == 2
+    assert report["vector_bytes_avoided"] == 2 * 768 * 4
+    dup_bytes = len((LICENSE + " 2026").encode()) + len(LICENSE.encode())
+    assert report["payload_bytes_avoided"] == dup_bytes
+    assert deduplicate_chunks([]) == []
+
+
+class FakeEmbedder:
+    def __init__(self) -> None:
+        self.embedded: list[str] = []
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        self.embedded.extend(texts)
+        rng = np.random.default_rng(len(self.embedded))
+        vectors = rng.standard_normal((len(texts), 8)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_ingest_stores_one_canonical_point_per_duplicate_group() -> None:
+    client = QdrantClient(location=":memory:")
+    embedder = FakeEmbedder()
+    chunks = [
+        TextChunk(LICENSE, "docs/a/LICENSE.md", 0),
+        TextChunk(LICENSE, "docs/b/LICENSE.md", 0),
+        TextChunk(_unique_text(3), "docs/b/guide.md", 0),
+    ]
+    name, written = ingest_chunks(client, embedder, chunks, "dedup", dedup_threshold=0.9)
+    assert written == 2
+    assert embedder.embedded == [LICENSE, _unique_text(3)]
+
+    hits = search(
+        client,
+        name,
+        np.ones(8, dtype=np.float32),
+        top_k=5,
+        filters=build_qdrant_filter(RetrievalFilters(source_id_prefix="docs/b")),
+        vector_name="content",
+    )
+    by_source = {h.payload["source_id"]: h.payload for h in hits}
+    assert set(by_source) == {"docs/a/LICENSE.md", "docs/b/guide.md"}
+    assert by_source["docs/a/LICENSE.md"]["source_ids"] == [
+        "docs/a/LICENSE.md",
+        "docs/b/LICENSE.md",
+    ]
+    assert "source_ids" not in by_source["docs/b/guide.md"]
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.eval.batch_runner import (
+    load_checkpoint,
+    merge_checkpoints,
+    run_evaluation_batched,
+    sample_id,
+    shard_samples,
+)
+from app.utils.rate_limit import TokenBucket
+
+
+def _samples(n: int) -> list[dict]:
+    return [
+        {"question": f"q{i}", "contexts": [f"c{i}"], "answer": f"a{i}", "ground_truths": []}
+        for i in range(n)
+    ]
+
+
+def _scorer(calls: list[int]):  # type: ignore[no-untyped-def]
+    def score(samples, metrics):  # type: ignore[no-untyped-def]
+        calls.append(len(samples))
+        return [{m: float(s["question"][1:]) / 10 for m in metrics} for s in samples]
+
+    return score
+
+
+def test_shards_partition_samples() -> None:
+    samples = _samples(40)
+    shards = [shard_samples(samples, i, 3) for i in range(3)]
+    ids = [sample_id(s) for shard in shards for s in shard]
+    assert sorted(ids) == sorted(sample_id(s) for s in samples)
+    with pytest.raises(ValueError):
+        shard_samples(samples, 3, 3)
+
+
+def test_batched_run_checkpoints_and_resumes(tmp_path: Path) -> None:
+    ckpt = tmp_path / "scores.jsonl"
+    calls: list[int] = []
+    result = run_evaluation_batched(
+        _samples(10)[:6],
+        metrics=["faithfulness"],
+        batch_size=4,
+        workers=2,
+        checkpoint=ckpt,
+        scorer=_scorer(calls),
+    )
+    assert sorted(calls) == [2, 4]
+    assert result["scored"] == 6 and result["resumed"] == 0
+    assert len(load_checkpoint(ckpt)) == 6
+
+    # Simulate a crash that left a partial line, then rerun on the full set
+    with ckpt.open("a", encoding="utf-8") as f:
+        f.write('{"sample_id": "trunc')
+    calls.clear()
+    progress: list[int] = []
+    result = run_evaluation_batched(
+        _samples(10),
+        metrics=["faithfulness"],
+        batch_size=4,
+        checkpoint=ckpt,
+        scorer=_scorer(calls),
+        on_progress=lambda sid, scores, done, total: progress.append(done),
+    )
+    assert calls == [4]
+    assert result["resumed"] == 6 and result["scored"] == 10
+    assert progress == [7, 8, 9, 10]
+    assert result["metrics"]["faithfulness"] == pytest.approx(0.45)
+
+
+def test_failed_batches_are_counted(tmp_path: Path) -> None:
+    def boom(samples, metrics):  # type: ignore[no-untyped-def]
+        raise RuntimeError("quota exceeded")
+
+    result = run_evaluation_batched(
+        _samples(3), metrics=["faithfulness"], max_retries=0, scorer=boom
+    )
+    assert result["failed"] == 3 and result["metrics"] == {}
+
+
+def test_short_scorer_output_fails_only_that_batch() -> None:
+    def short(samples, metrics):  # type: ignore[no-untyped-def]
+        rows = [{"faithfulness": 0.5} for _ in samples]
+        return rows[:-1] if any(s["question"] == "q3" for s in samples) else rows
+
+    result = run_evaluation_batched(
+        _samples(4), metrics=["faithfulness"], batch_size=2, max_retries=0, scorer=short
+    )
+    assert result["scored"] == 2 and result["failed"] == 2
+
+
+def test_shard_checkpoints_merge(tmp_path: Path) -> None:
+    samples = _samples(12)
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"shard{i}.jsonl"
+        run_evaluation_batched(
+            samples,
+            metrics=["faithfulness"],
+            checkpoint=path,
+            shard_index=i,
+            num_shards=2,
+            scorer=_scorer([]),
+        )
+        paths.append(path)
+    merged = merge_checkpoints(paths, metrics=["faithfulness"])
+    assert merged["samples"] == 12
+    assert merged["metrics"]["faithfulness"] == pytest.approx(0.55)
+
+
+def test_token_bucket_limits_rate() -> None:
+    bucket = TokenBucket(rate_per_s=100.0, capacity=1.0)
+    assert bucket.acquire(1.0)
+    assert not bucket.acquire(1.0, timeout=0.0)
+    assert bucket.acquire(1.0, timeout=1.0)
@@ -1,33 +1,135 @@
 from __future__ import annotations
 
+import time
+
 from fastapi.testclient import TestClient
 
+from app.eval.jobs import EvalJobManager, get_job_manager
 from app.main import app
 
+PAYLOAD = {
+    "samples": [
+        {
+            "question": "What is RAG?",
+            "contexts": ["RAG retrieves documents and generates answers."],
+            "answer": "RAG combines retrieval and generation.",
+            "ground_truths": ["RAG combines retrieval and generation."],
+        },
+        {
+            "question": "Why rerank?",
+            "contexts": ["Reranking orders candidates by relevance."],
+            "answer": "To order results by relevance.",
+            "ground_truths": [],
+        },
+    ]
+}
+
+
+def _wait(client: TestClient, job_id: str) -> dict:
+    for _ in range(200):
+        data = client.get(f"/v1/evaluate/{job_id}").json()
+        if data["status"] in {"succeeded", "failed"}:
+            return data
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_evaluate_smoke(monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+    client = TestClient(app)
+    manager = EvalJobManager(max_workers=1)
+    app.dependency_overrides[get_job_manager] = lambda: manager
+
+    # Monkeypatch per-sample scoring to avoid heavy imports during test
+    import app.eval.ragas_runner as rr
+
+    def fake_score(samples, metrics=None):  # type: ignore[no-untyped-def]
+        return [{"faithfulness": 0.9} for _ in samples]
+
+    monkeypatch.setattr(rr, "score_samples", fake_score)
+
+    try:
+        out_json = tmp_path / "report.json"
+        resp = client.post(
+            "/v1/evaluate", json={**PAYLOAD, "metrics": ["faithfulness"], "out_json": str(out_json)}
+        )
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+
+        data = _wait(client, job_id)
+        assert data["status"] == "succeeded"
+        assert data["done"] == data["total"] == 2
+        assert data["result"]["metrics"]["faithfulness"] == 0.9
+        assert data["partial_metrics"]["faithfulness"] == 0.9
+        assert data["written"]["json"] == str(out_json) and out_json.exists()
 
-def test_evaluate_smoke(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        with client.stream("GET", f"/v1/evaluate/{job_id}/events") as stream:
+            body = "".join(stream.iter_text())
+        assert body.count("event: progress") == 2
+        assert "event: succeeded" in body
+
+        assert client.get("/v1/evaluate/unknown").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+        manager.shutdown()
+
+
+def test_evaluate_job_fails_when_no_sample_is_scored(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import types
+
+    import app.eval.batch_runner as batch_runner
+    import app.eval.ragas_runner as rr
+
+    def failing_score(samples, metrics=None):  # type: ignore[no-untyped-def]
+        raise RuntimeError("judge unavailable")
+
+    monkeypatch.setattr(rr, "score_samples", failing_score)
+    # Skip the retry backoff
+    monkeypatch.setattr(batch_runner, "time", types.SimpleNamespace(sleep=lambda s: None))
     client = TestClient(app)
+    manager = EvalJobManager(max_workers=1)
+    app.dependency_overrides[get_job_manager] = lambda: manager
+    try:
+        job_id = client.post("/v1/evaluate", json=PAYLOAD).json()["job_id"]
+        data = _wait(client, job_id)
+        assert data["status"] == "failed"
+        assert data["error"] == "No sample was scored (2 failed)"
+        assert data["result"] is None
+    finally:
+        app.dependency_overrides = {}
+        manager.shutdown()
+
+
+def test_evaluate_queue_full_and_ttl_eviction(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import threading
 
-    # Monkeypatch run_evaluation to avoid heavy imports during test
     import app.eval.ragas_runner as rr
 
-    def fake_run(samples, metrics=None):  # type: ignore[no-untyped-def]
-        return {"metrics": {"faithfulness": 0.9}}
-
-    monkeypatch.setattr(rr, "run_evaluation", fake_run)
-
-    payload = {
-        "samples": [
-            {
-                "question": "What is RAG?",
-                "contexts": ["RAG retrieves documents and generates answers."],
-                "answer": "RAG combines retrieval and generation.",
-                "ground_truths": ["RAG combines retrieval and generation."],
-            }
-        ]
-    }
-    resp = client.post("/v1/evaluate", json=payload)
-    assert resp.status_code == 200
-    data = resp.json()
-    assert "result" in data and "metrics" in data["result"]
-    assert data["result"]["metrics"]["faithfulness"] == 0.9
+    release = threading.Event()
+
+    def blocking_score(samples, metrics=None):  # type: ignore[no-untyped-def]
+        release.wait(5)
+        return [{"faithfulness": 1.0} for _ in samples]
+
+    monkeypatch.setattr(rr, "score_samples", blocking_score)
+    client = TestClient(app)
+    manager = EvalJobManager(max_workers=1, max_pending=1, ttl_s=0.0)
+    app.dependency_overrides[get_job_manager] = lambda: manager
+    try:
+        first = client.post("/v1/evaluate", json=PAYLOAD)
+        assert first.status_code == 202
+        second = client.post("/v1/evaluate", json=PAYLOAD)
+        assert second.status_code == 429
+        assert second.headers["Retry-After"]
+        release.set()
+        job = manager.get(first.json()["job_id"])
+        assert job is not None
+        for _ in range(200):
+            if job.finished_at is not None:
+                break
+            time.sleep(0.01)
+        time.sleep(0.01)
+        # Finished jobs are evicted once their TTL has passed
+        assert client.get(f"/v1/evaluate/{job.id}").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+        manager.shutdown()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import numpy as np
+from fastapi.testclient import TestClient
+from qdrant_client import QdrantClient
+
+from app.main import app
+from app.retrieval.filters import (
+    RetrievalFilters,
+    build_qdrant_filter,
+    chunk_metadata,
+    source_prefixes,
+)
+from app.retrieval.qdrant_store import ensure_collection, search, upsert_points
+
+
+def test_source_prefixes_are_path_components() -> None:
+    assert source_prefixes("docs/product-a/guide.md") == [
+        "docs",
+        "docs/product-a",
+        "docs/product-a/guide.md",
+    ]
+
+
+def test_chunk_metadata_records_tags_and_times(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    f = tmp_path / "a.md"
+    f.write_text("hello", encoding="utf-8")
+    meta = chunk_metadata(str(f), tags=["b", "a", "a"], ingested_at=123)
+    assert meta["tags"] == ["a", "b"]
+    assert meta["ingested_at"] == 123
+    assert isinstance(meta["modified_at"], int)
+    assert "modified_at" not in chunk_metadata("missing/file.md")
+
+
+def test_empty_filters_build_no_qdrant_filter() -> None:
+    assert build_qdrant_filter(None) is None
+    assert build_qdrant_filter(RetrievalFilters()) is None
+    built = build_qdrant_filter(
+        RetrievalFilters(
+            source_id_prefix="docs/", tags=["x"], ingested_after="2026-01-01T00:00:00Z"
+        )
+    )
+    assert built is not None
+    assert [c.key for c in built.must] == ["source_prefixes", "tags", "ingested_at"]
+    assert built.must[0].match.value == "docs"
+
+
+def _collection() -> tuple[QdrantClient, str, str | None]:
+    client = QdrantClient(location=":memory:")
+    name, vector_name = ensure_collection(client, "filters", 4, desired_vector_name="content")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((6, 4)).astype(np.float32)
+    payloads = []
+    for i, source_id in enumerate(
+        [
+            "docs/product-a/1.md",
+            "docs/product-a/2.md",
+            "docs/product-ab/1.md",
+            "docs/product-b/1.md",
+            "docs/product-b/2.md",
+            "notes/x.md",
+        ]
+    ):
+        day = datetime(2026, 1, 1 + i, tzinfo=UTC)
+        payloads.append(
+            {
+                "source_id": source_id,
+                "chunk_index": 0,
+                "text": source_id,
+                **chunk_metadata(
+                    source_id, tags=["even" if i % 2 == 0 else "odd"], ingested_at=day.timestamp()
+                ),
+            }
+        )
+    upsert_points(client, name, vectors, payloads, vector_name=vector_name)
+    return client, name, vector_name
+
+
+def _sources(filters: RetrievalFilters) -> set[str]:
+    client, name, vector_name = _collection()
+    hits = search(
+        client,
+        name,
+        np.ones(4, dtype=np.float32),
+        top_k=10,
+        filters=build_qdrant_filter(filters),
+        vector_name=vector_name,
+    )
+    return {h.payload["source_id"] for h in hits}
+
+
+def test_filtered_search_by_prefix_tags_and_dates() -> None:
+    assert _sources(RetrievalFilters(source_id_prefix="docs/product-a")) == {
+        "docs/product-a/1.md",
+        "docs/product-a/2.md",
+    }
+    assert _sources(RetrievalFilters(source_id_prefix="docs", tags=["odd"])) == {
+        "docs/product-a/2.md",
+        "docs/product-b/1.md",
+    }
+    assert _sources(
+        RetrievalFilters(
+            ingested_after="2026-01-02T00:00:00Z", ingested_before="2026-01-03T00:00:00Z"
+        )
+    ) == {"docs/product-a/2.md", "docs/product-ab/1.md"}
+
+
+def test_query_api_passes_filters(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.service as svc
+
+    seen: dict[str, object] = {}
+
+    def fake_retrieve_top_chunks(query: str, top_k: int = 5, *, filters=None):  # type: ignore[no-untyped-def]
+        seen["filters"] = filters
+        return [{"text": "chunk", "source_id": "docs/a.md", "chunk_index": 0, "score": 0.9}]
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            return "answer"
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", fake_retrieve_top_chunks)
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+
+    client = TestClient(app)
+    resp = client.post(
+        "/v1/query",
+        json={"query": "q", "top_k": 3, "filters": {"source_id_prefix": "docs", "tags": ["a"]}},
+    )
+    assert resp.status_code == 200
+    assert seen["filters"] == RetrievalFilters(source_id_prefix="docs", tags=["a"])
+
+    resp = client.post("/v1/query", json={"query": "q", "top_k": 3, "filters": {"tags": 1}})
+    assert resp.status_code == 422
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from app.retrieval.ingest_cli import collect_chunks, ingest_chunks
+from app.utils.timing import StageTimer
+
+
+class Embedder:
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class RecordingProfiler:
+    def __init__(self) -> None:
+        self.events: list[str] = []
+
+    def enable(self) -> None:
+        self.events.append("enable")
+
+    def disable(self) -> None:
+        self.events.append("disable")
+
+
+def test_stage_timer_sums_repeated_stages_and_profiles_only_one() -> None:
+    profiler = RecordingProfiler()
+    stages = StageTimer(profile_stage="embed", profiler=profiler)
+    for _ in range(3):
+        with stages.stage("read"):
+            pass
+    with stages.stage("embed"):
+        pass
+    assert set(stages.ms) == {"read", "embed"}
+    assert all(ms >= 0.0 for ms in stages.ms.values())
+    assert profiler.events == ["enable", "disable"]
+
+
+def test_ingestion_reports_every_pipeline_stage(tmp_path: Path, capsys, caplog) -> None:  # type: ignore[no-untyped-def]
+    for i in range(3):
+        (tmp_path / f"doc{i}.md").write_text(f"Document {i}. " * 50, encoding="utf-8")
+    stages = StageTimer()
+    chunks = collect_chunks([str(tmp_path)], chunk_size=200, chunk_overlap=20, stages=stages)
+    client = QdrantClient(location=":memory:")
+    with caplog.at_level(logging.INFO, logger="app.retrieval.ingest_cli"):
+        _, points = ingest_chunks(client, Embedder(), chunks, "stages", stages=stages)
+
+    assert points == len(chunks)
+    expected = {"read", "chunk", "dedup", "embed", "collection", "payloads", "points", "upsert"}
+    assert expected <= set(stages.ms)
+    # A library call logs its progress; only the CLI prints
+    assert capsys.readouterr().out == ""
+    assert "Upserting points" in caplog.messages
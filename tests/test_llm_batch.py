@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections.abc import Iterator
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config.settings import get_settings
+from app.engine.offline import answer_offline
+from app.exceptions import LLMError
+from app.llm.batch import (
+    CHAT_ENDPOINT,
+    HttpBatchTransport,
+    PromptRequest,
+    parse_output,
+    run_batches,
+    wait_for_batch,
+)
+from app.retrieval.cache import clear_retrieval_caches, get_embedding_cache, get_result_cache
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+
+
+class BatchServer(ThreadingHTTPServer):
+    """Local stand-in for the Files and Batches API.
+
+    A batch reports ``in_progress`` on its first poll and completes on the next. Requests
+    whose user prompt mentions "FAIL" end up in the error file.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), BatchHandler)
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict[str, Any]] = {}
+        self.polls: dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def complete(self, batch: dict[str, Any]) -> None:
+        outputs, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            request = json.loads(line)
+            prompt = request["body"]["messages"][-1]["content"]
+            if "FAIL" in prompt:
+                errors.append(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 400,
+                            "body": {"error": {"message": "context too long"}},
+                        },
+                    }
+                )
+                continue
+            body = {
+                "choices": [{"message": {"content": f"answer to {request['custom_id']}"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+            }
+            outputs.append(
+                {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}}
+            )
+        for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+            if records:
+                file_id = f"file-{len(self.files)}"
+                self.files[file_id] = "".join(json.dumps(r) + "\n" for r in records).encode()
+                batch[key] = file_id
+        batch["status"] = "completed"
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    server: BatchServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, payload: dict[str, Any] | bytes) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        if self.headers.get("Authorization") != "Bearer test-key":
+            self._send(401, {"error": {"message": "bad key"}})
+            return
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            parts = {
+                p.get_param("name", header="content-disposition"): p for p in message.iter_parts()
+            }
+            assert parts["purpose"].get_content().strip() == "batch"
+            file_id = f"file-{len(self.server.files)}"
+            self.server.files[file_id] = parts["file"].get_payload(decode=True)
+            self._send(200, {"id": file_id})
+        elif self.path == "/v1/batches":
+            request = json.loads(body)
+            assert request["endpoint"] == CHAT_ENDPOINT
+            batch_id = f"batch-{len(self.server.batches)}"
+            self.server.batches[batch_id] = {
+                "id": batch_id,
+                "status": "validating",
+                "input_file_id": request["input_file_id"],
+            }
+            self._send(200, self.server.batches[batch_id])
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts[1] == "batches" and parts[2] in self.server.batches:
+            batch = self.server.batches[parts[2]]
+            self.server.polls[parts[2]] = self.server.polls.get(parts[2], 0) + 1
+            if self.server.polls[parts[2]] == 1:
+                batch["status"] = "in_progress"
+            elif batch["status"] != "completed":
+                self.server.complete(batch)
+            self._send(200, batch)
+        elif parts[1] == "files" and parts[2] in self.server.files:
+            self._send(200, self.server.files[parts[2]])
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+
+@pytest.fixture()
+def server() -> Iterator[BatchServer]:
+    srv = BatchServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_run_batches_round_trips_through_the_batch_api(server, tmp_path) -> None:  # type: ignore[no-untyped-def]
+    transport = HttpBatchTransport("test-key", server.base_url)
+    prompts = [PromptRequest(f"r{i}", "system", f"question {i}") for i in range(5)]
+    prompts.append(PromptRequest("r5", "system", "FAIL this one"))
+
+    run = run_batches(prompts, tmp_path, transport=transport, poll_s=0.0, max_requests=4)
+
+    assert run.batch_ids == ["batch-0", "batch-1"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["batch-0000.jsonl", "batch-0001.jsonl"]
+    first = json.loads((tmp_path / "batch-0000.jsonl").read_text().splitlines()[0])
+    assert first["custom_id"] == "r0" and first["url"] == CHAT_ENDPOINT
+    assert [m["role"] for m in first["body"]["messages"]] == ["system", "user"]
+    assert all(server.polls[b] == 2 for b in run.batch_ids)
+    assert run.outputs["r3"].answer == "answer to r3"
+    assert run.outputs["r3"].usage == {
+        "prompt_tokens": 10,
+        "completion_tokens": 3,
+        "total_tokens": 13,
+    }
+    assert run.outputs["r5"].answer is None
+    assert "context too long" in (run.outputs["r5"].error or "")
+
+    with pytest.raises(LLMError, match="401"):
+        HttpBatchTransport("wrong-key", server.base_url).submit(
+            tmp_path / "batch-0000.jsonl", CHAT_ENDPOINT
+        )
+
+
+def test_failed_batches_and_timeouts_surface_as_errors(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    class Transport:
+        def __init__(self, status: str) -> None:
+            self.status = status
+
+        def submit(self, input_path: Any, endpoint: str) -> str:
+            return "batch-x"
+
+        def retrieve(self, batch_id: str) -> dict[str, Any]:
+            return {"id": batch_id, "status": self.status}
+
+        def download(self, file_id: str) -> bytes:
+            raise AssertionError("nothing to download")
+
+    run = run_batches([PromptRequest("a", "s", "u")], tmp_path, transport=Transport("expired"))
+    assert run.outputs["a"].error == "No result in the output of batch batch-x (expired)"
+
+    sleeps: list[float] = []
+    with pytest.raises(LLMError, match="still in_progress"):
+        wait_for_batch(
+            Transport("in_progress"), "batch-x", poll_s=5.0, timeout_s=0.0, sleep=sleeps.append
+        )
+    assert sleeps == []
+
+    outputs = list(parse_output(b'{"custom_id": "b", "response": {"body": {"choices": []}}}\n'))
+    assert outputs[0].error == "Response without a message"
+
+
+def test_answer_offline_joins_batch_answers_into_results(server, tmp_path, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.service as svc
+
+    class Embedder:
+        model_name = "offline"
+
+        def __init__(self) -> None:
+            self.calls: list[int] = []
+
+        def embed(self, texts: list[str]) -> np.ndarray:
+            self.calls.append(len(texts))
+            return np.array([[1.0, float(len(t) % 7), 0.5] for t in texts], dtype=np.float32)
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            raise AssertionError("offline answers must not call the synchronous API")
+
+    embedder = Embedder()
+    client = QdrantClient(location=":memory:")
+    chunks = [TextChunk(f"chunk {i}", f"doc{i}.md", 0) for i in range(12)]
+    name, _ = ingest_chunks(client, embedder, chunks, "offline", dedup_threshold=None)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+    monkeypatch.setenv("QDRANT_COLLECTION", name)
+    monkeypatch.setenv("MMR_ENABLED", "false")
+    get_settings.cache_clear()
+    clear_retrieval_caches()
+    embedder.calls.clear()
+    try:
+        # The stand-in rejects prompts mentioning FAIL, and the user prompt includes the query
+        queries = ["chunk 3", "chunk 10", "  ", "FAIL chunk 3"]
+        answers = answer_offline(
+            queries,
+            tmp_path,
+            top_k=3,
+            transport=HttpBatchTransport("test-key", server.base_url),
+            embed_batch_size=2,
+            poll_s=0.0,
+        )
+        # Bulk retrieval leaves the caches of live traffic alone
+        assert get_result_cache().stats()["entries"] == 0
+        assert get_embedding_cache().stats()["entries"] == 0
+    finally:
+        get_settings.cache_clear()
+        clear_retrieval_caches()
+
+    # Three distinct queries embedded in two calls; the blank one retrieves nothing
+    assert embedder.calls == [2, 1]
+    assert answers.batch_ids == ["batch-0"]
+    assert set(answers.timings) == {"retrieve", "prepare", "generate"}
+    first, second, blank, failed = answers.results
+    assert first is not None and second is not None
+    assert first.answer == "answer to q0" and second.answer == "answer to q1"
+    assert 0 < len(first.citations) <= 3
+    assert first.tokens == {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13}
+    assert blank is not None and blank.answer == "" and blank.citations == []
+    assert failed is None and "context too long" in answers.errors[3]
+    assert list(answers.errors) == [3]
+    # Only the three prompts with context went into the batch file
+    assert len((tmp_path / "batch-0000.jsonl").read_text().splitlines()) == 3
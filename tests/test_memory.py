@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import tracemalloc
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.retrieval.models as model_registry
+from app.config.settings import get_settings
+from app.main import app
+from app.utils.memory import memory_probe
+
+
+@pytest.fixture
+def tracing():  # type: ignore[no-untyped-def]
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_probe_records_rss_delta_and_allocation_peak(tracing) -> None:  # type: ignore[no-untyped-def]
+    memory: dict[str, float] = {}
+    with memory_probe(memory, "embed"):
+        block = np.ones(4 * 1024 * 1024, dtype=np.float32)  # 16 MB, released below
+        del block
+    assert "embed_rss_delta" in memory
+    assert memory["embed_alloc_peak"] >= 15.0
+
+
+def test_memory_probe_is_a_no_op_without_a_target() -> None:
+    with memory_probe(None, "embed"):
+        pass
+
+
+def _patch_pipeline(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.service as svc
+
+    def fake_retrieve_top_chunks(query: str, top_k: int = 5):  # type: ignore[no-untyped-def]
+        return [{"text": "answer chunk", "source_id": "s.txt", "chunk_index": 0, "score": 0.9}]
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            return "answer chunk"
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", fake_retrieve_top_chunks)
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+
+
+def test_query_reports_stage_memory_only_when_enabled(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    _patch_pipeline(monkeypatch)
+    client = TestClient(app)
+
+    get_settings.cache_clear()
+    assert client.post("/v1/query", json={"query": "q"}).json()["memory_mb"] is None
+
+    monkeypatch.setenv("MEMORY_PROFILING", "true")
+    get_settings.cache_clear()
+    try:
+        memory = client.post("/v1/query", json={"query": "q"}).json()["memory_mb"]
+    finally:
+        get_settings.cache_clear()
+    assert {"retrieve_rss_delta", "generate_rss_delta", "rss_mb", "peak_rss_mb"} <= set(memory)
+    assert memory["peak_rss_mb"] >= memory["rss_mb"] > 0
+
+
+def test_debug_memory_lists_resident_models_with_parameter_bytes() -> None:
+    import torch
+
+    class TinyEmbedder:
+        model_name = "tiny"
+
+        def __init__(self) -> None:
+            self.model = torch.nn.Linear(4, 2)  # 8 weights + 2 biases
+
+    model_registry.reset_models()
+    model_registry._get_or_load("embeddings", TinyEmbedder)
+    try:
+        data = TestClient(app).get("/debug/memory").json()
+    finally:
+        model_registry.reset_models()
+    assert data["models"]["embeddings"] == {
+        "model_name": "tiny",
+        "parameters": 10,
+        "parameter_bytes": 40,
+        "dtypes": ["float32"],
+    }
+    assert data["process"]["rss_mb"] > 0
+    assert "embeddings" in data["caches"]
+    assert data["tracemalloc"] == {"tracing": False}
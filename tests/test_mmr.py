@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import numpy as np
+from fastapi.testclient import TestClient
+from qdrant_client import QdrantClient
+
+from app.main import app
+from app.retrieval.chunking import TextChunk
+from app.retrieval.diversity import mmr_select, relevance_scores
+from app.retrieval.ingest_cli import ingest_chunks
+
+# Two near-identical passages (0, 1) and a distinct one (2)
+VECTORS = np.array([[1.0, 0.0, 0.0], [0.99, 0.14, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+RELEVANCE = np.array([0.9, 0.88, 0.7], dtype=np.float32)
+
+
+def test_mmr_prefers_a_distinct_passage_over_a_near_duplicate() -> None:
+    assert mmr_select(VECTORS, RELEVANCE, 2, lambda_=0.5).indices == [0, 2]
+    # Pure relevance keeps the dense order
+    assert mmr_select(VECTORS, RELEVANCE, 2, lambda_=1.0).indices == [0, 1]
+
+
+def test_near_duplicates_are_dropped_even_if_fewer_than_k_remain() -> None:
+    selection = mmr_select(VECTORS, RELEVANCE, 3, lambda_=1.0, duplicate_threshold=0.95)
+    assert selection.indices == [0, 2]
+    assert selection.duplicates == 1
+
+
+def test_relevance_follows_the_rerank_order() -> None:
+    chunks = [{"score": 0.5, "rerank_score": 0.9}, {"score": 0.4, "rerank_score": 0.1}]
+    np.testing.assert_allclose(relevance_scores(chunks), [0.9, 0.1])
+    np.testing.assert_allclose(relevance_scores([{"score": 0.5}, {"score": 0.4}]), [0.5, 0.4])
+
+
+def test_partially_reranked_pool_keeps_the_cross_encoder_order() -> None:
+    # Adaptive reranking scored only the head; the tail keeps its dense score below it
+    chunks = [
+        {"score": 0.80, "rerank_score": 0.10},
+        {"score": 0.79, "rerank_score": 0.95},
+        {"score": 0.78},
+    ]
+    relevance = relevance_scores(chunks)
+    np.testing.assert_allclose(relevance, [0.79, 0.80, 0.78])
+    vectors = np.eye(3, dtype=np.float32)
+    assert mmr_select(vectors, relevance, 1).indices == [1]
+
+
+def test_search_returns_stored_vectors_on_request(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    class Embedder:
+        def embed(self, texts: list[str]) -> np.ndarray:
+            return np.array([[1.0, float(len(t) % 3), 0.5] for t in texts], dtype=np.float32)
+
+    client = QdrantClient(location=":memory:")
+    chunks = [TextChunk(f"chunk {'x' * i}", f"doc{i}.md", 0) for i in range(3)]
+    name, _ = ingest_chunks(client, Embedder(), chunks, "mmr", dedup_threshold=None)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: Embedder())
+
+    plain = svc.retrieve_top_chunks("chunk", top_k=3, collection=name)
+    assert all("vector" not in c for c in plain)
+    with_vectors = svc.retrieve_top_chunks("chunk", top_k=3, collection=name, with_vectors=True)
+    for c in with_vectors:
+        assert c["vector"].dtype == np.float32 and c["vector"].shape == (3,)
+
+
+def test_query_api_applies_mmr_per_request(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.service as svc
+
+    requested: list[bool] = []
+
+    def fake_retrieve_top_chunks(query: str, top_k: int = 5, with_vectors: bool = False):  # type: ignore[no-untyped-def]
+        requested.append(with_vectors)
+        return [
+            {
+                "text": f"passage {i}",
+                "source_id": f"s{i}.txt",
+                "chunk_index": 0,
+                "score": float(RELEVANCE[i]),
+                "vector": VECTORS[i],
+            }
+            for i in range(3)
+        ]
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            return "passage 0 passage 2"
+
+    monkeypatch.setattr(svc, "retrieve_top_chunks", fake_retrieve_top_chunks)
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+    client = TestClient(app)
+
+    plain = client.post("/v1/query", json={"query": "q", "top_k": 3}).json()
+    assert [c["source_id"] for c in plain["citations"]] == ["s0.txt", "s1.txt", "s2.txt"]
+    assert "mmr" not in plain["timings_ms"]
+    # The self-check retry may retrieve again; every retrieval follows the request's setting
+    assert requested and not any(requested)
+
+    requested.clear()
+    diverse = client.post("/v1/query", json={"query": "q", "top_k": 3, "mmr": True}).json()
+    assert [c["source_id"] for c in diverse["citations"]] == ["s0.txt", "s2.txt"]
+    assert diverse["timings_ms"]["mmr_duplicates"] == 1.0
+    assert diverse["timings_ms"]["mmr"] >= 0.0
+    assert requested and all(requested)
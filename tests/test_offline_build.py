@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.retrieval.chunking import TextChunk
+from app.retrieval.offline import build_artifact, export_collection, read_manifest, restore_artifact
+from app.retrieval.qdrant_store import collection_data_version, collection_vector_sizes, search
+
+
+class FakeEmbedder:
+    model_name = "fake"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows = [np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(16) for t in texts]
+        vectors = np.stack(rows).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _points(client: QdrantClient, collection: str) -> dict[str, tuple[dict, dict]]:
+    records, _ = client.scroll(collection, limit=1000, with_payload=True, with_vectors=True)
+    return {str(r.id): (r.payload, r.vector) for r in records}
+
+
+def test_offline_build_restores_identical_collection(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    chunks = [TextChunk(f"chunk number {i}", f"docs/d{i % 3}.md", i) for i in range(25)]
+    artifact = tmp_path / "index.tar.gz"
+    manifest = build_artifact(FakeEmbedder(), chunks, artifact, "kb", tags=["guide"], lowdim_size=4)
+    assert manifest["points"] == 25
+    assert manifest["vectors"] == {"content": 16, "content_lowdim": 4}
+    assert manifest["embedding_model"] == "fake"
+    assert read_manifest(artifact)["shards"] == manifest["shards"]
+
+    target = QdrantClient(location=":memory:")
+    report = restore_artifact(target, artifact, "kb_restored")
+    assert report["points"] == 25
+    assert collection_vector_sizes(target, "kb_restored") == {"content": 16, "content_lowdim": 4}
+    assert collection_data_version(target, "kb_restored") == 1
+
+    restored = _points(target, "kb_restored")
+    assert len(restored) == 25
+    payload, vectors = next(iter(restored.values()))
+    assert payload["tags"] == ["guide"] and payload["text"].startswith("chunk number")
+    assert len(vectors["content_lowdim"]) == 4
+
+    query = FakeEmbedder().embed(["chunk number 7"])[0]
+    hits = search(target, "kb_restored", query, top_k=1, vector_name="content")
+    assert hits[0].payload["text"] == "chunk number 7"
+
+
+def test_restore_refuses_to_overwrite_without_replace(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    artifact = tmp_path / "index.tar"
+    build_artifact(FakeEmbedder(), [TextChunk("a", "a.md", 0)], artifact, "kb")
+    target = QdrantClient(location=":memory:")
+    restore_artifact(target, artifact, "kb")
+    with pytest.raises(ValueError):
+        restore_artifact(target, artifact, "kb")
+    restore_artifact(target, artifact, "kb", replace=True)
+    assert target.count("kb").count == 1
+
+
+def test_export_round_trips_unnamed_vector_collections(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    source = QdrantClient(location=":memory:")
+    source.create_collection(
+        "plain", vectors_config=qmodels.VectorParams(size=3, distance=qmodels.Distance.COSINE)
+    )
+    source.upsert(
+        "plain",
+        points=[
+            qmodels.PointStruct(id=i, vector=[1.0, float(i), 0.5], payload={"n": i})
+            for i in range(1, 6)
+        ],
+    )
+    artifact = tmp_path / "plain.tar"
+    manifest = export_collection(source, "plain", artifact, shard_size=2)
+    assert manifest["vectors"] == {"": 3}
+    assert [s["points"] for s in manifest["shards"]] == [2, 2, 1]
+
+    target = QdrantClient(location=":memory:")
+    restore_artifact(target, artifact, "plain")
+    restored, original = _points(target, "plain"), _points(source, "plain")
+    assert restored.keys() == original.keys() == {str(i) for i in range(1, 6)}
+    for point_id, (payload, vector) in original.items():
+        assert restored[point_id][0] == payload
+        np.testing.assert_allclose(restored[point_id][1], vector, rtol=1e-6)
+
+
+def test_read_manifest_rejects_other_archives(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    import tarfile
+
+    path = tmp_path / "other.tar"
+    with tarfile.open(path, "w"):
+        pass
+    with pytest.raises(ValueError, match="has no manifest.json"):
+        read_manifest(path)
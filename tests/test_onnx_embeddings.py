@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from app.config.settings import get_settings  # noqa: E402
+from app.retrieval.onnx_embeddings import (  # noqa: E402
+    INT8_FILE,
+    OnnxEmbeddingsClient,
+    export_model,
+    parity,
+)
+
+WORDS = "retrieval augmented generation combines search with text models rerank answers".split()
+TEXTS = [
+    "retrieval augmented generation",
+    "rerank answers with text models",
+    "search",
+    "generation combines retrieval with search and rerank " * 3,
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory) -> str:  # type: ignore[no-untyped-def]
+    """A small random BERT saved as a sentence-transformers model (CLS pooling + normalize,
+    like bge), so no model download is needed."""
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    root = tmp_path_factory.mktemp("tiny")
+    vocab = root / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]))
+    tokenizer = BertTokenizerFast(vocab_file=str(vocab))
+    config = BertConfig(
+        vocab_size=tokenizer.vocab_size,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+    )
+    bert_dir = root / "bert"
+    BertModel(config).save_pretrained(bert_dir)
+    tokenizer.save_pretrained(bert_dir)
+    transformer = models.Transformer(str(bert_dir), max_seq_length=32)
+    pooling = models.Pooling(32, pooling_mode="cls")
+    model_dir = root / "st"
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()]).save(str(model_dir))
+    return str(model_dir)
+
+
+def test_fp32_export_matches_torch_outputs(tiny_model: str, tmp_path: Path) -> None:
+    from app.retrieval.embeddings import EmbeddingsClient
+
+    reference = EmbeddingsClient(model_name=tiny_model)
+    client = OnnxEmbeddingsClient(tiny_model, quantize=False, model_dir=str(tmp_path))
+    vectors = client.embed(TEXTS)
+    assert vectors.shape == (len(TEXTS), 32) and vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+    report = parity(reference, client, TEXTS[:2], TEXTS[2:], k=2)
+    assert report["cosine_min"] > 0.9999
+    assert report["recall_at_2"] == 1.0
+
+
+def test_int8_model_is_smaller_and_close_to_fp32(tiny_model: str, tmp_path: Path) -> None:
+    directory = export_model(tiny_model, tmp_path, quantize=True)
+    assert (directory / INT8_FILE).stat().st_size < (directory / "model.onnx").stat().st_size
+
+    fp32 = OnnxEmbeddingsClient(tiny_model, quantize=False, model_dir=str(tmp_path))
+    int8 = OnnxEmbeddingsClient(tiny_model, quantize=True, model_dir=str(tmp_path))
+    assert int8.model_name.endswith("@onnx-int8") and int8.footprint()["dtypes"] == ["int8"]
+    assert parity(fp32, int8, TEXTS, TEXTS)["cosine_mean"] > 0.95
+
+
+def test_registry_loads_the_configured_backend_from_an_existing_export(
+    tiny_model: str, tmp_path: Path, monkeypatch
+) -> None:  # type: ignore[no-untyped-def]
+    import shutil
+
+    import app.retrieval.models as registry
+    from app.retrieval.embeddings import DEFAULT_MODEL
+    from app.retrieval.onnx_embeddings import model_directory
+
+    # Stand the tiny export in for the default model; loading must not re-export it
+    shutil.copytree(
+        export_model(tiny_model, tmp_path / "src"), model_directory(DEFAULT_MODEL, tmp_path)
+    )
+    monkeypatch.setenv("EMBEDDINGS_BACKEND", "onnx")
+    monkeypatch.setenv("ONNX_MODEL_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    registry.reset_models()
+    try:
+        # Reported for results provenance without loading the model
+        assert registry.embedder_name() == f"{DEFAULT_MODEL}@onnx-int8"
+        embedder = registry.get_embedder()
+        assert isinstance(embedder, OnnxEmbeddingsClient)
+        assert registry.embedder_name() == embedder.model_name
+        assert embedder.embed(["search"]).shape == (1, 32)
+        assert registry.model_footprint()["embeddings"]["dtypes"] == ["int8"]
+    finally:
+        registry.reset_models()
+        get_settings.cache_clear()
+
+
+def test_sessions_from_before_a_fork_are_reused_only_when_single_threaded(
+    tiny_model: str, tmp_path: Path, monkeypatch
+) -> None:  # type: ignore[no-untyped-def]
+    import os
+
+    import app.retrieval.onnx_embeddings as onnx_embeddings
+
+    pid = os.getpid()
+
+    client = OnnxEmbeddingsClient(
+        tiny_model, quantize=False, model_dir=str(tmp_path), intra_op_threads=4
+    )
+    parent = client._get_session()
+    assert client._get_session() is parent
+
+    # A forked worker: the parent's 4-thread pool does not exist there
+    monkeypatch.setattr(onnx_embeddings.os, "getpid", lambda: pid + 1)
+    child = client._get_session()
+    assert child is not parent
+    assert client._get_session() is child
+
+    client.intra_op_threads = 1
+    monkeypatch.setattr(onnx_embeddings.os, "getpid", lambda: pid + 2)
+    single = client._get_session()
+    monkeypatch.setattr(onnx_embeddings.os, "getpid", lambda: pid + 3)
+    assert client._get_session() is single
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app.retrieval.models as registry
+from app.main import app
+
+
+def test_importing_app_does_not_load_model_libraries() -> None:
+    code = (
+        "import sys, app.main; "
+        "print(any(m in sys.modules for m in ('torch', 'sentence_transformers', 'qdrant_client')))"
+    )
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parents[1] / "src"))
+    out = subprocess.check_output([sys.executable, "-c", code], env=env, text=True)
+    assert out.strip() == "False"
+
+
+def test_ready_reports_loading_then_warm(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    release = threading.Event()
+    embedded: list[list[str]] = []
+
+    class SlowEmbeddings:
+        model_name = "fake-bge"
+
+        def __init__(self) -> None:
+            release.wait(5)
+
+        def embed(self, texts, *, normalize=True):  # type: ignore[no-untyped-def]
+            embedded.append(texts)
+            return np.zeros((len(texts), 4), dtype=np.float32)
+
+    registry.reset_models()
+    monkeypatch.setattr(registry.embeddings_module, "EmbeddingsClient", SlowEmbeddings)
+    client = TestClient(app)
+    try:
+        thread = registry.start_background_preload()
+        resp = client.get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["state"] == "loading"
+        assert client.get("/health").json()["model"]["loaded"] is False
+
+        release.set()
+        thread.join(5)
+        resp = client.get("/ready")
+        assert resp.status_code == 200 and resp.json()["ready"] is True
+        model = client.get("/health").json()["model"]
+        assert model["loaded"] is True
+        assert model["models"]["embeddings"]["model_name"] == "fake-bge"
+        assert model["models"]["embeddings"]["load_ms"] > 0
+        assert model["models"]["embeddings"]["warmup_ms"] is not None
+        # Warm-up ran one inference; later lookups reuse the same instance
+        assert embedded == [["warm up"]]
+        assert registry.get_embedder() is registry.get_embedder()
+    finally:
+        registry.reset_models()
+
+
+def test_ready_reports_failed_preload(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    def broken() -> None:
+        raise OSError("model download blocked")
+
+    registry.reset_models()
+    monkeypatch.setattr(registry.embeddings_module, "EmbeddingsClient", broken)
+    try:
+        registry.preload_models()
+        resp = TestClient(app).get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["state"] == "failed"
+        assert "blocked" in resp.json()["error"]
+    finally:
+        registry.reset_models()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.eval.results_store import (  # noqa: E402
+    diff_runs,
+    list_runs,
+    load_results,
+    question_id,
+    run_summaries,
+    summarize_diff,
+    write_run,
+)
+
+MODELS = {"judge": "judge-m", "generator": "gen-m", "embedding": "emb-m"}
+
+
+def _rows(scores: dict[str, float]) -> list[dict]:
+    return [
+        {"sample_id": sid, "question": f"question {sid}", "scores": {"faithfulness": s}}
+        for sid, s in scores.items()
+    ]
+
+
+def test_write_run_is_append_only_and_records_config_and_models(tmp_path: Path) -> None:
+    run = write_run(_rows({"a": 0.9}), root=tmp_path, config={"top_k": 5}, models=MODELS)
+    assert list_runs(tmp_path) == [run]
+    with pytest.raises(FileExistsError):
+        write_run(_rows({"a": 0.1}), root=tmp_path, run_id=run)
+
+    row = load_results(tmp_path).to_pylist()[0]
+    assert row["run_id"] == run and row["metric"] == "faithfulness" and row["score"] == 0.9
+    assert row["judge_model"] == "judge-m" and row["embedding_model"] == "emb-m"
+    assert row["config"] == '{"top_k": 5}' and len(row["config_hash"]) == 12
+
+
+def test_load_results_prunes_columns_and_filters_runs_and_metrics(tmp_path: Path) -> None:
+    rows = [{"sample_id": "a", "scores": {"faithfulness": 0.5, "answer_relevancy": 0.7}}]
+    first = write_run(rows, root=tmp_path, run_id="r1")
+    write_run(rows, root=tmp_path, run_id="r2")
+
+    table = load_results(tmp_path, runs=[first], metrics=["answer_relevancy"], columns=["score"])
+    assert table.column_names == ["score"]
+    assert table.to_pylist() == [{"score": 0.7}]
+    assert load_results(tmp_path, runs=["missing"], columns=["run_id"]).num_rows == 0
+    summaries = run_summaries(tmp_path).to_pylist()
+    assert [(r["run_id"], r["metric"], r["score_count"]) for r in summaries] == [
+        ("r1", "answer_relevancy", 1),
+        ("r1", "faithfulness", 1),
+        ("r2", "answer_relevancy", 1),
+        ("r2", "faithfulness", 1),
+    ]
+
+
+def test_diff_flags_per_question_regressions_worst_first(tmp_path: Path) -> None:
+    write_run(_rows({"a": 0.9, "b": 0.5, "c": 0.8, "only_base": 1.0}), root=tmp_path, run_id="b")
+    write_run(_rows({"a": 0.2, "b": 0.52, "c": 0.6, "only_new": 1.0}), root=tmp_path, run_id="c")
+
+    diff = diff_runs("b", "c", root=tmp_path, threshold=0.05)
+    rows = diff.to_pylist()
+    assert [r["sample_id"] for r in rows] == ["a", "c", "b"]
+    assert [r["regression"] for r in rows] == [True, True, False]
+    assert rows[0]["question"] == "question a"
+    assert rows[0]["delta"] == pytest.approx(-0.7)
+
+    summary = summarize_diff(diff)["faithfulness"]
+    assert summary["compared"] == 3 and summary["regressions"] == 2
+    assert summary["improvements"] == 1
+    assert summary["delta_mean"] == pytest.approx((-0.7 - 0.2 + 0.02) / 3)
+
+
+def test_question_id_ignores_the_answer() -> None:
+    assert question_id({"question": "q", "answer": "x"}) == question_id({"question": "q"})
+    assert question_id({"id": "42", "question": "q"}) == "42"
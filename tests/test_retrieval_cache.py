@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.retrieval.cache import (
+    EmbeddingCache,
+    SearchResultCache,
+    clear_retrieval_caches,
+    normalize_query,
+    record_cache_events,
+)
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.qdrant_store import collection_data_version
+
+
+def test_normalize_query_collapses_whitespace_and_unicode_forms() -> None:
+    assert normalize_query("  What   is\tRAG?\n") == "What is RAG?"
+    assert normalize_query("ﬁle　search") == "file search"
+
+
+def test_embedding_cache_evicts_least_recently_used_rows() -> None:
+    cache = EmbeddingCache(capacity=2)
+    cache.put("m", "a", np.array([1.0, 0.0]))
+    cache.put("m", "b", np.array([0.0, 1.0]))
+    assert cache.get("m", "a") is not None  # "a" is now most recent
+    cache.put("m", "c", np.array([1.0, 1.0]))
+    assert cache.get("m", "b") is None
+    np.testing.assert_array_equal(cache.get("m", "c"), [1.0, 1.0])
+    assert cache.get("other-model", "a") is None
+    # Returned rows are copies; the cached vector cannot be modified through them
+    row = cache.get("m", "a")
+    row[:] = 9.0
+    np.testing.assert_array_equal(cache.get("m", "a"), [1.0, 0.0])
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 2 * 2 * 4
+
+
+def test_result_cache_checks_version_and_ttl(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.retrieval.cache as cache_module
+
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = SearchResultCache(capacity=4, ttl_s=10.0)
+    cache.put("k", (1, 0), [{"text": "t", "score": 0.5}])
+    hit = cache.get("k", (1, 0))
+    assert hit == [{"text": "t", "score": 0.5}]
+    hit[0]["text"] = "mutated"
+    assert cache.get("k", (1, 0))[0]["text"] == "t"
+    assert cache.get("k", (2, 0)) is None  # data version changed
+    cache.put("k", (1, 0), [{"text": "t"}])
+    now[0] += 11.0
+    assert cache.get("k", (1, 0)) is None  # expired
+
+
+class CountingEmbedder:
+    model_name = "counting"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        self.calls += len(texts)
+        rows = [np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(8) for t in texts]
+        vectors = np.stack(rows).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture()
+def cached_service(monkeypatch):  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    client = QdrantClient(location=":memory:")
+    embedder = CountingEmbedder()
+    chunks = [TextChunk(f"chunk {i}", f"doc{i}.md", 0) for i in range(10)]
+    name, _ = ingest_chunks(client, embedder, chunks, "cached", dedup_threshold=None)
+    searches: list[str] = []
+    real_search = svc.qdrant_search
+
+    def spy(*args, **kwargs):  # type: ignore[no-untyped-def]
+        searches.append(args[1])
+        return real_search(*args, **kwargs)
+
+    monkeypatch.setattr(svc, "qdrant_search", spy)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: embedder)
+    clear_retrieval_caches()
+    embedder.calls = 0
+    yield svc, client, embedder, name, searches
+    clear_retrieval_caches()
+
+
+def test_repeated_query_skips_encoder_and_search(cached_service) -> None:  # type: ignore[no-untyped-def]
+    svc, _, embedder, name, searches = cached_service
+    with record_cache_events() as first:
+        a = svc.retrieve_top_chunks("what is  chunk 3?", top_k=3, collection=name)
+    with record_cache_events() as second:
+        b = svc.retrieve_top_chunks(" what is chunk 3? ", top_k=3, collection=name)
+    assert first == {"embedding_cache_hit": 0.0, "search_cache_hit": 0.0}
+    assert second == {"embedding_cache_hit": 1.0, "search_cache_hit": 1.0}
+    assert a == b
+    assert embedder.calls == 1
+    assert len(searches) == 1
+    # A different top_k reuses the embedding but not the results
+    with record_cache_events() as third:
+        svc.retrieve_top_chunks("what is chunk 3?", top_k=5, collection=name)
+    assert third == {"embedding_cache_hit": 1.0, "search_cache_hit": 0.0}
+    assert len(searches) == 2
+
+
+def test_ingestion_bumps_data_version_and_invalidates_results(cached_service) -> None:  # type: ignore[no-untyped-def]
+    svc, client, embedder, name, searches = cached_service
+    assert collection_data_version(client, name) == 1
+    svc.retrieve_top_chunks("chunk 1", top_k=3, collection=name)
+    ingest_chunks(
+        client, embedder, [TextChunk("chunk 1 again", "new.md", 0)], name, dedup_threshold=None
+    )
+    assert collection_data_version(client, name) == 2
+    with record_cache_events() as events:
+        results = svc.retrieve_top_chunks("chunk 1", top_k=3, collection=name)
+    assert events == {"embedding_cache_hit": 1.0, "search_cache_hit": 0.0}
+    assert len(results) == 3
+    assert len(searches) == 2
+
+
+def test_cache_can_be_disabled(cached_service, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    from app.config.settings import get_settings
+
+    svc, _, embedder, name, searches = cached_service
+    monkeypatch.setenv("RETRIEVAL_CACHE_ENABLED", "false")
+    get_settings.cache_clear()
+    try:
+        with record_cache_events() as events:
+            svc.retrieve_top_chunks("chunk 2", top_k=3, collection=name)
+            svc.retrieve_top_chunks("chunk 2", top_k=3, collection=name)
+        assert events == {}
+        assert embedder.calls == 2
+        assert len(searches) == 2
+    finally:
+        get_settings.cache_clear()
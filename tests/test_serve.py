@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from app.serve import worker_layouts
+
+SRC_DIR = str(Path(__file__).resolve().parents[1] / "src")
+
+
+def test_worker_layouts_split_cores_between_workers() -> None:
+    layouts = worker_layouts(list(range(8)), 4)
+    assert [w.threads for w in layouts] == [2, 2, 2, 2]
+    assert all(w.cpus is None for w in layouts)
+
+    pinned = worker_layouts(list(range(8)), 4, pin=True)
+    assert [sorted(w.cpus or ()) for w in pinned] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_worker_layouts_with_more_workers_than_cores() -> None:
+    layouts = worker_layouts([0, 1], 3, pin=True)
+    assert [w.threads for w in layouts] == [1, 1, 1]
+    assert [sorted(w.cpus or ()) for w in layouts] == [[0], [1], [0]]
+    assert worker_layouts([0, 1, 2, 3], 2, threads=1)[0].threads == 1
+
+
+def _children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+        return [int(p) for p in f.read().split()]
+
+
+@pytest.mark.skipif(not Path("/proc/self/task").exists(), reason="needs Linux /proc")
+def test_prefork_workers_share_one_socket_and_stop_on_sigterm() -> None:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {**os.environ, "PYTHONPATH": SRC_DIR, "PRELOAD_MODELS": "false"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", "2"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                time.sleep(0.1)
+        else:
+            pytest.fail("server did not start")
+        assert len(_children(proc.pid)) == 2
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
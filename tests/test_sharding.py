@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import io
+import json
+import threading
+import zlib
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config.settings import get_settings
+from app.exceptions import VectorDBError
+from app.logging.json_logger import configure_json_logging
+from app.retrieval.cache import clear_retrieval_caches, record_cache_events
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.sharding import (
+    SHARD_MAX_INFLIGHT,
+    Shard,
+    configured_shards,
+    ingest_sharded,
+    partition_chunks,
+    record_shard_stats,
+    scatter_gather,
+)
+
+SHARDS = [Shard(i, f"docs_shard{i}") for i in range(3)]
+
+
+class Embedder:
+    model_name = "sharding-test"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows = [np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16) for t in texts]
+        vectors = np.stack(rows).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _chunks(n: int) -> list[TextChunk]:
+    return [TextChunk(f"passage {i} of doc {i % 20}", f"doc{i % 20}.md", i // 20) for i in range(n)]
+
+
+def test_partitioning_keeps_a_document_in_one_shard() -> None:
+    parts = partition_chunks(_chunks(70), 3)
+    assert sum(len(p) for p in parts) == 70
+    owners = {c.source_id: i for i, part in enumerate(parts) for c in part}
+    for i, part in enumerate(parts):
+        assert all(owners[c.source_id] == i for c in part)
+    assert partition_chunks(_chunks(70), 3) == parts
+
+
+def test_shards_come_from_settings(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("QDRANT_COLLECTION", "docs")
+    monkeypatch.setenv("QDRANT_SHARDS", "2")
+    monkeypatch.setenv("QDRANT_SHARD_URLS", "http://a:6333, http://b:6333")
+    get_settings.cache_clear()
+    try:
+        assert configured_shards() == [
+            Shard(0, "docs_shard0", "http://a:6333"),
+            Shard(1, "docs_shard1", "http://b:6333"),
+        ]
+        monkeypatch.setenv("QDRANT_SHARD_URLS", "http://a:6333")
+        get_settings.cache_clear()
+        with pytest.raises(ValueError, match="1 endpoints for 2 shards"):
+            configured_shards()
+    finally:
+        get_settings.cache_clear()
+
+
+def test_scatter_gather_merges_and_drops_slow_or_failing_shards() -> None:
+    release = threading.Event()
+    scores = {0: [0.9, 0.5, 0.1], 1: [0.8, 0.7], 2: [0.95]}
+
+    def search(shard: Shard) -> list[dict[str, float]]:
+        if shard.index == 2:
+            release.wait(2)
+        return [{"score": s} for s in scores[shard.index]]
+
+    try:
+        with record_shard_stats() as stats:
+            merged = scatter_gather(SHARDS, search, 4, timeout_s=0.2)
+    finally:
+        release.set()
+    assert [(c["score"], c["shard"]) for c in merged] == [(0.9, 0), (0.8, 1), (0.7, 1), (0.5, 0)]
+    assert stats["shards_timed_out"] == 1.0 and stats["shards_failed"] == 0.0
+    assert {"shard0_ms", "shard1_ms", "shard2_ms"} <= stats.keys()
+    assert stats["shard2_ms"] >= 200.0
+
+    def failing(shard: Shard) -> list[dict[str, float]]:
+        if shard.index == 0:
+            raise ConnectionError("shard 0 down")
+        return [{"score": s} for s in scores[shard.index]]
+
+    stream = io.StringIO()
+    configure_json_logging("INFO", stream=stream)
+    try:
+        with record_shard_stats() as stats:
+            merged = scatter_gather(SHARDS, failing, 2, timeout_s=1.0)
+    finally:
+        configure_json_logging("INFO")
+    assert [c["score"] for c in merged] == [0.95, 0.8]
+    assert stats["shards_failed"] == 1.0
+    # The outage reaches the log
+    [warning] = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert warning["message"] == "Partial shard results"
+    assert warning["failed"] == [{"shard": 0, "error": "shard 0 down"}]
+
+    def down(shard: Shard) -> list[dict[str, float]]:
+        raise ConnectionError("cluster down")
+
+    with pytest.raises(VectorDBError, match="No shard answered"):
+        scatter_gather(SHARDS, down, 2, timeout_s=1.0)
+
+
+def test_a_stuck_shard_does_not_starve_the_others() -> None:
+    release = threading.Event()
+    stuck_calls = 0
+    lock = threading.Lock()
+    # Shards of their own, so the per-shard pools are not shared with other tests
+    shards = [Shard(i, f"starve_shard{i}") for i in range(3)]
+
+    def search(shard: Shard) -> list[dict[str, float]]:
+        nonlocal stuck_calls
+        if shard.index == 2:
+            with lock:
+                stuck_calls += 1
+            release.wait(10)
+        return [{"score": 1.0 - shard.index / 10}]
+
+    try:
+        # Many more requests than the stuck shard has threads
+        for _ in range(3 * SHARD_MAX_INFLIGHT):
+            with record_shard_stats() as stats:
+                merged = scatter_gather(shards, search, 2, timeout_s=0.05)
+            assert [c["shard"] for c in merged] == [0, 1]
+            assert stats["shards_timed_out"] == 1.0
+    finally:
+        release.set()
+    # Searches queued behind the stuck ones were cancelled instead of piling up
+    assert stuck_calls == SHARD_MAX_INFLIGHT
+
+
+@pytest.fixture()
+def sharded_service(monkeypatch):  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+    import app.retrieval.sharding as sharding
+
+    embedder = Embedder()
+    chunks = _chunks(60)
+    clients = {f"http://shard{i}": QdrantClient(location=":memory:") for i in range(3)}
+    monkeypatch.setenv("QDRANT_COLLECTION", "docs")
+    monkeypatch.setenv("QDRANT_SHARDS", "3")
+    monkeypatch.setenv("QDRANT_SHARD_URLS", ",".join(clients))
+    monkeypatch.setenv("SHARD_TIMEOUT_MS", "5000")
+    get_settings.cache_clear()
+    monkeypatch.setattr(sharding, "get_shard_client", lambda url: clients[url])
+    monkeypatch.setattr(svc, "get_shard_client", lambda url: clients[url])
+    monkeypatch.setattr(svc, "get_embedder", lambda: embedder)
+    written = ingest_sharded(embedder, chunks, configured_shards(), dedup_threshold=None)
+
+    # The same corpus in one collection, for comparison
+    reference = QdrantClient(location=":memory:")
+    name, _ = ingest_chunks(reference, embedder, chunks, "reference", dedup_threshold=None)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: reference)
+    clear_retrieval_caches()
+    yield svc, clients, written, name
+    clear_retrieval_caches()
+    get_settings.cache_clear()
+
+
+def test_sharded_search_matches_a_single_collection(sharded_service) -> None:  # type: ignore[no-untyped-def]
+    svc, clients, written, reference = sharded_service
+    assert sorted(c for c, _ in written) == ["docs_shard0", "docs_shard1", "docs_shard2"]
+    assert sum(points for _, points in written) == 60
+
+    def key(chunks):  # type: ignore[no-untyped-def]
+        return [(c["source_id"], c["chunk_index"], round(c["score"], 5)) for c in chunks]
+
+    for query in ("passage 3 of doc 3", "doc 5", "something else"):
+        with record_shard_stats() as stats:
+            sharded = svc.retrieve_top_chunks(query, top_k=8)
+        single = svc.retrieve_top_chunks(query, top_k=8, collection=reference)
+        assert key(sharded) == key(single)
+        assert all("shard" in c for c in sharded)
+        assert stats["shards_timed_out"] == 0.0
+    with record_cache_events() as events:
+        svc.retrieve_top_chunks("doc 5", top_k=8)
+    assert events == {"embedding_cache_hit": 1.0, "search_cache_hit": 1.0}
+
+
+def test_sharded_search_returns_partial_results_when_a_shard_is_slow(
+    sharded_service, monkeypatch
+) -> None:  # type: ignore[no-untyped-def]
+    svc, clients, _, _ = sharded_service
+    slow = clients["http://shard1"]
+    real_query = slow.query_points
+    release = threading.Event()
+
+    def stalled(*args, **kwargs):  # type: ignore[no-untyped-def]
+        release.wait(2)
+        return real_query(*args, **kwargs)
+
+    monkeypatch.setattr(slow, "query_points", stalled)
+    monkeypatch.setenv("SHARD_TIMEOUT_MS", "100")
+    get_settings.cache_clear()
+    try:
+        with record_shard_stats() as stats:
+            chunks = svc.retrieve_top_chunks("passage 3 of doc 3", top_k=8)
+    finally:
+        release.set()
+    assert chunks and all(c["shard"] != 1 for c in chunks)
+    assert stats["shards_timed_out"] == 1.0
+    assert stats["shard0_ms"] < stats["shard1_ms"]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config.settings import get_settings
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.text_store import INDEX_FILE, ChunkTextStore
+
+
+def test_append_get_and_reopen(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    store = ChunkTextStore(tmp_path)
+    a, b, c = (str(uuid.uuid4()) for _ in range(3))
+    assert store.append([(a, "first"), (b, "zweite Größe")]) == 2
+    assert store.get(a) == "first"
+    assert store.get(b) == "zweite Größe"
+    assert store.get(c) is None
+
+    # A second handle (e.g. another worker) sees appends made through the first
+    reader = ChunkTextStore(tmp_path)
+    store.append([(c, "")])
+    assert reader.get(c) == ""
+    view = reader.get_bytes(a)
+    assert view is not None and bytes(view) == b"first"
+    assert reader.get_many([a, c, str(uuid.uuid4())]) == {a: "first", c: ""}
+
+
+def test_torn_index_record_is_ignored(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    store = ChunkTextStore(tmp_path)
+    a = str(uuid.uuid4())
+    store.append([(a, "kept")])
+    with (tmp_path / INDEX_FILE).open("ab") as f:
+        f.write(b"\x00" * 5)
+    reopened = ChunkTextStore(tmp_path)
+    assert len(reopened) == 1
+    assert reopened.get(a) == "kept"
+
+
+class FakeEmbedder:
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.stack([np.full(4, len(t), dtype=np.float32) + np.arange(4) for t in texts])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture()
+def slim_search(tmp_path, monkeypatch):  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    monkeypatch.setenv("TEXT_STORE_PATH", str(tmp_path / "texts"))
+    get_settings.cache_clear()
+    client = QdrantClient(location=":memory:")
+    chunks = [TextChunk(f"chunk text {i} " * (i + 1), f"doc{i}.md", 0) for i in range(5)]
+    name, _ = ingest_chunks(client, FakeEmbedder(), chunks, "slim", dedup_threshold=None)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: FakeEmbedder())
+    yield svc, client, name
+    get_settings.cache_clear()
+
+
+def test_search_skips_text_and_hydrates_from_store(slim_search) -> None:  # type: ignore[no-untyped-def]
+    svc, client, name = slim_search
+    full = svc.retrieve_top_chunks("query", top_k=3, collection=name)
+    slim = svc.retrieve_top_chunks("query", top_k=3, collection=name, with_text=False)
+    assert all("text" in c for c in full)
+    assert not any("text" in c for c in slim)
+    assert [c["point_id"] for c in slim] == [c["point_id"] for c in full]
+
+    hydrated = svc.hydrate_texts(slim[:2], collection=name)
+    assert [c["text"] for c in hydrated] == [c["text"] for c in full[:2]]
+
+
+def test_hydrate_falls_back_to_qdrant_for_unknown_ids(  # type: ignore[no-untyped-def]
+    slim_search, tmp_path, monkeypatch
+) -> None:
+    svc, client, name = slim_search
+    slim = svc.retrieve_top_chunks("query", top_k=2, collection=name, with_text=False)
+    # A store that does not hold these points, e.g. ingested on another host
+    monkeypatch.setenv("TEXT_STORE_PATH", str(tmp_path / "other"))
+    get_settings.cache_clear()
+    hydrated = svc.hydrate_texts(slim, collection=name)
+    assert all(c["text"].startswith("chunk text") for c in hydrated)
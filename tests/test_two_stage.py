@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config.settings import get_settings
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.qdrant_store import (
+    collection_vector_sizes,
+    ensure_collection,
+    truncate_vectors,
+)
+
+
+def test_truncate_vectors_renormalizes() -> None:
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    out = truncate_vectors(vectors, 2)
+    assert out.shape == (2, 2)
+    np.testing.assert_allclose(out[0], [0.6, 0.8], rtol=1e-6)
+    np.testing.assert_array_equal(out[1], [0.0, 0.0])
+
+
+def test_ensure_collection_adds_lowdim_vector_to_new_collections_only() -> None:
+    client = QdrantClient(location=":memory:")
+    ensure_collection(client, "plain", 8, desired_vector_name="content")
+    ensure_collection(client, "two", 8, desired_vector_name="content", lowdim_size=4)
+    assert collection_vector_sizes(client, "plain") == {"content": 8}
+    assert collection_vector_sizes(client, "two") == {"content": 8, "content_lowdim": 4}
+    # Re-ensuring an existing collection never changes its schema
+    ensure_collection(client, "plain", 8, desired_vector_name="content", lowdim_size=4)
+    assert collection_vector_sizes(client, "plain") == {"content": 8}
+
+
+class FakeEmbedder:
+    def __init__(self, dim: int = 16) -> None:
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows = [
+            np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(self.dim) for t in texts
+        ]
+        vectors = np.stack(rows).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture()
+def two_stage_collection(monkeypatch):  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    client = QdrantClient(location=":memory:")
+    chunks = [TextChunk(f"chunk {i}", f"doc{i}.md", 0) for i in range(40)]
+    name, _ = ingest_chunks(
+        client, FakeEmbedder(), chunks, "two_stage", dedup_threshold=None, lowdim_size=8
+    )
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: FakeEmbedder())
+    svc._vector_sizes.clear()
+    yield svc, name
+    svc._vector_sizes.clear()
+    get_settings.cache_clear()
+
+
+def test_two_stage_search_rescores_prefiltered_candidates(two_stage_collection) -> None:  # type: ignore[no-untyped-def]
+    svc, name = two_stage_collection
+    full = svc.retrieve_top_chunks("query", top_k=5, collection=name, two_stage=False)
+    two = svc.retrieve_top_chunks("query", top_k=5, collection=name, two_stage=True)
+    assert len(two) == 5
+    # Scores are full-dimension cosine similarities, so shared hits score identically
+    full_scores = {c["point_id"]: c["score"] for c in full}
+    for c in two:
+        if c["point_id"] in full_scores:
+            assert c["score"] == pytest.approx(full_scores[c["point_id"]], abs=1e-5)
+    assert [c["score"] for c in two] == sorted((c["score"] for c in two), reverse=True)
+
+
+def test_oversampling_the_whole_collection_matches_full_search(  # type: ignore[no-untyped-def]
+    two_stage_collection, monkeypatch
+) -> None:
+    svc, name = two_stage_collection
+    monkeypatch.setenv("TWO_STAGE_OVERSAMPLE", "8")
+    get_settings.cache_clear()
+    full = svc.retrieve_top_chunks("query", top_k=5, collection=name, two_stage=False)
+    two = svc.retrieve_top_chunks("query", top_k=5, collection=name)
+    assert [c["point_id"] for c in two] == [c["point_id"] for c in full]
+
+
+def test_collections_without_lowdim_vector_use_single_stage(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    client = QdrantClient(location=":memory:")
+    name, _ = ingest_chunks(
+        client, FakeEmbedder(), [TextChunk("a", "a.md", 0)], "single", dedup_threshold=None
+    )
+    calls: list[object] = []
+    real_search = svc.qdrant_search
+
+    def spy(*args, **kwargs):  # type: ignore[no-untyped-def]
+        calls.append(kwargs.get("prefilter"))
+        return real_search(*args, **kwargs)
+
+    monkeypatch.setattr(svc, "qdrant_search", spy)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: FakeEmbedder())
+    svc._vector_sizes.clear()
+    assert len(svc.retrieve_top_chunks("q", top_k=3, collection=name)) == 1
+    assert calls == [None]
+    svc._vector_sizes.clear()
+
+
+def test_recreated_collections_drop_cached_vector_sizes(  # type: ignore[no-untyped-def]
+    two_stage_collection, monkeypatch
+) -> None:
+    svc, name = two_stage_collection
+    client = svc.get_qdrant_client()
+    assert svc._lowdim_size(client, name, "content") == 8
+
+    # Recreated without the prefilter vector; ingestion bumps the local epoch
+    client.delete_collection(name)
+    chunks = [TextChunk("a", "a.md", 0)]
+    ingest_chunks(client, FakeEmbedder(), chunks, name, dedup_threshold=None)
+    assert svc._lowdim_size(client, name, "content") is None
+    assert len(svc.retrieve_top_chunks("q", top_k=3, collection=name)) == 1
+
+    # Recreated by another process: picked up once CACHE_VERSION_CHECK_S has passed
+    client.delete_collection(name)
+    ensure_collection(client, name, 16, desired_vector_name="content", lowdim_size=4)
+    assert svc._lowdim_size(client, name, "content") is None
+    monkeypatch.setenv("CACHE_VERSION_CHECK_S", "0")
+    get_settings.cache_clear()
+    assert svc._lowdim_size(client, name, "content") == 4
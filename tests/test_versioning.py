@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import zlib
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config.settings import get_settings
+from app.exceptions import VectorDBError
+from app.retrieval.cache import clear_retrieval_caches
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+from app.retrieval.qdrant_store import alias_target, ensure_collection
+from app.retrieval.versioning import collection_versions, gc_versions, reindex
+
+
+class Embedder:
+    model_name = "versioning-test"
+
+    def __init__(self, dim: int = 16) -> None:
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows = [
+            np.random.default_rng(zlib.crc32(t.encode())).standard_normal(self.dim) for t in texts
+        ]
+        vectors = np.stack(rows).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _chunks(n: int, release: str) -> list[TextChunk]:
+    return [TextChunk(f"{release} passage {i}", f"doc{i}.md", 0) for i in range(n)]
+
+
+@pytest.fixture()
+def service(monkeypatch):  # type: ignore[no-untyped-def]
+    import app.retrieval.service as svc
+
+    client = QdrantClient(location=":memory:")
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: Embedder())
+    monkeypatch.setenv("QDRANT_COLLECTION", "docs")
+    monkeypatch.setenv("RETRIEVAL_CACHE_ENABLED", "false")
+    get_settings.cache_clear()
+    clear_retrieval_caches()
+    yield svc, client
+    get_settings.cache_clear()
+    clear_retrieval_caches()
+
+
+def _build(client: QdrantClient, chunks: list[TextChunk]):  # type: ignore[no-untyped-def]
+    return lambda collection: ingest_chunks(
+        client, Embedder(), chunks, collection, dedup_threshold=None
+    )
+
+
+def test_reindex_swaps_the_alias_only_after_the_build(service) -> None:  # type: ignore[no-untyped-def]
+    svc, client = service
+    first = reindex(client, "docs", _build(client, _chunks(10, "old")), keep=1)
+    assert first["collection"] == "docs_v1" and first["previous"] is None
+    assert alias_target(client, "docs") == "docs_v1"
+    assert svc.retrieve_top_chunks("old passage 3", top_k=1)[0]["text"] == "old passage 3"
+
+    seen_during_build: list[str] = []
+
+    def build(collection: str) -> None:
+        ingest_chunks(client, Embedder(), _chunks(10, "new"), collection, dedup_threshold=None)
+        # The new version is complete but not validated yet: queries still read the old one
+        seen_during_build.append(svc.retrieve_top_chunks("new passage 3", top_k=1)[0]["text"])
+
+    second = reindex(
+        client, "docs", build, embedder=Embedder(), smoke_queries=["new passage 1"], keep=1
+    )
+    assert seen_during_build and seen_during_build[0].startswith("old")
+    assert second["collection"] == "docs_v2" and second["previous"] == "docs_v1"
+    assert svc.retrieve_top_chunks("new passage 3", top_k=1)[0]["text"] == "new passage 3"
+    assert second["deleted"] == []
+
+    third = reindex(client, "docs", _build(client, _chunks(9, "newer")), keep=1)
+    assert third["collection"] == "docs_v3"
+    assert third["deleted"] == ["docs_v1"]
+    assert list(collection_versions(client, "docs")) == [2, 3]
+    assert gc_versions(client, "docs", keep=0) == ["docs_v2"]
+
+
+def test_failed_validation_keeps_the_live_version(service) -> None:  # type: ignore[no-untyped-def]
+    svc, client = service
+    reindex(client, "docs", _build(client, _chunks(10, "old")))
+
+    # Fewer than REINDEX_MIN_POINT_RATIO (0.8) of the live version's 10 points
+    with pytest.raises(VectorDBError, match="7 points, expected at least 8"):
+        reindex(client, "docs", _build(client, _chunks(7, "partial")))
+
+    # Vectors of the wrong size for the query embedder
+    def wrong_model(collection: str) -> None:
+        ingest_chunks(client, Embedder(8), _chunks(10, "new"), collection, dedup_threshold=None)
+
+    with pytest.raises(VectorDBError, match="smoke query 'new passage 1' failed"):
+        reindex(client, "docs", wrong_model, embedder=Embedder(), smoke_queries=["new passage 1"])
+
+    def crash(collection: str) -> None:
+        ingest_chunks(client, Embedder(), _chunks(3, "new"), collection, dedup_threshold=None)
+        raise RuntimeError("embedding service down")
+
+    with pytest.raises(RuntimeError):
+        reindex(client, "docs", crash)
+
+    assert alias_target(client, "docs") == "docs_v1"
+    assert list(collection_versions(client, "docs")) == [1]
+    assert svc.retrieve_top_chunks("old passage 3", top_k=1)[0]["text"] == "old passage 3"
+
+
+def test_plain_collections_and_incremental_ingest(service) -> None:  # type: ignore[no-untyped-def]
+    _, client = service
+    ingest_chunks(client, Embedder(), _chunks(3, "legacy"), "legacy", dedup_threshold=None)
+    built: list[str] = []
+    with pytest.raises(VectorDBError, match="legacy is a collection, not an alias"):
+        reindex(client, "legacy", built.append)
+    assert built == []
+
+    # Ingesting into the alias (without --reindex) adds to the live version
+    reindex(client, "docs", _build(client, _chunks(4, "old")))
+    assert ensure_collection(client, "docs", 16, desired_vector_name="content") == (
+        "docs_v1",
+        "content",
+    )
+    ingest_chunks(client, Embedder(), _chunks(2, "extra"), "docs", dedup_threshold=None)
+    assert client.count("docs_v1").count == 6
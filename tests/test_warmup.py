@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from qdrant_client import QdrantClient
+
+import app.engine.warmup as warmup
+from app.config.settings import get_settings
+from app.engine.warmup import WarmupQuery
+from app.main import app
+from app.retrieval.cache import clear_retrieval_caches
+from app.retrieval.chunking import TextChunk
+from app.retrieval.ingest_cli import ingest_chunks
+
+
+def _record(query: str, message: str = "Starting RAG query", **extra: object) -> str:
+    return json.dumps({"message": message, "query": query, "top_k": 5, "rerank": False, **extra})
+
+
+def test_log_queries_are_ranked_by_frequency(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    lines = [
+        _record("What is\tRAG?"),
+        _record("  What is   RAG? "),
+        _record("why rerank?"),
+        _record("What is RAG?"),
+        _record("why rerank?", rerank=True),
+        _record("filtered", filters={"source_ids": ["a.md"]}),
+        _record("ignored", message="Retrieved chunks"),
+        '{"message": "Starting RAG query", "query": ',  # truncated line
+        "plain text mentioning Starting RAG query",
+    ]
+    (tmp_path / "app.log").write_text("\n".join(lines[:5]) + "\n", encoding="utf-8")
+    with gzip.open(tmp_path / "app.log.1.gz", "wt", encoding="utf-8") as f:
+        f.write("\n".join(lines[5:]) + "\n")
+
+    paths = warmup.expand_log_paths(f"{tmp_path}/app.log, {tmp_path}/app.log.*.gz")
+    assert len(paths) == 2
+    queries = warmup.queries_from_logs(paths, top_n=10)
+    assert queries[0] == WarmupQuery("What is RAG?", 5, False)
+    assert set(queries[1:]) == {WarmupQuery("why rerank?"), WarmupQuery("why rerank?", 5, True)}
+    assert warmup.queries_from_logs(paths, top_n=1) == [WarmupQuery("What is RAG?")]
+
+
+def test_golden_questions_top_up_the_logged_ones(tmp_path, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    (tmp_path / "app.log").write_text(_record("What does RAG combine?") + "\n", encoding="utf-8")
+    monkeypatch.setenv("WARMUP_LOG_PATHS", str(tmp_path / "*.log"))
+    monkeypatch.setenv("WARMUP_TOP_N", "2")
+    get_settings.cache_clear()
+    try:
+        queries = warmup.select_queries(get_settings())
+    finally:
+        get_settings.cache_clear()
+    # The golden set's first question is already logged, so the second one fills the slot
+    assert [q.query for q in queries] == ["What does RAG combine?", "Why use reranking?"]
+
+
+def test_warmup_bounds_concurrency_and_respects_the_budget() -> None:
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    replayed: list[str] = []
+
+    class SlowEngine:
+        def prefetch(self, query: str, top_k: int, rerank: bool) -> dict[str, float]:
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+                replayed.append(query)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            if query == "q1":
+                raise RuntimeError("vector DB unavailable")
+            return {}
+
+    queries = [WarmupQuery(f"q{i}") for i in range(40)]
+    started = time.monotonic()
+    summary = warmup.run_warmup(
+        queries, concurrency=2, budget_s=0.3, engine_factory=SlowEngine  # type: ignore[arg-type]
+    )
+    assert time.monotonic() - started < 1.0
+    assert peak <= 2
+    assert summary["budget_exhausted"] is True
+    assert summary["failed"] == 1
+    assert summary["skipped"] > 0
+    total = summary["completed"] + summary["failed"] + summary["skipped"] + summary["in_flight"]
+    assert total == summary["queries"] == 40
+    # The most frequent queries are replayed first
+    assert set(replayed[:2]) == {"q0", "q1"}
+
+
+def test_prefetch_fills_the_caches_real_queries_use(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    import app.llm.client as llm
+    import app.retrieval.service as svc
+    from app.engine.rag_engine import RAGEngine
+
+    class Embedder:
+        model_name = "warm"
+
+        def embed(self, texts: list[str]) -> np.ndarray:
+            return np.array([[1.0, float(len(t) % 5), 0.5] for t in texts], dtype=np.float32)
+
+    class FakeLLM:
+        def generate(self, system_prompt: str, user_prompt: str) -> str:
+            return "chunk"
+
+    client = QdrantClient(location=":memory:")
+    chunks = [TextChunk(f"chunk {i}", f"doc{i}.md", 0) for i in range(12)]
+    name, _ = ingest_chunks(client, Embedder(), chunks, "warm", dedup_threshold=None)
+    monkeypatch.setattr(svc, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(svc, "get_embedder", lambda: Embedder())
+    monkeypatch.setattr(llm, "LLMClient", lambda: FakeLLM())
+    monkeypatch.setenv("QDRANT_COLLECTION", name)
+    get_settings.cache_clear()
+    clear_retrieval_caches()
+    try:
+        engine = RAGEngine()
+        cold = engine.prefetch("chunk 3", top_k=5, rerank=False)
+        assert cold["search_cache_hit"] == 0.0
+        result = engine.query("chunk 3", top_k=5, rerank=False)
+        assert result.timings["embedding_cache_hit"] == 1.0
+        assert result.timings["search_cache_hit"] == 1.0
+    finally:
+        get_settings.cache_clear()
+        clear_retrieval_caches()
+
+
+def test_ready_waits_for_cache_warmup(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    release = threading.Event()
+
+    def fake_warm_caches() -> dict[str, object]:
+        release.wait(5)
+        warmup._update(state="done", completed=3)
+        return warmup.warmup_status()
+
+    monkeypatch.setenv("PRELOAD_MODELS", "false")
+    get_settings.cache_clear()
+    monkeypatch.setattr(warmup, "warm_caches", fake_warm_caches)
+    client = TestClient(app)
+    try:
+        thread = warmup.start_background_warmup()
+        resp = client.get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["warmup"]["state"] in warmup.PENDING_STATES
+
+        release.set()
+        thread.join(5)
+        resp = client.get("/ready")
+        assert resp.status_code == 200
+        assert resp.json()["warmup"] == {
+            "state": "done",
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "completed": 3,
+        }
+    finally:
+        warmup.reset_warmup()
+        get_settings.cache_clear()